@@ -0,0 +1,318 @@
+"""
+Answer cache module for the RAG application.
+Returns a stored answer when the same or a paraphrased question is asked
+again about the same index, so repeat questions skip retrieval and the LLM.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import FAISS
+
+# Environment variable overriding the default similarity threshold
+SIMILARITY_THRESHOLD_ENV_VAR = "RAG_ANSWER_CACHE_THRESHOLD"
+
+def _read_similarity_threshold(default: float = 0.95) -> float:
+    """
+    Read the default similarity threshold from the environment.
+
+    Args:
+        default: The threshold used when the environment variable is not set
+
+    Returns:
+        The cosine similarity threshold
+
+    Raises:
+        ValueError: If the environment variable is not a number between -1 and 1
+    """
+    value = os.environ.get(SIMILARITY_THRESHOLD_ENV_VAR)
+    if value is None:
+        return default
+    try:
+        threshold = float(value)
+    except ValueError:
+        raise ValueError(f"{SIMILARITY_THRESHOLD_ENV_VAR} must be a number, got {value!r}.") from None
+    if not -1.0 <= threshold <= 1.0:
+        raise ValueError(f"{SIMILARITY_THRESHOLD_ENV_VAR} must be a cosine similarity between -1 and 1, "
+                         f"got {value!r}.")
+    return threshold
+
+
+# Default cosine similarity above which two questions get the same answer
+DEFAULT_SIMILARITY_THRESHOLD = _read_similarity_threshold()
+
+# Default time after which a cached answer expires
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Default maximum number of cached answers
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so that copies differing only in case or whitespace match.
+
+    Args:
+        question: The question
+
+    Returns:
+        The lower-cased question with runs of whitespace collapsed
+    """
+    return " ".join(question.lower().split())
+
+
+def get_index_version(vector_store: VectorStore) -> str:
+    """
+    Get a version string that changes whenever the content of an index changes.
+
+    For FAISS, the version is derived from the number of vectors and the
+    docstore ids of the first and last ones. New chunks always get new
+    random ids and are appended at the end, and deleting chunks changes the
+    count, so every update changes the version. The same index loaded again,
+    in any process, keeps its version. A store made of several FAISS
+    stores, such as a ShardedVectorStore, exposes them as `shards` and
+    combines their versions. Other vector stores are versioned by object identity.
+
+    Args:
+        vector_store: The vector store
+
+    Returns:
+        The version string
+    """
+    shards = getattr(vector_store, "shards", None)
+    if shards is not None:
+        shard_versions = ":".join(get_index_version(shard) for shard in shards)
+        return hashlib.sha1(shard_versions.encode("utf-8")).hexdigest()
+    if not isinstance(vector_store, FAISS):
+        return f"{type(vector_store).__name__}-{id(vector_store)}"
+
+    count = vector_store.index.ntotal
+    first_id = vector_store.index_to_docstore_id[0] if count else ""
+    last_id = vector_store.index_to_docstore_id[count - 1] if count else ""
+    return hashlib.sha1(f"{count}:{first_id}:{last_id}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """An answer stored in the answer cache."""
+
+    index_version: str
+    question: str
+    embedding: np.ndarray
+    answer: str
+    context: List[Document] = field(default_factory=list)
+    created_at: float = 0.0
+
+
+class SemanticAnswerCache:
+    """
+    An in-memory cache of answers keyed by index version and question embedding.
+
+    A question hits the cache when its normalized text matches a cached
+    question, or when the cosine similarity of its embedding with a cached
+    question of the same index version reaches the threshold. Entries
+    expire after a time to live, and the least recently used entries are
+    evicted beyond the maximum size. The cache is safe to share between
+    threads, such as Streamlit sessions.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            similarity_threshold: Cosine similarity above which a cached answer is returned
+            ttl_seconds: Time after which a cached answer expires, or None to keep answers until evicted
+            max_entries: Maximum number of cached answers
+            clock: Function returning the current time in seconds
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._next_entry_id = 0
+        # Every entry in least recently used order
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        # The entries of each index version, and their normalized questions
+        self._version_entries: Dict[str, List[int]] = {}
+        self._exact_entries: Dict[tuple, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the cache.
+
+        Returns:
+            A dict with the number of entries, hits, misses, evictions, expirations and invalidations
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def lookup(
+        self,
+        index_version: str,
+        question: str,
+        embedding: Optional[Sequence[float]] = None,
+    ) -> Optional[CachedAnswer]:
+        """
+        Find the cached answer of a question.
+
+        Args:
+            index_version: The version of the index the question is asked about
+            question: The question
+            embedding: The question embedding, or None to match the question text only
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        with self._lock:
+            # Drop expired answers first, so they cannot shadow a fresh similar one
+            self._purge_expired(index_version)
+
+            entry_id = self._exact_entries.get((index_version, normalize_question(question)))
+            if entry_id is None and embedding is not None:
+                entry_id = self._find_similar(index_version, _normalize_vector(embedding))
+
+            if entry_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id]
+
+    def store(
+        self,
+        index_version: str,
+        question: str,
+        embedding: Sequence[float],
+        answer: str,
+        context: Optional[List[Document]] = None,
+    ) -> None:
+        """
+        Store the answer of a question.
+
+        Args:
+            index_version: The version of the index the question was asked about
+            question: The question
+            embedding: The question embedding
+            answer: The answer
+            context: The retrieved documents the answer was generated from
+        """
+        with self._lock:
+            exact_key = (index_version, normalize_question(question))
+            if exact_key in self._exact_entries:
+                self._remove(self._exact_entries[exact_key])
+
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+            self._entries[entry_id] = CachedAnswer(
+                index_version=index_version,
+                question=question,
+                embedding=_normalize_vector(embedding),
+                answer=answer,
+                context=list(context or []),
+                created_at=self.clock(),
+            )
+            self._version_entries.setdefault(index_version, []).append(entry_id)
+            self._exact_entries[exact_key] = entry_id
+
+            while len(self._entries) > self.max_entries:
+                oldest_entry_id = next(iter(self._entries))
+                self._remove(oldest_entry_id)
+                self.evictions += 1
+
+    def invalidate(self, index_version: Optional[str] = None) -> int:
+        """
+        Remove the cached answers of an index version, or every cached answer.
+
+        Args:
+            index_version: The version whose answers are removed, or None for all of them
+
+        Returns:
+            The number of removed answers
+        """
+        with self._lock:
+            if index_version is None:
+                entry_ids = list(self._entries)
+            else:
+                entry_ids = list(self._version_entries.get(index_version, []))
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            self.invalidations += len(entry_ids)
+            return len(entry_ids)
+
+    def _find_similar(self, index_version: str, embedding: np.ndarray) -> Optional[int]:
+        """Find the most similar cached question of an index version above the threshold."""
+        entry_ids = self._version_entries.get(index_version)
+        if not entry_ids:
+            return None
+
+        embeddings = np.stack([self._entries[entry_id].embedding for entry_id in entry_ids])
+        similarities = embeddings @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return entry_ids[best]
+        return None
+
+    def _purge_expired(self, index_version: str) -> None:
+        """Remove the expired entries of an index version."""
+        if self.ttl_seconds is None:
+            return
+        for entry_id in list(self._version_entries.get(index_version, [])):
+            if self._is_expired(self._entries[entry_id]):
+                self._remove(entry_id)
+                self.expirations += 1
+
+    def _is_expired(self, entry: CachedAnswer) -> bool:
+        """Check whether an entry has outlived the time to live."""
+        return self.ttl_seconds is not None and self.clock() - entry.created_at > self.ttl_seconds
+
+    def _remove(self, entry_id: int) -> None:
+        """Remove an entry from every lookup structure."""
+        entry = self._entries.pop(entry_id)
+        version_entries = self._version_entries[entry.index_version]
+        version_entries.remove(entry_id)
+        if not version_entries:
+            del self._version_entries[entry.index_version]
+        exact_key = (entry.index_version, normalize_question(entry.question))
+        if self._exact_entries.get(exact_key) == entry_id:
+            del self._exact_entries[exact_key]
+
+
+def _normalize_vector(embedding: Sequence[float]) -> np.ndarray:
+    """Scale a vector to unit length, so dot products are cosine similarities."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -8,8 +8,14 @@ import streamlit as st
 import sys
 from typing import Optional
 
-from document_processor import load_and_process_url
-from rag_engine import create_rag_chain, query_rag_chain
+from answer_cache import SemanticAnswerCache
+from context_packer import ContextPacker
+from document_processor import get_embedding_backend, load_shared_url_index, warm_up_embeddings
+from embedding_cache import ChunkEmbeddingCache
+from index_cache import IndexCache
+from index_registry import IndexRegistry
+from instrumentation import SamplingProfiler, get_metrics
+from rag_engine import create_rag_chain, stream_rag_chain
 
 # Set page configuration
 st.set_page_config(
@@ -25,6 +31,7 @@ This application allows you to ask questions about the content of any web page.
 1. Enter a URL
 2. Wait for the content to be processed
 3. Ask questions about the content
+4. Optionally add more pages, which are indexed in the background while you keep asking
 """)
 
 # Check for Anthropic API key
@@ -46,9 +53,47 @@ def get_api_key():
 api_key = get_api_key()
 os.environ["ANTHROPIC_API_KEY"] = api_key
 
-# Initialize session state variables
-if "vector_store" not in st.session_state:
-    st.session_state.vector_store = None
+# Share one on-disk index cache across sessions. Indexes are opened memory-mapped
+# with their chunks in SQLite, so sessions share one copy instead of each loading their own
+@st.cache_resource
+def get_index_cache():
+    return IndexCache(disk_backed=True)
+
+# Share the loaded indexes across sessions: sessions on the same page use one index,
+# built once, and unused indexes are evicted to keep memory under RAG_INDEX_REGISTRY_MB
+@st.cache_resource
+def get_index_registry():
+    return IndexRegistry()
+
+# Share one chunk embedding cache across sessions
+@st.cache_resource
+def get_embedding_cache():
+    return ChunkEmbeddingCache()
+
+# Share one answer cache across sessions, so a question asked again about the
+# same page is answered without retrieval or a call to Claude
+@st.cache_resource
+def get_answer_cache():
+    return SemanticAnswerCache()
+
+# Load the shared embedding model once per process, before the first URL is processed.
+# Its backend is chosen with RAG_EMBEDDING_BACKEND, onnx-int8 runs on CPUs without torch
+embedding_stats = warm_up_embeddings()
+st.sidebar.caption(
+    f"Embedding model ({get_embedding_backend()}) loaded in {embedding_stats['load_seconds']:.2f}s, "
+    f"process memory {embedding_stats['resident_memory_bytes'] / (1024 * 1024):.0f} MB"
+)
+
+# Initialize session state variables. The session holds a handle to a shared index,
+# which is released when the session processes another URL or is closed. Pages added
+# go to the session's own live index, a copy of the shared index that other sessions
+# never see, and the registry counts its memory against the budget until it is released
+if "index_handle" not in st.session_state:
+    st.session_state.index_handle = None
+if "live_index" not in st.session_state:
+    st.session_state.live_index = None
+if "pending_adds" not in st.session_state:
+    st.session_state.pending_adds = []
 if "rag_chain" not in st.session_state:
     st.session_state.rag_chain = None
 if "chat_history" not in st.session_state:
@@ -60,16 +105,43 @@ url_input = st.text_input("Enter a URL to analyze:", placeholder="https://exampl
 if url_input and st.button("Process URL"):
     with st.spinner("Loading and processing the web page..."):
         try:
-            st.session_state.vector_store = load_and_process_url(url_input)
-            st.session_state.rag_chain = create_rag_chain(st.session_state.vector_store)
+            index_handle = load_shared_url_index(
+                url_input, get_index_registry(), get_index_cache(), get_embedding_cache()
+            )
+            if st.session_state.index_handle is not None:
+                st.session_state.index_handle.release()
+            st.session_state.index_handle = index_handle
+            st.session_state.live_index = index_handle.get_live_index(embedding_cache=get_embedding_cache())
+            st.session_state.pending_adds = []
+            # Pack the retrieved chunks into a token budget, so prompts stay small
+            st.session_state.rag_chain = create_rag_chain(
+                st.session_state.live_index, answer_cache=get_answer_cache(), context_packer=ContextPacker()
+            )
             st.success("Web page processed successfully! You can now ask questions.")
         except Exception as e:
             st.error(f"Error processing the URL: {str(e)}")
 
+# Add the page to the current knowledge base in the background, questions keep
+# being answered from the current pages until it is indexed
+if url_input and st.session_state.live_index is not None and st.button("Add to knowledge base"):
+    st.session_state.pending_adds.append((url_input, st.session_state.live_index.add_url(url_input)))
+
+# Report the pages added since the last run
+for added_url, add_future in list(st.session_state.pending_adds):
+    if not add_future.done():
+        st.info(f"Indexing {added_url} in the background...")
+        continue
+    st.session_state.pending_adds.remove((added_url, add_future))
+    try:
+        add_stats = add_future.result()
+        st.success(f"Added {added_url}: {add_stats['added']} chunks added, {add_stats['removed']} removed.")
+    except Exception as e:
+        st.error(f"Error adding {added_url}: {str(e)}")
+
 # Q&A section
 st.header("Ask Questions")
 
-if st.session_state.vector_store is not None and st.session_state.rag_chain is not None:
+if st.session_state.index_handle is not None and st.session_state.rag_chain is not None:
     # Display chat history
     for i, (question, answer) in enumerate(st.session_state.chat_history):
         with st.chat_message("user"):
@@ -85,17 +157,77 @@ if st.session_state.vector_store is not None and st.session_state.rag_chain is n
             st.write(question)
         
         with st.chat_message("assistant"):
-            with st.spinner("Generating answer..."):
-                try:
-                    answer = query_rag_chain(st.session_state.rag_chain, question)
-                    st.write(answer)
-                    # Add to chat history
-                    st.session_state.chat_history.append((question, answer))
-                except Exception as e:
-                    st.error(f"Error generating answer: {str(e)}")
+            try:
+                # Render the answer as it is generated
+                answer_stream = stream_rag_chain(st.session_state.rag_chain, question)
+                st.write_stream(answer_stream)
+                source = " (cached)" if answer_stream.cached else ""
+                packing = ""
+                if answer_stream.packing_stats:
+                    packing = (f", context {answer_stream.packing_stats['tokens_after']} tokens "
+                               f"({answer_stream.packing_stats['tokens_saved']} saved)")
+                st.caption(
+                    f"First token {answer_stream.time_to_first_token or 0:.2f}s, "
+                    f"total {answer_stream.total_seconds:.2f}s{packing}{source}"
+                )
+                # Add to chat history
+                st.session_state.chat_history.append((question, answer_stream.answer))
+            except Exception as e:
+                st.error(f"Error generating answer: {str(e)}")
+
+    answer_cache_stats = get_answer_cache().stats()
+    st.sidebar.caption(
+        f"Answer cache: {answer_cache_stats['hits']} hits, {answer_cache_stats['misses']} misses, "
+        f"{answer_cache_stats['entries']} answers"
+    )
+    live_index_stats = st.session_state.live_index.stats()
+    st.sidebar.caption(
+        f"Knowledge base: {live_index_stats['chunks']} chunks, {live_index_stats['adds']} pages added, "
+        f"{len(st.session_state.pending_adds)} being indexed"
+    )
+    registry_stats = get_index_registry().stats()
+    st.sidebar.caption(
+        f"Shared indexes: {registry_stats['indexes']} ({registry_stats['in_use']} in use), "
+        f"{registry_stats['memory_bytes'] / (1024 * 1024):.0f} of "
+        f"{registry_stats['memory_budget_bytes'] / (1024 * 1024):.0f} MB, "
+        f"{registry_stats['builds']} builds, {registry_stats['hits'] + registry_stats['waits']} reuses"
+    )
 else:
     st.info("Please process a URL first to ask questions about its content.")
 
+# Share one sampling profiler across sessions, it samples every thread of the process
+@st.cache_resource
+def get_profiler():
+    return SamplingProfiler()
+
+# Optional performance panel with the time and counters of every stage
+if st.sidebar.checkbox("Show performance panel"):
+    with st.expander("Performance", expanded=True):
+        stage_rows = [
+            {
+                "stage": stage_name,
+                "calls": totals["calls"],
+                "total s": round(totals["seconds"], 3),
+                "mean ms": round(1000 * totals["mean_seconds"], 1),
+                "max ms": round(1000 * totals["max_seconds"], 1),
+                **totals["counters"],
+            }
+            for stage_name, totals in get_metrics().snapshot().items()
+        ]
+        if stage_rows:
+            st.dataframe(stage_rows, use_container_width=True)
+        else:
+            st.caption("No stage has run yet.")
+        st.download_button("Download JSON", get_metrics().to_json(), file_name="rag_metrics.json")
+        st.download_button("Download Prometheus metrics", get_metrics().to_prometheus(), file_name="rag_metrics.prom")
+        
+        profiler = get_profiler()
+        if st.toggle("Sampling profiler", value=profiler.running):
+            profiler.start()
+            st.code(profiler.format_report(), language=None)
+        else:
+            profiler.stop()
+
 # Footer
 st.markdown("---")
 st.markdown("Powered by LangChain, Claude, and Streamlit")
@@ -0,0 +1,293 @@
+"""
+Batch query module for the RAG application.
+Answers many questions against one RAG chain with bounded concurrency,
+backing off when the model API reports rate limits or overload, and writes
+the results as JSON Lines as they complete.
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO
+
+# Default number of questions answered at the same time
+DEFAULT_CONCURRENCY = 8
+
+# Default number of attempts per question before it is reported as failed
+DEFAULT_MAX_ATTEMPTS = 6
+
+# Number of questions read ahead per worker, bounding the questions held in memory
+QUEUED_QUESTIONS_PER_WORKER = 2
+
+# Delay before the first retry, doubled after every further rate-limited attempt
+DEFAULT_BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# HTTP status codes of rate limit (429) and overload (529) errors
+RETRYABLE_STATUS_CODES = {429, 529}
+
+
+def read_questions_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read the questions of a JSON Lines file one line at a time.
+
+    Each line holds an object with a "question" field and optionally an "id"
+    and other fields, which are copied to the result, or a plain JSON
+    string. Blank lines are skipped.
+
+    Args:
+        path: Path of the questions file
+
+    Yields:
+        One dict per question, with an "id" defaulting to the line number
+
+    Raises:
+        ValueError: If a line has no question
+    """
+    with open(path) as questions_file:
+        for line_number, line in enumerate(questions_file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            if "question" not in item:
+                raise ValueError(f"Line {line_number} of {path} has no question")
+            item.setdefault("id", line_number)
+            yield item
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check whether an error is a rate limit or overload response of the model API.
+
+    Args:
+        error: The error raised by the chain
+
+    Returns:
+        True if the question should be retried after a delay
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Get the delay requested by the retry-after header of an error response.
+
+    Args:
+        error: The error raised by the chain
+
+    Returns:
+        The delay in seconds, or None if the response did not request one
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitGate:
+    """
+    A pause shared by every worker of a batch.
+
+    When one question is rate limited, new attempts of every worker wait
+    until the backoff has passed instead of adding to the overload.
+    """
+
+    def __init__(self):
+        self.resume_at = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Hold new attempts for at least this many seconds."""
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    async def wait(self) -> None:
+        """Wait until attempts may be made again."""
+        delay = self.resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.resume_at - time.monotonic()
+
+
+async def aanswer_question(
+    rag_chain: Any,
+    item: Dict[str, Any],
+    gate: RateLimitGate,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    base_backoff_seconds: float = DEFAULT_BASE_BACKOFF_SECONDS,
+) -> Dict[str, Any]:
+    """
+    Answer one question, retrying rate-limited attempts with exponential backoff.
+
+    Args:
+        rag_chain: The RAG chain to query
+        item: The question dict, as read by read_questions_file()
+        gate: The pause shared by the workers of the batch
+        max_attempts: Number of attempts before the question is reported as failed
+        base_backoff_seconds: Delay before the first retry
+
+    Returns:
+        The question dict with the answer, the sources of the context, the
+        number of attempts and the time taken, or the error
+
+    Raises:
+        ValueError: If max_attempts is less than 1
+    """
+    if max_attempts < 1:
+        raise ValueError(f"max_attempts must be at least 1, got {max_attempts}.")
+
+    result = dict(item)
+    start_time = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        await gate.wait()
+        try:
+            state = await rag_chain.ainvoke({"question": item["question"]})
+        except Exception as e:
+            if is_retryable_error(e) and attempt < max_attempts:
+                # Honour the requested delay, otherwise back off exponentially with jitter
+                delay = get_retry_after_seconds(e)
+                if delay is None:
+                    delay = min(MAX_BACKOFF_SECONDS, base_backoff_seconds * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                gate.pause(delay)
+                continue
+            result["error"] = str(e)
+            break
+        result["answer"] = state["answer"]
+        result["sources"] = [document.metadata.get("source") for document in state.get("context", [])]
+        result["cached"] = bool(state.get("cached"))
+        break
+
+    result["attempts"] = attempt
+    result["seconds"] = round(time.perf_counter() - start_time, 3)
+    return result
+
+
+async def arun_batch(
+    rag_chain: Any,
+    questions: Iterable[Dict[str, Any]],
+    on_result: Callable[[Dict[str, Any]], None],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    base_backoff_seconds: float = DEFAULT_BASE_BACKOFF_SECONDS,
+) -> Dict[str, float]:
+    """
+    Answer a batch of questions with at most `concurrency` in flight.
+
+    A fixed number of workers take questions from a bounded queue, which
+    is filled from the questions as the workers make room, so a lazy
+    iterable such as read_questions_file() is never read far ahead of the
+    answers. Each result is passed to on_result as soon as it completes,
+    so results arrive in completion order.
+
+    Args:
+        rag_chain: The RAG chain to query
+        questions: The question dicts, as yielded by read_questions_file()
+        on_result: Called with every result
+        concurrency: Maximum number of questions answered at the same time
+        max_attempts: Number of attempts per question before it is reported as failed
+        base_backoff_seconds: Delay before the first retry of a rate-limited question
+
+    Returns:
+        A dict with the number of answered and failed questions, the number
+        of retries, the total time and the questions answered per second
+
+    Raises:
+        ValueError: If max_attempts is less than 1, or reading the questions fails
+    """
+    if max_attempts < 1:
+        raise ValueError(f"max_attempts must be at least 1, got {max_attempts}.")
+
+    num_workers = max(1, concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=num_workers * QUEUED_QUESTIONS_PER_WORKER)
+    gate = RateLimitGate()
+    stats = {"answered": 0, "failed": 0, "retries": 0}
+    read_errors = []
+
+    async def reader():
+        try:
+            for item in questions:
+                await queue.put(item)
+        except Exception as e:
+            # Let the workers finish the questions already read before reporting the error
+            read_errors.append(e)
+        finally:
+            for _ in range(num_workers):
+                await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            result = await aanswer_question(rag_chain, item, gate, max_attempts, base_backoff_seconds)
+            stats["failed" if "error" in result else "answered"] += 1
+            stats["retries"] += result["attempts"] - 1
+            on_result(result)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(reader(), *(worker() for _ in range(num_workers)))
+    total_seconds = time.perf_counter() - start_time
+    if read_errors:
+        raise read_errors[0]
+
+    completed = stats["answered"] + stats["failed"]
+    stats["seconds"] = total_seconds
+    stats["questions_per_second"] = completed / total_seconds if total_seconds > 0 else 0.0
+    return stats
+
+
+def write_result(output_file: TextIO, result: Dict[str, Any]) -> None:
+    """
+    Write one result as a JSON line and flush it, so partial results survive an interruption.
+
+    Args:
+        output_file: The open output file
+        result: The result dict
+    """
+    output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+    output_file.flush()
+
+
+def run_batch_file(
+    rag_chain: Any,
+    questions_path: str,
+    output_path: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Dict[str, float]:
+    """
+    Answer the questions of a JSON Lines file and write the results to another.
+
+    Args:
+        rag_chain: The RAG chain to query
+        questions_path: Path of the questions file
+        output_path: Path of the results file, one JSON object per line in completion order
+        concurrency: Maximum number of questions answered at the same time
+        max_attempts: Number of attempts per question before it is reported as failed
+
+    Returns:
+        The statistics of arun_batch()
+
+    Raises:
+        ValueError: If max_attempts is less than 1, or a line of the questions file has no question
+    """
+    if max_attempts < 1:
+        raise ValueError(f"max_attempts must be at least 1, got {max_attempts}.")
+
+    with open(output_path, "w") as output_file:
+        return asyncio.run(arun_batch(
+            rag_chain,
+            read_questions_file(questions_path),
+            lambda result: write_result(output_file, result),
+            concurrency=concurrency,
+            max_attempts=max_attempts,
+        ))
@@ -0,0 +1,101 @@
+"""
+Benchmark of the overhead of building a RAG chain and of the model client per question.
+
+Compares building a chain with the prompt pulled from the LangChain hub,
+as before, with the bundled prompt, and creating a new ChatAnthropic client
+for every question, as before, with the shared client of get_llm(). No
+request is sent to Anthropic. The hub pull needs network access and is
+reported as unavailable when offline.
+
+Run from the repository root:
+    python -m benchmarks.bench_chain_construction --repeats 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from rag_engine import LLM_MAX_TOKENS, LLM_MODEL_NAME, LLM_TEMPERATURE, create_rag_chain, get_llm
+
+
+def time_calls(function: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """Call a function several times and report the first and the median call in milliseconds."""
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return {"first_ms": 1000 * durations[0], "median_ms": 1000 * statistics.median(durations)}
+
+
+def pull_hub_prompt():
+    """Pull the RAG prompt from the LangChain hub, as chains were built before."""
+    from langchain import hub
+    return hub.pull("rlm/rag-prompt")
+
+
+def create_client_per_question():
+    """Create a model client and its HTTP client, as every question did before."""
+    llm = ChatAnthropic(temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS, model_name=LLM_MODEL_NAME)
+    return llm._client
+
+
+def use_shared_client():
+    """Get the shared model client and its HTTP client."""
+    return get_llm()._client
+
+
+def run_benchmark(repeats: int = 50) -> List[Dict[str, object]]:
+    """
+    Measure chain construction and per-question client overhead.
+
+    Args:
+        repeats: Number of times each step is measured
+
+    Returns:
+        One result dict per measured step
+    """
+    # The client is never used to send a request, so any key will do
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark-key")
+    vector_store = FAISS.from_texts(["A chunk"], DeterministicFakeEmbedding(size=16))
+
+    results = []
+    try:
+        results.append({"step": "hub prompt pull", **time_calls(pull_hub_prompt, min(repeats, 5))})
+    except Exception as e:
+        results.append({"step": "hub prompt pull", "error": str(e).splitlines()[0][:80]})
+    results.append({"step": "chain, bundled prompt", **time_calls(lambda: create_rag_chain(vector_store), repeats)})
+    results.append({"step": "client per question", **time_calls(create_client_per_question, repeats)})
+    results.append({"step": "shared client", **time_calls(use_shared_client, repeats)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG chain construction and model client overhead")
+    parser.add_argument("--repeats", type=int, default=50, help="Number of times each step is measured")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeats)
+
+    print(f"{'step':<24}{'first ms':>10}{'median ms':>11}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['step']:<24}  unavailable: {result['error']}")
+        else:
+            print(f"{result['step']:<24}{result['first_ms']:>10.2f}{result['median_ms']:>11.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark of chunk de-duplication on a synthetic multi-page documentation site.
+
+The site is built from the saved HTML fixtures the way documentation sites
+tend to look: every page repeats a few shared notices, and each page is
+published for several product versions with small edits between versions.
+Reports how many chunks are dropped before embedding and the time spent
+de-duplicating.
+
+Run from the repository root:
+    python -m benchmarks.bench_chunk_dedup
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from chunk_dedup import ChunkDeduplicator
+from document_processor import DEDUP_THRESHOLD, create_text_splitter
+from html_extractor import extract_text_blocks
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "docs_large.html")
+
+SHARED_NOTICES = [
+    "Note: this documentation covers a product that is still in active development. Interfaces described "
+    "here may change between minor releases, so pin the version you depend on and read the release notes "
+    "before upgrading. Report documentation problems through the issue tracker of the project.",
+    "Copyright the project authors. The documentation is licensed under the Creative Commons Attribution "
+    "4.0 License and code samples are licensed under the Apache 2.0 License. Trademarks belong to their "
+    "respective owners and are used for identification purposes only.",
+]
+
+
+def build_site(page_count: int, versions: int, edit_rate: float, seed: int = 7) -> List[Document]:
+    """
+    Build the pages of a synthetic documentation site.
+
+    Args:
+        page_count: Number of distinct pages per version
+        versions: Number of versions each page is published for
+        edit_rate: Fraction of blocks changed between consecutive versions
+        seed: Seed of the random edits
+
+    Returns:
+        One document per page and version
+    """
+    random_generator = random.Random(seed)
+    with open(FIXTURE_PATH, encoding="utf-8") as fixture_file:
+        blocks = extract_text_blocks(fixture_file.read())
+
+    blocks_per_page = max(len(blocks) // page_count, 1)
+    documents = []
+    for page in range(page_count):
+        page_blocks = blocks[page * blocks_per_page:(page + 1) * blocks_per_page]
+        for version in range(versions):
+            if version:
+                # A few blocks change in every new version
+                page_blocks = [
+                    block + f" Changed in version {version}." if random_generator.random() < edit_rate else block
+                    for block in page_blocks
+                ]
+            text = "\n\n".join([SHARED_NOTICES[0]] + page_blocks + [SHARED_NOTICES[1]])
+            documents.append(Document(
+                page_content=text,
+                metadata={"source": f"https://docs.example.com/v{version + 1}/page{page}"},
+            ))
+    return documents
+
+
+def run_benchmark(page_count: int = 40, versions: int = 3, edit_rate: float = 0.1) -> Dict[str, object]:
+    """
+    Split the synthetic site and de-duplicate its chunks.
+
+    Args:
+        page_count: Number of distinct pages per version
+        versions: Number of versions each page is published for
+        edit_rate: Fraction of blocks changed between consecutive versions
+
+    Returns:
+        A dict with the chunk counts and timings
+    """
+    documents = build_site(page_count, versions, edit_rate)
+    chunks = create_text_splitter().split_documents(documents)
+
+    deduplicator = ChunkDeduplicator(threshold=DEDUP_THRESHOLD)
+    start_time = time.perf_counter()
+    kept_chunks = deduplicator.filter(chunks)
+    dedup_seconds = time.perf_counter() - start_time
+
+    return {
+        "pages": len(documents),
+        "threshold": DEDUP_THRESHOLD,
+        "chunks": len(chunks),
+        "kept_chunks": len(kept_chunks),
+        "dropped_fraction": 1 - len(kept_chunks) / len(chunks) if chunks else 0.0,
+        "dedup_seconds": dedup_seconds,
+        "chunks_per_second": len(chunks) / dedup_seconds if dedup_seconds > 0 else 0.0,
+        **deduplicator.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk de-duplication on a synthetic docs site")
+    parser.add_argument("--pages", type=int, default=40, help="Distinct pages per version")
+    parser.add_argument("--versions", type=int, default=3, help="Versions of every page")
+    parser.add_argument("--edit-rate", type=float, default=0.1, help="Fraction of blocks edited per version")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.pages, args.versions, args.edit_rate)
+
+    print(f"Pages: {result['pages']}, threshold: {result['threshold']}")
+    print(f"Chunks: {result['chunks']} -> {result['kept_chunks']} "
+          f"({result['dropped_fraction']:.0%} dropped: {result['exact_duplicates']} exact, "
+          f"{result['near_duplicates']} near)")
+    print(f"De-duplication: {result['dedup_seconds'] * 1000:.0f} ms ({result['chunks_per_second']:.0f} chunks/s)")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(result, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
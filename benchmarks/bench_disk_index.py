@@ -0,0 +1,170 @@
+"""
+Benchmark of the memory held by each process that opens a large index.
+
+A synthetic corpus is saved once in the pickled FAISS format and once as a
+disk index (see disk_store). Each format is then opened in fresh
+processes, which report the time to open it, their RSS and private
+(anonymous) memory growth, and the latency of top-k searches. Pages of a
+memory-mapped index count towards the RSS but are shared with every other
+process through the page cache, so the private memory is the cost of each
+additional session.
+
+Run from the repository root:
+    python -m benchmarks.bench_disk_index --chunks 100000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.bench_index_types import make_clustered_vectors
+from disk_store import load_disk_index, open_disk_index, write_disk_index
+from index_factory import INDEX_TYPES, build_index, choose_index_type
+from resource_usage import get_private_memory_bytes, get_resident_memory_bytes
+
+WORDS = ("index", "query", "vector", "chunk", "page", "model", "search", "cache", "token", "store")
+
+MODES = ("pickle", "disk_load", "disk_open")
+
+
+def make_corpus(chunk_count: int, dimension: int, chunk_chars: int, index_type: str) -> FAISS:
+    """Build an in-memory vector store of synthetic chunks around clustered vectors."""
+    random_state = np.random.RandomState(1)
+    texts = []
+    for position in range(chunk_count):
+        words = random_state.choice(WORDS, size=chunk_chars // 6)
+        texts.append(f"Chunk {position}: " + " ".join(words))
+    metadatas = [{"source": f"https://example.com/page/{position // 20}", "start_index": 0}
+                 for position in range(chunk_count)]
+
+    vectors = make_clustered_vectors(chunk_count, dimension, max(10, chunk_count // 500), seed=1)
+    vector_store = FAISS.from_embeddings(
+        zip(texts, vectors.tolist()),
+        DeterministicFakeEmbedding(size=dimension),
+        metadatas=metadatas,
+    )
+    vector_store.index = build_index(index_type, vectors)
+    return vector_store
+
+
+def measure_open(mode: str, directory: str, dimension: int, query_count: int, k: int) -> Dict[str, float]:
+    """Open a saved index in the current process and measure memory and search latency."""
+    embeddings = DeterministicFakeEmbedding(size=dimension)
+    private_before = get_private_memory_bytes()
+    resident_before = get_resident_memory_bytes()
+
+    start_time = time.perf_counter()
+    if mode == "pickle":
+        vector_store = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+    elif mode == "disk_load":
+        vector_store = load_disk_index(directory, embeddings)
+    else:
+        vector_store = open_disk_index(directory, embeddings)
+    open_seconds = time.perf_counter() - start_time
+
+    queries = make_clustered_vectors(query_count, dimension, 10, seed=2)
+    latencies = []
+    for query in queries.tolist():
+        start_time = time.perf_counter()
+        vector_store.similarity_search_by_vector(query, k=k)
+        latencies.append(time.perf_counter() - start_time)
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "open_seconds": open_seconds,
+        "private_megabytes": (get_private_memory_bytes() - private_before) / (1024 * 1024),
+        "resident_megabytes": (get_resident_memory_bytes() - resident_before) / (1024 * 1024),
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def run_benchmark(
+    chunk_count: int = 100_000,
+    dimension: int = 384,
+    chunk_chars: int = 800,
+    index_type: Optional[str] = None,
+    query_count: int = 200,
+    k: int = 4,
+) -> List[Dict[str, object]]:
+    """
+    Save a synthetic corpus in both formats and open each in a fresh process.
+
+    Args:
+        chunk_count: Number of chunks
+        dimension: Dimension of the vectors
+        chunk_chars: Approximate number of characters per chunk
+        index_type: Index type, chosen with choose_index_type() by default
+        query_count: Number of queries per process
+        k: Number of chunks per query
+
+    Returns:
+        One result dict per format, with the size of the saved files
+    """
+    faiss.omp_set_num_threads(1)
+    index_type = index_type or choose_index_type(chunk_count, dimension)
+    vector_store = make_corpus(chunk_count, dimension, chunk_chars, index_type)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        pickle_dir = os.path.join(work_dir, "pickle")
+        disk_dir = os.path.join(work_dir, "disk")
+        vector_store.save_local(pickle_dir)
+        write_disk_index(vector_store, disk_dir)
+        del vector_store
+
+        # A fresh process per format, so nothing is already resident
+        context = multiprocessing.get_context("spawn")
+        results = []
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for mode in MODES:
+                directory = pickle_dir if mode == "pickle" else disk_dir
+                result = pool.apply(measure_open, (mode, directory, dimension, query_count, k))
+                result["index_type"] = index_type
+                result["files_megabytes"] = sum(
+                    os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                ) / (1024 * 1024)
+                results.append(result)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-process memory of pickled and disk-backed indexes")
+    parser.add_argument("--chunks", type=int, default=100_000, help="Number of chunks")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the vectors")
+    parser.add_argument("--chunk-chars", type=int, default=800, help="Approximate characters per chunk")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="Index type, chosen automatically by default")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per process")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.chunks, args.dimension, args.chunk_chars, args.index_type, args.queries)
+
+    print(f"{args.chunks} chunks of ~{args.chunk_chars} characters, index type {results[0]['index_type']}")
+    print(f"{'format':<11}{'files MB':>10}{'open s':>9}{'RSS MB':>9}{'private MB':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for result in results:
+        print(f"{result['mode']:<11}{result['files_megabytes']:>10.1f}{result['open_seconds']:>9.2f}"
+              f"{result['resident_megabytes']:>9.1f}{result['private_megabytes']:>12.1f}"
+              f"{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Benchmark of the embedding backends on the saved HTML fixtures: throughput, memory and retrieval recall.
+
+The chunks of every fixture are embedded by each backend in a fresh
+process, which reports the model load time, the embedding throughput
+in chunks/s and the RSS added by the model and peak RSS. Questions
+generated from the chunks are then searched in an exact index of each
+backend's vectors, and the recall@k of every backend is the share of the
+reference backend's top k chunks it also returns. The mean cosine
+similarity of the vectors of the same chunk shows how far a backend
+drifts from the reference.
+
+The models are downloaded on first use. A backend whose packages are not
+installed is reported as skipped.
+
+Run from the repository root:
+    python -m benchmarks.bench_embedding_backends
+    python -m benchmarks.bench_embedding_backends --backend sentence-transformers --backend onnx-int8 --k 4
+"""
+
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.bench_suite import FIXTURES_DIR, make_questions
+from embedding_backends import ONNX_INT8, SENTENCE_TRANSFORMERS
+
+# Timed embedding passes per backend, the fastest is reported
+REPEATS = 3
+
+
+def load_fixture_chunks(paths: List[str]) -> List[Document]:
+    """Parse, split and deduplicate the fixtures like load_and_process_url."""
+    from document_processor import parse_html_document, remove_duplicate_chunks, split_documents
+
+    chunks = []
+    with redirect_stdout(io.StringIO()):
+        for path in paths:
+            with open(path, encoding="utf-8") as html_file:
+                url = f"https://fixtures.example.com/{os.path.basename(path)}"
+                chunks.extend(remove_duplicate_chunks(split_documents([parse_html_document(url, html_file.read())])))
+    return chunks
+
+
+def run_backend(backend: str, model_name: str, texts: List[str], questions: List[str]) -> Dict[str, object]:
+    """
+    Load a backend and embed the chunks and questions in the current process.
+
+    Args:
+        backend: The name of the embedding backend
+        model_name: The embedding model
+        texts: The chunk texts
+        questions: The questions
+
+    Returns:
+        The result dict of the backend, with its vectors
+    """
+    # Imported here so the fresh process of every backend pays for its own imports
+    from embedding_backends import create_backend_embeddings
+    from resource_usage import get_peak_resident_memory_bytes, get_resident_memory_bytes
+
+    baseline_rss = get_resident_memory_bytes()
+    start_time = time.perf_counter()
+    try:
+        embeddings = create_backend_embeddings(model_name, backend)
+        embeddings.embed_query("warm up")
+    except ImportError as e:
+        return {"backend": backend, "skipped": str(e)}
+    load_seconds = time.perf_counter() - start_time
+    model_rss = get_resident_memory_bytes() - baseline_rss
+
+    embed_seconds = []
+    for _ in range(REPEATS):
+        start_time = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        embed_seconds.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    question_vectors = [embeddings.embed_query(question) for question in questions]
+    query_seconds = time.perf_counter() - start_time
+
+    return {
+        "backend": backend,
+        "model": model_name,
+        "load_seconds": load_seconds,
+        "chunks": len(texts),
+        "chunks_per_second": len(texts) / min(embed_seconds),
+        "query_ms": 1000 * query_seconds / len(questions),
+        "model_rss_mb": model_rss / (1024 * 1024),
+        "peak_rss_mb": get_peak_resident_memory_bytes() / (1024 * 1024),
+        "dimension": len(vectors[0]),
+        "vectors": vectors,
+        "question_vectors": question_vectors,
+    }
+
+
+def search_top_k(vectors: List[List[float]], question_vectors: List[List[float]], k: int) -> np.ndarray:
+    """Return the positions of the k nearest chunks of every question, with an exact L2 index like the vector store."""
+    vector_array = np.array(vectors, dtype=np.float32)
+    index = faiss.IndexFlatL2(vector_array.shape[1])
+    index.add(vector_array)
+    _, positions = index.search(np.array(question_vectors, dtype=np.float32), k)
+    return positions
+
+
+def get_recall(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Return the share of the reference top k positions found in the candidate top k, over every question."""
+    found = sum(len(set(reference_row) & set(candidate_row)) for reference_row, candidate_row in zip(reference, candidate))
+    return found / reference.size
+
+
+def get_mean_cosine(reference: List[List[float]], candidate: List[List[float]]) -> float:
+    """Return the mean cosine similarity of the vectors of the same chunks."""
+    reference_array = np.array(reference, dtype=np.float32)
+    candidate_array = np.array(candidate, dtype=np.float32)
+    dot = (reference_array * candidate_array).sum(axis=1)
+    norms = np.linalg.norm(reference_array, axis=1) * np.linalg.norm(candidate_array, axis=1)
+    return float(np.mean(dot / np.maximum(norms, 1e-12)))
+
+
+def run_benchmark(
+    backends: Optional[List[str]] = None,
+    model_name: str = "all-MiniLM-L6-v2",
+    question_count: int = 200,
+    k: int = 4,
+    fixtures: Optional[List[str]] = None,
+) -> List[Dict[str, object]]:
+    """
+    Compare embedding backends on the chunks of the fixtures.
+
+    Args:
+        backends: The backends to compare, the first is the reference of the recall
+        model_name: The embedding model
+        question_count: Number of questions searched
+        k: Number of chunks per question compared for the recall
+        fixtures: Optional paths of the fixtures, every saved fixture by default
+
+    Returns:
+        One result dict per backend, without its vectors
+    """
+    backends = backends or [SENTENCE_TRANSFORMERS, ONNX_INT8]
+    paths = fixtures or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")), key=os.path.getsize)
+    chunks = load_fixture_chunks(paths)
+    texts = [chunk.page_content for chunk in chunks]
+    questions = make_questions(chunks, question_count)
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for backend in backends:
+            results.append(pool.apply(run_backend, (backend, model_name, texts, questions)))
+
+    reference = next((result for result in results if "skipped" not in result), None)
+    if reference is not None:
+        reference_top_k = search_top_k(reference["vectors"], reference["question_vectors"], k)
+        for result in results:
+            if "skipped" in result:
+                continue
+            result["reference"] = reference["backend"]
+            result[f"recall_at_{k}"] = get_recall(
+                reference_top_k, search_top_k(result["vectors"], result["question_vectors"], k)
+            )
+            result["mean_cosine_to_reference"] = get_mean_cosine(reference["vectors"], result["vectors"])
+
+    for result in results:
+        result.pop("vectors", None)
+        result.pop("question_vectors", None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the throughput, memory and recall of embedding backends")
+    parser.add_argument("--backend", action="append", dest="backends",
+                        help="Backend to compare, sentence-transformers and onnx-int8 by default; the first is the reference")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model")
+    parser.add_argument("--questions", type=int, default=200, help="Number of questions searched")
+    parser.add_argument("--k", type=int, default=4, help="Number of chunks per question compared for the recall")
+    parser.add_argument("--fixture", action="append", dest="fixtures", help="Fixture to embed, every fixture by default")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.backends, args.model, args.questions, args.k, args.fixtures)
+
+    print(f"{'backend':<24}{'load s':>8}{'chunks/s':>10}{'query ms':>10}{'model MB':>10}{'peak MB':>9}"
+          f"{f'recall@{args.k}':>11}{'cosine':>8}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['backend']:<24}skipped: {result['skipped']}")
+            continue
+        print(f"{result['backend']:<24}{result['load_seconds']:>8.2f}{result['chunks_per_second']:>10.0f}"
+              f"{result['query_ms']:>10.2f}{result['model_rss_mb']:>10.0f}{result['peak_rss_mb']:>9.0f}"
+              f"{result[f'recall_at_{args.k}']:>11.3f}{result['mean_cosine_to_reference']:>8.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of HTML extraction on the saved HTML fixtures.
+
+Compares the previous WebBaseLoader-style extraction (html.parser with a
+SoupStrainer over nested container tags) with html_extractor, reporting
+parse time, extracted characters and the resulting chunk counts.
+
+Run from the repository root:
+    python -m benchmarks.bench_html_extraction
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import bs4
+from langchain_core.documents import Document
+
+from document_processor import create_text_splitter
+from html_extractor import extract_text, get_parser_name
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# The tags the previous loader kept, including the containers around paragraphs
+LEGACY_CONTENT_TAGS = ["p", "h1", "h2", "h3", "h4", "h5", "article", "section", "div", "main"]
+
+
+def legacy_extract_text(html: str) -> str:
+    """Extract text the way the previous WebBaseLoader configuration did."""
+    soup = bs4.BeautifulSoup(html, "html.parser", parse_only=bs4.SoupStrainer(LEGACY_CONTENT_TAGS))
+    return soup.get_text()
+
+
+def time_extraction(extract: Callable[[str], str], html: str, repeats: int) -> float:
+    """Return the median time of an extraction function in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        extract(html)
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+
+def run_benchmark(repeats: int = 5) -> List[Dict[str, object]]:
+    """
+    Run the extraction benchmark on every fixture.
+
+    Args:
+        repeats: Number of timed runs per fixture and extractor
+
+    Returns:
+        One result dict per fixture
+    """
+    text_splitter = create_text_splitter()
+    results = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as fixture_file:
+            html = fixture_file.read()
+
+        legacy_text = legacy_extract_text(html)
+        new_text = extract_text(html)
+        legacy_chunks = text_splitter.split_documents([Document(page_content=legacy_text)])
+        new_chunks = text_splitter.split_documents([Document(page_content=new_text)])
+
+        results.append({
+            "fixture": os.path.basename(path),
+            "html_bytes": len(html.encode("utf-8")),
+            "legacy_seconds": time_extraction(legacy_extract_text, html, repeats),
+            "new_seconds": time_extraction(extract_text, html, repeats),
+            "legacy_characters": len(legacy_text),
+            "new_characters": len(new_text),
+            "legacy_chunks": len(legacy_chunks),
+            "new_chunks": len(new_chunks),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction on saved fixtures")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per fixture and extractor")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeats)
+
+    print(f"Parser backend: {get_parser_name()}")
+    print(f"{'fixture':<20}{'KB':>8}{'legacy ms':>12}{'new ms':>10}{'legacy chars':>14}{'new chars':>11}"
+          f"{'legacy chunks':>15}{'new chunks':>12}")
+    for result in results:
+        print(f"{result['fixture']:<20}{result['html_bytes'] / 1024:>8.0f}"
+              f"{result['legacy_seconds'] * 1000:>12.1f}{result['new_seconds'] * 1000:>10.1f}"
+              f"{result['legacy_characters']:>14}{result['new_characters']:>11}"
+              f"{result['legacy_chunks']:>15}{result['new_chunks']:>12}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump({"parser": get_parser_name(), "results": results}, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark of recall@k against search latency for the index types of index_factory.
+
+Vectors are drawn around random cluster centres in a low-dimensional
+latent space and projected to the embedding dimension, which is closer to
+real sentence embeddings than uniform noise, so the benchmark runs offline
+without an embedding model. Every index type is compared with the exact
+flat index, sweeping nprobe for inverted files and efSearch for HNSW.
+
+Run from the repository root:
+    python -m benchmarks.bench_index_types --vectors 50000
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from index_factory import (
+    FLAT,
+    HNSW,
+    INDEX_TYPES,
+    build_index,
+    choose_index_type,
+    make_search_parameters,
+)
+
+NPROBE_VALUES = [1, 4, 8, 16, 32, 64]
+EF_SEARCH_VALUES = [16, 32, 64, 128, 256]
+
+
+LATENT_DIMENSION = 32
+
+
+def make_clustered_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    """Draw normalized vectors around cluster centres of a latent space shared by every call."""
+    shared_state = np.random.RandomState(0)
+    centres = shared_state.normal(size=(clusters, LATENT_DIMENSION))
+    projection = shared_state.normal(size=(LATENT_DIMENSION, dimension))
+
+    random_state = np.random.RandomState(seed)
+    assignments = random_state.randint(0, clusters, size=count)
+    latent = centres[assignments] + 0.5 * random_state.normal(size=(count, LATENT_DIMENSION))
+    vectors = (latent @ projection + 0.5 * random_state.normal(size=(count, dimension))).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def measure_search(
+    index: faiss.Index,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Dict[str, float]:
+    """Search one query at a time and measure recall@k and latency percentiles."""
+    params = make_search_parameters(index, nprobe, ef_search)
+    latencies = []
+    found = 0
+    for query_index in range(len(queries)):
+        query = queries[query_index:query_index + 1]
+        start_time = time.perf_counter()
+        if params is None:
+            _, indices = index.search(query, k)
+        else:
+            _, indices = index.search(query, k, params=params)
+        latencies.append(time.perf_counter() - start_time)
+        found += len(set(indices[0]) & set(ground_truth[query_index]))
+
+    latencies.sort()
+    return {
+        "recall_at_k": found / (len(queries) * k),
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "queries_per_second": len(latencies) / sum(latencies),
+    }
+
+
+def run_benchmark(
+    vector_count: int = 50_000,
+    dimension: int = 384,
+    query_count: int = 200,
+    k: int = 10,
+    index_types: Optional[List[str]] = None,
+) -> List[Dict[str, object]]:
+    """
+    Build every index type on the same vectors and sweep its search settings.
+
+    Args:
+        vector_count: Number of indexed vectors
+        dimension: Dimension of the vectors
+        query_count: Number of queries
+        k: Number of neighbours per query
+        index_types: Index types to compare, all of them by default
+
+    Returns:
+        One result dict per index type and search setting
+    """
+    # One thread, so latencies reflect a single query as the RAG chain sends them
+    faiss.omp_set_num_threads(1)
+    clusters = max(10, vector_count // 500)
+    vectors = make_clustered_vectors(vector_count, dimension, clusters, seed=1)
+    queries = make_clustered_vectors(query_count, dimension, clusters, seed=2)
+
+    exact_index = build_index(FLAT, vectors)
+    _, ground_truth = exact_index.search(queries, k)
+
+    results = []
+    for index_type in index_types or INDEX_TYPES:
+        start_time = time.perf_counter()
+        index = build_index(index_type, vectors)
+        build_seconds = time.perf_counter() - start_time
+        index_bytes = len(faiss.serialize_index(index))
+
+        if index_type == HNSW:
+            settings = [{"ef_search": ef_search} for ef_search in EF_SEARCH_VALUES]
+        elif faiss.try_extract_index_ivf(index) is not None:
+            settings = [{"nprobe": nprobe} for nprobe in NPROBE_VALUES if nprobe <= index.nlist]
+        else:
+            settings = [{}]
+
+        for setting in settings:
+            result = {
+                "index_type": index_type,
+                "setting": ", ".join(f"{name}={value}" for name, value in setting.items()) or "-",
+                "build_seconds": build_seconds,
+                "index_megabytes": index_bytes / (1024 * 1024),
+            }
+            result.update(measure_search(index, queries, ground_truth, k, **setting))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k against latency for FAISS index types")
+    parser.add_argument("--vectors", type=int, default=50_000, help="Number of indexed vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, help="Index types to compare")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.vectors, args.dimension, args.queries, args.k, args.index_types)
+
+    print(f"{args.vectors} vectors of dimension {args.dimension}, automatic choice: "
+          f"{choose_index_type(args.vectors, args.dimension)}")
+    print(f"{'index':<11}{'setting':<14}{'build s':>9}{'MB':>8}{'recall@' + str(args.k):>11}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'QPS':>9}")
+    for result in results:
+        print(f"{result['index_type']:<11}{result['setting']:<14}{result['build_seconds']:>9.2f}"
+              f"{result['index_megabytes']:>8.1f}{result['recall_at_k']:>11.3f}"
+              f"{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}{result['queries_per_second']:>9.0f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
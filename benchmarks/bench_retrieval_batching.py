@@ -0,0 +1,160 @@
+"""
+Benchmark of retrieval throughput with and without micro-batching at 1, 8 and 64 concurrent users.
+
+Each user is a thread that embeds and searches its questions one after
+another, either alone (embed_query and a FAISS search per question) or
+through a RetrievalBatcher. sentence-transformers is not needed: by
+default queries are embedded by a small random two-layer network of
+about the size of all-MiniLM-L6-v2's weights, so that, as with the real
+model, each forward pass streams the weights from memory and a batch pays
+that cost once. Pass --model to use a HuggingFace embedding model instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_retrieval_batching --chunks 100000
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.bench_disk_index import WORDS, make_corpus
+from benchmarks.offline_models import RandomNetworkEmbeddings
+from index_factory import INDEX_TYPES, choose_index_type, similarity_search_with_parameters
+from retrieval_batcher import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, RetrievalBatcher
+
+USER_COUNTS = [1, 8, 64]
+
+
+def make_questions(count: int, seed: int = 3) -> List[str]:
+    """Make distinct questions of a dozen words."""
+    random_state = np.random.RandomState(seed)
+    return [f"Question {number}: " + " ".join(random_state.choice(WORDS, size=12)) + "?" for number in range(count)]
+
+
+def run_users(
+    vector_store: FAISS,
+    questions: List[str],
+    user_count: int,
+    batcher: Optional[RetrievalBatcher],
+    k: int,
+) -> Dict[str, float]:
+    """Answer every question with retrieval only, split between concurrent users."""
+    latencies: List[float] = []
+    latencies_lock = threading.Lock()
+
+    def user(user_questions: List[str]):
+        user_latencies = []
+        for question in user_questions:
+            start_time = time.perf_counter()
+            if batcher is not None:
+                batcher.search(question)
+            else:
+                similarity_search_with_parameters(vector_store, question, k=k)
+            user_latencies.append(time.perf_counter() - start_time)
+        with latencies_lock:
+            latencies.extend(user_latencies)
+
+    threads = [threading.Thread(target=user, args=(questions[number::user_count],)) for number in range(user_count)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_seconds = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "queries_per_second": len(latencies) / total_seconds,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def run_benchmark(
+    chunk_count: int = 100_000,
+    dimension: int = 384,
+    query_count: int = 640,
+    k: int = 4,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+    index_type: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """
+    Measure retrieval throughput and latency with and without batching.
+
+    Args:
+        chunk_count: Number of indexed chunks
+        dimension: Dimension of the vectors, ignored with a model
+        query_count: Number of questions per run
+        k: Number of chunks per question
+        max_batch_size: Maximum batch size of the batcher
+        max_wait_ms: Maximum wait of the batcher
+        index_type: Index type, chosen with choose_index_type() by default
+        model_name: Optional HuggingFace embedding model, a random network by default
+
+    Returns:
+        One result dict per number of users and mode
+    """
+    if model_name:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        dimension = len(embeddings.embed_query("dimension"))
+    else:
+        embeddings = RandomNetworkEmbeddings(dimension)
+
+    index_type = index_type or choose_index_type(chunk_count, dimension)
+    vector_store = make_corpus(chunk_count, dimension, 200, index_type)
+    vector_store.embedding_function = embeddings
+    questions = make_questions(query_count)
+
+    results = []
+    for user_count in USER_COUNTS:
+        for mode in ("unbatched", "batched"):
+            batcher = None
+            if mode == "batched":
+                batcher = RetrievalBatcher(vector_store, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, k=k)
+            result = {"users": user_count, "mode": mode, "index_type": index_type}
+            result.update(run_users(vector_store, questions, user_count, batcher, k))
+            if batcher is not None:
+                batcher.close()
+                result["mean_batch_size"] = batcher.stats()["mean_batch_size"]
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched retrieval under concurrent users")
+    parser.add_argument("--chunks", type=int, default=100_000, help="Number of indexed chunks")
+    parser.add_argument("--queries", type=int, default=640, help="Number of questions per run")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Maximum batch size")
+    parser.add_argument("--wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="Maximum wait for a batch")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="Index type, chosen automatically by default")
+    parser.add_argument("--model", help="HuggingFace embedding model to use instead of the random network")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.chunks, query_count=args.queries, max_batch_size=args.batch_size,
+                            max_wait_ms=args.wait_ms, index_type=args.index_type, model_name=args.model)
+
+    print(f"{args.chunks} chunks, index type {results[0]['index_type']}, "
+          f"batch size {args.batch_size}, wait {args.wait_ms} ms")
+    print(f"{'users':>5}  {'mode':<10}{'QPS':>9}{'p50 ms':>9}{'p95 ms':>9}{'batch':>7}")
+    for result in results:
+        batch_size = f"{result['mean_batch_size']:.1f}" if "mean_batch_size" in result else "-"
+        print(f"{result['users']:>5}  {result['mode']:<10}{result['queries_per_second']:>9.0f}"
+              f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{batch_size:>7}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark of sharded index build and search against a single index.
+
+A synthetic multi-site corpus of clustered vectors is indexed once as a
+single FAISS index and then split into 1, 2, 4 and 8 shards, by site or
+by hash. For each shard count the benchmark reports the build time of
+the shard indexes, the p50/p95 latency of one-query searches, and the
+share of queries whose top k chunks are the same as the single index's,
+which is 1.0 for exact (flat) shards. Shards are searched by one thread
+each, up to the number of CPUs, so the latency falls as cores are added;
+on a single core it shows the cost of the merge instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_sharded_search --chunks 200000
+    python -m benchmarks.bench_sharded_search --index-type hnsw --shard-by hash --json sharded.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.bench_index_types import make_clustered_vectors
+from index_factory import AUTO, FLAT, INDEX_TYPES, IndexConfig, build_index, resolve_index_type
+from sharded_store import BY_SOURCE, PARTITION_MODES, build_sharded_store
+
+SHARD_COUNTS = [1, 2, 4, 8]
+
+# Number of sites the synthetic pages belong to
+SITE_COUNT = 64
+
+
+def make_documents(chunk_count: int) -> List[Document]:
+    """Make chunks of pages spread over SITE_COUNT sites."""
+    return [
+        Document(
+            id=f"chunk-{position}",
+            page_content=f"Chunk {position}",
+            metadata={"source": f"https://site{position % SITE_COUNT}.example.com/page/{position // 200}"},
+        )
+        for position in range(chunk_count)
+    ]
+
+
+def measure_search(vector_store, queries: np.ndarray, k: int) -> Dict[str, object]:
+    """Search one query at a time and return the latency percentiles and the ids found."""
+    latencies = []
+    found_ids = []
+    for query in queries.tolist():
+        start_time = time.perf_counter()
+        results = vector_store.similarity_search_with_score_by_vector(query, k=k)
+        latencies.append(time.perf_counter() - start_time)
+        found_ids.append([document.id for document, _ in results])
+    latencies.sort()
+    return {
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "ids": found_ids,
+    }
+
+
+def run_benchmark(
+    chunk_count: int = 200_000,
+    dimension: int = 384,
+    query_count: int = 200,
+    k: int = 4,
+    shard_counts: Optional[List[int]] = None,
+    partition_by: str = BY_SOURCE,
+    index_type: str = FLAT,
+) -> List[Dict[str, object]]:
+    """
+    Compare a single index with sharded stores of several sizes.
+
+    Args:
+        chunk_count: Number of indexed chunks
+        dimension: Dimension of the vectors
+        query_count: Number of queries searched
+        k: Number of chunks per query
+        shard_counts: The numbers of shards compared, SHARD_COUNTS by default
+        partition_by: BY_SOURCE or BY_HASH
+        index_type: Index type of the single index and of each shard, chosen by corpus size with AUTO
+
+    Returns:
+        One result dict for the single index and one per shard count
+    """
+    embeddings = DeterministicFakeEmbedding(size=dimension)
+    documents = make_documents(chunk_count)
+    vectors = make_clustered_vectors(chunk_count, dimension, max(10, chunk_count // 500), seed=1)
+    queries = make_clustered_vectors(query_count, dimension, max(10, chunk_count // 500), seed=2)
+    index_config = IndexConfig(index_type=index_type)
+
+    start_time = time.perf_counter()
+    single_index_type = resolve_index_type(index_config, chunk_count, dimension)
+    vector_store = FAISS.from_embeddings(
+        [(document.page_content, vector) for document, vector in zip(documents, vectors.tolist())],
+        embeddings,
+        metadatas=[document.metadata for document in documents],
+        ids=[document.id for document in documents],
+    )
+    vector_store.index = build_index(single_index_type, vectors)
+    single_build_seconds = time.perf_counter() - start_time
+    single_search = measure_search(vector_store, queries, k)
+    reference_ids = single_search.pop("ids")
+
+    results = [{
+        "shards": 0,
+        "index_type": single_index_type,
+        "build_seconds": single_build_seconds,
+        "same_top_k": 1.0,
+        **single_search,
+    }]
+    for shard_count in shard_counts or SHARD_COUNTS:
+        start_time = time.perf_counter()
+        sharded_store = build_sharded_store(documents, vectors, embeddings, shard_count, partition_by, index_config)
+        build_seconds = time.perf_counter() - start_time
+        search = measure_search(sharded_store, queries, k)
+        sharded_store.close()
+
+        found_ids = search.pop("ids")
+        description = sharded_store.describe()
+        results.append({
+            "shards": shard_count,
+            "index_type": description["shards"][0]["index_type"],
+            "shard_chunks": [shard["vectors"] for shard in description["shards"]],
+            "build_seconds": build_seconds,
+            "same_top_k": sum(ids == reference for ids, reference in zip(found_ids, reference_ids)) / query_count,
+            **search,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded index build and search against a single index")
+    parser.add_argument("--chunks", type=int, default=200_000, help="Number of indexed chunks")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries searched")
+    parser.add_argument("--k", type=int, default=4, help="Number of chunks per query")
+    parser.add_argument("--shards", type=int, action="append", help="Number of shards, 1, 2, 4 and 8 by default")
+    parser.add_argument("--shard-by", default=BY_SOURCE, choices=PARTITION_MODES, help="Partition mode of the shards")
+    parser.add_argument("--index-type", default=FLAT, choices=(AUTO,) + INDEX_TYPES,
+                        help="Index type of the single index and of each shard, exact flat indexes by default")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.chunks, args.dimension, args.queries, args.k, args.shards, args.shard_by,
+                            args.index_type)
+
+    print(f"CPUs: {os.cpu_count()}, partition by {args.shard_by}")
+    print(f"{'shards':>8}{'index':>10}{'build s':>10}{'p50 ms':>9}{'p95 ms':>9}{'same top k':>12}")
+    for result in results:
+        shards = result["shards"] or "single"
+        print(f"{shards:>8}{result['index_type']:>10}{result['build_seconds']:>10.2f}"
+              f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['same_top_k']:>12.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark of the cold start of the command-line interface.
+
+Imports main.py in fresh interpreters, measuring the wall-clock time of
+each import and, with python -X importtime, the modules that take the
+longest to import. It also checks that the heavy dependencies which are
+loaded lazily or in the background (the Anthropic SDK, torch,
+sentence-transformers, FAISS, LangGraph and the HTML parsers) are not
+imported at start-up. The benchmark exits with status 1 when the median
+start-up time exceeds the budget.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --repeats 5 --budget 2.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Start-up time above which the benchmark, and tests/test_startup.py, fail
+STARTUP_BUDGET_SECONDS = float(os.environ.get("RAG_STARTUP_BUDGET_SECONDS", "2.5"))
+
+# Modules that must only be imported once they are needed
+LAZY_MODULES = (
+    "anthropic",
+    "langchain_anthropic",
+    "langchain_community.document_loaders",
+    "sentence_transformers",
+    "torch",
+    "onnxruntime",
+    "faiss",
+    "langgraph",
+    "bs4",
+    "lxml",
+)
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import_seconds(module: str = "main") -> float:
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module: The module to import
+
+    Returns:
+        The wall-clock time of the interpreter, including its own start-up, in seconds
+    """
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPOSITORY_ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start_time
+
+
+def get_import_times(module: str = "main") -> List[Dict[str, object]]:
+    """
+    Import a module in a fresh interpreter with python -X importtime.
+
+    Args:
+        module: The module to import
+
+    Returns:
+        One dict per imported module with its own and cumulative import time
+        in milliseconds, slowest cumulative first
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPOSITORY_ROOT, check=True, capture_output=True, text=True,
+    )
+    import_times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        import_times.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    import_times.sort(key=lambda import_time: import_time["cumulative_ms"], reverse=True)
+    return import_times
+
+
+def get_loaded_lazy_modules(module: str = "main") -> List[str]:
+    """
+    Import a module in a fresh interpreter and list the lazy modules it imported.
+
+    Args:
+        module: The module to import
+
+    Returns:
+        The names of LAZY_MODULES that were imported
+    """
+    code = (
+        f"import json, sys\nimport {module}\n"
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPOSITORY_ROOT, check=True, capture_output=True, text=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(repeats: int = 5, top: int = 15) -> Dict[str, object]:
+    """
+    Measure the cold start of main.py.
+
+    Args:
+        repeats: Number of fresh interpreters timed
+        top: Number of slowest imports reported
+
+    Returns:
+        A dict with the median and every start-up time in seconds, the
+        slowest imports and the lazy modules that were imported
+    """
+    durations = [measure_import_seconds() for _ in range(repeats)]
+    return {
+        "median_seconds": statistics.median(durations),
+        "seconds": durations,
+        "slowest_imports": get_import_times()[:top],
+        "loaded_lazy_modules": get_loaded_lazy_modules(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the command-line interface")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of fresh interpreters timed")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports printed")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="Median start-up time in seconds above which the benchmark fails")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.repeats, args.top)
+
+    print(f"{'module':<50}{'self ms':>10}{'cumulative ms':>15}")
+    for import_time in result["slowest_imports"]:
+        print(f"{import_time['module']:<50}{import_time['self_ms']:>10.1f}{import_time['cumulative_ms']:>15.1f}")
+    print(f"\nStart-up: median {result['median_seconds']:.2f}s over {args.repeats} runs (budget {args.budget:.2f}s)")
+    if result["loaded_lazy_modules"]:
+        print(f"Imported at start-up although they should be lazy: {', '.join(result['loaded_lazy_modules'])}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(result, json_file, indent=2)
+
+    if result["median_seconds"] > args.budget or result["loaded_lazy_modules"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
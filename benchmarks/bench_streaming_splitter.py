@@ -0,0 +1,131 @@
+"""
+Benchmark of the streaming text splitter on large pages: split time and peak memory.
+
+The text of the saved HTML fixtures is repeated into pages of the given
+sizes, one keeping its paragraphs and one with single line breaks only,
+like a changelog or a plain text manual. Each page is split by the
+previous RecursiveCharacterTextSplitter.split_documents, by the
+StreamingTextSplitter into a list, and by the StreamingTextSplitter
+iterating over the chunks without keeping them, as the ingest pipeline
+consumes them. Peak memory is the peak of Python allocations during the
+split, measured with tracemalloc, which also slows every splitter down,
+so time is measured in separate runs.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming_splitter
+    python -m benchmarks.bench_streaming_splitter --megabytes 1 --megabytes 8 --json splitter.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.bench_suite import FIXTURES_DIR
+from document_processor import CHUNK_OVERLAP, CHUNK_SIZE
+from html_extractor import extract_text
+from streaming_splitter import StreamingTextSplitter
+
+
+def make_page(text: str, megabytes: float) -> str:
+    """Repeat a text into a page of about the given size."""
+    size = int(megabytes * 1024 * 1024)
+    return (text * (size // len(text) + 1))[:size]
+
+
+def measure(split: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """Return the median time and the peak traced memory of a split."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        split()
+        timings.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    split()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": statistics.median(timings), "peak_mb": peak_bytes / (1024 * 1024)}
+
+
+def run_benchmark(megabytes: Optional[List[float]] = None, repeats: int = 3) -> List[Dict[str, object]]:
+    """
+    Split large pages with each splitter.
+
+    Args:
+        megabytes: The page sizes, 1 and 8 MB by default
+        repeats: Number of timed runs per page and splitter
+
+    Returns:
+        One result dict per page and splitter
+    """
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as fixture_file:
+            texts.append(extract_text(fixture_file.read()))
+    fixture_text = "\n\n".join(texts)
+
+    recursive_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+    )
+    streaming_splitter = StreamingTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+
+    def iterate(documents: List[Document]) -> int:
+        return sum(1 for _ in streaming_splitter.iter_documents(documents))
+
+    splitters = {
+        "recursive": recursive_splitter.split_documents,
+        "streaming list": streaming_splitter.split_documents,
+        "streaming iter": iterate,
+    }
+
+    results = []
+    for size in megabytes or [1.0, 8.0]:
+        pages = {
+            "paragraphs": make_page(fixture_text, size),
+            "lines": make_page(fixture_text.replace("\n\n", "\n"), size),
+        }
+        for layout, page in pages.items():
+            documents = [Document(page_content=page, metadata={"source": f"https://example.com/{layout}"})]
+            expected_chunks = [chunk.page_content for chunk in recursive_splitter.split_documents(documents)]
+            same_chunks = [chunk.page_content for chunk in streaming_splitter.split_documents(documents)] == expected_chunks
+            for name, split in splitters.items():
+                results.append({
+                    "megabytes": size,
+                    "layout": layout,
+                    "splitter": name,
+                    "chunks": len(expected_chunks),
+                    "same_chunks": same_chunks,
+                    **measure(lambda: split(documents), repeats),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the split time and peak memory of the text splitters")
+    parser.add_argument("--megabytes", type=float, action="append", help="Page size, 1 and 8 MB by default")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per page and splitter")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.megabytes, args.repeats)
+
+    print(f"{'MB':>5}  {'layout':<12}{'splitter':<16}{'chunks':>8}{'seconds':>9}{'peak MB':>9}  same chunks")
+    for result in results:
+        print(f"{result['megabytes']:>5.1f}  {result['layout']:<12}{result['splitter']:<16}{result['chunks']:>8}"
+              f"{result['seconds']:>9.3f}{result['peak_mb']:>9.1f}  {result['same_chunks']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
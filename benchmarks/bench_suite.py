@@ -0,0 +1,335 @@
+"""
+Offline end-to-end benchmark suite: ingestion and question answering on the saved HTML fixtures.
+
+Each fixture is ingested through the stages of load_and_process_url
+(parse, split, deduplicate, embed and index) and a question set generated
+from its chunks is answered through create_rag_chain. Embeddings come from
+the random network of benchmarks.offline_models and answers from its
+deterministic ExtractiveChatModel, so nothing is downloaded or sent over
+the network. Every fixture runs in a fresh process so its peak RSS is its
+own.
+
+Reported per fixture: ingest pages/s and chunks/s with the median time of
+each stage, peak RSS, and p50/p95/p99 retrieve and end-to-end latency.
+Results are saved as JSON, and --compare prints the change of each
+metric against an earlier results file.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --json results.json
+    python -m benchmarks.bench_suite --json new.json --compare results.json
+"""
+
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Metrics compared by --compare, with True where higher is better
+COMPARED_METRICS = {
+    "ingest.pages_per_second": True,
+    "ingest.chunks_per_second": True,
+    "peak_rss_mb": False,
+    "query.retrieve_ms.p50": False,
+    "query.retrieve_ms.p95": False,
+    "query.retrieve_ms.p99": False,
+    "query.end_to_end_ms.p50": False,
+    "query.end_to_end_ms.p95": False,
+    "query.end_to_end_ms.p99": False,
+}
+
+
+def get_percentiles(durations: List[float]) -> Dict[str, float]:
+    """Return the p50, p95 and p99 of durations in seconds, in milliseconds."""
+    if not durations:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.array(durations) * 1000, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def make_questions(chunks: List[object], count: int, seed: int = 0) -> List[str]:
+    """Make questions about random passages of the chunks, the same ones for every run."""
+    random_state = np.random.RandomState(seed)
+    questions = []
+    for _ in range(count):
+        words = chunks[random_state.randint(len(chunks))].page_content.split()
+        start = random_state.randint(max(1, len(words) - 6))
+        questions.append(f"What does the page say about {' '.join(words[start:start + 6])}?")
+    return questions
+
+
+def run_fixture(
+    path: str,
+    question_count: int,
+    repeats: int,
+    index_type: Optional[str],
+    first_token_ms: float,
+    token_ms: float,
+) -> Dict[str, object]:
+    """
+    Ingest one fixture and answer its questions in the current process.
+
+    Args:
+        path: Path of the HTML fixture
+        question_count: Number of questions answered
+        repeats: Number of timed ingestions, the median is reported
+        index_type: Optional index type, chosen by corpus size by default
+        first_token_ms: Simulated time to the first token of the chat model
+        token_ms: Simulated time per further token of the chat model
+
+    Returns:
+        The result dict of the fixture
+    """
+    # Imported here so the fresh process of every fixture pays for its own imports
+    from benchmarks.offline_models import ExtractiveChatModel, RandomNetworkEmbeddings
+    from document_processor import (
+        create_vector_store,
+        parse_html_document,
+        remove_duplicate_chunks,
+        split_documents,
+    )
+    from index_factory import AUTO, IndexConfig, apply_index_config, describe_index
+    from instrumentation import InstrumentationHook, add_hook
+    from rag_engine import create_rag_chain
+    from resource_usage import get_peak_resident_memory_bytes, get_resident_memory_bytes
+
+    class RetrieveTimes(InstrumentationHook):
+        def __init__(self):
+            self.seconds: List[float] = []
+
+        def on_stage(self, event):
+            if event.stage == "retrieve":
+                self.seconds.append(event.seconds)
+
+    with open(path, encoding="utf-8") as html_file:
+        html = html_file.read()
+    url = f"https://fixtures.example.com/{os.path.basename(path)}"
+    embeddings = RandomNetworkEmbeddings()
+    index_config = IndexConfig(index_type=index_type or AUTO)
+    baseline_rss = get_resident_memory_bytes()
+
+    # Ingest the page stage by stage, as load_and_process_url does without a cache
+    stage_times: Dict[str, List[float]] = {name: [] for name in ("parse", "split", "dedup", "embed", "index")}
+    # The stages print their progress, which is not part of the results
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            documents = [parse_html_document(url, html)]
+            stage_times["parse"].append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            chunks = split_documents(documents)
+            stage_times["split"].append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            kept_chunks = remove_duplicate_chunks(chunks)
+            stage_times["dedup"].append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            vector_store = create_vector_store(kept_chunks, embeddings)
+            stage_times["embed"].append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            apply_index_config(vector_store, index_config)
+            stage_times["index"].append(time.perf_counter() - start_time)
+
+    stage_medians = {name: statistics.median(times) for name, times in stage_times.items()}
+    ingest_seconds = sum(stage_medians.values())
+
+    # Answer the questions one after another, as a user of the CLI does
+    retrieve_times = RetrieveTimes()
+    add_hook(retrieve_times)
+    llm = ExtractiveChatModel(first_token_seconds=first_token_ms / 1000, seconds_per_token=token_ms / 1000)
+    rag_chain = create_rag_chain(vector_store, llm=llm)
+    questions = make_questions(kept_chunks, question_count)
+    rag_chain.invoke({"question": questions[0]})
+    retrieve_times.seconds.clear()
+
+    end_to_end_seconds = []
+    for question in questions:
+        start_time = time.perf_counter()
+        rag_chain.invoke({"question": question})
+        end_to_end_seconds.append(time.perf_counter() - start_time)
+
+    return {
+        "fixture": os.path.basename(path),
+        "html_kilobytes": len(html.encode("utf-8")) / 1024,
+        "index": describe_index(vector_store.index)["index_type"],
+        "ingest": {
+            "pages": 1,
+            "chunks": len(chunks),
+            "kept_chunks": len(kept_chunks),
+            "seconds": ingest_seconds,
+            "stage_seconds": stage_medians,
+            "pages_per_second": 1 / ingest_seconds,
+            "chunks_per_second": len(kept_chunks) / ingest_seconds,
+        },
+        "query": {
+            "questions": len(questions),
+            "retrieve_ms": get_percentiles(retrieve_times.seconds),
+            "end_to_end_ms": get_percentiles(end_to_end_seconds),
+        },
+        "baseline_rss_mb": baseline_rss / (1024 * 1024),
+        "peak_rss_mb": get_peak_resident_memory_bytes() / (1024 * 1024),
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    """Return the commit of the working tree, or None outside a git checkout."""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(FIXTURES_DIR), capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def run_benchmark(
+    question_count: int = 200,
+    repeats: int = 3,
+    index_type: Optional[str] = None,
+    first_token_ms: float = 0.0,
+    token_ms: float = 0.0,
+    fixtures: Optional[List[str]] = None,
+) -> Dict[str, object]:
+    """
+    Run the suite on every fixture, each in a fresh process.
+
+    Args:
+        question_count: Number of questions answered per fixture
+        repeats: Number of timed ingestions per fixture
+        index_type: Optional index type, chosen by corpus size by default
+        first_token_ms: Simulated time to the first token of the chat model
+        token_ms: Simulated time per further token of the chat model
+        fixtures: Optional paths of the fixtures, every saved fixture by default
+
+    Returns:
+        A dict with the settings and environment of the run and one result per fixture
+    """
+    paths = fixtures or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")), key=os.path.getsize)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for path in paths:
+            results.append(pool.apply(run_fixture, (path, question_count, repeats, index_type, first_token_ms, token_ms)))
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "questions": question_count,
+            "repeats": repeats,
+            "index_type": index_type,
+            "first_token_ms": first_token_ms,
+            "token_ms": token_ms,
+        },
+        "fixtures": results,
+    }
+
+
+def get_metric(result: Dict[str, object], name: str) -> Optional[float]:
+    """Get a dotted metric such as "query.retrieve_ms.p95" from a fixture result."""
+    value: object = result
+    for key in name.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return float(value)
+
+
+def compare_results(previous: Dict[str, object], current: Dict[str, object]) -> List[Dict[str, object]]:
+    """
+    Compare the metrics of two runs fixture by fixture.
+
+    Args:
+        previous: The results of the earlier run
+        current: The results of the new run
+
+    Returns:
+        One dict per fixture and metric with both values, the change in
+        percent and whether the change is a regression of more than 10%
+    """
+    previous_fixtures = {result["fixture"]: result for result in previous["fixtures"]}
+    rows = []
+    for result in current["fixtures"]:
+        previous_result = previous_fixtures.get(result["fixture"])
+        if previous_result is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old_value = get_metric(previous_result, metric)
+            new_value = get_metric(result, metric)
+            if old_value is None or new_value is None or old_value == 0:
+                continue
+            change_percent = 100 * (new_value - old_value) / old_value
+            worse_percent = -change_percent if higher_is_better else change_percent
+            rows.append({
+                "fixture": result["fixture"],
+                "metric": metric,
+                "previous": old_value,
+                "current": new_value,
+                "change_percent": change_percent,
+                "regression": worse_percent > 10,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of ingestion and question answering")
+    parser.add_argument("--questions", type=int, default=200, help="Number of questions answered per fixture")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed ingestions per fixture")
+    parser.add_argument("--index-type", help="Index type, chosen by corpus size by default")
+    parser.add_argument("--first-token-ms", type=float, default=0.0,
+                        help="Simulated time to the first token of the chat model")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Simulated time per further token")
+    parser.add_argument("--fixture", action="append", dest="fixtures", help="Fixture to run, every fixture by default")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    parser.add_argument("--compare", metavar="PREVIOUS_JSON", help="Print the change against an earlier results file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.questions, args.repeats, args.index_type, args.first_token_ms, args.token_ms,
+                            args.fixtures)
+
+    def format_percentiles(percentiles: Dict[str, float]) -> str:
+        return f"{percentiles['p50']:.2f}/{percentiles['p95']:.2f}/{percentiles['p99']:.2f}"
+
+    print(f"{'fixture':<18}{'KB':>6}{'chunks':>8}{'pages/s':>9}{'chunks/s':>10}{'peak MB':>9}"
+          f"{'retrieve p50/p95/p99 ms':>26}{'end-to-end p50/p95/p99 ms':>28}")
+    for result in results["fixtures"]:
+        print(f"{result['fixture']:<18}{result['html_kilobytes']:>6.0f}{result['ingest']['kept_chunks']:>8}"
+              f"{result['ingest']['pages_per_second']:>9.2f}{result['ingest']['chunks_per_second']:>10.0f}"
+              f"{result['peak_rss_mb']:>9.0f}{format_percentiles(result['query']['retrieve_ms']):>26}"
+              f"{format_percentiles(result['query']['end_to_end_ms']):>28}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        print(f"\nChange against {args.compare} ({previous.get('git_commit')} -> {results['git_commit']}):")
+        for row in compare_results(previous, results):
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['fixture']:<18}{row['metric']:<26}{row['previous']:>10.2f}{row['current']:>10.2f}"
+                  f"{row['change_percent']:>+8.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    main()
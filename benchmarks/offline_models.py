@@ -0,0 +1,113 @@
+"""
+Offline stand-ins for the embedding model and Claude, shared by the benchmarks.
+
+RandomNetworkEmbeddings replaces the sentence-transformers model with a
+random two-layer network over hashed words of about the same size, so
+embedding costs about as much memory traffic without the model download.
+ExtractiveChatModel replaces Claude with a deterministic model that
+answers with the first sentences of the retrieved context, with an
+optional simulated latency.
+"""
+
+import re
+import time
+import zlib
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from context_packer import estimate_tokens
+
+# Sizes of the random network, about 22 million weights like all-MiniLM-L6-v2
+HASHED_FEATURES = 8192
+HIDDEN_SIZE = 2304
+
+# Number of context sentences in an answer of the extractive model
+ANSWER_SENTENCES = 2
+
+
+class RandomNetworkEmbeddings(Embeddings):
+    """A random two-layer network over hashed words, standing in for a sentence embedding model."""
+
+    def __init__(self, dimension: int = 384, seed: int = 0):
+        random_state = np.random.RandomState(seed)
+        self.first_layer = random_state.normal(size=(HASHED_FEATURES, HIDDEN_SIZE)).astype(np.float32)
+        self.second_layer = random_state.normal(size=(HIDDEN_SIZE, dimension)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        features = np.zeros((len(texts), HASHED_FEATURES), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                features[row, zlib.crc32(word.encode("utf-8")) % HASHED_FEATURES] += 1.0
+        hidden = np.maximum(features @ self.first_layer, 0)
+        return (hidden @ self.second_layer).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class ExtractiveChatModel(BaseChatModel):
+    """
+    A deterministic chat model answering with the first sentences of the prompt context.
+
+    The first token arrives after first_token_seconds and every further word
+    after seconds_per_token, so the end-to-end latency of a chain can be
+    measured with a realistic generation time or without one. The usage
+    metadata reports tokens estimated from the prompt and answer lengths.
+    """
+
+    first_token_seconds: float = 0.0
+    seconds_per_token: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "extractive-fake"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        """Extract the answer from the context of the last message."""
+        prompt = str(messages[-1].content)
+        context = prompt.split("Context:", 1)[-1].split("\nAnswer:", 1)[0].strip()
+        sentences = re.split(r"(?<=[.!?])\s+", context)
+        return " ".join(sentences[:ANSWER_SENTENCES]) or "I don't know."
+
+    def _usage(self, messages: List[BaseMessage], answer: str) -> dict:
+        input_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        output_tokens = estimate_tokens(answer)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        answer = self._answer(messages)
+        time.sleep(self.first_token_seconds + self.seconds_per_token * max(0, len(answer.split()) - 1))
+        message = AIMessage(content=answer, usage_metadata=self._usage(messages, answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        answer = self._answer(messages)
+        time.sleep(self.first_token_seconds)
+        words = answer.split(" ")
+        for position, word in enumerate(words):
+            if position:
+                time.sleep(self.seconds_per_token)
+            text = word if position == 0 else " " + word
+            usage = self._usage(messages, answer) if position == len(words) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text, usage_metadata=usage))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
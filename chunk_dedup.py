@@ -0,0 +1,382 @@
+"""
+Chunk de-duplication module for the RAG application.
+Drops exact and near-duplicate chunks before they are embedded, using
+content hashes and MinHash signatures indexed with locality-sensitive hashing.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+# Default estimated Jaccard similarity above which two chunks are near-duplicates
+DEFAULT_THRESHOLD = 0.85
+
+# Default number of MinHash permutations per signature
+DEFAULT_NUM_PERMUTATIONS = 128
+
+# Default number of words per shingle
+DEFAULT_SHINGLE_SIZE = 3
+
+# Metadata key listing the other sources that contained a dropped copy of a chunk
+DUPLICATE_SOURCES_KEY = "duplicate_sources"
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize chunk text so that copies differing only in case or whitespace match.
+
+    Args:
+        text: The chunk text
+
+    Returns:
+        The lower-cased text with runs of whitespace collapsed
+    """
+    return " ".join(text.lower().split())
+
+
+def make_text_key(text: str) -> str:
+    """
+    Build the exact-duplicate key of a chunk text.
+
+    Args:
+        text: The chunk text
+
+    Returns:
+        A hex digest of the normalized text
+    """
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def choose_lsh_bands(threshold: float, num_permutations: int) -> Tuple[int, int]:
+    """
+    Choose how to split a signature into LSH bands for a similarity threshold.
+
+    Two signatures become candidates when all rows of at least one band are
+    equal, which happens with probability 1 - (1 - s^rows)^bands for
+    similarity s. The split whose turning point (1 / bands)^(1 / rows) is
+    closest to the threshold without going over it is used, so few true
+    near-duplicates are missed.
+
+    Args:
+        threshold: The similarity threshold
+        num_permutations: The signature length
+
+    Returns:
+        The number of bands and the number of rows per band
+    """
+    splits = [(bands, num_permutations // bands) for bands in range(1, num_permutations + 1)
+              if num_permutations % bands == 0]
+    below = [split for split in splits if (1 / split[0]) ** (1 / split[1]) <= threshold]
+    if below:
+        return max(below, key=lambda split: (1 / split[0]) ** (1 / split[1]))
+    return min(splits, key=lambda split: abs((1 / split[0]) ** (1 / split[1]) - threshold))
+
+
+class ChunkDeduplicator:
+    """
+    Streaming filter of exact and near-duplicate chunks.
+
+    Every chunk is first checked against the hashes of the normalized text of
+    the chunks kept so far. Chunks that are not exact copies get a MinHash
+    signature of their word shingles, which is looked up in an LSH index to
+    find kept chunks with an estimated Jaccard similarity of at least the
+    threshold. Only the hashes and signatures of kept chunks are held, not
+    their text, so the filter can sit in a streaming pipeline.
+
+    When a duplicate comes from another source than the chunk that was kept,
+    that source is recorded against the kept chunk.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_permutations: int = DEFAULT_NUM_PERMUTATIONS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        seed: int = 1,
+    ):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            threshold: Estimated Jaccard similarity above which chunks are near-duplicates,
+                1.0 or more only drops exact duplicates
+            num_permutations: Number of MinHash permutations per signature
+            shingle_size: Number of words per shingle
+            seed: Seed of the MinHash permutations
+        """
+        self.threshold = threshold
+        self.num_permutations = num_permutations
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_lsh_bands(threshold, num_permutations)
+
+        random_state = np.random.RandomState(seed)
+        self._a = random_state.randint(1, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self._b = random_state.randint(0, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+
+        # Key and source of every kept chunk, and the sources of its dropped copies
+        self._kept_sources: Dict[str, Any] = {}
+        self.duplicate_sources: Dict[str, List[str]] = defaultdict(list)
+
+        # MinHash signatures of the kept chunks and the LSH buckets pointing at them
+        self._signatures: List[np.ndarray] = []
+        self._signature_keys: List[str] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+
+        self.kept = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the deduplicator.
+
+        Returns:
+            A dict with the number of kept chunks, exact duplicates and near-duplicates
+        """
+        return {
+            "kept": self.kept,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+        }
+
+    def filter(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Drop the chunks that duplicate a chunk seen before.
+
+        Kept chunks get the sources of the duplicates found so far in their
+        metadata. Duplicates of chunks that were already passed on are only
+        recorded in duplicate_sources, see apply_duplicate_sources().
+
+        Args:
+            documents: The chunks to filter
+
+        Returns:
+            The chunks that are not duplicates, in their original order
+        """
+        kept_documents = []
+        for document in documents:
+            if self._add(document.page_content, document.metadata.get("source"), keep=True):
+                kept_documents.append(document)
+
+        for document in kept_documents:
+            sources = self.duplicate_sources.get(make_text_key(document.page_content))
+            if sources:
+                document.metadata[DUPLICATE_SOURCES_KEY] = list(sources)
+        return kept_documents
+
+    def register(self, documents: Iterable[Document]) -> None:
+        """
+        Add chunks that are already indexed, so that new copies of them are dropped.
+
+        Args:
+            documents: The indexed chunks
+        """
+        for document in documents:
+            self._add(document.page_content, document.metadata.get("source"), keep=False)
+
+    def get_duplicate_sources(self, text: str) -> List[str]:
+        """
+        Get the sources of the dropped copies of a kept chunk.
+
+        Args:
+            text: The text of the kept chunk
+
+        Returns:
+            The sources, in the order the copies were found
+        """
+        return list(self.duplicate_sources.get(make_text_key(text), []))
+
+    def _add(self, text: str, source: Any, keep: bool) -> bool:
+        """
+        Check a chunk against the kept chunks and keep it if it is new.
+
+        Returns:
+            True if the chunk is kept, False if it is a duplicate
+        """
+        key = make_text_key(text)
+        if key in self._kept_sources:
+            if keep:
+                self.exact_duplicates += 1
+            self._record_duplicate(key, source)
+            return False
+
+        signature = None
+        if self.threshold < 1.0:
+            signature = self._make_signature(text)
+            if signature is not None:
+                match_key = self._find_near_duplicate(signature)
+                if match_key is not None:
+                    if keep:
+                        self.near_duplicates += 1
+                    self._record_duplicate(match_key, source)
+                    return False
+
+        self._kept_sources[key] = source
+        if keep:
+            self.kept += 1
+        if signature is not None:
+            self._index_signature(key, signature)
+        return True
+
+    def _record_duplicate(self, key: str, source: Any) -> None:
+        """Record the source of a dropped copy against the kept chunk."""
+        if source is None or source == self._kept_sources[key]:
+            return
+        if source not in self.duplicate_sources[key]:
+            self.duplicate_sources[key].append(source)
+
+    def _make_signature(self, text: str) -> Optional[np.ndarray]:
+        """Compute the MinHash signature of the word shingles of a text."""
+        words = _WORD_PATTERN.findall(text.lower())
+        if not words:
+            return None
+
+        shingle_count = max(len(words) - self.shingle_size + 1, 1)
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(shingle_count)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+
+        # Universal hashing of every shingle with every permutation, keeping the minimum
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Split a signature into the keys of its LSH bands."""
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _find_near_duplicate(self, signature: np.ndarray) -> Optional[str]:
+        """Find a kept chunk whose estimated similarity reaches the threshold."""
+        checked: Set[int] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            for index in self._buckets[band].get(band_key, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                similarity = float(np.mean(self._signatures[index] == signature))
+                if similarity >= self.threshold:
+                    return self._signature_keys[index]
+        return None
+
+    def _index_signature(self, key: str, signature: np.ndarray) -> None:
+        """Add the signature of a kept chunk to the LSH index."""
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._signature_keys.append(key)
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band][band_key].append(index)
+
+
+def merge_duplicate_sources(*source_lists: Iterable[Any]) -> List[Any]:
+    """
+    Merge lists of duplicate sources, keeping the first occurrence of each.
+
+    Args:
+        source_lists: The lists to merge
+
+    Returns:
+        The merged list
+    """
+    merged = []
+    for sources in source_lists:
+        for source in sources:
+            if source not in merged:
+                merged.append(source)
+    return merged
+
+
+def iter_indexed_documents(vector_store: FAISS) -> Iterable[Document]:
+    """
+    Iterate over the chunks held by a FAISS vector store.
+
+    Args:
+        vector_store: The vector store
+
+    Returns:
+        An iterator over the indexed documents
+    """
+    for docstore_id in vector_store.index_to_docstore_id.values():
+        document = vector_store.docstore.search(docstore_id)
+        if isinstance(document, Document):
+            yield document
+
+
+def get_indexed_sources(vector_store: FAISS) -> Set[str]:
+    """
+    Get every source with chunks in a FAISS vector store, including the sources of dropped duplicates.
+
+    Args:
+        vector_store: The vector store
+
+    Returns:
+        The sources of the indexed chunks
+    """
+    sources = set()
+    for document in iter_indexed_documents(vector_store):
+        sources.add(document.metadata.get("source"))
+        sources.update(document.metadata.get(DUPLICATE_SOURCES_KEY, []))
+    return sources
+
+
+def apply_duplicate_sources(vector_store: FAISS, deduplicator: ChunkDeduplicator) -> int:
+    """
+    Record the duplicate sources found by a deduplicator on the indexed chunks.
+
+    Needed when chunks were indexed before all their copies had been seen,
+    for example in the streaming ingest pipeline.
+
+    Args:
+        vector_store: The vector store holding the kept chunks
+        deduplicator: The deduplicator that filtered the chunks
+
+    Returns:
+        The number of chunks whose metadata changed
+    """
+    if not deduplicator.duplicate_sources:
+        return 0
+
+    updated_count = 0
+    for document in iter_indexed_documents(vector_store):
+        sources = deduplicator.duplicate_sources.get(make_text_key(document.page_content))
+        if not sources:
+            continue
+        existing_sources = document.metadata.get(DUPLICATE_SOURCES_KEY, [])
+        merged_sources = merge_duplicate_sources(existing_sources, sources)
+        if merged_sources != existing_sources:
+            document.metadata[DUPLICATE_SOURCES_KEY] = merged_sources
+            updated_count += 1
+    return updated_count
+
+
+def forget_duplicate_sources(vector_store: FAISS, sources: Set[Any]) -> None:
+    """
+    Remove sources from the duplicate sources of every indexed chunk.
+
+    Used before the pages of these sources are indexed again, since their
+    new content may no longer contain the copies.
+
+    Args:
+        vector_store: The vector store to update
+        sources: The sources to remove
+    """
+    for document in iter_indexed_documents(vector_store):
+        existing_sources = document.metadata.get(DUPLICATE_SOURCES_KEY)
+        if not existing_sources:
+            continue
+        remaining_sources = [source for source in existing_sources if source not in sources]
+        if remaining_sources:
+            document.metadata[DUPLICATE_SOURCES_KEY] = remaining_sources
+        else:
+            del document.metadata[DUPLICATE_SOURCES_KEY]
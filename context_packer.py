@@ -0,0 +1,268 @@
+"""
+Context packing module for the RAG application.
+Turns the retrieved chunks into a compact prompt context: weak hits are
+dropped, overlapping neighbours of the same page are merged back into
+one passage, and the passages are packed into a token budget.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Default maximum number of context tokens sent to the model
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Default number of chunks retrieved before packing, the k of FAISS.similarity_search
+DEFAULT_FETCH_K = 4
+
+# Default distance below the best relevance score within which hits are kept
+DEFAULT_SCORE_MARGIN = 0.2
+
+# Drops between consecutive relevance scores at least this large end the kept hits
+DEFAULT_MIN_SCORE_GAP = 0.1
+
+# Average number of characters per token of English text for Claude models
+CHARS_PER_TOKEN = 4
+
+# Separator between passages in the prompt, as joined by rag_engine.generate
+PASSAGE_SEPARATOR = "\n\n"
+
+# Largest whitespace gap between two chunks that still counts as contiguous
+MAX_MERGE_GAP_CHARS = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without a tokenizer.
+
+    Args:
+        text: The text
+
+    Returns:
+        The estimated token count
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class Passage:
+    """A run of merged chunks from one source."""
+
+    source: Any
+    start_index: Optional[int]
+    text: str
+    score: float
+    metadata: Dict[str, Any]
+    chunk_count: int = 1
+    scores: List[float] = field(default_factory=list)
+
+    @property
+    def end_index(self) -> Optional[int]:
+        if self.start_index is None:
+            return None
+        return self.start_index + len(self.text)
+
+    def to_document(self) -> Document:
+        """Build the document passed to the prompt."""
+        metadata = dict(self.metadata)
+        metadata["relevance_score"] = self.score
+        metadata["merged_chunks"] = self.chunk_count
+        if self.start_index is not None:
+            metadata["start_index"] = self.start_index
+            metadata["end_index"] = self.end_index
+        return Document(page_content=self.text, metadata=metadata)
+
+
+def choose_score_cutoff(
+    scores: List[float],
+    score_margin: float = DEFAULT_SCORE_MARGIN,
+    min_score_gap: float = DEFAULT_MIN_SCORE_GAP,
+) -> float:
+    """
+    Choose the relevance score below which hits are dropped for one question.
+
+    The cutoff follows the best hit: hits more than score_margin below it are
+    dropped, and so are all hits after the largest drop between consecutive
+    scores when that drop is at least min_score_gap. The best hit is always kept.
+
+    Args:
+        scores: The relevance scores of the hits
+        score_margin: Distance below the best score within which hits are kept
+        min_score_gap: Smallest drop between consecutive scores that ends the kept hits
+
+    Returns:
+        The lowest score that is kept
+    """
+    ordered = sorted(scores, reverse=True)
+    if not ordered:
+        return 0.0
+
+    cutoff = ordered[0] - score_margin
+    gaps = [(ordered[i] - ordered[i + 1], i) for i in range(len(ordered) - 1)]
+    if gaps:
+        largest_gap, position = max(gaps)
+        if largest_gap >= min_score_gap:
+            cutoff = max(cutoff, ordered[position])
+    return min(cutoff, ordered[0])
+
+
+def merge_chunks(scored_documents: List[Tuple[Document, float]]) -> List[Passage]:
+    """
+    Merge chunks of the same source that overlap or touch into passages.
+
+    Chunks are placed with their start_index metadata. The overlap of two
+    neighbours is only removed when its text really is the same in both, so
+    chunks whose offsets do not match the text are kept apart. Chunks
+    without a source or start_index stay passages of their own.
+
+    Args:
+        scored_documents: The chunks with their relevance scores
+
+    Returns:
+        The passages, most relevant first
+    """
+    passages: List[Passage] = []
+    by_source: Dict[Any, List[Tuple[Document, float]]] = {}
+    for document, score in scored_documents:
+        source = document.metadata.get("source")
+        if source is None or document.metadata.get("start_index") is None:
+            passages.append(Passage(source, None, document.page_content, score, dict(document.metadata), 1, [score]))
+        else:
+            by_source.setdefault(source, []).append((document, score))
+
+    for source, chunks in by_source.items():
+        chunks.sort(key=lambda chunk: chunk[0].metadata["start_index"])
+        current: Optional[Passage] = None
+        for document, score in chunks:
+            start_index = document.metadata["start_index"]
+            if current is not None and _append_chunk(current, document.page_content, start_index, score):
+                continue
+            if current is not None:
+                passages.append(current)
+            current = Passage(source, start_index, document.page_content, score, dict(document.metadata), 1, [score])
+        if current is not None:
+            passages.append(current)
+
+    passages.sort(key=lambda passage: passage.score, reverse=True)
+    return passages
+
+
+def _append_chunk(passage: Passage, text: str, start_index: int, score: float) -> bool:
+    """Extend a passage with the next chunk of its source if they overlap or touch."""
+    end_index = passage.end_index
+    if start_index > end_index + MAX_MERGE_GAP_CHARS:
+        return False
+
+    if start_index >= end_index:
+        # Contiguous, separated at most by the whitespace the splitter stripped
+        passage.text = passage.text + (" " if start_index > end_index else "") + text
+    else:
+        overlap = end_index - start_index
+        if overlap > len(text):
+            # Contained in the passage
+            if text not in passage.text:
+                return False
+        else:
+            if passage.text[len(passage.text) - overlap:] != text[:overlap]:
+                return False
+            passage.text = passage.text + text[overlap:]
+
+    passage.score = max(passage.score, score)
+    passage.scores.append(score)
+    passage.chunk_count += 1
+    return True
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a token budget.
+
+    Hits below an adaptive relevance cutoff are dropped, the remaining
+    chunks are merged into passages where they overlap, and passages are
+    added most relevant first while they fit the budget. A passage larger
+    than the whole budget is cut when it is the first one.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        fetch_k: int = DEFAULT_FETCH_K,
+        score_margin: float = DEFAULT_SCORE_MARGIN,
+        min_score_gap: float = DEFAULT_MIN_SCORE_GAP,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Initialize the packer.
+
+        Args:
+            token_budget: Maximum number of context tokens
+            fetch_k: Number of chunks to retrieve before packing
+            score_margin: Distance below the best relevance score within which hits are kept
+            min_score_gap: Smallest drop between consecutive scores that ends the kept hits
+            token_counter: Function counting the tokens of a text, estimate_tokens() by default
+        """
+        self.token_budget = token_budget
+        self.fetch_k = fetch_k
+        self.score_margin = score_margin
+        self.min_score_gap = min_score_gap
+        self.token_counter = token_counter
+
+    def pack(self, scored_documents: List[Tuple[Document, float]]) -> Tuple[List[Document], Dict[str, int]]:
+        """
+        Pack retrieved chunks into the token budget.
+
+        Args:
+            scored_documents: The retrieved chunks with their relevance scores
+
+        Returns:
+            The packed passages as documents, most relevant first, and a dict
+            with the tokens of the raw and packed context, the tokens saved
+            and the number of hits, kept hits, passages and dropped passages
+        """
+        raw_context = PASSAGE_SEPARATOR.join(document.page_content for document, _ in scored_documents)
+        tokens_before = self.token_counter(raw_context) if raw_context else 0
+
+        cutoff = choose_score_cutoff([score for _, score in scored_documents], self.score_margin, self.min_score_gap)
+        kept = [(document, score) for document, score in scored_documents if score >= cutoff]
+        passages = merge_chunks(kept)
+
+        packed: List[Document] = []
+        used_tokens = 0
+        dropped_passages = 0
+        separator_tokens = self.token_counter(PASSAGE_SEPARATOR)
+        for passage in passages:
+            passage_tokens = self.token_counter(passage.text) + (separator_tokens if packed else 0)
+            if used_tokens + passage_tokens <= self.token_budget:
+                packed.append(passage.to_document())
+                used_tokens += passage_tokens
+            elif not packed:
+                # The best passage alone is larger than the budget, so keep its beginning
+                passage.text = self._truncate(passage.text, self.token_budget)
+                packed.append(passage.to_document())
+                used_tokens += self.token_counter(passage.text)
+            else:
+                dropped_passages += 1
+
+        tokens_after = self.token_counter(PASSAGE_SEPARATOR.join(document.page_content for document in packed))
+        stats = {
+            "hits": len(scored_documents),
+            "kept_hits": len(kept),
+            "passages": len(packed),
+            "dropped_passages": dropped_passages,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(0, tokens_before - tokens_after),
+        }
+        return packed, stats
+
+    def _truncate(self, text: str, token_budget: int) -> str:
+        """Cut a text to at most token_budget tokens, at a word boundary when possible."""
+        end = min(len(text), token_budget * CHARS_PER_TOKEN)
+        while end > 0 and self.token_counter(text[:end]) > token_budget:
+            end -= max(1, (end // 10))
+        cut = text[:end]
+        if end < len(text) and " " in cut:
+            cut = cut[:cut.rindex(" ")]
+        return cut
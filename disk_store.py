@@ -0,0 +1,312 @@
+"""
+Disk-backed vector store module for the RAG application.
+Stores a FAISS index next to a SQLite docstore so that large indexes can be
+opened memory-mapped and read-only, fetching chunk text only for the hits.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from index_factory import IVF, IVF_FP16, IVF_PQ, get_index_type
+
+DISK_INDEX_FILE = "index.faiss"
+DISK_DOCSTORE_FILE = "docstore.sqlite"
+DISK_MANIFEST_FILE = "disk_index.json"
+
+# Number of rows written to the docstore per statement
+WRITE_BATCH_SIZE = 1000
+
+
+def is_disk_index(directory: str) -> bool:
+    """
+    Check whether a directory holds an index written by write_disk_index().
+
+    Args:
+        directory: The directory to check
+
+    Returns:
+        True if the directory holds a disk index
+    """
+    return os.path.exists(os.path.join(directory, DISK_MANIFEST_FILE))
+
+
+def get_mmap_flags(index_type: Optional[str]) -> int:
+    """
+    Get the FAISS read flags that memory-map an index of a given type.
+
+    Inverted lists are mapped with IO_FLAG_MMAP. Flat code storage, also
+    used for the vectors of an HNSW graph, is mapped with IO_FLAG_MMAP_IFC.
+    The two flags cannot be combined for inverted files.
+
+    Args:
+        index_type: The index_factory type of the index
+
+    Returns:
+        The flags to pass to faiss.read_index
+    """
+    import faiss
+
+    if index_type in (IVF, IVF_FP16, IVF_PQ):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+class SQLiteDocstore(Docstore):
+    """
+    A read-only docstore that reads chunks from a SQLite file on demand.
+
+    Each row holds the position of the chunk in the FAISS index, its
+    docstore id, its text and its metadata as JSON. The file is opened once
+    and shared by every thread behind a lock, so like the memory-mapped
+    index it stays readable even if the cache entry is evicted meanwhile.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the docstore.
+
+        Args:
+            path: Path of the SQLite file written by write_disk_index()
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        """Run a query and return all its rows."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def search(self, search: str) -> Union[str, Document]:
+        """
+        Get a chunk by its docstore id.
+
+        Args:
+            search: The docstore id
+
+        Returns:
+            The Document, or an error message if there is no such chunk
+        """
+        rows = self._query("SELECT page_content, metadata FROM chunks WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        page_content, metadata = rows[0]
+        return Document(id=search, page_content=page_content, metadata=json.loads(metadata))
+
+    def get_docstore_id(self, position: int) -> Optional[str]:
+        """
+        Get the docstore id of the chunk at a position of the FAISS index.
+
+        Args:
+            position: The position in the index
+
+        Returns:
+            The docstore id, or None if there is no chunk at that position
+        """
+        rows = self._query("SELECT id FROM chunks WHERE position = ?", (int(position),))
+        return rows[0][0] if rows else None
+
+    def iter_positions(self) -> Iterator[int]:
+        """Iterate over the positions of every chunk, in index order."""
+        for (position,) in self._query("SELECT position FROM chunks ORDER BY position"):
+            yield position
+
+    def count(self) -> int:
+        """Return the number of chunks."""
+        return self._query("SELECT COUNT(*) FROM chunks")[0][0]
+
+    def delete(self, ids: List) -> None:
+        """Chunks cannot be deleted from a read-only docstore."""
+        raise ValueError("The disk-backed docstore is read-only.")
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        with self._lock:
+            self._connection.close()
+
+
+class SQLiteIndexToDocstoreId(Mapping):
+    """
+    The mapping from FAISS positions to docstore ids, read from the docstore
+    on demand instead of being held in memory.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        docstore_id = self.docstore.get_docstore_id(position)
+        if docstore_id is None:
+            raise KeyError(position)
+        return docstore_id
+
+    def __iter__(self) -> Iterator[int]:
+        return self.docstore.iter_positions()
+
+    def __len__(self) -> int:
+        return self.docstore.count()
+
+
+class ReadOnlyFAISS(FAISS):
+    """
+    A FAISS vector store opened from a disk index for querying only.
+
+    The index is memory-mapped, so processes opening the same index share
+    its pages through the page cache. Writing to a memory-mapped FAISS
+    index aborts the process, so every write is refused here instead.
+    """
+
+    def add_texts(self, *args: Any, **kwargs: Any) -> List[str]:
+        raise ValueError("This vector store was opened read-only from a disk index.")
+
+    def add_embeddings(self, *args: Any, **kwargs: Any) -> List[str]:
+        raise ValueError("This vector store was opened read-only from a disk index.")
+
+    def delete(self, *args: Any, **kwargs: Any) -> Optional[bool]:
+        raise ValueError("This vector store was opened read-only from a disk index.")
+
+    def merge_from(self, *args: Any, **kwargs: Any) -> None:
+        raise ValueError("This vector store was opened read-only from a disk index.")
+
+    def save_local(self, *args: Any, **kwargs: Any) -> None:
+        raise ValueError("This vector store was opened read-only from a disk index.")
+
+
+def write_disk_index(vector_store: FAISS, directory: str) -> None:
+    """
+    Write a FAISS vector store as a FAISS index file and a SQLite docstore.
+
+    Args:
+        vector_store: The vector store to write
+        directory: The directory to write to, created if needed
+    """
+    import faiss
+
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(vector_store.index, os.path.join(directory, DISK_INDEX_FILE))
+
+    docstore_path = os.path.join(directory, DISK_DOCSTORE_FILE)
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)
+    connection = sqlite3.connect(docstore_path)
+    try:
+        connection.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+            "page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        rows = []
+        for position, docstore_id in sorted(vector_store.index_to_docstore_id.items()):
+            document = vector_store.docstore.search(docstore_id)
+            if not isinstance(document, Document):
+                raise ValueError(f"Could not find document for id {docstore_id}")
+            rows.append((int(position), docstore_id, document.page_content, json.dumps(document.metadata)))
+            if len(rows) >= WRITE_BATCH_SIZE:
+                connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        if rows:
+            connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+    manifest = {
+        "index_type": get_index_type(vector_store.index),
+        "vectors": vector_store.index.ntotal,
+        "dimension": vector_store.index.d,
+        "distance_strategy": vector_store.distance_strategy.value,
+        "normalize_L2": vector_store._normalize_L2,
+    }
+    with open(os.path.join(directory, DISK_MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+
+def read_disk_manifest(directory: str) -> Dict[str, Any]:
+    """
+    Read the manifest of a disk index.
+
+    Args:
+        directory: The directory of the disk index
+
+    Returns:
+        The index type, size, dimension and distance settings
+    """
+    with open(os.path.join(directory, DISK_MANIFEST_FILE)) as manifest_file:
+        return json.load(manifest_file)
+
+
+def open_disk_index(directory: str, embeddings: Embeddings) -> ReadOnlyFAISS:
+    """
+    Open a disk index memory-mapped and read-only.
+
+    Only the pages of the index touched by a search are read, and chunk
+    text is fetched from SQLite for the hits only, so the process holds
+    almost no private memory for the index.
+
+    Args:
+        directory: The directory of the disk index
+        embeddings: The embeddings used to embed queries
+
+    Returns:
+        A read-only vector store
+    """
+    import faiss
+
+    manifest = read_disk_manifest(directory)
+    index = faiss.read_index(os.path.join(directory, DISK_INDEX_FILE), get_mmap_flags(manifest["index_type"]))
+    docstore = SQLiteDocstore(os.path.join(directory, DISK_DOCSTORE_FILE))
+    return ReadOnlyFAISS(
+        embeddings,
+        index,
+        docstore,
+        SQLiteIndexToDocstoreId(docstore),
+        normalize_L2=manifest["normalize_L2"],
+        distance_strategy=DistanceStrategy(manifest["distance_strategy"]),
+    )
+
+
+def load_disk_index(directory: str, embeddings: Embeddings) -> FAISS:
+    """
+    Load a disk index fully into memory, so it can be updated.
+
+    Args:
+        directory: The directory of the disk index
+        embeddings: The embeddings used to embed queries and new chunks
+
+    Returns:
+        A writable in-memory vector store
+    """
+    import faiss
+
+    manifest = read_disk_manifest(directory)
+    index = faiss.read_index(os.path.join(directory, DISK_INDEX_FILE))
+
+    documents = {}
+    index_to_docstore_id = {}
+    connection = sqlite3.connect(f"file:{os.path.join(directory, DISK_DOCSTORE_FILE)}?mode=ro", uri=True)
+    try:
+        for position, docstore_id, page_content, metadata in connection.execute(
+            "SELECT position, id, page_content, metadata FROM chunks ORDER BY position"
+        ):
+            documents[docstore_id] = Document(id=docstore_id, page_content=page_content, metadata=json.loads(metadata))
+            index_to_docstore_id[position] = docstore_id
+    finally:
+        connection.close()
+
+    return FAISS(
+        embeddings,
+        index,
+        InMemoryDocstore(documents),
+        index_to_docstore_id,
+        normalize_L2=manifest["normalize_L2"],
+        distance_strategy=DistanceStrategy(manifest["distance_strategy"]),
+    )
@@ -3,34 +3,168 @@ Document processing module for the RAG application.
 Handles loading, splitting, and indexing documents from URLs.
 """
 
-import bs4
-from typing import List, Optional
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.vectorstores import VectorStore
 from langchain_community.vectorstores import FAISS
 
-def load_and_process_url(url: str) -> VectorStore:
+from chunk_dedup import (
+    ChunkDeduplicator,
+    apply_duplicate_sources,
+    forget_duplicate_sources,
+    get_indexed_sources,
+    iter_indexed_documents,
+)
+from context_packer import CHARS_PER_TOKEN
+from embedding_backends import (
+    DEFAULT_EMBEDDING_BACKEND,
+    SENTENCE_TRANSFORMERS,
+    create_backend_embeddings,
+    get_embedding_backend_names,
+)
+from embedding_cache import ChunkEmbeddingCache, get_embedding_model_name, remove_sources, update_vector_store
+from html_extractor import extract_page
+from index_factory import IndexConfig, apply_index_config, describe_index
+from ingest_pipeline import DEFAULT_BATCH_SIZE, IngestPipeline
+from index_cache import IndexCache, compute_content_hash, make_cache_key
+from index_registry import IndexHandle, IndexRegistry
+from instrumentation import stage
+from resource_usage import get_resident_memory_bytes
+from streaming_splitter import StreamingTextSplitter
+from web_fetcher import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    FetchResult,
+    ValidatorStore,
+    fetch_urls,
+    iter_crawl_site,
+    iter_fetch_urls,
+)
+
+# Embedding model used to index the documents
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# File in a cached index entry holding the validators of its pages
+VALIDATORS_FILE = "validators.json"
+
+# Text splitter settings
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Unit of the chunk size, "characters" or "tokens"
+CHUNK_SIZE_UNIT = os.environ.get("RAG_CHUNK_SIZE_UNIT", "characters")
+
+# Text splitter settings in tokens, within the 256 tokens all-MiniLM-L6-v2 embeds
+CHUNK_SIZE_TOKENS = 250
+CHUNK_OVERLAP_TOKENS = 50
+
+# Estimated similarity above which chunks are dropped as near-duplicates before embedding
+DEDUP_THRESHOLD = 0.85
+
+# The embedding model is loaded once per process and shared by every caller
+_embedding_backend = DEFAULT_EMBEDDING_BACKEND
+_embeddings: Optional[Embeddings] = None
+_embeddings_stats: Dict[str, float] = {}
+_embeddings_lock = threading.Lock()
+
+def load_and_process_url(
+    url: str,
+    index_cache: Optional[IndexCache] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    index_config: Optional[IndexConfig] = None,
+    documents: Optional[List[Document]] = None,
+) -> VectorStore:
     """
     Load content from a URL, process it, and create a vector store.
     
     Args:
         url: The URL to load and process
+        index_cache: Optional cache of previously built indexes
+        embedding_cache: Optional cache of chunk embeddings
+        index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+        documents: Optional documents of the URL that were already loaded, fetched if not provided
         
     Returns:
         A vector store containing the processed documents
     """
     # Load the documents
-    documents = load_documents_from_url(url)
+    if documents is None:
+        documents = load_documents_from_url(url)
     
-    # Split the documents
-    document_chunks = split_documents(documents)
+    # Without an index cache, build a new vector store from the chunks
+    if index_cache is None:
+        document_chunks = remove_duplicate_chunks(split_documents(documents))
+        vector_store = create_vector_store(document_chunks, embedding_cache=embedding_cache)
+        return apply_index_config(vector_store, index_config)
+    
+    # Reuse a previously built index when the page has not changed
+    embeddings = get_embeddings()
+    settings = get_index_settings(embeddings, index_config)
+    cache_key = make_cache_key(url, compute_content_hash(documents), settings)
+    cached_vector_store = index_cache.open(cache_key, embeddings)
+    if cached_vector_store is not None:
+        print(f"Loaded cached vector store for: {url}")
+        return cached_vector_store
     
-    # Create and return the vector store
-    return create_vector_store(document_chunks)
+    # Split the documents and drop duplicate chunks
+    document_chunks = remove_duplicate_chunks(split_documents(documents))
+    
+    # When an older version of the page was indexed, patch that index instead of rebuilding it
+    vector_store = None
+    previous_cache_key = index_cache.find_latest_entry(url, settings)
+    if previous_cache_key is not None:
+        vector_store = index_cache.load(previous_cache_key, embeddings)
+    
+    if vector_store is not None:
+        update_stats = update_vector_store(vector_store, document_chunks, embedding_cache)
+        print(f"Updated cached vector store: {update_stats['added']} chunks added, "
+              f"{update_stats['removed']} removed, {update_stats['unchanged']} unchanged.")
+    else:
+        vector_store = create_vector_store(document_chunks, embeddings, embedding_cache)
+    apply_index_config(vector_store, index_config)
+    
+    index_cache.save(cache_key, vector_store, url, settings)
+    return open_saved_index(index_cache, cache_key, embeddings, vector_store)
+
+def load_shared_url_index(
+    url: str,
+    index_registry: IndexRegistry,
+    index_cache: Optional[IndexCache] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    index_config: Optional[IndexConfig] = None,
+) -> IndexHandle:
+    """
+    Get the index of a URL from a registry shared by the whole process.
+    
+    The page is fetched to find its content hash, and the index is keyed by
+    URL, content hash and index settings like the on-disk cache. Callers
+    asking for the same version of a page share one index, and concurrent
+    callers wait for a single build. A changed page gets a new index.
+    
+    Args:
+        url: The URL to load and process
+        index_registry: The registry of loaded indexes
+        index_cache: Optional cache of previously built indexes
+        embedding_cache: Optional cache of chunk embeddings
+        index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+        
+    Returns:
+        A handle holding the vector store, to release when it is no longer needed
+    """
+    documents = load_documents_from_url(url)
+    settings = get_index_settings(get_embeddings(), index_config)
+    registry_key = make_cache_key(url, compute_content_hash(documents), settings)
+    
+    return index_registry.acquire(
+        registry_key,
+        lambda: load_and_process_url(url, index_cache, embedding_cache, index_config, documents),
+    )
 
 def load_documents_from_url(url: str) -> List[Document]:
     """
@@ -44,17 +178,13 @@ def load_documents_from_url(url: str) -> List[Document]:
     """
     print(f"Loading content from: {url}")
     
-    # Use WebBaseLoader to fetch the content
-    loader = WebBaseLoader(
-        web_paths=[url],
-        bs_kwargs=dict(
-            parse_only=bs4.SoupStrainer(
-                ["p", "h1", "h2", "h3", "h4", "h5", "article", "section", "div", "main"]
-            )
-        )
-    )
+    # Fetch the page and extract its text blocks
+    result = fetch_urls([url], requests_per_second_per_host=0)[0]
+    if result.error is not None:
+        raise ValueError(f"Could not load {url}: {result.error}")
     
-    documents = loader.load()
+    document = parse_html_document(url, result.html)
+    documents = [document] if document.page_content else []
     
     # Print the content for demonstration (only in CLI mode)
     if documents:
@@ -64,6 +194,352 @@ def load_documents_from_url(url: str) -> List[Document]:
     
     return documents
 
+def parse_html_document(url: str, html: str) -> Document:
+    """
+    Extract the text of an HTML page into a Document.
+    
+    Every text block of the page appears once, in document order, separated
+    by blank lines so the text splitter can split on block boundaries.
+    Navigation, footers, cookie banners and other boilerplate are dropped.
+    
+    Args:
+        url: The URL of the page
+        html: The HTML content of the page
+        
+    Returns:
+        A Document with the page text, its source URL and its title
+    """
+    with stage("parse", pages=1, bytes=len(html)) as counters:
+        title, blocks = extract_page(html)
+        metadata = {"source": url}
+        if title:
+            metadata["title"] = title
+        document = Document(page_content="\n\n".join(blocks), metadata=metadata)
+        counters["blocks"] = len(blocks)
+    return document
+
+def load_and_process_urls(
+    urls: List[str],
+    index_cache: Optional[IndexCache] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    index_config: Optional[IndexConfig] = None,
+) -> VectorStore:
+    """
+    Load many URLs concurrently and index them into one vector store.
+    
+    Args:
+        urls: The URLs to load and process
+        index_cache: Optional cache of previously built indexes
+        embedding_cache: Optional cache of chunk embeddings
+        max_concurrency: Maximum number of pages fetched at the same time
+        requests_per_second_per_host: Maximum request rate per host
+        batch_size: Number of chunks embedded and added to the index at once
+        index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+        
+    Returns:
+        A vector store containing the processed documents of every URL
+    """
+    print(f"Loading content from {len(urls)} URLs...")
+    
+    def fetch_pages(validator_store: Optional[ValidatorStore]) -> Iterable[FetchResult]:
+        return iter_fetch_urls(
+            urls,
+            max_concurrency=max_concurrency,
+            requests_per_second_per_host=requests_per_second_per_host,
+            validator_store=validator_store,
+        )
+    
+    collection_name = "urls:" + "\n".join(sorted(urls))
+    return index_fetched_pages(
+        collection_name, fetch_pages, index_cache, embedding_cache, batch_size, index_config
+    )
+
+def load_and_process_site(
+    start_url: str,
+    max_pages: int = 100,
+    index_cache: Optional[IndexCache] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    index_config: Optional[IndexConfig] = None,
+) -> VectorStore:
+    """
+    Crawl a site from a start URL and index every page into one vector store.
+    
+    Args:
+        start_url: The URL to start crawling from
+        max_pages: Maximum number of pages to crawl
+        index_cache: Optional cache of previously built indexes
+        embedding_cache: Optional cache of chunk embeddings
+        max_concurrency: Maximum number of pages fetched at the same time
+        requests_per_second_per_host: Maximum request rate per host
+        batch_size: Number of chunks embedded and added to the index at once
+        index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+        
+    Returns:
+        A vector store containing the processed documents of every crawled page
+    """
+    def fetch_pages(validator_store: Optional[ValidatorStore]) -> Iterable[FetchResult]:
+        return iter_crawl_site(
+            start_url,
+            max_pages=max_pages,
+            max_concurrency=max_concurrency,
+            requests_per_second_per_host=requests_per_second_per_host,
+            validator_store=validator_store,
+        )
+    
+    collection_name = f"crawl:{start_url}:{max_pages}"
+    return index_fetched_pages(
+        collection_name, fetch_pages, index_cache, embedding_cache, batch_size, index_config
+    )
+
+def index_fetched_pages(
+    collection_name: str,
+    fetch_pages: Callable[[Optional[ValidatorStore]], Iterable[FetchResult]],
+    index_cache: Optional[IndexCache] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    index_config: Optional[IndexConfig] = None,
+) -> VectorStore:
+    """
+    Fetch a collection of pages and build or update its vector store.
+    
+    A new index is built with the streaming ingest pipeline. When the index
+    cache holds a previous index of the collection, pages are fetched with
+    conditional requests instead: unchanged pages keep their chunks, changed
+    pages are patched and pages that are gone are removed.
+    
+    Args:
+        collection_name: Name identifying the collection in the index cache
+        fetch_pages: Function returning an iterable of fetched pages, given the validator store to use
+        index_cache: Optional cache of previously built indexes
+        embedding_cache: Optional cache of chunk embeddings
+        batch_size: Number of chunks embedded and added to the index at once
+        index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+        
+    Returns:
+        A vector store containing the processed documents of the collection
+    """
+    embeddings = get_embeddings()
+    settings = get_index_settings(embeddings, index_config)
+    
+    # Validators are only used together with the index they describe
+    vector_store = None
+    validator_store = None
+    if index_cache is not None:
+        cache_key = make_cache_key(collection_name, "collection", settings)
+        vector_store = index_cache.load(cache_key, embeddings)
+        validator_store = ValidatorStore(os.path.join(index_cache.entry_path(cache_key), VALIDATORS_FILE))
+        if vector_store is None:
+            validator_store.clear()
+        else:
+            # A page without chunks in the index must be downloaded in full, a 304 would leave it out
+            indexed_sources = get_indexed_sources(vector_store)
+            for url in validator_store.urls():
+                if url not in indexed_sources:
+                    validator_store.forget(url)
+    
+    deduplicator = create_deduplicator()
+    if vector_store is None:
+        # Build a new index, overlapping fetching, splitting and embedding
+        text_splitter = create_text_splitter()
+        
+        def split_page(documents: List[Document]) -> List[Document]:
+            return deduplicator.filter(text_splitter.iter_documents(documents))
+        
+        pipeline = IngestPipeline(
+            embeddings,
+            parse_page=parse_html_document,
+            split_page=split_page,
+            embedding_cache=embedding_cache,
+            batch_size=batch_size,
+        )
+        vector_store = pipeline.run(fetch_pages(validator_store))
+        print_fetch_summary(pipeline.fetch_results)
+        print_pipeline_stats(pipeline.stats())
+        if vector_store is None:
+            raise ValueError("No content was loaded from the URLs.")
+        
+        # Copies found after their chunk was indexed are recorded now
+        apply_duplicate_sources(vector_store, deduplicator)
+        print_dedup_stats(deduplicator)
+    else:
+        # Patch the cached index with the pages that changed
+        results = list(fetch_pages(validator_store))
+        print_fetch_summary(results)
+        
+        documents = [parse_html_document(result.url, result.html) for result in results if result.html is not None]
+        add_documents_to_vector_store(vector_store, documents, embedding_cache, deduplicator)
+        
+        # Drop pages that are no longer part of the collection, keep pages that failed temporarily
+        current_sources = {result.url for result in results if result.status_code not in (404, 410)}
+        removed_count = remove_sources(vector_store, current_sources)
+        if removed_count:
+            print(f"Removed {removed_count} chunks of pages that are gone.")
+        for url in validator_store.urls():
+            if url not in current_sources:
+                validator_store.forget(url)
+    
+    # Switch to an approximate index once the collection has grown large enough
+    apply_index_config(vector_store, index_config)
+    print_index_description(vector_store)
+    
+    if index_cache is not None:
+        index_cache.save(cache_key, vector_store, collection_name, settings)
+        if index_cache.contains(cache_key):
+            validator_store.save()
+        return open_saved_index(index_cache, cache_key, embeddings, vector_store)
+    
+    return vector_store
+
+def add_documents_to_vector_store(
+    vector_store: FAISS,
+    documents: List[Document],
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> Dict[str, int]:
+    """
+    Split pages and add their chunks to an existing vector store in place.
+    
+    Pages that are already indexed are patched, keeping their unchanged
+    chunks, and chunks already indexed for another page are dropped as
+    duplicates.
+    
+    Args:
+        vector_store: The vector store to update
+        documents: The pages to add
+        embedding_cache: Optional cache used to embed the new chunks
+        deduplicator: Optional deduplicator to use, a new one if not provided
+        
+    Returns:
+        A dict with the number of added, removed and unchanged chunks
+    """
+    document_chunks = split_documents(documents) if documents else []
+    if not document_chunks:
+        return {"added": 0, "removed": 0, "unchanged": 0}
+    
+    if deduplicator is None:
+        deduplicator = create_deduplicator()
+    
+    # Drop chunks of the changed pages that are already indexed for another page
+    changed_sources = {document.metadata["source"] for document in documents}
+    forget_duplicate_sources(vector_store, changed_sources)
+    deduplicator.register(
+        document for document in iter_indexed_documents(vector_store)
+        if document.metadata.get("source") not in changed_sources
+    )
+    document_chunks = remove_duplicate_chunks(document_chunks, deduplicator)
+    update_stats = update_vector_store(vector_store, document_chunks, embedding_cache)
+    apply_duplicate_sources(vector_store, deduplicator)
+    return update_stats
+
+def open_saved_index(
+    index_cache: IndexCache,
+    cache_key: str,
+    embeddings: Embeddings,
+    vector_store: VectorStore,
+) -> VectorStore:
+    """
+    Swap a freshly saved index for its memory-mapped copy when the cache is disk-backed.
+    
+    Args:
+        index_cache: The cache the index was saved to
+        cache_key: The key of the saved entry
+        embeddings: The embeddings used to embed queries
+        vector_store: The in-memory vector store that was saved
+        
+    Returns:
+        The read-only disk-backed store, or the in-memory store if the cache is not disk-backed
+    """
+    if not index_cache.disk_backed:
+        return vector_store
+    
+    # The in-memory copy is released once the caller drops it
+    disk_vector_store = index_cache.open(cache_key, embeddings)
+    return disk_vector_store if disk_vector_store is not None else vector_store
+
+def print_fetch_summary(results: List[FetchResult]) -> None:
+    """
+    Print how many pages were downloaded, unchanged or failed.
+    
+    Args:
+        results: The fetch results of a collection
+    """
+    downloaded_count = len([result for result in results if result.error is None and not result.not_modified])
+    unchanged_count = len([result for result in results if result.not_modified])
+    failed_count = len([result for result in results if result.error is not None])
+    print(f"Fetched {downloaded_count} pages, {unchanged_count} unchanged, {failed_count} failed.")
+
+def print_index_description(vector_store: VectorStore) -> None:
+    """
+    Print the type, size and search settings of the index of a vector store.
+    
+    Args:
+        vector_store: The FAISS vector store
+    """
+    description = describe_index(vector_store.index)
+    settings = ", ".join(f"{name} {value}" for name, value in description.items() if name != "index_type")
+    print(f"Index: {description['index_type']} ({settings})")
+
+def print_pipeline_stats(stats: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Print the per-stage counters of an ingest pipeline run.
+    
+    Args:
+        stats: The stats returned by IngestPipeline.stats()
+    """
+    for stage_name, stage_stats in stats.items():
+        print(f"  {stage_name}: {stage_stats['items']} items in {stage_stats['busy_seconds']:.2f}s "
+              f"({stage_stats['items_per_second']:.1f}/s), max queue depth {stage_stats['max_queue_depth']}")
+
+def print_dedup_stats(deduplicator: ChunkDeduplicator) -> None:
+    """
+    Print how many chunks were kept and dropped as duplicates.
+    
+    Args:
+        deduplicator: The deduplicator that filtered the chunks
+    """
+    stats = deduplicator.stats()
+    total_count = stats["kept"] + stats["exact_duplicates"] + stats["near_duplicates"]
+    dropped_count = total_count - stats["kept"]
+    dropped_percent = 100 * dropped_count / total_count if total_count else 0.0
+    print(f"Dropped {dropped_count} of {total_count} chunks as duplicates ({dropped_percent:.0f}%): "
+          f"{stats['exact_duplicates']} exact, {stats['near_duplicates']} near.")
+
+def estimate_token_length(text: str) -> float:
+    """
+    Estimate the number of tokens of a piece of text.
+    
+    The estimate is not rounded, so the estimates of the pieces of a chunk
+    add up to the estimate of the chunk.
+    
+    Args:
+        text: The text
+        
+    Returns:
+        The estimated token count
+    """
+    return len(text) / CHARS_PER_TOKEN
+
+def create_text_splitter() -> StreamingTextSplitter:
+    """
+    Create the text splitter used to chunk documents.
+    
+    The splitter yields the same chunks as RecursiveCharacterTextSplitter
+    with the same settings, without holding every piece of a large page
+    in memory.
+    
+    Returns:
+        A text splitter with the configured chunk size, overlap and unit
+    """
+    if CHUNK_SIZE_UNIT == "tokens":
+        return StreamingTextSplitter(CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, length_function=estimate_token_length)
+    return StreamingTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+
 def split_documents(documents: List[Document]) -> List[Document]:
     """
     Split documents into smaller chunks for better processing.
@@ -77,41 +553,223 @@ def split_documents(documents: List[Document]) -> List[Document]:
     print("Splitting documents into chunks...")
     
     # Create a text splitter with appropriate chunk size and overlap
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        add_start_index=True,
-    )
+    text_splitter = create_text_splitter()
     
     # Split the documents
-    split_docs = text_splitter.split_documents(documents)
+    with stage("split", documents=len(documents)) as counters:
+        split_docs = text_splitter.split_documents(documents)
+        counters["chunks"] = len(split_docs)
     
     print(f"Split {len(documents)} documents into {len(split_docs)} chunks.")
     
     return split_docs
 
-def create_vector_store(documents: List[Document]) -> VectorStore:
+def create_deduplicator() -> ChunkDeduplicator:
     """
-    Create a vector store from documents.
+    Create the deduplicator used to drop duplicate chunks before embedding.
+    
+    Returns:
+        A deduplicator with the configured similarity threshold
+    """
+    return ChunkDeduplicator(threshold=DEDUP_THRESHOLD)
+
+def remove_duplicate_chunks(
+    document_chunks: List[Document],
+    deduplicator: Optional[ChunkDeduplicator] = None,
+) -> List[Document]:
+    """
+    Drop exact and near-duplicate chunks so they are not embedded and indexed.
+    
+    The kept chunk lists the other sources that contained a copy in its
+    "duplicate_sources" metadata.
     
     Args:
-        documents: List of documents to index
+        document_chunks: The chunks to filter
+        deduplicator: Optional deduplicator holding chunks seen before, a new one if not provided
         
     Returns:
-        A vector store containing the indexed documents
+        The chunks without duplicates
     """
-    print("Creating vector store from document chunks...")
+    if deduplicator is None:
+        deduplicator = create_deduplicator()
+    
+    kept_chunks = deduplicator.filter(document_chunks)
+    
+    if len(kept_chunks) < len(document_chunks):
+        print_dedup_stats(deduplicator)
+    
+    return kept_chunks
+
+def set_embedding_backend(backend: str) -> None:
+    """
+    Select the backend of the shared embedding model.
+    
+    The shared model is loaded again on next use if it was loaded with
+    another backend.
+    
+    Args:
+        backend: The name of a registered embedding backend
+        
+    Raises:
+        ValueError: If the backend is not registered
+    """
+    global _embedding_backend
+    
+    if backend not in get_embedding_backend_names():
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {get_embedding_backend_names()}.")
+    if backend != _embedding_backend:
+        _embedding_backend = backend
+        reset_embeddings()
+
+def get_embedding_backend() -> str:
+    """
+    Get the backend of the shared embedding model.
+    
+    Returns:
+        The backend name, from RAG_EMBEDDING_BACKEND unless set_embedding_backend() was called
+    """
+    return _embedding_backend
+
+def create_embeddings() -> Embeddings:
+    """
+    Create a new instance of the embeddings used to index documents and queries.
+    
+    Most callers should use get_embeddings() to share the loaded model.
+    
+    Returns:
+        The embeddings of the selected backend, HuggingFace embeddings by default
+    """
+    if _embedding_backend != SENTENCE_TRANSFORMERS:
+        return create_backend_embeddings(EMBEDDING_MODEL_NAME, _embedding_backend)
     
     # Initialize the HuggingFace embeddings (as a replacement for OpenAI embeddings)
     try:
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
     except Exception as e:
         print(f"Error initializing embeddings: {str(e)}")
         print("Falling back to default HuggingFace embeddings...")
         embeddings = HuggingFaceEmbeddings()
     
+    return embeddings
+
+def get_embeddings() -> Embeddings:
+    """
+    Get the embedding model shared by the whole process.
+    
+    The model is loaded on first use. Loading is guarded by a lock so that
+    concurrent callers (for example several Streamlit sessions) wait for a
+    single load instead of each loading their own copy.
+    
+    Returns:
+        The shared embeddings
+    """
+    global _embeddings
+    
+    if _embeddings is not None:
+        return _embeddings
+    
+    with _embeddings_lock:
+        if _embeddings is None:
+            memory_before = get_resident_memory_bytes()
+            start_time = time.perf_counter()
+            embeddings = create_embeddings()
+            _embeddings_stats["load_seconds"] = time.perf_counter() - start_time
+            _embeddings_stats["memory_bytes"] = get_resident_memory_bytes() - memory_before
+            _embeddings = embeddings
+    
+    return _embeddings
+
+def warm_up_embeddings() -> Dict[str, float]:
+    """
+    Load the shared embedding model and run one embedding so the first real
+    request does not pay the start-up cost.
+    
+    Returns:
+        A dict with the model load time in seconds, the memory added by
+        loading the model and the resident memory of the process, in bytes
+    """
+    embeddings = get_embeddings()
+    
+    with _embeddings_lock:
+        if "warm_up_seconds" not in _embeddings_stats:
+            start_time = time.perf_counter()
+            embeddings.embed_query("warm up")
+            _embeddings_stats["warm_up_seconds"] = time.perf_counter() - start_time
+    
+    stats = dict(_embeddings_stats)
+    stats["resident_memory_bytes"] = get_resident_memory_bytes()
+    return stats
+
+def reset_embeddings() -> None:
+    """
+    Drop the shared embedding model so the next call to get_embeddings() loads it again.
+    """
+    global _embeddings
+    
+    with _embeddings_lock:
+        _embeddings = None
+        _embeddings_stats.clear()
+
+def get_index_settings(embeddings: Embeddings, index_config: Optional[IndexConfig] = None) -> Dict[str, Any]:
+    """
+    Get the settings that determine the content of an index.
+    
+    Args:
+        embeddings: The embeddings used to build the index
+        index_config: Optional type and memory budget of the FAISS index
+        
+    Returns:
+        A dict of the embedding model, splitter and index settings
+    """
+    if index_config is None:
+        index_config = IndexConfig()
+    
+    return {
+        "embedding_model": get_embedding_model_name(embeddings),
+        "chunk_size": CHUNK_SIZE_TOKENS if CHUNK_SIZE_UNIT == "tokens" else CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP_TOKENS if CHUNK_SIZE_UNIT == "tokens" else CHUNK_OVERLAP,
+        "chunk_size_unit": CHUNK_SIZE_UNIT,
+        "dedup_threshold": DEDUP_THRESHOLD,
+        "index_type": index_config.index_type,
+        "index_memory_budget_bytes": index_config.memory_budget_bytes,
+    }
+
+def create_vector_store(
+    documents: List[Document],
+    embeddings: Optional[Embeddings] = None,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+) -> VectorStore:
+    """
+    Create a vector store from documents.
+    
+    Args:
+        documents: List of documents to index
+        embeddings: Optional embeddings to use, the shared model if not provided
+        embedding_cache: Optional cache of chunk embeddings, so only new text is embedded
+        
+    Returns:
+        A vector store containing the indexed documents
+    """
+    print("Creating vector store from document chunks...")
+    
+    if embeddings is None:
+        embeddings = get_embeddings()
+    
     # Create a FAISS vector store from the documents
-    vector_store = FAISS.from_documents(documents, embeddings)
+    if embedding_cache is None:
+        # Embedding takes nearly all of the time, so the flat index build is counted with it
+        with stage("embed", chunks=len(documents)):
+            vector_store = FAISS.from_documents(documents, embeddings)
+    else:
+        texts = [document.page_content for document in documents]
+        with stage("embed", chunks=len(documents)):
+            vectors = embedding_cache.embed_documents(texts, embeddings)
+        with stage("index", chunks=len(documents)):
+            vector_store = FAISS.from_embeddings(
+                list(zip(texts, vectors)),
+                embeddings,
+                metadatas=[document.metadata for document in documents],
+            )
     
     print(f"Vector store created with {len(documents)} document chunks.")
     
@@ -0,0 +1,224 @@
+"""
+Embedding backends module for the RAG application.
+Creates the embedding model from a configurable backend: sentence-transformers
+on torch, the default, or an int8-quantized ONNX export of the same model run
+with ONNX Runtime, which needs neither torch nor a GPU and produces vectors
+of the same dimension.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Names of the built-in backends
+SENTENCE_TRANSFORMERS = "sentence-transformers"
+ONNX_INT8 = "onnx-int8"
+
+# Environment variable selecting the backend
+EMBEDDING_BACKEND_ENV_VAR = "RAG_EMBEDDING_BACKEND"
+DEFAULT_EMBEDDING_BACKEND = os.environ.get(EMBEDDING_BACKEND_ENV_VAR, SENTENCE_TRANSFORMERS)
+
+# Hugging Face organisation of models given by their short name, such as all-MiniLM-L6-v2
+MODEL_ORGANISATION = "sentence-transformers"
+
+# int8 export of the model published next to it, quantized for AVX2, which every x86-64 server of the last decade has
+ONNX_INT8_MODEL_FILE = os.environ.get("RAG_ONNX_MODEL_FILE", "onnx/model_quint8_avx2.onnx")
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+
+# Longer texts are truncated, as sentence-transformers does for all-MiniLM-L6-v2
+ONNX_MAX_SEQUENCE_LENGTH = 256
+
+# Number of texts run through the ONNX model at once
+ONNX_BATCH_SIZE = 32
+
+# Threads used by ONNX Runtime for one batch, 0 lets it use every core
+ONNX_THREADS = int(os.environ.get("RAG_ONNX_THREADS", "0"))
+
+# Factories of the registered backends, each creating the embeddings of a model name
+_backends: Dict[str, Callable[[str], Embeddings]] = {}
+
+
+def register_embedding_backend(name: str, factory: Callable[[str], Embeddings]) -> None:
+    """
+    Register an embedding backend, replacing any backend of the same name.
+
+    Args:
+        name: The name used to select the backend
+        factory: Function creating the embeddings of a model name
+    """
+    _backends[name] = factory
+
+
+def get_embedding_backend_names() -> List[str]:
+    """
+    Get the names of the registered embedding backends.
+
+    Returns:
+        The names, in registration order
+    """
+    return list(_backends)
+
+
+def create_backend_embeddings(model_name: str, backend: Optional[str] = None) -> Embeddings:
+    """
+    Create the embeddings of a model with a backend.
+
+    Args:
+        model_name: The model name
+        backend: Optional backend name, DEFAULT_EMBEDDING_BACKEND if not provided
+
+    Returns:
+        The embeddings
+
+    Raises:
+        ValueError: If the backend is not registered
+        ImportError: If the packages of the backend are not installed
+    """
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    factory = _backends.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {get_embedding_backend_names()}.")
+    return factory(model_name)
+
+
+def create_sentence_transformers_embeddings(model_name: str) -> Embeddings:
+    """
+    Create sentence-transformers embeddings, run with torch.
+
+    Args:
+        model_name: The model name
+
+    Returns:
+        The HuggingFace embeddings
+    """
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def mean_pool_and_normalize(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """
+    Turn the token embeddings of a batch into unit length sentence embeddings.
+
+    Averages the embeddings of the tokens that are not padding, then
+    normalizes them, like the pooling and normalize modules of the
+    sentence-transformers models.
+
+    Args:
+        token_embeddings: Array of shape (texts, tokens, dimension)
+        attention_mask: Array of shape (texts, tokens), 1 for real tokens and 0 for padding
+
+    Returns:
+        Array of shape (texts, dimension)
+    """
+    mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.maximum(mask.sum(axis=1), 1e-9)
+    pooled = summed / counts
+    norms = np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+    return pooled / norms
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings computed by an ONNX export of a sentence-transformers model.
+
+    Texts are sorted by length and run in batches padded to their longest
+    text, so short chunks do not pay for the padding of long ones.
+    """
+
+    def __init__(
+        self,
+        session: Any,
+        tokenizer: Any,
+        model_name: str,
+        batch_size: int = ONNX_BATCH_SIZE,
+    ):
+        """
+        Initialize the embeddings.
+
+        Args:
+            session: The ONNX Runtime inference session of the model
+            tokenizer: The tokenizer of the model, padding each batch to its longest text
+            model_name: Name identifying the model and its quantization in the caches
+            batch_size: Number of texts run through the model at once
+        """
+        self.session = session
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._input_names = {model_input.name for model_input in session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one batch of texts through the model."""
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: feeds[name] for name in feeds if name in self._input_names})[0]
+        return mean_pool_and_normalize(token_embeddings, attention_mask)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda position: len(texts[position]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch_positions = order[start:start + self.batch_size]
+            batch_vectors = self._embed_batch([texts[position] for position in batch_positions])
+            for position, vector in zip(batch_positions, batch_vectors.tolist()):
+                vectors[position] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_onnx_int8_embeddings(model_name: str) -> OnnxEmbeddings:
+    """
+    Create embeddings run by ONNX Runtime on the int8-quantized export of a model.
+
+    The model and tokenizer files are downloaded from the Hugging Face hub
+    on first use and cached like the sentence-transformers models.
+
+    Args:
+        model_name: The model name, a short name is looked up in the sentence-transformers organisation
+
+    Returns:
+        The ONNX embeddings
+
+    Raises:
+        ImportError: If onnxruntime, tokenizers or huggingface_hub is not installed
+    """
+    try:
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+    except ImportError as e:
+        raise ImportError(
+            f"The {ONNX_INT8} embedding backend needs onnxruntime, tokenizers and huggingface_hub: "
+            "pip install onnxruntime tokenizers huggingface_hub"
+        ) from e
+
+    repository = model_name if "/" in model_name else f"{MODEL_ORGANISATION}/{model_name}"
+    tokenizer = Tokenizer.from_file(hf_hub_download(repository, ONNX_TOKENIZER_FILE))
+    tokenizer.enable_truncation(max_length=ONNX_MAX_SEQUENCE_LENGTH)
+    tokenizer.enable_padding()
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = ONNX_THREADS
+    session = onnxruntime.InferenceSession(
+        hf_hub_download(repository, ONNX_INT8_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+    )
+    # The quantized vectors differ slightly from the torch ones, so caches keep them apart
+    return OnnxEmbeddings(session, tokenizer, f"{model_name}@{ONNX_INT8}")
+
+
+register_embedding_backend(SENTENCE_TRANSFORMERS, create_sentence_transformers_embeddings)
+register_embedding_backend(ONNX_INT8, create_onnx_int8_embeddings)
@@ -0,0 +1,411 @@
+"""
+Embedding cache module for the RAG application.
+Stores chunk embeddings on disk so unchanged text is never embedded twice,
+and patches existing FAISS indexes in place when a page changes.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock, the store is then only safe within one process
+    fcntl = None
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from chunk_dedup import DUPLICATE_SOURCES_KEY, merge_duplicate_sources
+from index_factory import delete_from_vector_store
+
+# Default location of the on-disk embedding cache, can be overridden with RAG_EMBEDDING_CACHE_DIR
+DEFAULT_EMBEDDING_CACHE_DIR = os.environ.get(
+    "RAG_EMBEDDING_CACHE_DIR", os.path.join(".rag_cache", "embeddings")
+)
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.txt"
+METADATA_FILE = "store.json"
+LOCK_FILE = "store.lock"
+
+
+def get_embedding_model_name(embeddings: Embeddings) -> str:
+    """
+    Get a name identifying the model behind an embeddings object.
+
+    Args:
+        embeddings: The embeddings
+
+    Returns:
+        The model name, or the class name if the embeddings have no model name
+    """
+    return getattr(embeddings, "model_name", type(embeddings).__name__)
+
+
+def make_chunk_key(model_name: str, text: str) -> str:
+    """
+    Build the content address of a chunk embedding.
+
+    Args:
+        model_name: The embedding model name
+        text: The chunk text
+
+    Returns:
+        A hex digest of the model name and the chunk text
+    """
+    hasher = hashlib.sha256()
+    hasher.update(model_name.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class _ModelEmbeddingStore:
+    """
+    The cached embeddings of a single model.
+
+    Vectors are appended to a flat float32 file that is read through a
+    memory map. The keys file holds one chunk key per line, and the line
+    number is the row of the vector in the vectors file. Appends hold an
+    exclusive lock on the store, so several processes can share it.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.directory = directory
+        self.model_name = model_name
+        self.dimension: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        # Number of complete rows read and the size of their keys in the keys file
+        self._row_count = 0
+        self._keys_offset = 0
+        os.makedirs(self.directory, exist_ok=True)
+        with self._locked():
+            self._sync()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the lock of the store, shared by every process using the directory."""
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """
+        Read the rows appended since the last read, by this or another process.
+
+        Only rows with both a complete key and a complete vector are read.
+        Whatever follows them was left by a writer that crashed between its
+        vectors and keys appends, and is truncated so the next append starts
+        on a row boundary. Must be called with the lock held.
+        """
+        if self.dimension is None:
+            metadata_path = os.path.join(self.directory, METADATA_FILE)
+            if not os.path.exists(metadata_path):
+                return
+            with open(metadata_path) as metadata_file:
+                self.dimension = json.load(metadata_file)["dimension"]
+        row_bytes = self.dimension * 4
+
+        keys_path = os.path.join(self.directory, KEYS_FILE)
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        new_keys: List[str] = []
+        if os.path.exists(keys_path):
+            with open(keys_path, "rb") as keys_file:
+                keys_file.seek(self._keys_offset)
+                data = keys_file.read()
+            new_keys = data[:data.rfind(b"\n") + 1].decode("utf-8").splitlines()
+        vector_rows = os.path.getsize(vectors_path) // row_bytes if os.path.exists(vectors_path) else 0
+
+        # Keys are written after their vectors, so there are never more complete keys than vectors
+        for key in new_keys[:max(0, vector_rows - self._row_count)]:
+            self.rows[key] = self._row_count
+            self._row_count += 1
+            self._keys_offset += len(key.encode("utf-8")) + 1
+
+        _truncate(keys_path, self._keys_offset)
+        _truncate(vectors_path, self._row_count * row_bytes)
+        self._remap()
+
+    def _remap(self) -> None:
+        """Open the vectors file as a read-only memory map."""
+        if not self._row_count:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            os.path.join(self.directory, VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(self._row_count, self.dimension),
+        )
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached vector for a key, or None."""
+        row = self.rows.get(key)
+        if row is None or self._vectors is None:
+            return None
+        return np.array(self._vectors[row])
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Append new vectors to the store."""
+        with self._locked():
+            # Another process may have appended rows since the last read
+            self._sync()
+
+            new_keys = []
+            new_vectors = []
+            seen_keys = set()
+            for key, vector in zip(keys, vectors):
+                if key not in self.rows and key not in seen_keys:
+                    seen_keys.add(key)
+                    new_keys.append(key)
+                    new_vectors.append(vector)
+            if not new_keys:
+                return
+
+            vectors_array = np.asarray(new_vectors, dtype=np.float32)
+            if self.dimension is None:
+                self.dimension = int(vectors_array.shape[1])
+                with open(os.path.join(self.directory, METADATA_FILE), "w") as metadata_file:
+                    json.dump({"model_name": self.model_name, "dimension": self.dimension}, metadata_file)
+
+            # Write the vectors before the keys so a key never points at a missing vector
+            with open(os.path.join(self.directory, VECTORS_FILE), "ab") as vectors_file:
+                vectors_file.write(vectors_array.tobytes())
+            with open(os.path.join(self.directory, KEYS_FILE), "a") as keys_file:
+                for key in new_keys:
+                    keys_file.write(key + "\n")
+
+            for key in new_keys:
+                self.rows[key] = self._row_count
+                self._row_count += 1
+                self._keys_offset += len(key.encode("utf-8")) + 1
+            self._remap()
+
+
+def _truncate(path: str, size: int) -> None:
+    """Cut a file down to a size if it is longer."""
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        os.truncate(path, size)
+
+
+class ChunkEmbeddingCache:
+    """
+    A content-addressed, on-disk cache of chunk embeddings.
+
+    Embeddings are keyed by a hash of the model name and the chunk text, so
+    the same text is only ever embedded once per model. The cache is safe to
+    use from several threads of one process.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_EMBEDDING_CACHE_DIR):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where the cached embeddings are stored
+        """
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._stores: Dict[str, _ModelEmbeddingStore] = {}
+        self._lock = threading.Lock()
+
+    def _get_store(self, model_name: str) -> _ModelEmbeddingStore:
+        """Open the store for a model, creating it if needed."""
+        store = self._stores.get(model_name)
+        if store is None:
+            directory_name = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+            store = _ModelEmbeddingStore(os.path.join(self.cache_dir, directory_name), model_name)
+            self._stores[model_name] = store
+        return store
+
+    def embed_documents(self, texts: List[str], embeddings: Embeddings) -> List[List[float]]:
+        """
+        Embed texts, reusing cached vectors and embedding only the missing ones.
+
+        Args:
+            texts: The chunk texts to embed
+            embeddings: The embeddings used for texts that are not cached
+
+        Returns:
+            One embedding per text, in the same order as the texts
+        """
+        model_name = get_embedding_model_name(embeddings)
+
+        with self._lock:
+            store = self._get_store(model_name)
+            keys = [make_chunk_key(model_name, text) for text in texts]
+            vectors: List[Optional[List[float]]] = []
+            missing_positions = []
+            for position, key in enumerate(keys):
+                vector = store.get(key)
+                if vector is None:
+                    missing_positions.append(position)
+                    vectors.append(None)
+                else:
+                    vectors.append(vector.tolist())
+            self.hits += len(texts) - len(missing_positions)
+            self.misses += len(missing_positions)
+
+        if missing_positions:
+            missing_texts = [texts[position] for position in missing_positions]
+            # Round to float32 so fresh and cached vectors are identical
+            new_vectors = np.asarray(embeddings.embed_documents(missing_texts), dtype=np.float32)
+            with self._lock:
+                store.put_many([keys[position] for position in missing_positions], new_vectors)
+            for position, vector in zip(missing_positions, new_vectors):
+                vectors[position] = vector.tolist()
+
+        return vectors
+
+
+def _hand_over_to_duplicate_source(document: Document, excluded_sources: Set[str]) -> bool:
+    """
+    Move a chunk to another source that contained a dropped copy of it, instead of removing it.
+
+    Args:
+        document: The indexed chunk whose source no longer contains it
+        excluded_sources: Sources the chunk cannot be moved to
+
+    Returns:
+        True if the chunk was moved, False if it should be removed
+    """
+    remaining_sources = [
+        source for source in document.metadata.get(DUPLICATE_SOURCES_KEY, []) if source not in excluded_sources
+    ]
+    if not remaining_sources:
+        return False
+
+    # The position and title belonged to the previous source
+    document.metadata.pop("start_index", None)
+    document.metadata.pop("title", None)
+    document.metadata["source"] = remaining_sources[0]
+    if remaining_sources[1:]:
+        document.metadata[DUPLICATE_SOURCES_KEY] = remaining_sources[1:]
+    else:
+        del document.metadata[DUPLICATE_SOURCES_KEY]
+    return True
+
+
+def remove_sources(vector_store: FAISS, sources_to_keep: Set[str]) -> int:
+    """
+    Remove the chunks of every source that is not in a set of sources.
+
+    A chunk that was also found in a kept source (see chunk_dedup) is moved
+    to that source instead of being removed.
+
+    Args:
+        vector_store: The FAISS vector store to update
+        sources_to_keep: The sources whose chunks are kept
+
+    Returns:
+        The number of removed chunks
+    """
+    removed_ids = []
+    for docstore_id in vector_store.index_to_docstore_id.values():
+        document = vector_store.docstore.search(docstore_id)
+        if not isinstance(document, Document) or document.metadata.get("source") in sources_to_keep:
+            continue
+        removed_sources = set(document.metadata.get(DUPLICATE_SOURCES_KEY, [])) - set(sources_to_keep)
+        if not _hand_over_to_duplicate_source(document, removed_sources):
+            removed_ids.append(docstore_id)
+
+    if removed_ids:
+        delete_from_vector_store(vector_store, removed_ids)
+    return len(removed_ids)
+
+
+def update_vector_store(
+    vector_store: FAISS,
+    documents: List[Document],
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+) -> Dict[str, int]:
+    """
+    Patch a FAISS vector store in place so it holds the given chunks.
+
+    Chunks from the same sources that are already in the index are kept,
+    chunks that are no longer present are removed and only new chunks are
+    embedded and added. Chunks from other sources are left untouched, and a
+    removed chunk that was also found in another source is moved to it.
+
+    Args:
+        vector_store: The FAISS vector store to update
+        documents: The current chunks of one or more sources
+        embedding_cache: Optional cache used to embed the new chunks
+
+    Returns:
+        A dict with the number of added, removed and unchanged chunks
+    """
+    sources = {document.metadata.get("source") for document in documents}
+
+    # Group the existing chunks of these sources by their text
+    existing_ids_by_text: Dict[str, List[str]] = defaultdict(list)
+    for docstore_id in vector_store.index_to_docstore_id.values():
+        existing_document = vector_store.docstore.search(docstore_id)
+        if isinstance(existing_document, Document) and existing_document.metadata.get("source") in sources:
+            existing_ids_by_text[existing_document.page_content].append(docstore_id)
+
+    # Match new chunks against existing ones with the same text
+    unchanged: List[Tuple[str, Document]] = []
+    added_documents: List[Document] = []
+    for document in documents:
+        matching_ids = existing_ids_by_text.get(document.page_content)
+        if matching_ids:
+            unchanged.append((matching_ids.pop(0), document))
+        else:
+            added_documents.append(document)
+    removed_ids = []
+    for ids in existing_ids_by_text.values():
+        for docstore_id in ids:
+            if not _hand_over_to_duplicate_source(vector_store.docstore.search(docstore_id), sources):
+                removed_ids.append(docstore_id)
+
+    if removed_ids:
+        delete_from_vector_store(vector_store, removed_ids)
+
+    # Unchanged text may have moved within the page, so refresh its metadata,
+    # keeping the duplicate sources that are not being updated
+    for docstore_id, document in unchanged:
+        existing_document = vector_store.docstore.search(docstore_id)
+        metadata = dict(document.metadata)
+        duplicate_sources = merge_duplicate_sources(
+            [source for source in existing_document.metadata.get(DUPLICATE_SOURCES_KEY, []) if source not in sources],
+            metadata.get(DUPLICATE_SOURCES_KEY, []),
+        )
+        if duplicate_sources:
+            metadata[DUPLICATE_SOURCES_KEY] = duplicate_sources
+        vector_store.docstore.delete([docstore_id])
+        vector_store.docstore.add({
+            docstore_id: Document(id=docstore_id, page_content=document.page_content, metadata=metadata)
+        })
+
+    if added_documents:
+        texts = [document.page_content for document in added_documents]
+        if embedding_cache is not None:
+            vectors = embedding_cache.embed_documents(texts, vector_store.embeddings)
+        else:
+            vectors = vector_store.embeddings.embed_documents(texts)
+        vector_store.add_embeddings(
+            list(zip(texts, vectors)),
+            metadatas=[document.metadata for document in added_documents],
+        )
+
+    return {
+        "added": len(added_documents),
+        "removed": len(removed_ids),
+        "unchanged": len(unchanged),
+    }
@@ -0,0 +1,286 @@
+"""
+HTML extraction module for the RAG application.
+Extracts the readable text blocks of a page exactly once, in document order,
+and drops boilerplate such as navigation, footers and cookie banners.
+"""
+
+import re
+from typing import Any, List, Mapping, Optional, Tuple
+
+import bs4
+from bs4.element import Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag
+
+# Tags whose whole text forms one block
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "blockquote",
+    "dt", "dd", "td", "th", "figcaption", "caption", "summary",
+}
+
+# Tags whose text flows into the surrounding block
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "br", "cite", "code", "data", "dfn", "em", "i",
+    "kbd", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup",
+    "time", "u", "var", "wbr", "del", "ins", "label",
+}
+
+# Tags that never hold page content
+BOILERPLATE_TAGS = {
+    "nav", "aside", "script", "style", "noscript", "form", "iframe", "svg",
+    "template", "button", "select", "textarea", "input", "head",
+}
+
+# Tags that are boilerplate at page level but content inside an article
+PAGE_LEVEL_BOILERPLATE_TAGS = {"header", "footer"}
+
+# Id and class tokens that mark boilerplate containers. Only whole tokens
+# match, so layout names such as "wy-nav-content" or "has-sidebar" do not
+BOILERPLATE_TOKENS = {
+    "cookie", "cookies", "consent", "gdpr", "banner", "navbar", "nav", "navigation", "menu", "footer",
+    "breadcrumb", "breadcrumbs", "sidebar", "share", "social", "advert", "ads", "promo", "popup", "modal",
+    "newsletter", "skip-link", "cookie-banner", "cookie-consent", "cookie-notice", "cookie-bar",
+    "consent-banner", "social-share", "share-buttons", "site-nav", "site-footer",
+}
+
+# Elements with these roles are boilerplate
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog", "alertdialog"}
+
+# Tags that hold the main content of a page, an element containing one is never dropped
+MAIN_CONTENT_TAGS = ("main", "article")
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def get_parser_name() -> str:
+    """
+    Get the fastest available HTML parser backend.
+
+    Returns:
+        "lxml" if it is installed, otherwise Python's built-in "html.parser"
+    """
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def _normalize_text(text: str) -> str:
+    """Collapse runs of whitespace into single spaces."""
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def _is_boilerplate(tag_name: str, attributes: Mapping[str, Any], inside_article: bool) -> bool:
+    """Check whether an element is navigation, a banner or other boilerplate."""
+    if tag_name in BOILERPLATE_TAGS:
+        return True
+    if tag_name in PAGE_LEVEL_BOILERPLATE_TAGS and not inside_article:
+        return True
+    if attributes.get("role") in BOILERPLATE_ROLES:
+        return True
+    if attributes.get("aria-hidden") == "true" or "hidden" in attributes:
+        return True
+
+    # BeautifulSoup gives the class as a list, lxml as a string
+    class_value = attributes.get("class") or ""
+    if not isinstance(class_value, str):
+        class_value = " ".join(class_value)
+    tokens = f"{attributes.get('id') or ''} {class_value}".lower().split()
+    return any(token in BOILERPLATE_TOKENS for token in tokens)
+
+
+def _lxml_contains_main_content(element) -> bool:
+    """Check whether an lxml element holds a main or article element."""
+    return bool(element.xpath('boolean(.//main | .//article | .//*[@role="main"])'))
+
+
+def _soup_contains_main_content(element: Tag) -> bool:
+    """Check whether a BeautifulSoup element holds a main or article element."""
+    return element.find(MAIN_CONTENT_TAGS) is not None or element.find(attrs={"role": "main"}) is not None
+
+
+def _flush_pending(blocks: List[str], pending: List[str]) -> None:
+    """Turn loose text collected outside block tags into a block."""
+    text = _normalize_text("".join(pending))
+    if text:
+        blocks.append(text)
+    pending.clear()
+
+
+def _lxml_text(element) -> str:
+    """Get the text of an lxml element, skipping boilerplate inside it."""
+    parts = []
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in BOILERPLATE_TAGS:
+            parts.append(_lxml_text(child))
+        if child.tail:
+            parts.append(child.tail)
+    return "".join(parts)
+
+
+def _collect_lxml_blocks(element, blocks: List[str], pending: List[str], inside_article: bool) -> None:
+    """Walk the children of an lxml element in document order and collect text blocks."""
+    if element.text:
+        pending.append(element.text)
+
+    for child in element:
+        tag_name = child.tag if isinstance(child.tag, str) else None
+        if tag_name is None or (
+            _is_boilerplate(tag_name, child.attrib, inside_article) and not _lxml_contains_main_content(child)
+        ):
+            pass
+        elif tag_name in BLOCK_TAGS:
+            _flush_pending(blocks, pending)
+            text = _normalize_text(_lxml_text(child))
+            if text:
+                blocks.append(text)
+        elif tag_name in INLINE_TAGS:
+            pending.append(_lxml_text(child))
+        else:
+            # A container: its text is split into blocks of its own
+            _flush_pending(blocks, pending)
+            _collect_lxml_blocks(child, blocks, pending, inside_article or tag_name in MAIN_CONTENT_TAGS)
+            _flush_pending(blocks, pending)
+
+        # The text after an element belongs to its parent, even after skipped elements
+        if child.tail:
+            pending.append(child.tail)
+
+
+def _extract_page_with_lxml(html: str) -> Tuple[Optional[str], List[str]]:
+    """Extract the title and text blocks of a page by walking the lxml tree directly."""
+    from lxml import html as lxml_html
+
+    if not html.strip():
+        return None, []
+
+    parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+    document = lxml_html.document_fromstring(html.encode("utf-8"), parser=parser)
+
+    # Line breaks separate words
+    for line_break in document.iter("br"):
+        line_break.tail = "\n" + (line_break.tail or "")
+
+    title = None
+    title_element = document.find(".//title")
+    if title_element is not None:
+        title = _normalize_text(title_element.text_content()) or None
+
+    body = document.find("body")
+    blocks: List[str] = []
+    pending: List[str] = []
+    _collect_lxml_blocks(body if body is not None else document, blocks, pending, inside_article=False)
+    _flush_pending(blocks, pending)
+    return title, blocks
+
+
+def _is_text_node(node) -> bool:
+    """Check whether a BeautifulSoup node is visible text rather than a comment or declaration."""
+    return isinstance(node, NavigableString) and not isinstance(
+        node, (Comment, Declaration, Doctype, ProcessingInstruction)
+    )
+
+
+def _soup_text(element: Tag) -> str:
+    """Get the text of a BeautifulSoup element, skipping boilerplate inside it."""
+    parts = []
+    for child in element.children:
+        if _is_text_node(child):
+            parts.append(str(child))
+        elif isinstance(child, Tag) and child.name == "br":
+            parts.append("\n")
+        elif isinstance(child, Tag) and child.name not in BOILERPLATE_TAGS:
+            parts.append(_soup_text(child))
+    return "".join(parts)
+
+
+def _collect_soup_blocks(element: Tag, blocks: List[str], pending: List[str], inside_article: bool) -> None:
+    """Walk the children of a BeautifulSoup element in document order and collect text blocks."""
+    for child in element.children:
+        if _is_text_node(child):
+            pending.append(str(child))
+        elif not isinstance(child, Tag) or (
+            _is_boilerplate(child.name, child.attrs, inside_article) and not _soup_contains_main_content(child)
+        ):
+            continue
+        elif child.name in BLOCK_TAGS:
+            _flush_pending(blocks, pending)
+            text = _normalize_text(_soup_text(child))
+            if text:
+                blocks.append(text)
+        elif child.name in INLINE_TAGS:
+            pending.append(_soup_text(child))
+        else:
+            # A container: its text is split into blocks of its own
+            _flush_pending(blocks, pending)
+            _collect_soup_blocks(child, blocks, pending, inside_article or child.name in MAIN_CONTENT_TAGS)
+            _flush_pending(blocks, pending)
+
+
+def _extract_page_with_soup(html: str, parser: str) -> Tuple[Optional[str], List[str]]:
+    """Extract the title and text blocks of a page with BeautifulSoup."""
+    soup = bs4.BeautifulSoup(html, parser)
+
+    title = None
+    if soup.title is not None:
+        title = _normalize_text(soup.title.get_text()) or None
+
+    blocks: List[str] = []
+    pending: List[str] = []
+    _collect_soup_blocks(soup.body or soup, blocks, pending, inside_article=False)
+    _flush_pending(blocks, pending)
+    return title, blocks
+
+
+def extract_page(html: str, parser: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Extract the title and the text blocks of an HTML page in a single parse.
+
+    Each paragraph, heading, list item or other block is emitted once, even
+    when it is nested inside several containers. Loose text directly inside a
+    container becomes a block of its own. Navigation, headers, footers,
+    sidebars, cookie banners and scripts are dropped, but an element that
+    holds the main content of the page (main, article or role="main") is
+    always kept.
+
+    Args:
+        html: The HTML content of the page
+        parser: Optional parser backend, "lxml" or "html.parser", the fastest available by default
+
+    Returns:
+        The page title (or None) and the text blocks in document order
+    """
+    parser = parser or get_parser_name()
+    if parser == "lxml":
+        return _extract_page_with_lxml(html)
+    return _extract_page_with_soup(html, parser)
+
+
+def extract_text_blocks(html: str, parser: Optional[str] = None) -> List[str]:
+    """
+    Extract the text blocks of an HTML page.
+
+    Args:
+        html: The HTML content of the page
+        parser: Optional parser backend, "lxml" or "html.parser", the fastest available by default
+
+    Returns:
+        The text blocks in document order
+    """
+    _, blocks = extract_page(html, parser)
+    return blocks
+
+
+def extract_text(html: str, parser: Optional[str] = None) -> str:
+    """
+    Extract the readable text of an HTML page.
+
+    Args:
+        html: The HTML content of the page
+        parser: Optional parser backend, "lxml" or "html.parser", the fastest available by default
+
+    Returns:
+        The text blocks separated by blank lines
+    """
+    return "\n\n".join(extract_text_blocks(html, parser))
@@ -0,0 +1,361 @@
+"""
+Index cache module for the RAG application.
+Stores built FAISS indexes on disk so that a page is only embedded once.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import FAISS
+
+from disk_store import is_disk_index, load_disk_index, open_disk_index, write_disk_index
+
+# Default location of the on-disk cache, can be overridden with RAG_CACHE_DIR
+DEFAULT_CACHE_DIR = os.environ.get("RAG_CACHE_DIR", os.path.join(".rag_cache", "indexes"))
+
+# Default maximum size of the cache on disk (1 GB)
+DEFAULT_MAX_SIZE_BYTES = 1024 * 1024 * 1024
+
+# Name of the metadata file stored next to each cached index
+ENTRY_METADATA_FILE = "cache_entry.json"
+
+
+def compute_content_hash(documents: List[Document]) -> str:
+    """
+    Compute a stable hash of the content of a list of documents.
+
+    Args:
+        documents: The documents loaded from a URL
+
+    Returns:
+        A hex digest identifying the content
+    """
+    hasher = hashlib.sha256()
+    for document in documents:
+        hasher.update(document.page_content.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def make_cache_key(url: str, content_hash: str, settings: Dict[str, Any]) -> str:
+    """
+    Build the cache key for an index.
+
+    Args:
+        url: The URL the index was built from
+        content_hash: Hash of the loaded page content
+        settings: Embedding model and splitter settings used to build the index
+
+    Returns:
+        A hex digest used as the cache entry name
+    """
+    key_material = json.dumps(
+        {"url": url, "content_hash": content_hash, "settings": settings},
+        sort_keys=True,
+    )
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class IndexCache:
+    """
+    A persistent cache of FAISS indexes keyed by URL, content and settings.
+
+    Each entry is a directory containing the FAISS index, the docstore and a
+    small metadata file. When the cache grows beyond its size limit the least
+    recently used entries are removed.
+
+    A disk-backed cache stores the docstore in SQLite (see disk_store), so
+    entries can be opened memory-mapped and read-only with open().
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        disk_backed: bool = False,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where the cached indexes are stored
+            max_size_bytes: Maximum total size of the cache on disk
+            disk_backed: Store entries as a FAISS index file and a SQLite docstore
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.disk_backed = disk_backed
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, cache_key: str) -> str:
+        """Return the directory used for a cache entry."""
+        return os.path.join(self.cache_dir, cache_key)
+
+    def contains(self, cache_key: str) -> bool:
+        """Return True if the cache has an entry for the key."""
+        return os.path.exists(os.path.join(self.entry_path(cache_key), ENTRY_METADATA_FILE))
+
+    def load(self, cache_key: str, embeddings: Embeddings) -> Optional[VectorStore]:
+        """
+        Load a cached index fully into memory, so it can be updated.
+
+        Args:
+            cache_key: The key of the entry to load
+            embeddings: The embeddings used to embed queries against the index
+
+        Returns:
+            The cached vector store, or None if there is no usable entry
+        """
+        return self._load_entry(cache_key, embeddings, read_only=False)
+
+    def open(self, cache_key: str, embeddings: Embeddings) -> Optional[VectorStore]:
+        """
+        Open a cached index for querying.
+
+        Entries of a disk-backed cache are opened memory-mapped and read-only,
+        with chunk text read from SQLite for the hits only, so every session
+        and process opening the entry shares one copy through the page cache.
+        Other entries are loaded into memory.
+
+        Args:
+            cache_key: The key of the entry to open
+            embeddings: The embeddings used to embed queries against the index
+
+        Returns:
+            The cached vector store, or None if there is no usable entry
+        """
+        return self._load_entry(cache_key, embeddings, read_only=True)
+
+    def _load_entry(self, cache_key: str, embeddings: Embeddings, read_only: bool) -> Optional[VectorStore]:
+        """Load or open an entry, removing it if it cannot be read."""
+        if not self.contains(cache_key):
+            return None
+
+        entry_path = self.entry_path(cache_key)
+        try:
+            if is_disk_index(entry_path) and read_only:
+                vector_store = open_disk_index(entry_path, embeddings)
+            elif is_disk_index(entry_path):
+                vector_store = load_disk_index(entry_path, embeddings)
+            else:
+                # The pickle files were written by this cache, so they are trusted
+                vector_store = FAISS.load_local(
+                    entry_path,
+                    embeddings,
+                    allow_dangerous_deserialization=True,
+                )
+        except Exception as e:
+            print(f"Error loading cached index, rebuilding: {str(e)}")
+            self.remove(cache_key)
+            return None
+
+        self._touch(cache_key)
+        return vector_store
+
+    def save(
+        self,
+        cache_key: str,
+        vector_store: FAISS,
+        url: str,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Save an index to the cache and evict old entries if needed.
+
+        Args:
+            cache_key: The key of the entry to save
+            vector_store: The FAISS vector store to save
+            url: The URL the index was built from
+            settings: Optional embedding model and splitter settings used to build the index
+        """
+        entry_path = self.entry_path(cache_key)
+
+        # Write to a temporary directory first so readers never see a partial entry
+        temporary_path = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        if self.disk_backed:
+            write_disk_index(vector_store, temporary_path)
+        else:
+            vector_store.save_local(temporary_path)
+        metadata = {
+            "url": url,
+            "settings": settings,
+            "created_at": time.time(),
+            "last_accessed_at": time.time(),
+        }
+        with open(os.path.join(temporary_path, ENTRY_METADATA_FILE), "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+        self._swap_in(cache_key, temporary_path)
+        self.evict()
+
+    def _swap_in(self, cache_key: str, temporary_path: str, attempts: int = 3) -> None:
+        """
+        Move a written entry into place, replacing any existing entry.
+
+        A directory cannot be renamed over a non-empty one, so the existing
+        entry is renamed aside first and deleted afterwards. Readers see
+        either the old or the new entry, never a partial one.
+
+        Args:
+            cache_key: The key of the entry
+            temporary_path: The directory the entry was written to
+            attempts: How often to retry when a concurrent save moves entries meanwhile
+        """
+        entry_path = self.entry_path(cache_key)
+        for attempt in range(attempts):
+            old_path = os.path.join(self.cache_dir, f".old-{uuid.uuid4().hex}")
+            try:
+                os.replace(entry_path, old_path)
+            except FileNotFoundError:
+                old_path = None
+
+            try:
+                os.replace(temporary_path, entry_path)
+                return
+            except OSError:
+                if self.contains(cache_key):
+                    # A concurrent save of the same key won the race, and the same key means the same index
+                    shutil.rmtree(temporary_path, ignore_errors=True)
+                    return
+                if attempt == attempts - 1:
+                    shutil.rmtree(temporary_path, ignore_errors=True)
+                    raise
+            finally:
+                if old_path is not None:
+                    shutil.rmtree(old_path, ignore_errors=True)
+
+    def remove(self, cache_key: str) -> None:
+        """Remove an entry from the cache."""
+        shutil.rmtree(self.entry_path(cache_key), ignore_errors=True)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        List the entries in the cache.
+
+        Returns:
+            A list of dicts with the key, url, size and last access time of each entry
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("."):
+                # Entries being written or replaced
+                continue
+            metadata = self._read_metadata(name)
+            if metadata is None:
+                continue
+            entries.append({
+                "key": name,
+                "url": metadata.get("url"),
+                "size_bytes": self._directory_size(self.entry_path(name)),
+                "last_accessed_at": metadata.get("last_accessed_at", 0.0),
+            })
+        return entries
+
+    def find_latest_entry(self, url: str, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        Find the most recently used entry built from a URL with the given settings.
+
+        This is used to patch the previous index of a page when its content changes.
+
+        Args:
+            url: The URL the index was built from
+            settings: The embedding model and splitter settings of the index
+
+        Returns:
+            The key of the entry, or None if there is no such entry
+        """
+        latest_key = None
+        latest_access = -1.0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("."):
+                continue
+            metadata = self._read_metadata(name)
+            if metadata is None or metadata.get("url") != url or metadata.get("settings") != settings:
+                continue
+            if metadata.get("last_accessed_at", 0.0) > latest_access:
+                latest_key = name
+                latest_access = metadata.get("last_accessed_at", 0.0)
+        return latest_key
+
+    def total_size(self) -> int:
+        """Return the total size of the cache entries in bytes."""
+        return sum(entry["size_bytes"] for entry in self.entries())
+
+    def evict(self) -> List[str]:
+        """
+        Remove the least recently used entries until the cache fits its size limit.
+
+        Replaced entries that a save could not delete, because a concurrent
+        access wrote into them or the process stopped, are removed too.
+
+        Returns:
+            The keys of the removed entries
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(".old-"):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+        entries = sorted(self.entries(), key=lambda entry: entry["last_accessed_at"])
+        total_size = sum(entry["size_bytes"] for entry in entries)
+
+        evicted_keys = []
+        for entry in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            self.remove(entry["key"])
+            total_size -= entry["size_bytes"]
+            evicted_keys.append(entry["key"])
+
+        if evicted_keys:
+            print(f"Evicted {len(evicted_keys)} cached indexes to stay under the cache size limit.")
+
+        return evicted_keys
+
+    def _touch(self, cache_key: str) -> None:
+        """Record that an entry was just used."""
+        metadata = self._read_metadata(cache_key)
+        if metadata is None:
+            return
+        metadata["last_accessed_at"] = time.time()
+        metadata_path = os.path.join(self.entry_path(cache_key), ENTRY_METADATA_FILE)
+        # Replace the file in one rename, so a crash never leaves unreadable metadata.
+        # The file is written outside the entry, which a concurrent save may be deleting.
+        temporary_path = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}.json")
+        try:
+            with open(temporary_path, "w") as metadata_file:
+                json.dump(metadata, metadata_file)
+            os.replace(temporary_path, metadata_path)
+        except OSError:
+            # The entry was replaced or evicted meanwhile
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _read_metadata(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Read the metadata file of an entry, or None if it is missing."""
+        metadata_path = os.path.join(self.entry_path(cache_key), ENTRY_METADATA_FILE)
+        try:
+            with open(metadata_path) as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _directory_size(path: str) -> int:
+        """Return the total size of the files in a directory."""
+        total_size = 0
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                try:
+                    total_size += os.path.getsize(os.path.join(root, file_name))
+                except FileNotFoundError:
+                    # Removed by a concurrent save or eviction
+                    continue
+        return total_size
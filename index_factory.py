@@ -0,0 +1,583 @@
+"""
+Index factory module for the RAG application.
+Builds approximate nearest neighbour FAISS indexes (HNSW, IVF, IVF-PQ and
+float16 storage) and chooses one automatically by corpus size and memory budget.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import FAISS
+
+from instrumentation import stage
+
+# FAISS is imported by the functions that use it, so importing the factory
+# for its index types and defaults stays cheap at start-up
+
+# Index types supported by the factory
+FLAT = "flat"
+FLAT_FP16 = "flat_fp16"
+HNSW = "hnsw"
+IVF = "ivf"
+IVF_FP16 = "ivf_fp16"
+IVF_PQ = "ivf_pq"
+INDEX_TYPES = (FLAT, FLAT_FP16, HNSW, IVF, IVF_FP16, IVF_PQ)
+
+# Chooses the index type from the number of vectors and the memory budget
+AUTO = "auto"
+
+# Default index type, can be overridden with RAG_INDEX_TYPE
+DEFAULT_INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", AUTO)
+
+# Up to this many vectors an exact flat index is fast enough
+FLAT_MAX_VECTORS = 20_000
+
+# Up to this many vectors an HNSW graph is used, above it an inverted file
+HNSW_MAX_VECTORS = 1_000_000
+
+# HNSW graph settings: neighbours per node and build/search beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+DEFAULT_EF_SEARCH = 64
+
+# Inverted file settings: training points per centroid and the share of lists searched
+MIN_POINTS_PER_CENTROID = 39
+DEFAULT_NPROBE_FRACTION = 8
+MIN_NPROBE = 8
+
+# Product quantization uses 8 bits per code, so training needs at least 256 points
+PQ_BITS = 8
+PQ_MIN_TRAINING_POINTS = 1 << PQ_BITS
+
+
+@dataclass
+class IndexConfig:
+    """How the FAISS index of a vector store is built."""
+
+    index_type: str = DEFAULT_INDEX_TYPE
+    memory_budget_bytes: Optional[int] = None
+
+
+def estimate_index_bytes(index_type: str, num_vectors: int, dimension: int) -> int:
+    """
+    Estimate the memory used by an index.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        num_vectors: Number of vectors in the index
+        dimension: Dimension of the vectors
+
+    Returns:
+        The estimated size in bytes
+    """
+    id_bytes = 8
+    bytes_per_vector = {
+        FLAT: 4 * dimension,
+        FLAT_FP16: 2 * dimension,
+        HNSW: 4 * dimension + 2 * HNSW_M * 4 + 2 * HNSW_M,
+        IVF: 4 * dimension + id_bytes,
+        IVF_FP16: 2 * dimension + id_bytes,
+        IVF_PQ: get_pq_subquantizers(dimension) + id_bytes,
+    }[index_type]
+    return num_vectors * bytes_per_vector
+
+
+def choose_index_type(num_vectors: int, dimension: int, memory_budget_bytes: Optional[int] = None) -> str:
+    """
+    Choose an index type for a corpus.
+
+    Small corpora use an exact flat index, medium corpora an HNSW graph and
+    large corpora an inverted file. When the preferred index does not fit
+    the memory budget, a more compact storage is used instead.
+
+    Args:
+        num_vectors: Number of vectors to index
+        dimension: Dimension of the vectors
+        memory_budget_bytes: Optional maximum size of the index
+
+    Returns:
+        One of INDEX_TYPES
+    """
+    if num_vectors <= FLAT_MAX_VECTORS:
+        candidates = [FLAT, FLAT_FP16, IVF_PQ]
+    elif num_vectors <= HNSW_MAX_VECTORS:
+        candidates = [HNSW, IVF_FP16, IVF_PQ]
+    else:
+        candidates = [IVF, IVF_FP16, IVF_PQ]
+
+    if memory_budget_bytes is None:
+        return candidates[0]
+    for index_type in candidates:
+        if estimate_index_bytes(index_type, num_vectors, dimension) <= memory_budget_bytes:
+            return index_type
+    return candidates[-1]
+
+
+def get_buildable_index_type(index_type: str, num_vectors: int) -> str:
+    """
+    Get the index type that build_index() actually builds for a corpus.
+
+    Product quantization falls back to float16 flat storage when there are
+    too few vectors to train it.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        num_vectors: Number of vectors to index
+
+    Returns:
+        One of INDEX_TYPES
+    """
+    if index_type == IVF_PQ and num_vectors < PQ_MIN_TRAINING_POINTS:
+        return FLAT_FP16
+    return index_type
+
+
+def resolve_index_type(index_config: IndexConfig, num_vectors: int, dimension: int) -> str:
+    """
+    Get the index type to build for a configuration and a corpus.
+
+    The type is the one build_index() produces, so an index that was built
+    for the configuration matches it and is not rebuilt.
+
+    Args:
+        index_config: The index configuration
+        num_vectors: Number of vectors to index
+        dimension: Dimension of the vectors
+
+    Returns:
+        One of INDEX_TYPES
+
+    Raises:
+        ValueError: If the configured index type is unknown
+    """
+    if index_config.index_type == AUTO:
+        index_type = choose_index_type(num_vectors, dimension, index_config.memory_budget_bytes)
+    elif index_config.index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_config.index_type!r}, expected one of {AUTO}, "
+                         + ", ".join(INDEX_TYPES))
+    else:
+        index_type = index_config.index_type
+    return get_buildable_index_type(index_type, num_vectors)
+
+
+def get_index_type(index: "faiss.Index") -> Optional[str]:
+    """
+    Get the factory index type of a FAISS index.
+
+    Args:
+        index: The FAISS index
+
+    Returns:
+        One of INDEX_TYPES, or None for indexes the factory does not build
+    """
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IVF_PQ
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return IVF_FP16
+    if isinstance(index, faiss.IndexIVFFlat):
+        return IVF
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return FLAT_FP16
+    if isinstance(index, faiss.IndexFlat):
+        return FLAT
+    return None
+
+
+def get_nlist(num_vectors: int) -> int:
+    """
+    Get the number of inverted lists for a corpus: about the square root of
+    its size, with enough training points per centroid.
+
+    Args:
+        num_vectors: Number of vectors to index
+
+    Returns:
+        The number of inverted lists
+    """
+    return max(1, min(int(math.sqrt(num_vectors)), num_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def get_default_nprobe(nlist: int) -> int:
+    """
+    Get the default number of inverted lists visited per query.
+
+    Args:
+        nlist: The number of inverted lists
+
+    Returns:
+        The number of lists to probe
+    """
+    return min(nlist, max(MIN_NPROBE, nlist // DEFAULT_NPROBE_FRACTION))
+
+
+def get_pq_subquantizers(dimension: int) -> int:
+    """
+    Get the number of product quantizer codes per vector, about one per 8 dimensions.
+
+    Args:
+        dimension: Dimension of the vectors
+
+    Returns:
+        A divisor of the dimension
+    """
+    subquantizers = max(1, dimension // 8)
+    while dimension % subquantizers:
+        subquantizers -= 1
+    return subquantizers
+
+
+def build_index(index_type: str, vectors: np.ndarray, metric: Optional[int] = None) -> "faiss.Index":
+    """
+    Build, train and fill a FAISS index.
+
+    Product quantization falls back to float16 flat storage when there are
+    too few vectors to train it.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        vectors: The vectors to add, one per row
+        metric: The FAISS metric of the index, L2 if not provided
+
+    Returns:
+        The FAISS index holding the vectors, in row order
+    """
+    import faiss
+
+    if metric is None:
+        metric = faiss.METRIC_L2
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+
+    index_type = get_buildable_index_type(index_type, num_vectors)
+
+    if index_type == FLAT:
+        index = faiss.IndexFlat(dimension, metric)
+    elif index_type == FLAT_FP16:
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, metric)
+    elif index_type == HNSW:
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+    elif index_type in (IVF, IVF_FP16, IVF_PQ):
+        nlist = get_nlist(num_vectors)
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if index_type == IVF:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        elif index_type == IVF_FP16:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_fp16, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, get_pq_subquantizers(dimension), PQ_BITS, metric)
+        index.own_fields = True
+        quantizer.this.disown()
+        index.nprobe = get_default_nprobe(nlist)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def build_serialized_index(index_type: str, vectors: np.ndarray, metric: Optional[int] = None) -> np.ndarray:
+    """
+    Build a FAISS index and serialize it, so it can be built in a worker process and sent back.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        vectors: The vectors to add, one per row
+        metric: The FAISS metric of the index, L2 if not provided
+
+    Returns:
+        The serialized index, to be read with faiss.deserialize_index()
+    """
+    import faiss
+
+    return faiss.serialize_index(build_index(index_type, vectors, metric))
+
+
+def reconstruct_vectors(index: "faiss.Index") -> np.ndarray:
+    """
+    Get every vector stored in an index, in id order.
+
+    Quantized indexes return their decoded approximation of the vectors.
+
+    Args:
+        index: The FAISS index
+
+    Returns:
+        The vectors, one per row
+    """
+    import faiss
+
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    ivf_index = faiss.try_extract_index_ivf(index)
+    if ivf_index is not None:
+        ivf_index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def apply_index_config(vector_store: VectorStore, index_config: Optional[IndexConfig] = None) -> VectorStore:
+    """
+    Rebuild the FAISS index of a vector store with the configured index type.
+
+    Stores are built with a flat index first, because an inverted file
+    needs the vectors to train on and the size of a streamed corpus is not
+    known up front. The index is rebuilt only when the configured (or
+    automatically chosen) type differs from the current one. The order of
+    the vectors is kept, so the docstore mapping does not change.
+
+    Args:
+        vector_store: The vector store to update, other stores than FAISS are left as they are
+        index_config: Optional index configuration, the defaults if not provided
+
+    Returns:
+        The same vector store
+    """
+    if not isinstance(vector_store, FAISS):
+        return vector_store
+    if index_config is None:
+        index_config = IndexConfig()
+
+    index = vector_store.index
+    target_type = resolve_index_type(index_config, index.ntotal, index.d)
+    if index.ntotal == 0 or get_index_type(index) == target_type:
+        return vector_store
+
+    with stage("index", chunks=index.ntotal, rebuilds=1):
+        vector_store.index = build_index(target_type, reconstruct_vectors(index), index.metric_type)
+    return vector_store
+
+
+def delete_from_vector_store(vector_store: FAISS, docstore_ids: List[str]) -> None:
+    """
+    Delete chunks from a FAISS vector store, whatever its index type.
+
+    Flat indexes remove vectors in place. HNSW graphs cannot remove vectors,
+    and inverted files keep the ids of the remaining vectors instead of
+    renumbering them as the vector store expects, so those indexes are
+    rebuilt without the deleted vectors, keeping their trained quantizers.
+
+    Args:
+        vector_store: The vector store to update
+        docstore_ids: The docstore ids of the chunks to delete
+    """
+    import faiss
+
+    if not docstore_ids:
+        return
+
+    if isinstance(faiss.downcast_index(vector_store.index), faiss.IndexFlatCodes):
+        vector_store.delete(docstore_ids)
+        return
+
+    deleted_ids = set(docstore_ids)
+    kept_positions = [
+        position for position, docstore_id in sorted(vector_store.index_to_docstore_id.items())
+        if docstore_id not in deleted_ids
+    ]
+    vectors = reconstruct_vectors(vector_store.index)
+
+    new_index = faiss.clone_index(vector_store.index)
+    new_index.reset()
+    ivf_index = faiss.try_extract_index_ivf(new_index)
+    if ivf_index is not None:
+        ivf_index.set_direct_map_type(faiss.DirectMap.NoMap)
+    if kept_positions:
+        new_index.add(np.ascontiguousarray(vectors[kept_positions]))
+
+    vector_store.docstore.delete(list(deleted_ids))
+    vector_store.index_to_docstore_id = {
+        new_position: vector_store.index_to_docstore_id[old_position]
+        for new_position, old_position in enumerate(kept_positions)
+    }
+    vector_store.index = new_index
+
+
+def make_search_parameters(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Optional["faiss.SearchParameters"]:
+    """
+    Build per-query search parameters for an index.
+
+    Args:
+        index: The FAISS index
+        nprobe: Optional number of inverted lists to visit, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The search parameters, or None if none apply to the index
+    """
+    import faiss
+
+    index_type = get_index_type(index)
+    if index_type == HNSW and ef_search is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    if index_type in (IVF, IVF_FP16, IVF_PQ) and nprobe is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    return None
+
+
+def search_index(
+    index: "faiss.Index",
+    vectors: np.ndarray,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search a FAISS index with per-query search parameters.
+
+    Args:
+        index: The FAISS index
+        vectors: The query vectors, one per row, normalized if the index expects it
+        k: Number of neighbours returned per query
+        nprobe: Optional number of inverted lists to visit, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The distances and positions of the neighbours of each query, -1 where there are fewer than k
+    """
+    params = make_search_parameters(index, nprobe, ef_search)
+    if params is None:
+        return index.search(vectors, k)
+    return index.search(vectors, k, params=params)
+
+
+def search_vectors_with_scores(
+    vector_store: FAISS,
+    vectors: np.ndarray,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    Search a FAISS vector store for query vectors with per-query search parameters.
+
+    The parameters are passed to this search only, so concurrent queries
+    with different settings do not affect each other.
+
+    Args:
+        vector_store: The vector store to search, or a store made of several
+            FAISS indexes with its own search_vectors_with_scores() method,
+            such as a ShardedVectorStore
+        vectors: The query vectors, one per row
+        k: Number of documents returned per query
+        nprobe: Optional number of inverted lists to visit, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The most similar documents of each query vector, with their relevance
+        scores as computed by the vector store (higher is more relevant)
+    """
+    if not isinstance(vector_store, FAISS):
+        # Sharded stores search their shards and merge the results themselves
+        return vector_store.search_vectors_with_scores(vectors, k, nprobe, ef_search)
+
+    import faiss
+
+    vectors = np.array(vectors, dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vectors)
+
+    distances, indices = search_index(vector_store.index, vectors, k, nprobe, ef_search)
+
+    relevance_score_fn = vector_store._select_relevance_score_fn()
+    results = []
+    for distance_row, index_row in zip(distances, indices):
+        scored_documents = []
+        for distance, position in zip(distance_row, index_row):
+            if position == -1:
+                continue
+            document = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            if isinstance(document, Document):
+                scored_documents.append((document, relevance_score_fn(float(distance))))
+        results.append(scored_documents)
+    return results
+
+
+def search_vectors(
+    vector_store: FAISS,
+    vectors: np.ndarray,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Document]]:
+    """
+    Search a FAISS vector store for query vectors with per-query search parameters.
+
+    Args:
+        vector_store: The vector store to search
+        vectors: The query vectors, one per row
+        k: Number of documents returned per query
+        nprobe: Optional number of inverted lists to visit, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The most similar documents of each query vector
+    """
+    results = search_vectors_with_scores(vector_store, vectors, k, nprobe, ef_search)
+    return [[document for document, _ in scored_documents] for scored_documents in results]
+
+
+def similarity_search_with_parameters(
+    vector_store: FAISS,
+    query: str,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    embedding: Optional[List[float]] = None,
+) -> List[Document]:
+    """
+    Search a FAISS vector store with per-query search parameters.
+
+    Args:
+        vector_store: The vector store to search
+        query: The query text
+        k: Number of documents to return
+        nprobe: Optional number of inverted lists to visit, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+        embedding: Optional embedding of the query, if it was already computed
+
+    Returns:
+        The most similar documents
+    """
+    if embedding is None:
+        embedding = vector_store.embeddings.embed_query(query)
+    return search_vectors(vector_store, np.array([embedding], dtype=np.float32), k, nprobe, ef_search)[0]
+
+
+def describe_index(index: "faiss.Index") -> Dict[str, object]:
+    """
+    Describe the type, size and search settings of an index.
+
+    Args:
+        index: The FAISS index
+
+    Returns:
+        A dict with the index type, vector count, dimension and search settings
+    """
+    import faiss
+
+    description: Dict[str, object] = {"index_type": get_index_type(index), "vectors": index.ntotal, "dimension": index.d}
+    ivf_index = faiss.try_extract_index_ivf(index)
+    if ivf_index is not None:
+        description["nlist"] = ivf_index.nlist
+        description["nprobe"] = ivf_index.nprobe
+    downcast_index = faiss.downcast_index(index)
+    if isinstance(downcast_index, faiss.IndexHNSW):
+        description["ef_search"] = downcast_index.hnsw.efSearch
+    return description
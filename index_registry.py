@@ -0,0 +1,329 @@
+"""
+Index registry module for the RAG application.
+Shares loaded vector stores between the sessions of one process: each
+index is built once, concurrent requests for the same index wait for that
+single build, pages a session adds to an index go to a live index of its
+own whose memory is counted too, and unused indexes are evicted least
+recently used first to keep the total index memory under a budget.
+"""
+
+import os
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from langchain_core.vectorstores import VectorStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from embedding_cache import ChunkEmbeddingCache
+from index_factory import FLAT, IndexConfig, estimate_index_bytes, get_index_type
+
+if TYPE_CHECKING:
+    # live_index imports document_processor, which imports this module
+    from live_index import LiveIndex
+
+# Default memory budget of the indexes held by the registry
+DEFAULT_MEMORY_BUDGET_BYTES = int(os.environ.get("RAG_INDEX_REGISTRY_MB", "1024")) * 1024 * 1024
+
+# Estimated overhead of one in-memory docstore entry (Document object, metadata dict and id)
+DOCUMENT_OVERHEAD_BYTES = 600
+
+
+def estimate_vector_store_bytes(vector_store: VectorStore) -> int:
+    """
+    Estimate the memory held by a vector store.
+
+    Counts the FAISS index and, for in-memory docstores, the chunk texts.
+    Chunks kept in a SQLite docstore are read on demand and not counted.
+
+    Args:
+        vector_store: The vector store
+
+    Returns:
+        The estimated size in bytes, 0 for stores other than FAISS
+    """
+    if not isinstance(vector_store, FAISS):
+        return 0
+
+    index = vector_store.index
+    memory_bytes = estimate_index_bytes(get_index_type(index) or FLAT, index.ntotal, index.d)
+    if isinstance(vector_store.docstore, InMemoryDocstore):
+        for document in vector_store.docstore._dict.values():
+            memory_bytes += len(document.page_content) + DOCUMENT_OVERHEAD_BYTES
+    return memory_bytes
+
+
+class _RegistryEntry:
+    """An index of the registry, built or being built."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future: Future = Future()
+        self.vector_store: Optional[VectorStore] = None
+        self.memory_bytes = 0
+        self.references = 0
+        self.last_used = time.monotonic()
+
+
+class _LiveState:
+    """The live index of a handle and the registry entry counting its snapshots."""
+
+    def __init__(self):
+        self.live_index: Optional["LiveIndex"] = None
+        self.entry: Optional[_RegistryEntry] = None
+
+
+class IndexHandle:
+    """
+    A reference to an index of the registry.
+
+    The index is not evicted while a handle to it is held. Call release()
+    when the index is no longer needed. A handle that is garbage collected
+    without being released, for example with the state of a closed
+    Streamlit session, releases its reference then.
+    """
+
+    def __init__(self, registry: "IndexRegistry", entry: _RegistryEntry):
+        self.key = entry.key
+        self.vector_store = entry.vector_store
+        self._registry = registry
+        self._live_state = _LiveState()
+        self._finalizer = weakref.finalize(self, registry._release, entry, self._live_state)
+
+    def get_live_index(
+        self,
+        embedding_cache: Optional[ChunkEmbeddingCache] = None,
+        index_config: Optional[IndexConfig] = None,
+    ) -> "LiveIndex":
+        """
+        Get the live index that adds pages to a copy of this index, for this handle only.
+
+        The shared index keeps the contents its key describes, so other
+        handles of the key never see the added pages. Each snapshot of the
+        live index is held by a registry entry of its own, so its memory
+        counts against the budget until the handle is released, which also
+        stops the live index. The live index is created by the first call,
+        whose arguments it keeps.
+
+        Args:
+            embedding_cache: Optional cache used to embed the new chunks
+            index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+
+        Returns:
+            The live index of the handle
+        """
+        return self._registry._get_live_index(self, embedding_cache, index_config)
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self) -> None:
+        """Give up the reference to the index, which can then be evicted."""
+        self._finalizer()
+
+    def __enter__(self) -> "IndexHandle":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class IndexRegistry:
+    """
+    A process-wide registry of loaded vector stores.
+
+    Indexes are keyed by the caller, typically by URL, content hash and
+    index settings, so sessions asking about the same version of a page
+    share one index. The first caller of a key builds the index and the
+    others wait for that build. When the estimated memory of the indexes
+    exceeds the budget, indexes without a handle are evicted, least recently
+    used first. Indexes in use are never evicted, so the budget can be
+    exceeded while they are all in use.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+        memory_estimator: Callable[[VectorStore], int] = estimate_vector_store_bytes,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            memory_budget_bytes: Total estimated memory of the indexes kept without a handle
+            memory_estimator: Function estimating the memory of a vector store
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.memory_estimator = memory_estimator
+        self._entries: Dict[str, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+
+        self.builds = 0
+        self.hits = 0
+        self.waits = 0
+        self.evictions = 0
+        self.failures = 0
+
+    def acquire(self, key: str, build: Callable[[], VectorStore]) -> IndexHandle:
+        """
+        Get a handle to the index of a key, building it if needed.
+
+        Args:
+            key: The key of the index
+            build: Function building the index, called at most once at a time per key
+
+        Returns:
+            A handle holding the vector store
+
+        Raises:
+            Exception: The error of the build, for its caller and every waiting caller
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            is_builder = entry is None
+            if is_builder:
+                entry = _RegistryEntry(key)
+                self._entries[key] = entry
+                self.builds += 1
+            elif entry.future.done():
+                self.hits += 1
+            else:
+                self.waits += 1
+            entry.references += 1
+            entry.last_used = time.monotonic()
+
+        if is_builder:
+            try:
+                vector_store = build()
+            except BaseException as e:
+                with self._lock:
+                    # Let the next caller try again
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                    entry.references -= 1
+                    self.failures += 1
+                entry.future.set_exception(e)
+                raise
+            memory_bytes = self.memory_estimator(vector_store)
+            with self._lock:
+                entry.vector_store = vector_store
+                entry.memory_bytes = memory_bytes
+                self._evict()
+            entry.future.set_result(vector_store)
+        else:
+            try:
+                entry.future.result()
+            except BaseException:
+                with self._lock:
+                    entry.references -= 1
+                raise
+
+        return IndexHandle(self, entry)
+
+    def _get_live_index(
+        self,
+        handle: IndexHandle,
+        embedding_cache: Optional[ChunkEmbeddingCache],
+        index_config: Optional[IndexConfig],
+    ) -> "LiveIndex":
+        """Get the live index of a handle, creating it and the entry of its snapshots on first use."""
+        from live_index import LiveIndex
+
+        live_state = handle._live_state
+        with self._lock:
+            if live_state.live_index is None:
+                # A unique key, so no other handle acquires the grown index
+                live_entry = _RegistryEntry(f"{handle.key}#live-{uuid.uuid4().hex}")
+                live_entry.references = 1
+                live_entry.future.set_result(None)
+                self._entries[live_entry.key] = live_entry
+                live_state.entry = live_entry
+                live_state.live_index = LiveIndex(
+                    handle.vector_store,
+                    embedding_cache=embedding_cache,
+                    index_config=index_config,
+                    on_update=lambda vector_store: self._publish(live_entry, vector_store),
+                )
+            return live_state.live_index
+
+    def _publish(self, entry: _RegistryEntry, vector_store: VectorStore) -> None:
+        """Count a new snapshot of a live index in place of the previous one."""
+        memory_bytes = self.memory_estimator(vector_store)
+        with self._lock:
+            # An add that finishes after its handle was released has nothing left to count against
+            if self._entries.get(entry.key) is entry:
+                entry.vector_store = vector_store
+                entry.memory_bytes = memory_bytes
+                self._evict()
+
+    def _release(self, entry: _RegistryEntry, live_state: _LiveState) -> None:
+        """Drop a handle's reference to an entry and its live index, and evict unused entries over the budget."""
+        with self._lock:
+            entry.references -= 1
+            entry.last_used = time.monotonic()
+            if live_state.entry is not None:
+                # A grown index belongs to its handle only, so it is not kept for reuse
+                if self._entries.get(live_state.entry.key) is live_state.entry:
+                    del self._entries[live_state.entry.key]
+                live_state.live_index.close(wait=False)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Evict unused built entries, least recently used first, until the budget is met. Holds the lock."""
+        memory_bytes = sum(entry.memory_bytes for entry in self._entries.values())
+        if memory_bytes <= self.memory_budget_bytes:
+            return
+
+        unused = sorted(
+            (entry for entry in self._entries.values() if entry.references == 0 and entry.future.done()),
+            key=lambda entry: entry.last_used,
+        )
+        for entry in unused:
+            if memory_bytes <= self.memory_budget_bytes:
+                break
+            del self._entries[entry.key]
+            memory_bytes -= entry.memory_bytes
+            self.evictions += 1
+
+    def evict_unused(self) -> int:
+        """
+        Evict every index without a handle.
+
+        Returns:
+            The number of evicted indexes
+        """
+        with self._lock:
+            unused = [entry for entry in self._entries.values() if entry.references == 0 and entry.future.done()]
+            for entry in unused:
+                del self._entries[entry.key]
+            self.evictions += len(unused)
+        return len(unused)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the state and counters of the registry.
+
+        Returns:
+            A dict with the number of indexes, those in use and being built,
+            their estimated memory and the budget, and the number of builds,
+            hits, waits on an in-flight build, evictions and failed builds
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            return {
+                "indexes": len(entries),
+                "in_use": sum(1 for entry in entries if entry.references > 0),
+                "building": sum(1 for entry in entries if not entry.future.done()),
+                "memory_bytes": sum(entry.memory_bytes for entry in entries),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "builds": self.builds,
+                "hits": self.hits,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "failures": self.failures,
+            }
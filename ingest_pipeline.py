@@ -0,0 +1,286 @@
+"""
+Streaming ingest pipeline for the RAG application.
+Runs fetch, parse/split and embed as overlapping stages connected by bounded
+queues, so memory stays bounded no matter how many pages are ingested.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from embedding_cache import ChunkEmbeddingCache
+from instrumentation import record_stage, stage
+from web_fetcher import FetchResult
+
+# Default number of chunks embedded and added to the index at once
+DEFAULT_BATCH_SIZE = 64
+
+# Default capacity of the queues between stages
+DEFAULT_QUEUE_SIZE = 32
+
+# Marks the end of the items in a queue
+_END_OF_STREAM = object()
+
+
+class StageStats:
+    """Timing and throughput counters of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.output_queue: Optional[queue.Queue] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a snapshot of the counters."""
+        queue_depth = self.output_queue.qsize() if self.output_queue is not None else 0
+        items_per_second = self.items / self.busy_seconds if self.busy_seconds > 0 else 0.0
+        return {
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+            "items_per_second": items_per_second,
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class IngestPipeline:
+    """
+    Ingests fetched pages into a FAISS vector store in overlapping stages.
+
+    - fetch: pulls fetch results from an iterable (the iteration does the fetching)
+    - split: parses each page and splits it into chunks
+    - embed: embeds chunks in fixed-size batches and adds each batch to the index
+
+    Each stage runs in its own thread and hands work to the next stage
+    through a bounded queue. While page N is being parsed and split, page
+    N+1 is being fetched and earlier chunks are being embedded. A full queue
+    blocks the stage before it, which keeps peak memory bounded.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        parse_page: Callable[[str, str], Document],
+        split_page: Callable[[List[Document]], List[Document]],
+        embedding_cache: Optional[ChunkEmbeddingCache] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        progress_callback: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            embeddings: The embeddings used to embed the chunks
+            parse_page: Function turning a URL and its HTML into a Document
+            split_page: Function splitting a list of documents into chunks
+            embedding_cache: Optional cache of chunk embeddings
+            batch_size: Number of chunks embedded and added to the index at once
+            queue_size: Capacity of the queues between stages
+            progress_callback: Optional function called with the stats after each batch
+        """
+        self.embeddings = embeddings
+        self.parse_page = parse_page
+        self.split_page = split_page
+        self.embedding_cache = embedding_cache
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.progress_callback = progress_callback
+
+        self.fetch_results: List[FetchResult] = []
+        self._stats = {name: StageStats(name) for name in ("fetch", "split", "embed")}
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get a snapshot of the per-stage counters.
+
+        Safe to call from another thread while the pipeline is running.
+
+        Returns:
+            A dict of stage name to items, busy time, throughput and queue depths
+        """
+        with self._stats_lock:
+            return {name: stage.to_dict() for name, stage in self._stats.items()}
+
+    def run(self, fetch_results: Iterable[FetchResult], vector_store: Optional[FAISS] = None) -> Optional[FAISS]:
+        """
+        Run the pipeline until every page has been fetched, split and indexed.
+
+        Args:
+            fetch_results: Iterable producing the fetched pages
+            vector_store: Optional existing vector store to add the chunks to
+
+        Returns:
+            The vector store, or None if no chunks were produced and no store was given
+        """
+        page_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue: queue.Queue = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        self._stats["fetch"].output_queue = page_queue
+        self._stats["split"].output_queue = chunk_queue
+
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._fetch_stage, fetch_results, page_queue), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._split_stage, page_queue, chunk_queue), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            vector_store = self._embed_stage(chunk_queue, vector_store)
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            self._stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return vector_store
+
+    def _run_stage(self, stage: Callable, source: Any, output_queue: queue.Queue) -> None:
+        """Run a stage in a thread, recording errors and always ending its output."""
+        try:
+            stage(source, output_queue)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop_event.set()
+        finally:
+            self._put(output_queue, _END_OF_STREAM, force=True)
+
+    def _put(self, output_queue: queue.Queue, item: Any, stage_name: Optional[str] = None, force: bool = False) -> bool:
+        """
+        Put an item on a queue, giving up if the pipeline is stopping.
+
+        Returns:
+            True if the item was queued
+        """
+        while True:
+            if self._stop_event.is_set() and not force:
+                return False
+            try:
+                output_queue.put(item, timeout=0.1)
+            except queue.Full:
+                if force and self._stop_event.is_set():
+                    # Nobody is reading anymore, make room for the end marker
+                    try:
+                        output_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                continue
+            if stage_name is not None:
+                with self._stats_lock:
+                    stage = self._stats[stage_name]
+                    stage.max_queue_depth = max(stage.max_queue_depth, output_queue.qsize())
+            return True
+
+    def _get(self, input_queue: queue.Queue) -> Any:
+        """Take the next item from a queue, or the end marker if the pipeline is stopping."""
+        while True:
+            try:
+                return input_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return _END_OF_STREAM
+
+    def _fetch_stage(self, fetch_results: Iterable[FetchResult], page_queue: queue.Queue) -> None:
+        """Pull fetched pages and pass the downloaded ones on."""
+        iterator = iter(fetch_results)
+        while not self._stop_event.is_set():
+            start_time = time.perf_counter()
+            try:
+                result = next(iterator)
+            except StopIteration:
+                break
+            with self._stats_lock:
+                self._stats["fetch"].items += 1
+                self._stats["fetch"].busy_seconds += time.perf_counter() - start_time
+
+            if result.html is None:
+                self.fetch_results.append(result)
+                continue
+
+            # Keep a summary of the result without holding on to the page body
+            self.fetch_results.append(FetchResult(
+                url=result.url,
+                status_code=result.status_code,
+                etag=result.etag,
+                last_modified=result.last_modified,
+                content_bytes=result.content_bytes,
+                elapsed_seconds=result.elapsed_seconds,
+                links=result.links,
+            ))
+            if not self._put(page_queue, result, "fetch"):
+                break
+
+    def _split_stage(self, page_queue: queue.Queue, chunk_queue: queue.Queue) -> None:
+        """Parse and split each page and pass its chunks on."""
+        while True:
+            result = self._get(page_queue)
+            if result is _END_OF_STREAM:
+                break
+
+            start_time = time.perf_counter()
+            document = self.parse_page(result.url, result.html)
+            split_start_time = time.perf_counter()
+            chunks = self.split_page([document])
+            end_time = time.perf_counter()
+            record_stage("split", end_time - split_start_time, documents=1, chunks=len(chunks))
+            with self._stats_lock:
+                self._stats["split"].items += len(chunks)
+                self._stats["split"].busy_seconds += end_time - start_time
+
+            for chunk in chunks:
+                if not self._put(chunk_queue, chunk, "split"):
+                    return
+
+    def _embed_stage(self, chunk_queue: queue.Queue, vector_store: Optional[FAISS]) -> Optional[FAISS]:
+        """Embed chunks in fixed-size batches and add each batch to the index."""
+        batch: List[Document] = []
+        while True:
+            chunk = self._get(chunk_queue)
+            if chunk is not _END_OF_STREAM:
+                batch.append(chunk)
+            if batch and (len(batch) >= self.batch_size or chunk is _END_OF_STREAM):
+                vector_store = self._embed_batch(batch, vector_store)
+                batch = []
+            if chunk is _END_OF_STREAM:
+                return vector_store
+
+    def _embed_batch(self, batch: List[Document], vector_store: Optional[FAISS]) -> FAISS:
+        """Embed one batch of chunks and add it to the vector store."""
+        start_time = time.perf_counter()
+
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        with stage("embed", chunks=len(batch)):
+            if self.embedding_cache is not None:
+                vectors = self.embedding_cache.embed_documents(texts, self.embeddings)
+            else:
+                vectors = self.embeddings.embed_documents(texts)
+
+        with stage("index", chunks=len(batch)):
+            if vector_store is None:
+                vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings, metadatas=metadatas)
+            else:
+                vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+
+        with self._stats_lock:
+            self._stats["embed"].items += len(batch)
+            self._stats["embed"].busy_seconds += time.perf_counter() - start_time
+
+        if self.progress_callback is not None:
+            self.progress_callback(self.stats())
+
+        return vector_store
@@ -0,0 +1,396 @@
+"""
+Instrumentation module for the RAG application.
+Records the time and counters of every ingest and query stage (fetch,
+parse, split, embed, index, and each node of the RAG chain), passes them to
+pluggable hooks, and exports the totals as JSON or in the Prometheus text
+format. A sampling profiler can be switched on for one-off deep dives.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+# Prefix of the exported Prometheus metric names
+METRIC_PREFIX = "rag"
+
+# Default time between two stack samples of the profiler
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+
+# Set to 1 to run the sampling profiler for the whole CLI session
+PROFILE_ENV_VAR = "RAG_PROFILE"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageEvent:
+    """One completed run of a stage."""
+
+    stage: str
+    seconds: float
+    counters: Dict[str, float] = field(default_factory=dict)
+    started_at: float = 0.0
+    thread: str = ""
+
+
+class InstrumentationHook:
+    """
+    Receives every stage event of the process.
+
+    Subclasses override on_stage(). Hooks are called on the thread that ran
+    the stage, so they must be thread-safe and quick. An error raised by a
+    hook is logged and does not reach the code that ran the stage.
+    """
+
+    def on_stage(self, event: StageEvent) -> None:
+        """
+        Handle a completed stage.
+
+        Args:
+            event: The stage, its duration and its counters
+        """
+
+
+class MetricsRecorder(InstrumentationHook):
+    """
+    Aggregates stage events into totals per stage.
+
+    For each stage it keeps the number of runs, the total and maximum time
+    and the sum of each counter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+
+    def on_stage(self, event: StageEvent) -> None:
+        with self._lock:
+            totals = self._stages.get(event.stage)
+            if totals is None:
+                totals = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "counters": Counter()}
+                self._stages[event.stage] = totals
+            totals["calls"] += 1
+            totals["seconds"] += event.seconds
+            totals["max_seconds"] = max(totals["max_seconds"], event.seconds)
+            totals["counters"].update(event.counters)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the totals of every stage.
+
+        Returns:
+            A dict per stage with its calls, total, mean and maximum seconds
+            and the sums of its counters
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "calls": totals["calls"],
+                    "seconds": totals["seconds"],
+                    "mean_seconds": totals["seconds"] / totals["calls"],
+                    "max_seconds": totals["max_seconds"],
+                    "counters": dict(totals["counters"]),
+                }
+                for stage, totals in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        """Forget every recorded stage."""
+        with self._lock:
+            self._stages.clear()
+
+    def to_json(self) -> str:
+        """
+        Export the totals as JSON.
+
+        Returns:
+            The snapshot() as a JSON document
+        """
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """
+        Export the totals in the Prometheus text exposition format.
+
+        Returns:
+            Counters of the calls and seconds of each stage, a gauge of the
+            slowest run, and one counter per stage counter, such as
+            rag_stage_bytes_total{stage="fetch"}
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def add_metric(name: str, metric_type: str, help_text: str, samples: List[str]):
+            if samples:
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+                lines.extend(samples)
+
+        def sample(name: str, stage: str, value: float) -> str:
+            return f'{METRIC_PREFIX}_{name}{{stage="{stage}"}} {value:g}'
+
+        stages = sorted(snapshot)
+        add_metric("stage_calls_total", "counter", "Number of runs of the stage.",
+                   [sample("stage_calls_total", stage, snapshot[stage]["calls"]) for stage in stages])
+        add_metric("stage_seconds_total", "counter", "Time spent in the stage.",
+                   [sample("stage_seconds_total", stage, snapshot[stage]["seconds"]) for stage in stages])
+        add_metric("stage_max_seconds", "gauge", "Slowest run of the stage.",
+                   [sample("stage_max_seconds", stage, snapshot[stage]["max_seconds"]) for stage in stages])
+
+        counter_names = sorted({name for totals in snapshot.values() for name in totals["counters"]})
+        for counter_name in counter_names:
+            metric_name = f"stage_{counter_name}_total"
+            add_metric(metric_name, "counter", f"Sum of {counter_name} over the runs of the stage.", [
+                sample(metric_name, stage, snapshot[stage]["counters"][counter_name])
+                for stage in stages if counter_name in snapshot[stage]["counters"]
+            ])
+        return "\n".join(lines) + "\n"
+
+
+class JsonLinesTraceHook(InstrumentationHook):
+    """Writes every stage event as one JSON line, as a trace of a run."""
+
+    def __init__(self, output_file: TextIO):
+        """
+        Initialize the hook.
+
+        Args:
+            output_file: The open file the events are written to
+        """
+        self.output_file = output_file
+        self._lock = threading.Lock()
+
+    def on_stage(self, event: StageEvent) -> None:
+        line = json.dumps(asdict(event))
+        with self._lock:
+            self.output_file.write(line + "\n")
+
+
+# The recorder of the process, and the hooks receiving every stage event
+_metrics = MetricsRecorder()
+_hooks: List[InstrumentationHook] = [_metrics]
+_hooks_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    Get the recorder that aggregates the stages of the whole process.
+
+    Returns:
+        The shared metrics recorder
+    """
+    return _metrics
+
+
+def add_hook(hook: InstrumentationHook) -> None:
+    """
+    Pass every following stage event to a hook.
+
+    Args:
+        hook: The hook to add
+    """
+    global _hooks
+    with _hooks_lock:
+        # Replace the list so record_stage() can iterate over it without the lock
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook: InstrumentationHook) -> None:
+    """
+    Stop passing stage events to a hook.
+
+    Args:
+        hook: The hook to remove
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = [other for other in _hooks if other is not hook]
+
+
+def record_stage(name: str, seconds: float, started_at: Optional[float] = None, **counters: float) -> None:
+    """
+    Record a completed stage that was timed by the caller.
+
+    Args:
+        name: The stage name, such as "fetch" or "generate"
+        seconds: The duration of the stage
+        started_at: The wall-clock start time, now minus the duration by default
+        **counters: Counts of the stage, such as bytes=1024 or chunks=12
+    """
+    event = StageEvent(
+        stage=name,
+        seconds=seconds,
+        counters={key: value for key, value in counters.items() if value is not None},
+        started_at=started_at if started_at is not None else time.time() - seconds,
+        thread=threading.current_thread().name,
+    )
+    for hook in _hooks:
+        try:
+            hook.on_stage(event)
+        except Exception:
+            # A broken exporter must not fail the request, or hide its own error
+            logger.exception("Instrumentation hook %r failed on stage %r", hook, name)
+
+
+@contextmanager
+def stage(name: str, **counters: float) -> Iterator[Dict[str, float]]:
+    """
+    Time a block of code as a stage.
+
+    The block can add counters to the yielded dict, for example
+    counters["chunks"] = len(chunks). The stage is recorded even when the
+    block raises, with an "errors" counter of 1.
+
+    Args:
+        name: The stage name
+        **counters: Initial counters of the stage
+
+    Yields:
+        The counters of the stage
+    """
+    started_at = time.time()
+    start_time = time.perf_counter()
+    stage_counters: Dict[str, float] = dict(counters)
+    try:
+        yield stage_counters
+    except BaseException:
+        stage_counters["errors"] = stage_counters.get("errors", 0) + 1
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start_time, started_at, **stage_counters)
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that samples the stacks of every thread.
+
+    A background thread records the innermost frames of all other threads
+    every interval, so the overhead stays low and the profile covers the
+    fetch, embedding and retrieval worker threads too. Each sample counts
+    once for the function it is in (self) and once for every function on
+    its stack (total).
+    """
+
+    def __init__(self, interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval_seconds: Time between two samples
+        """
+        self.interval_seconds = interval_seconds
+        self.samples = 0
+        self._self_counts: Counter = Counter()
+        self._total_counts: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start sampling, if not started already."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, keeping the samples taken."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+
+    def reset(self) -> None:
+        """Drop the samples taken."""
+        with self._lock:
+            self.samples = 0
+            self._self_counts.clear()
+            self._total_counts.clear()
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        """Sample the stacks of the other threads until stopped."""
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_thread_id:
+                        continue
+                    self.samples += 1
+                    self._self_counts[_describe_frame(frame)] += 1
+                    seen = set()
+                    while frame is not None:
+                        location = _describe_frame(frame)
+                        if location not in seen:
+                            seen.add(location)
+                            self._total_counts[location] += 1
+                        frame = frame.f_back
+
+    def report(self, top: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the functions seen in the most samples.
+
+        Args:
+            top: Number of functions returned
+
+        Returns:
+            One dict per function with its location, the samples it was
+            running in (self) and on the stack of (total), and the share of
+            all samples, ordered by self samples
+        """
+        with self._lock:
+            samples = self.samples
+            rows = [
+                {
+                    "function": location,
+                    "self_samples": count,
+                    "total_samples": self._total_counts[location],
+                    "self_percent": 100.0 * count / samples,
+                    "total_percent": 100.0 * self._total_counts[location] / samples,
+                }
+                for location, count in self._self_counts.most_common(top)
+            ]
+        return rows
+
+    def format_report(self, top: int = 20) -> str:
+        """
+        Format the report as a table.
+
+        Args:
+            top: Number of functions listed
+
+        Returns:
+            The table, most sampled function first
+        """
+        lines = [f"{'self %':>7}{'total %':>9}  function ({self.samples} samples)"]
+        for row in self.report(top):
+            lines.append(f"{row['self_percent']:>7.1f}{row['total_percent']:>9.1f}  {row['function']}")
+        return "\n".join(lines)
+
+
+def _describe_frame(frame: Any) -> str:
+    """Describe the function of a frame as function (file:line of its definition)."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
@@ -0,0 +1,266 @@
+"""
+Live index module for the RAG application.
+Grows a vector store with new pages while it keeps serving queries: pages
+are embedded and inserted in the background into a copy of the index,
+which replaces the served index in one step once it is complete.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import faiss
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from document_processor import (
+    add_documents_to_vector_store,
+    create_vector_store,
+    get_embeddings,
+    load_documents_from_url,
+    remove_duplicate_chunks,
+    split_documents,
+)
+from embedding_cache import ChunkEmbeddingCache
+from index_factory import IndexConfig, apply_index_config
+from instrumentation import stage
+
+# Default number of URLs fetched at the same time by add_url()
+DEFAULT_FETCH_WORKERS = 4
+
+
+def copy_vector_store(vector_store: FAISS) -> FAISS:
+    """
+    Copy a FAISS vector store into memory, so the copy can be changed while the original is read.
+
+    The index is copied and the chunks are copied into an in-memory
+    docstore with their own metadata dicts. Stores opened read-only from a
+    disk index are copied the same way, so the copy can be written to.
+
+    Args:
+        vector_store: The vector store to copy
+
+    Returns:
+        A new vector store with the same chunks and search settings
+    """
+    documents = {}
+    for docstore_id in vector_store.index_to_docstore_id.values():
+        document = vector_store.docstore.search(docstore_id)
+        if isinstance(document, Document):
+            documents[docstore_id] = Document(
+                id=docstore_id, page_content=document.page_content, metadata=dict(document.metadata)
+            )
+
+    return FAISS(
+        vector_store.embedding_function,
+        # Cloning a memory-mapped index keeps it mapped read-only, a serialized copy owns its memory
+        faiss.deserialize_index(faiss.serialize_index(vector_store.index)),
+        InMemoryDocstore(documents),
+        {position: docstore_id for position, docstore_id in vector_store.index_to_docstore_id.items()},
+        relevance_score_fn=vector_store.override_relevance_score_fn,
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy,
+    )
+
+
+class LiveIndex:
+    """
+    A vector store that grows in the background while it serves queries.
+
+    Queries read the current snapshot, a complete FAISS vector store that
+    is never changed once served. New pages are split, deduplicated and
+    embedded by a single background writer into a copy of the snapshot,
+    which then replaces it by swapping one reference. Queries in flight
+    keep the snapshot they started with, so they never wait for a writer
+    and never see a half-built index.
+
+    Adds queued while the writer is busy are applied together, so the
+    index is copied once per batch of adds rather than once per page.
+    Pages that are already indexed are patched, and the previous
+    snapshot is freed when its last query finishes.
+    """
+
+    def __init__(
+        self,
+        vector_store: Optional[FAISS] = None,
+        embeddings: Optional[Embeddings] = None,
+        embedding_cache: Optional[ChunkEmbeddingCache] = None,
+        index_config: Optional[IndexConfig] = None,
+        fetch_workers: int = DEFAULT_FETCH_WORKERS,
+        on_update: Optional[Callable[[FAISS], None]] = None,
+    ):
+        """
+        Initialize the live index.
+
+        Args:
+            vector_store: Optional vector store to start from, it is copied and never changed
+            embeddings: Optional embeddings of an empty live index, the shared model by default.
+                Pages added to a vector store are embedded with its own embeddings
+            embedding_cache: Optional cache used to embed the new chunks
+            index_config: Optional type and memory budget of the FAISS index, chosen automatically by default
+            fetch_workers: Number of URLs fetched at the same time by add_url()
+            on_update: Optional function called on the writer thread with every new
+                snapshot, before the futures of its adds are resolved
+        """
+        self._vector_store = vector_store
+        self._embeddings = embeddings
+        self.embedding_cache = embedding_cache
+        self.index_config = index_config
+        self.on_update = on_update
+
+        self._pending: List[Tuple[List[Document], Future]] = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-index-writer")
+        self._fetchers = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="live-index-fetch")
+
+        self.version = 0
+        self.adds = 0
+        self.failures = 0
+        self.last_add_seconds = 0.0
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """The embeddings of the index."""
+        if self._embeddings is not None:
+            return self._embeddings
+        if self._vector_store is not None:
+            return self._vector_store.embeddings
+        return get_embeddings()
+
+    def snapshot(self) -> Optional[FAISS]:
+        """
+        Get the vector store to query, without waiting for adds in progress.
+
+        Returns:
+            The current vector store, None before the first add to an empty live index
+        """
+        # Reading one attribute is atomic, the writer replaces it with a complete store
+        return self._vector_store
+
+    def add_documents(self, documents: List[Document]) -> "Future[Dict[str, int]]":
+        """
+        Add pages to the index in the background.
+
+        Args:
+            documents: The pages to add, one document per page with a "source" metadata
+
+        Returns:
+            A future resolved once the pages are searchable, with the number of
+            added, removed and unchanged chunks and the new index version
+        """
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((list(documents), future))
+        self._writer.submit(self._apply_pending)
+        return future
+
+    def add_url(self, url: str) -> "Future[Dict[str, int]]":
+        """
+        Fetch a URL and add its page to the index in the background.
+
+        Args:
+            url: The URL to add
+
+        Returns:
+            A future resolved once the page is searchable, see add_documents()
+        """
+        def fetch_and_add() -> Dict[str, int]:
+            documents = load_documents_from_url(url)
+            if not documents:
+                raise ValueError(f"No content was loaded from {url}.")
+            return self.add_documents(documents).result()
+
+        return self._fetchers.submit(fetch_and_add)
+
+    def _apply_pending(self) -> None:
+        """Add every queued page to a copy of the snapshot and swap it in. Runs on the writer thread."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        documents = [document for batch_documents, _ in batch for document in batch_documents]
+        start_time = time.perf_counter()
+        try:
+            with stage("live_add", pages=len(documents)) as counters:
+                current = self._vector_store
+                if current is None:
+                    chunks = remove_duplicate_chunks(split_documents(documents))
+                    if not chunks:
+                        raise ValueError("No content was found in the added pages.")
+                    new_vector_store = create_vector_store(chunks, self.embeddings, self.embedding_cache)
+                    update_stats = {"added": len(chunks), "removed": 0, "unchanged": 0}
+                else:
+                    new_vector_store = copy_vector_store(current)
+                    update_stats = add_documents_to_vector_store(new_vector_store, documents, self.embedding_cache)
+                apply_index_config(new_vector_store, self.index_config)
+                counters.update(update_stats)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._vector_store = new_vector_store
+            self.version += 1
+            self.adds += len(batch)
+            self.last_add_seconds = time.perf_counter() - start_time
+            result = dict(update_stats, version=self.version)
+        if self.on_update is not None:
+            self.on_update(new_vector_store)
+        for _, future in batch:
+            future.set_result(result)
+
+    def wait(self) -> None:
+        """Wait until every add queued so far is searchable or has failed."""
+        self._writer.submit(lambda: None).result()
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop the background threads once the queued adds are done.
+
+        Args:
+            wait: Whether to wait for the queued adds before returning
+        """
+        self._fetchers.shutdown(wait=wait)
+        self._writer.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Get the state and counters of the live index.
+
+        Returns:
+            A dict with the number of indexed chunks, the index version, the
+            number of queued, applied and failed adds and the duration of the last one
+        """
+        vector_store = self.snapshot()
+        with self._lock:
+            return {
+                "chunks": vector_store.index.ntotal if vector_store is not None else 0,
+                "version": self.version,
+                "pending": len(self._pending),
+                "adds": self.adds,
+                "failures": self.failures,
+                "last_add_seconds": self.last_add_seconds,
+            }
+
+
+def get_current_vector_store(vector_store: Union[VectorStore, LiveIndex]) -> VectorStore:
+    """
+    Get the vector store to query now.
+
+    Args:
+        vector_store: A vector store, or a live index whose current snapshot is returned
+
+    Returns:
+        The vector store
+    """
+    if isinstance(vector_store, LiveIndex):
+        return vector_store.snapshot()
+    return vector_store
@@ -6,21 +6,27 @@ This app allows users to provide a URL and ask questions about the content.
 
 import os
 import argparse
-from typing import List, Dict, Any
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
 
-from langchain_core.documents import Document
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_anthropic import ChatAnthropic
 from langchain_core.vectorstores import VectorStore
-from langchain_core.prompts import PromptTemplate
-from langchain import hub
-from langgraph.graph import START, StateGraph
-from typing_extensions import TypedDict
 
-from document_processor import load_and_process_url, load_documents_from_url
-from rag_engine import create_rag_chain, query_rag_chain
+from answer_cache import DEFAULT_SIMILARITY_THRESHOLD, SemanticAnswerCache
+from batch_query import DEFAULT_CONCURRENCY, run_batch_file
+from context_packer import DEFAULT_TOKEN_BUDGET, ContextPacker
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, get_embedding_backend_names
+from embedding_cache import ChunkEmbeddingCache, DEFAULT_EMBEDDING_CACHE_DIR
+from index_cache import IndexCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE_BYTES
+from index_factory import AUTO, DEFAULT_INDEX_TYPE, INDEX_TYPES, IndexConfig
+from ingest_pipeline import DEFAULT_BATCH_SIZE
+from instrumentation import PROFILE_ENV_VAR, JsonLinesTraceHook, SamplingProfiler, add_hook, get_metrics
+from web_fetcher import DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND_PER_HOST
+from sharded_store import DEFAULT_NUM_SHARDS, DEFAULT_PARTITION, PARTITION_MODES, shard_vector_store
+
+# document_processor (FAISS and the HTML parsers), rag_engine (LangGraph) and
+# retrieval_batcher are imported where they are used, so start-up stays fast
 
 def main():
     """
@@ -29,36 +35,257 @@ def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="RAG application for web content")
     parser.add_argument("--url", help="URL to process for RAG")
+    parser.add_argument("--urls-file", help="File with one URL per line to process together")
+    parser.add_argument("--crawl", metavar="START_URL", help="Crawl a site from this URL and process every page")
+    parser.add_argument("--max-pages", type=int, default=100, help="Maximum number of pages to crawl")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of pages fetched, or of questions answered with --questions, "
+                             "at the same time")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+                        help="Maximum requests per second sent to a single host (0 for no limit)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of chunks embedded and added to the index at once")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the on-disk index cache")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_SIZE_BYTES // (1024 * 1024),
+                        help="Maximum size of the index cache in megabytes")
+    parser.add_argument("--embedding-cache-dir", default=DEFAULT_EMBEDDING_CACHE_DIR,
+                        help="Directory for the on-disk chunk embedding cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk index and embedding caches")
+    parser.add_argument("--embedding-backend", choices=get_embedding_backend_names(), default=DEFAULT_EMBEDDING_BACKEND,
+                        help="Backend running the embedding model, onnx-int8 needs no torch or GPU "
+                             "(default from RAG_EMBEDDING_BACKEND)")
+    parser.add_argument("--disk-index", action="store_true",
+                        help="Keep cached indexes on disk and open them memory-mapped, with chunk text in SQLite")
+    parser.add_argument("--index-type", default=DEFAULT_INDEX_TYPE, choices=(AUTO,) + INDEX_TYPES,
+                        help="FAISS index type, 'auto' chooses by the number of chunks and the memory budget")
+    parser.add_argument("--index-memory-mb", type=int,
+                        help="Memory budget of the FAISS index in megabytes, used by --index-type auto")
+    parser.add_argument("--shards", type=int, default=DEFAULT_NUM_SHARDS,
+                        help="Split the index into this many shards, built and searched in parallel")
+    parser.add_argument("--shard-by", default=DEFAULT_PARTITION, choices=PARTITION_MODES,
+                        help="Assign chunks to shards by the site of their page or by a hash of their text")
+    parser.add_argument("--nprobe", type=int, help="Inverted lists visited per query on IVF indexes")
+    parser.add_argument("--ef-search", type=int, help="Search beam width on HNSW indexes")
+    parser.add_argument("--questions", metavar="QUESTIONS_JSONL",
+                        help="Answer the questions of this JSON Lines file instead of asking interactively")
+    parser.add_argument("--output", default="answers.jsonl",
+                        help="JSON Lines file the answers of --questions are written to")
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="Always generate a new answer, even for a repeat question")
+    parser.add_argument("--answer-cache-threshold", type=float, default=DEFAULT_SIMILARITY_THRESHOLD,
+                        help="Cosine similarity above which a previous answer is reused")
+    parser.add_argument("--pack-context", action="store_true",
+                        help="Merge overlapping chunks and drop weak hits to fit the context into --context-tokens")
+    parser.add_argument("--context-tokens", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="Token budget of the retrieved context with --pack-context")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write the time and counters of every stage to this file at exit, "
+                             "in the Prometheus text format if it ends in .prom, as JSON otherwise")
+    parser.add_argument("--trace", metavar="PATH", help="Write every stage event to this JSON Lines file")
+    parser.add_argument("--profile", action="store_true", default=os.environ.get(PROFILE_ENV_VAR) == "1",
+                        help="Sample the stacks of all threads and print the hottest functions at exit")
     args = parser.parse_args()
+    setup_instrumentation(args.metrics, args.trace, args.profile)
+
+    # Load the embedding model in the background, while the user types the API key and URL
+    def warm_up():
+        from document_processor import set_embedding_backend, warm_up_embeddings
+
+        set_embedding_backend(args.embedding_backend)
+        return warm_up_embeddings()
+    embeddings_warm_up = run_in_background(warm_up, "embedding-warm-up")
+
+    index_config = IndexConfig(
+        index_type=args.index_type,
+        memory_budget_bytes=args.index_memory_mb * 1024 * 1024 if args.index_memory_mb else None,
+    )
+
+    # Set up the index and embedding caches
+    index_cache = None
+    embedding_cache = None
+    if not args.no_cache:
+        index_cache = IndexCache(
+            args.cache_dir,
+            max_size_bytes=args.cache_max_mb * 1024 * 1024,
+            disk_backed=args.disk_index,
+        )
+        embedding_cache = ChunkEmbeddingCache(args.embedding_cache_dir)
+    answer_cache = None
+    if not args.no_answer_cache:
+        answer_cache = SemanticAnswerCache(similarity_threshold=args.answer_cache_threshold)
+    context_packer = None
+    if args.pack_context:
+        context_packer = ContextPacker(token_budget=args.context_tokens)
 
     # Check for API key
     if not os.environ.get("ANTHROPIC_API_KEY"):
         api_key = input("Please enter your Anthropic API key: ")
         os.environ["ANTHROPIC_API_KEY"] = api_key
 
-    # Initialize the RAG application
-    if args.url:
-        # Process the URL provided as argument
-        vector_store = load_and_process_url(args.url)
-        print("Document processing complete. Vector store created.")
-        interactive_mode(vector_store)
-    else:
+    # Create the Claude client in the background too, it needs the API key
+    def warm_up_llm():
+        from rag_engine import get_llm
+
+        return get_llm()
+    run_in_background(warm_up_llm, "llm-warm-up")
+
+    url = args.url
+    if not (args.urls_file or args.crawl or args.url):
         # Interactive mode from the beginning
         url = input("Please enter a URL to analyze: ")
-        vector_store = load_and_process_url(url)
-        print("Document processing complete. Vector store created.")
-        interactive_mode(vector_store)
 
-def interactive_mode(vector_store: VectorStore):
+    # Wait for the embedding model before processing
+    if not embeddings_warm_up.done():
+        print("Loading embedding model...")
+    stats = embeddings_warm_up.result()
+    print(f"Embedding model loaded in {stats['load_seconds']:.2f}s "
+          f"(resident memory: {stats['resident_memory_bytes'] / (1024 * 1024):.0f} MB).")
+
+    # Initialize the RAG application
+    from document_processor import load_and_process_site, load_and_process_url, load_and_process_urls
+
+    if args.urls_file:
+        # Process every URL listed in the file
+        vector_store = load_and_process_urls(
+            read_urls_file(args.urls_file),
+            index_cache,
+            embedding_cache,
+            max_concurrency=args.concurrency,
+            requests_per_second_per_host=args.rate_limit,
+            batch_size=args.batch_size,
+            index_config=index_config,
+        )
+    elif args.crawl:
+        # Crawl the site from the start URL
+        vector_store = load_and_process_site(
+            args.crawl,
+            max_pages=args.max_pages,
+            index_cache=index_cache,
+            embedding_cache=embedding_cache,
+            max_concurrency=args.concurrency,
+            requests_per_second_per_host=args.rate_limit,
+            batch_size=args.batch_size,
+            index_config=index_config,
+        )
+    else:
+        # Process the URL provided as argument or typed in
+        vector_store = load_and_process_url(url, index_cache, embedding_cache, index_config)
+    print("Document processing complete. Vector store created.")
+
+    if args.shards > 1:
+        # Split the index so every core searches a part of it
+        vector_store = shard_vector_store(vector_store, args.shards, args.shard_by, index_config)
+        print(f"Index split into {args.shards} shards by {args.shard_by}: "
+              f"{[shard['vectors'] for shard in vector_store.describe()['shards']]} chunks.")
+
+    if args.questions:
+        # Answer every question of the file and exit
+        batch_mode(vector_store, args.questions, args.output, args.concurrency,
+                   args.nprobe, args.ef_search, answer_cache, context_packer)
+    else:
+        interactive_mode(vector_store, args.nprobe, args.ef_search, answer_cache, context_packer)
+
+def setup_instrumentation(metrics_path: Optional[str], trace_path: Optional[str], profile: bool):
+    """
+    Set up the stage metrics, the trace and the profiler requested on the command line.
+    
+    The metrics file and the profile are written when the process exits.
+    
+    Args:
+        metrics_path: Optional path of the metrics file
+        trace_path: Optional path of the JSON Lines trace
+        profile: Whether to run the sampling profiler
+    """
+    if trace_path:
+        trace_file = open(trace_path, "w")
+        add_hook(JsonLinesTraceHook(trace_file))
+        atexit.register(trace_file.close)
+    
+    if metrics_path:
+        def write_metrics():
+            metrics = get_metrics()
+            with open(metrics_path, "w") as metrics_file:
+                metrics_file.write(metrics.to_prometheus() if metrics_path.endswith(".prom") else metrics.to_json())
+        atexit.register(write_metrics)
+    
+    if profile:
+        profiler = SamplingProfiler()
+        profiler.start()
+        
+        def print_profile():
+            profiler.stop()
+            print("\nSampling profile:")
+            print(profiler.format_report())
+        atexit.register(print_profile)
+
+def run_in_background(function: Callable[[], Any], name: str) -> Future:
+    """
+    Call a function in a daemon thread, so slow start-up work overlaps with user input.
+    
+    Args:
+        function: The function to call, without arguments
+        name: Name of the thread
+        
+    Returns:
+        A future resolving to the result of the function, or raising its error
+    """
+    future: Future = Future()
+    
+    def run():
+        try:
+            future.set_result(function())
+        except Exception as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+def read_urls_file(path: str) -> List[str]:
+    """
+    Read a list of URLs from a file, ignoring blank lines and comments.
+    
+    Args:
+        path: Path of the file with one URL per line
+        
+    Returns:
+        The URLs in the file
+    """
+    urls = []
+    with open(path) as urls_file:
+        for line in urls_file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                urls.append(line)
+    return urls
+
+def interactive_mode(
+    vector_store: VectorStore,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    context_packer: Optional[ContextPacker] = None,
+):
     """
     Run the interactive Q&A session with the user.
     
     Args:
         vector_store: The vector store containing the processed documents
+        nprobe: Optional number of inverted lists visited per query, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+        answer_cache: Optional cache of answers to repeat questions
+        context_packer: Optional packer of the retrieved chunks into a token budget
     """
+    from rag_engine import create_rag_chain, stream_rag_chain
+
     # Create the RAG chain
     print("Creating RAG chain with Claude 3 Sonnet...")
-    rag_chain = create_rag_chain(vector_store)
+    rag_chain = create_rag_chain(
+        vector_store,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        answer_cache=answer_cache,
+        context_packer=context_packer,
+    )
     
     print("\nRAG Application ready! Ask questions about the content or type 'exit' to quit.")
     
@@ -70,12 +297,74 @@ def interactive_mode(vector_store: VectorStore):
         print("Retrieving relevant information...")
         
         try:
-            # Process the question through the RAG chain
-            answer = query_rag_chain(rag_chain, question)
-            print(f"\nAnswer: {answer}")
+            # Process the question through the RAG chain, printing the answer as it is generated
+            print("\nAnswer: ", end="", flush=True)
+            answer_stream = stream_rag_chain(rag_chain, question)
+            for piece in answer_stream:
+                print(piece, end="", flush=True)
+            print()
+            source = " (cached)" if answer_stream.cached else ""
+            packing = ""
+            if answer_stream.packing_stats:
+                packing = (f", context {answer_stream.packing_stats['tokens_after']} tokens, "
+                           f"{answer_stream.packing_stats['tokens_saved']} saved")
+            print(f"[first token {answer_stream.time_to_first_token or 0:.2f}s, "
+                  f"total {answer_stream.total_seconds:.2f}s{packing}{source}]")
         except Exception as e:
             print(f"\nError processing your question: {str(e)}")
             print("Please try again with a different question.")
 
+def batch_mode(
+    vector_store: VectorStore,
+    questions_path: str,
+    output_path: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    context_packer: Optional[ContextPacker] = None,
+):
+    """
+    Answer the questions of a file concurrently and write the answers to another.
+    
+    Args:
+        vector_store: The vector store containing the processed documents
+        questions_path: Path of the JSON Lines file of questions
+        output_path: Path of the JSON Lines file the answers are written to
+        concurrency: Maximum number of questions answered at the same time
+        nprobe: Optional number of inverted lists visited per query, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+        answer_cache: Optional cache of answers to repeat questions
+        context_packer: Optional packer of the retrieved chunks into a token budget
+    """
+    from rag_engine import create_rag_chain
+    from retrieval_batcher import DEFAULT_K, RetrievalBatcher
+
+    # Concurrent questions are embedded and searched together
+    retrieval_batcher = RetrievalBatcher(
+        vector_store,
+        max_batch_size=concurrency,
+        k=context_packer.fetch_k if context_packer is not None else DEFAULT_K,
+        nprobe=nprobe,
+        ef_search=ef_search,
+    )
+    rag_chain = create_rag_chain(
+        vector_store,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        answer_cache=answer_cache,
+        retrieval_batcher=retrieval_batcher,
+        context_packer=context_packer,
+    )
+    
+    print(f"Answering the questions of {questions_path} with concurrency {concurrency}...")
+    try:
+        stats = run_batch_file(rag_chain, questions_path, output_path, concurrency=concurrency)
+    finally:
+        retrieval_batcher.close()
+    print(f"Answered {stats['answered']} questions ({stats['failed']} failed, {stats['retries']} retries) "
+          f"in {stats['seconds']:.1f}s, {stats['questions_per_second']:.2f} questions/s. "
+          f"Answers written to {output_path}.")
+
 if __name__ == "__main__":
     main()
@@ -3,68 +3,295 @@ RAG engine module for the application.
 Handles the creation and querying of the RAG chain.
 """
 
-from typing import Dict, Any, List
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 
 from langchain_core.documents import Document
-from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_core.vectorstores import VectorStore
-from langchain import hub
-from langgraph.graph import START, StateGraph
-from typing_extensions import TypedDict
+from langchain_community.vectorstores import FAISS
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import NotRequired, TypedDict
+
+from answer_cache import SemanticAnswerCache, get_index_version
+from context_packer import ContextPacker
+from index_factory import search_vectors_with_scores, similarity_search_with_parameters
+from instrumentation import stage
+from live_index import LiveIndex, get_current_vector_store
+from retrieval_batcher import RetrievalBatcher
+from sharded_store import ShardedVectorStore
+
+# The "rlm/rag-prompt" prompt of the LangChain hub, bundled so that building a chain needs no network
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    (
+        "human",
+        "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to "
+        "answer the question. If you don't know the answer, just say that you don't know. Use three sentences "
+        "maximum and keep the answer concise.\nQuestion: {question} \nContext: {context} \nAnswer:",
+    ),
+])
+
+# Settings of the Anthropic model that generates the answers
+LLM_MODEL_NAME = "claude-3-opus-20240229"
+LLM_TEMPERATURE = 0.5
+LLM_MAX_TOKENS = 1000
+
+_llm: Optional[BaseChatModel] = None
+_llm_lock = threading.Lock()
+
+def get_llm() -> BaseChatModel:
+    """
+    Get the chat model shared by every chain in the process.
+    
+    The model is created on first use. Its Anthropic client keeps a pool of
+    keep-alive HTTP connections, so questions after the first one skip the
+    client setup and reuse an open connection. The client is thread-safe,
+    so Streamlit sessions share it.
+    
+    Returns:
+        The shared chat model
+    """
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            # Imported here because the Anthropic SDK takes most of the start-up time of the CLI
+            from langchain_anthropic import ChatAnthropic
+            
+            _llm = ChatAnthropic(temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS, model_name=LLM_MODEL_NAME)
+        return _llm
 
 class State(TypedDict):
     """State for the RAG application."""
     question: str
     context: List[Document]
     answer: str
+    # Set by the answer cache nodes only
+    question_embedding: NotRequired[List[float]]
+    index_version: NotRequired[str]
+    cached: NotRequired[bool]
+    # Set by the context packing nodes only
+    scored_context: NotRequired[List[Tuple[Document, float]]]
+    packing_stats: NotRequired[Dict[str, int]]
 
-def create_rag_chain(vector_store: VectorStore) -> Any:
+def create_rag_chain(
+    vector_store: Union[VectorStore, LiveIndex],
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    llm: Optional[BaseChatModel] = None,
+    retrieval_batcher: Optional[RetrievalBatcher] = None,
+    context_packer: Optional[ContextPacker] = None,
+) -> Any:
     """
     Create a RAG chain using LangGraph.
     
+    With an answer cache, the question is embedded first and a stored
+    answer to the same or a similar question about the same version of the
+    index is returned without retrieval or generation. When the index
+    changes, the answers cached for its previous version are invalidated.
+    
+    With a context packer, the retrieved chunks keep their relevance scores
+    and are packed into a token budget before generation: weak hits are
+    dropped and overlapping chunks of the same page are merged.
+    
+    With a live index, every question is answered from the snapshot that
+    is current when it reaches a node, so pages added in the background
+    become searchable without creating a new chain.
+    
     Args:
-        vector_store: The vector store containing the indexed documents
+        vector_store: The vector store containing the indexed documents, or a live index
+        nprobe: Optional number of inverted lists visited per query, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+        answer_cache: Optional cache of answers, which may be shared between chains
+        llm: Optional chat model, the model shared by get_llm() by default
+        retrieval_batcher: Optional batcher that searches the vector store for concurrent
+            questions together, with its own search settings
+        context_packer: Optional packer of the retrieved chunks into a token budget
         
     Returns:
         A compiled LangGraph for RAG
     """
-    # Get a prompt from the hub
-    prompt = hub.pull("rlm/rag-prompt")
+    prompt = RAG_PROMPT
+    
+    # The index version this chain last answered from
+    last_index_version = {"version": None}
+    
+    # Define the cache lookup function
+    def check_cache(state: State):
+        with stage("check_cache") as counters:
+            current_store = get_current_vector_store(vector_store)
+            index_version = get_index_version(current_store)
+            if last_index_version["version"] not in (None, index_version):
+                # The index changed, so answers about its previous content are stale
+                answer_cache.invalidate(last_index_version["version"])
+            last_index_version["version"] = index_version
+            
+            question_embedding = current_store.embeddings.embed_query(state["question"])
+            cached_answer = answer_cache.lookup(index_version, state["question"], question_embedding)
+            counters["hits"] = int(cached_answer is not None)
+        if cached_answer is not None:
+            return {"answer": cached_answer.answer, "context": cached_answer.context, "cached": True}
+        return {"question_embedding": question_embedding, "index_version": index_version, "cached": False}
+    
+    # Skip retrieval and generation on a cache hit
+    def route_after_cache(state: State):
+        return END if state.get("cached") else "retrieve"
     
     # Define the retrieve function
     def retrieve(state: State):
-        retrieved_docs = vector_store.similarity_search(state["question"])
+        question_embedding = state.get("question_embedding")
+        current_store = get_current_vector_store(vector_store)
+        with stage("retrieve") as counters:
+            if retrieval_batcher is not None:
+                # Embed and search together with the questions of other callers
+                retrieved_docs = retrieval_batcher.search(state["question"], question_embedding)
+            elif (nprobe is not None or ef_search is not None) and isinstance(current_store, (FAISS, ShardedVectorStore)):
+                # Trade recall for speed on approximate indexes, for this chain only
+                retrieved_docs = similarity_search_with_parameters(
+                    current_store, state["question"], nprobe=nprobe, ef_search=ef_search, embedding=question_embedding
+                )
+            elif question_embedding is not None:
+                # The answer cache already embedded the question
+                retrieved_docs = current_store.similarity_search_by_vector(question_embedding)
+            else:
+                retrieved_docs = current_store.similarity_search(state["question"])
+            counters["documents"] = len(retrieved_docs)
         return {"context": retrieved_docs}
     
+    # The retrieve function used with a context packer, which keeps the relevance scores
+    def retrieve_with_scores(state: State):
+        question_embedding = state.get("question_embedding")
+        current_store = get_current_vector_store(vector_store)
+        with stage("retrieve") as counters:
+            if retrieval_batcher is not None:
+                scored_docs = retrieval_batcher.search_with_scores(state["question"], question_embedding)
+            elif isinstance(current_store, (FAISS, ShardedVectorStore)):
+                if question_embedding is None:
+                    question_embedding = current_store.embeddings.embed_query(state["question"])
+                scored_docs = search_vectors_with_scores(
+                    current_store, [question_embedding], context_packer.fetch_k, nprobe, ef_search
+                )[0]
+            else:
+                scored_docs = current_store.similarity_search_with_relevance_scores(
+                    state["question"], k=context_packer.fetch_k
+                )
+            counters["documents"] = len(scored_docs)
+        return {"scored_context": scored_docs}
+    
+    # The async version of retrieve, which waits for its batch without holding a worker thread
+    async def aretrieve(state: State):
+        if retrieval_batcher is not None:
+            with stage("retrieve") as counters:
+                retrieved_docs = await retrieval_batcher.asearch(state["question"], state.get("question_embedding"))
+                counters["documents"] = len(retrieved_docs)
+            return {"context": retrieved_docs}
+        return await asyncio.to_thread(retrieve, state)
+    
+    async def aretrieve_with_scores(state: State):
+        if retrieval_batcher is not None:
+            with stage("retrieve") as counters:
+                scored_docs = await retrieval_batcher.asearch_with_scores(
+                    state["question"], state.get("question_embedding")
+                )
+                counters["documents"] = len(scored_docs)
+            return {"scored_context": scored_docs}
+        return await asyncio.to_thread(retrieve_with_scores, state)
+    
+    # Define the context packing function
+    def pack_context(state: State):
+        with stage("pack_context") as counters:
+            packed_docs, packing_stats = context_packer.pack(state["scored_context"])
+            counters.update(packing_stats)
+        return {"context": packed_docs, "packing_stats": packing_stats}
+    
     # Define the generate function
-    def generate(state: State):
+    def make_messages(state: State):
         
         # Join the document contents
         docs_content = "\n\n".join(doc.page_content for doc in state["context"])
         
         # Create messages for the model
-        messages = prompt.invoke({"question": state["question"], "context": docs_content})
+        return prompt.invoke({"question": state["question"], "context": docs_content})
+    
+    def generate(state: State):
+        messages = make_messages(state)
         
-        # Initialize the Anthropic model (Claude 3 Opus)
-        llm = ChatAnthropic(temperature=0.5, max_tokens=1000, model_name="claude-3-opus-20240229")
+        # Use the shared Anthropic model (Claude 3 Opus) unless the chain was given one
+        chat_model = llm if llm is not None else get_llm()
         
         # Generate the response
-        response = llm.invoke(messages)
+        with stage("generate", documents=len(state["context"])) as counters:
+            response = chat_model.invoke(messages)
+            counters.update(get_token_counts(response))
         
         return {"answer": response.content}
     
+    # The async version of generate, used by ainvoke so that concurrent
+    # questions wait on the model without holding a worker thread each
+    async def agenerate(state: State):
+        messages = make_messages(state)
+        chat_model = llm if llm is not None else get_llm()
+        with stage("generate", documents=len(state["context"])) as counters:
+            response = await chat_model.ainvoke(messages)
+            counters.update(get_token_counts(response))
+        return {"answer": response.content}
+    
+    # Define the cache store function
+    def store_answer(state: State):
+        with stage("store_answer"):
+            answer_cache.store(
+                state["index_version"],
+                state["question"],
+                state["question_embedding"],
+                state["answer"],
+                state["context"],
+            )
+        return {}
+    
     # Create and compile the graph
     graph_builder = StateGraph(State)
-    graph_builder.add_node("retrieve", retrieve)
-    graph_builder.add_node("generate", generate)
+    if context_packer is not None:
+        graph_builder.add_node("retrieve", RunnableLambda(retrieve_with_scores, afunc=aretrieve_with_scores))
+        graph_builder.add_node("pack_context", pack_context)
+    else:
+        graph_builder.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))
+    graph_builder.add_node("generate", RunnableLambda(generate, afunc=agenerate))
     
     # Define the edges
-    graph_builder.add_edge(START, "retrieve")
-    graph_builder.add_edge("retrieve", "generate")
+    if answer_cache is not None:
+        graph_builder.add_node("check_cache", check_cache)
+        graph_builder.add_node("store_answer", store_answer)
+        graph_builder.add_edge(START, "check_cache")
+        graph_builder.add_conditional_edges("check_cache", route_after_cache, ["retrieve", END])
+        graph_builder.add_edge("generate", "store_answer")
+    else:
+        graph_builder.add_edge(START, "retrieve")
+    if context_packer is not None:
+        graph_builder.add_edge("retrieve", "pack_context")
+        graph_builder.add_edge("pack_context", "generate")
+    else:
+        graph_builder.add_edge("retrieve", "generate")
     
     # Compile the graph
     return graph_builder.compile()
 
+def get_token_counts(message: Any) -> Dict[str, int]:
+    """
+    Get the token usage reported with a model response.
+    
+    Args:
+        message: The AI message returned by the chat model
+        
+    Returns:
+        A dict with the input and output tokens, empty if the model did not report them
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {key: usage[key] for key in ("input_tokens", "output_tokens") if key in usage}
+
 def query_rag_chain(rag_chain: Any, question: str) -> str:
     """
     Query the RAG chain with a question.
@@ -81,3 +308,124 @@ def query_rag_chain(rag_chain: Any, question: str) -> str:
     
     # Return the answer
     return result["answer"]
+
+async def aquery_rag_chain(rag_chain: Any, question: str) -> str:
+    """
+    Query the RAG chain with a question, asynchronously.
+    
+    Retrieval runs in a worker thread and generation awaits the async model
+    client, so many questions can be answered concurrently.
+    
+    Args:
+        rag_chain: The RAG chain to query
+        question: The question to ask
+        
+    Returns:
+        The answer from the RAG chain
+    """
+    result = await rag_chain.ainvoke({"question": question})
+    return result["answer"]
+
+def _get_message_text(message: Any) -> str:
+    """
+    Get the text of a streamed message chunk.
+    
+    Args:
+        message: The message chunk, whose content is a string or a list of content blocks
+        
+    Returns:
+        The text of the chunk
+    """
+    content = getattr(message, "content", "")
+    if isinstance(content, str):
+        return content
+    
+    # Anthropic content blocks, of which only the text blocks are part of the answer
+    parts = []
+    for block in content:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+class AnswerStream:
+    """
+    The answer of a RAG chain, streamed as the model generates it.
+    
+    Iterating over the stream runs the chain and yields pieces of the answer
+    as soon as they arrive. Afterwards the stream holds the full answer, the
+    retrieved context, whether the answer came from the answer cache, the
+    statistics of the context packer if the chain has one, and the time to
+    the first token and in total.
+    """
+    
+    def __init__(self, rag_chain: Any, question: str):
+        """
+        Initialize the stream.
+        
+        Args:
+            rag_chain: The RAG chain to query
+            question: The question to ask
+        """
+        self.rag_chain = rag_chain
+        self.question = question
+        self.answer = ""
+        self.context: List[Document] = []
+        self.cached = False
+        self.packing_stats: Optional[Dict[str, int]] = None
+        self.time_to_first_token: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        start_time = time.perf_counter()
+        pieces = []
+        
+        def record(text: str):
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start_time
+            pieces.append(text)
+        
+        # The messages mode yields the tokens of the model, the updates mode the output of each node
+        for mode, chunk in self.rag_chain.stream({"question": self.question}, stream_mode=["messages", "updates"]):
+            if mode == "messages":
+                message, metadata = chunk
+                text = _get_message_text(message)
+                if text and metadata.get("langgraph_node") == "generate":
+                    record(text)
+                    yield text
+                continue
+            
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                if "context" in update:
+                    self.context = update["context"]
+                if "packing_stats" in update:
+                    self.packing_stats = update["packing_stats"]
+                if node == "check_cache" and update.get("cached"):
+                    # A cached answer arrives whole
+                    self.cached = True
+                    record(update["answer"])
+                    yield update["answer"]
+                elif node == "generate" and not pieces:
+                    # The model did not stream, so the answer arrives whole
+                    record(update["answer"])
+                    yield update["answer"]
+        
+        self.answer = "".join(pieces)
+        self.total_seconds = time.perf_counter() - start_time
+
+def stream_rag_chain(rag_chain: Any, question: str) -> AnswerStream:
+    """
+    Query the RAG chain with a question, streaming the answer.
+    
+    Args:
+        rag_chain: The RAG chain to query
+        question: The question to ask
+        
+    Returns:
+        An AnswerStream yielding pieces of the answer as they are generated,
+        which reports the time to the first token and the total time once consumed
+    """
+    return AnswerStream(rag_chain, question)
@@ -0,0 +1,71 @@
+"""
+Resource usage module for the RAG application.
+Reports the memory used by the current process.
+"""
+
+import resource
+import sys
+from typing import Optional
+
+
+def _read_status_bytes(field: str) -> Optional[int]:
+    """Read a memory field of /proc/self/status in bytes, or None if it is not available."""
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith(field + ":"):
+                    # The value is reported in kilobytes
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_resident_memory_bytes() -> int:
+    """
+    Get the resident memory (RSS) of the current process.
+
+    Reads /proc/self/status where available and falls back to the peak
+    resident size reported by getrusage on other platforms.
+
+    Returns:
+        The resident memory in bytes
+    """
+    resident = _read_status_bytes("VmRSS")
+    if resident is not None:
+        return resident
+
+    return get_peak_resident_memory_bytes()
+
+
+def get_private_memory_bytes() -> int:
+    """
+    Get the anonymous resident memory of the current process.
+
+    Unlike the RSS, this leaves out pages of memory-mapped files, which
+    are shared with other processes through the page cache. Falls back to
+    the RSS where the split is not available.
+
+    Returns:
+        The private resident memory in bytes
+    """
+    private = _read_status_bytes("RssAnon")
+    if private is not None:
+        return private
+
+    return get_resident_memory_bytes()
+
+
+def get_peak_resident_memory_bytes() -> int:
+    """
+    Get the peak resident memory of the current process.
+
+    Returns:
+        The peak resident memory in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
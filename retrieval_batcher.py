@@ -0,0 +1,301 @@
+"""
+Retrieval batching module for the RAG application.
+Gathers the queries of concurrent callers into micro-batches that are
+embedded in one forward pass and searched with one FAISS call.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from index_factory import search_vectors_with_scores
+from live_index import LiveIndex, get_current_vector_store
+
+# Default maximum number of queries embedded and searched together
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# Default time the first query of a batch waits for others to join it
+DEFAULT_MAX_WAIT_MS = 2.0
+
+# Default number of documents returned per query, as for FAISS.similarity_search
+DEFAULT_K = 4
+
+
+@dataclass
+class _RetrievalRequest:
+    """A query waiting for its batch."""
+
+    query: str
+    embedding: Optional[List[float]]
+    future: Future = field(default_factory=Future)
+
+
+class RetrievalBatcher:
+    """
+    A retrieval service that coalesces concurrent queries into batches.
+
+    Callers block in search() (or await asearch()) while a dispatcher thread
+    collects the queries arriving within max_wait_ms of the first one, up to
+    max_batch_size. The queries without an embedding are embedded with one
+    embed_documents() call, every query is searched with one FAISS search,
+    and each caller gets its own results. The dispatcher only waits while
+    the previous batch held several queries, so a single user is never
+    delayed, and the queries that queue up during a batch form the next one.
+
+    Queries are embedded with embed_documents(), which equals embed_query()
+    for the sentence-transformers models used here but not for models that
+    add a query instruction.
+    """
+
+    def __init__(
+        self,
+        vector_store: Union[FAISS, LiveIndex],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        k: int = DEFAULT_K,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            vector_store: The FAISS vector store to search, or a live index whose current snapshot is searched
+            max_batch_size: Maximum number of queries embedded and searched together
+            max_wait_ms: Time the first query of a batch waits for others to join it
+            k: Number of documents returned per query
+            nprobe: Optional number of inverted lists visited per query, for IVF indexes
+            ef_search: Optional beam width of the graph search, for HNSW indexes
+        """
+        self.vector_store = vector_store
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.k = k
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        self._requests: "queue.Queue[Optional[_RetrievalRequest]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._last_batch_size = 0
+
+        self.batches = 0
+        self.queries = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the counters of the batcher.
+
+        Returns:
+            A dict with the number of batches and queries and the mean batch size
+        """
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
+
+    def submit(self, query: str, embedding: Optional[List[float]] = None) -> Future:
+        """
+        Queue a query for the next batch.
+
+        Args:
+            query: The query text
+            embedding: The query embedding, if it was already computed
+
+        Returns:
+            A future resolving to the most similar documents with their relevance scores
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The retrieval batcher is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="retrieval-batcher", daemon=True)
+                self._thread.start()
+        request = _RetrievalRequest(query, embedding)
+        self._requests.put(request)
+        return request.future
+
+    def search(self, query: str, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Search for a query as part of the next batch, blocking until it is done.
+
+        Args:
+            query: The query text
+            embedding: The query embedding, if it was already computed
+
+        Returns:
+            The most similar documents
+        """
+        return [document for document, _ in self.submit(query, embedding).result()]
+
+    def search_with_scores(self, query: str, embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        """
+        Search for a query as part of the next batch, returning relevance scores too.
+
+        Args:
+            query: The query text
+            embedding: The query embedding, if it was already computed
+
+        Returns:
+            The most similar documents with their relevance scores
+        """
+        return self.submit(query, embedding).result()
+
+    async def asearch(self, query: str, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Search for a query as part of the next batch, without blocking the event loop.
+
+        Args:
+            query: The query text
+            embedding: The query embedding, if it was already computed
+
+        Returns:
+            The most similar documents
+        """
+        scored_documents = await asyncio.wrap_future(self.submit(query, embedding))
+        return [document for document, _ in scored_documents]
+
+    async def asearch_with_scores(
+        self, query: str, embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for a query as part of the next batch, returning relevance scores too.
+
+        Args:
+            query: The query text
+            embedding: The query embedding, if it was already computed
+
+        Returns:
+            The most similar documents with their relevance scores
+        """
+        return await asyncio.wrap_future(self.submit(query, embedding))
+
+    def close(self) -> None:
+        """Stop the dispatcher thread once the queued queries are done."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._requests.put(None)
+            thread.join()
+
+    def _dispatch(self) -> None:
+        """Collect queries into batches and run them until the batcher is closed."""
+        while True:
+            first_request = self._requests.get()
+            if first_request is None:
+                return
+
+            # Only wait for more queries while callers are concurrent, so a lone
+            # caller is never delayed, but take every query already queued
+            batch = [first_request]
+            stop = False
+            wait_seconds = self.max_wait_ms / 1000 if self._last_batch_size > 1 else 0.0
+            deadline = time.perf_counter() + wait_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            self._last_batch_size = len(batch)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[_RetrievalRequest]) -> None:
+        """Embed and search a batch of queries and resolve their futures."""
+        try:
+            results = search_batch_with_scores(
+                get_current_vector_store(self.vector_store),
+                [request.query for request in batch],
+                [request.embedding for request in batch],
+                self.k,
+                self.nprobe,
+                self.ef_search,
+            )
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.queries += len(batch)
+        for request, documents in zip(batch, results):
+            request.future.set_result(documents)
+
+
+def search_batch_with_scores(
+    vector_store: FAISS,
+    queries: List[str],
+    embeddings: Optional[List[Optional[List[float]]]] = None,
+    k: int = DEFAULT_K,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    Search a FAISS vector store for several queries with one embedding pass and one search.
+
+    Args:
+        vector_store: The vector store to search
+        queries: The query texts
+        embeddings: Optional embeddings of the queries, None for the queries to embed
+        k: Number of documents returned per query
+        nprobe: Optional number of inverted lists visited per query, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The most similar documents of each query with their relevance scores,
+        in the order of the queries
+    """
+    vectors = list(embeddings) if embeddings is not None else [None] * len(queries)
+    missing = [position for position, vector in enumerate(vectors) if vector is None]
+    if missing:
+        new_vectors = vector_store.embeddings.embed_documents([queries[position] for position in missing])
+        for position, vector in zip(missing, new_vectors):
+            vectors[position] = vector
+
+    return search_vectors_with_scores(vector_store, np.array(vectors, dtype=np.float32), k, nprobe, ef_search)
+
+
+def search_batch(
+    vector_store: FAISS,
+    queries: List[str],
+    embeddings: Optional[List[Optional[List[float]]]] = None,
+    k: int = DEFAULT_K,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Document]]:
+    """
+    Search a FAISS vector store for several queries with one embedding pass and one search.
+
+    Args:
+        vector_store: The vector store to search
+        queries: The query texts
+        embeddings: Optional embeddings of the queries, None for the queries to embed
+        k: Number of documents returned per query
+        nprobe: Optional number of inverted lists visited per query, for IVF indexes
+        ef_search: Optional beam width of the graph search, for HNSW indexes
+
+    Returns:
+        The most similar documents of each query, in the order of the queries
+    """
+    results = search_batch_with_scores(vector_store, queries, embeddings, k, nprobe, ef_search)
+    return [[document for document, _ in scored_documents] for scored_documents in results]
@@ -0,0 +1,689 @@
+"""
+Sharded vector store module for the RAG application.
+Splits the chunks of a large, multi-site corpus between several FAISS
+indexes, builds them in parallel processes and searches them in parallel,
+merging the top k of every shard into the top k of the whole corpus.
+"""
+
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from embedding_cache import ChunkEmbeddingCache, update_vector_store
+from index_factory import (
+    FLAT,
+    IndexConfig,
+    build_index,
+    build_serialized_index,
+    delete_from_vector_store,
+    describe_index,
+    reconstruct_vectors,
+    resolve_index_type,
+    search_index,
+)
+from instrumentation import stage
+
+# FAISS, the embedding model and live_index (which loads the HTML parsers)
+# are imported by the functions that use them, so the CLI can read the
+# defaults of this module at start-up
+
+# Ways of assigning chunks to shards: by the site of their page, so the
+# chunks of a site share a shard, or by a hash of their text, for shards of even size
+BY_SOURCE = "source"
+BY_HASH = "hash"
+PARTITION_MODES = (BY_SOURCE, BY_HASH)
+
+# Default number of shards and partition mode, can be overridden with RAG_SHARDS and RAG_SHARD_BY
+DEFAULT_NUM_SHARDS = int(os.environ.get("RAG_SHARDS", "1"))
+DEFAULT_PARTITION = os.environ.get("RAG_SHARD_BY", BY_SOURCE)
+
+
+def get_site(source: str) -> str:
+    """
+    Get the site of a source URL.
+
+    Args:
+        source: The source URL
+
+    Returns:
+        The host of the URL, or the source itself if it has none
+    """
+    return urlparse(source).netloc or source
+
+
+def get_shard_position(document: Document, num_shards: int, partition_by: str = BY_SOURCE) -> int:
+    """
+    Get the shard a chunk belongs to.
+
+    The position comes from a hash that is the same in every process, so
+    a chunk is found in the same shard when its site is updated later.
+
+    Args:
+        document: The chunk
+        num_shards: Number of shards
+        partition_by: BY_SOURCE or BY_HASH
+
+    Returns:
+        The position of the shard
+    """
+    if partition_by == BY_SOURCE:
+        key = get_site(document.metadata.get("source", ""))
+    elif partition_by == BY_HASH:
+        key = document.page_content
+    else:
+        raise ValueError(f"Unknown partition mode {partition_by!r}, expected one of {PARTITION_MODES}.")
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def merge_top_k(
+    shard_results: Sequence[Tuple[np.ndarray, np.ndarray]],
+    k: int,
+    higher_is_better: bool = False,
+) -> List[List[Tuple[float, int, int]]]:
+    """
+    Merge the top k neighbours found in every shard into the top k overall.
+
+    The neighbours of each shard are already sorted, so the rows are merged
+    rather than sorted again. Neighbours at the same distance are ordered
+    by shard.
+
+    Args:
+        shard_results: The distances and positions returned by the search of each shard
+        k: Number of neighbours kept per query
+        higher_is_better: Whether larger distances are closer, as for inner products
+
+    Returns:
+        For each query, the distance, shard and position in its shard of the nearest neighbours
+    """
+    sign = -1.0 if higher_is_better else 1.0
+    query_count = len(shard_results[0][0]) if shard_results else 0
+    merged = []
+    for query in range(query_count):
+        rows = [
+            [(float(distance), shard, int(position))
+             for distance, position in zip(distances[query], positions[query]) if position != -1]
+            for shard, (distances, positions) in enumerate(shard_results)
+        ]
+        merged.append(list(itertools.islice(heapq.merge(*rows, key=lambda hit: sign * hit[0]), k)))
+    return merged
+
+
+def make_shard(
+    documents: List[Document],
+    index: "faiss.Index",
+    embeddings: Embeddings,
+    normalize_L2: bool = False,
+    relevance_score_fn: Optional[Callable[[float], float]] = None,
+    distance_strategy: DistanceStrategy = DistanceStrategy.EUCLIDEAN_DISTANCE,
+) -> FAISS:
+    """
+    Wrap a FAISS index and the chunks of its vectors, in row order, into a vector store.
+
+    Args:
+        documents: The chunks, keeping their ids if they have one
+        index: The index holding their vectors
+        embeddings: The embeddings used to embed queries
+        normalize_L2: Whether query vectors are normalized before searching
+        relevance_score_fn: Optional function turning distances into relevance scores
+        distance_strategy: The distance of the index, which selects the default relevance scores
+
+    Returns:
+        The vector store of the shard
+    """
+    docstore_ids = [document.id or str(uuid.uuid4()) for document in documents]
+    docstore = InMemoryDocstore({
+        docstore_id: Document(id=docstore_id, page_content=document.page_content, metadata=dict(document.metadata))
+        for docstore_id, document in zip(docstore_ids, documents)
+    })
+    return FAISS(
+        embeddings,
+        index,
+        docstore,
+        dict(enumerate(docstore_ids)),
+        relevance_score_fn=relevance_score_fn,
+        normalize_L2=normalize_L2,
+        distance_strategy=distance_strategy,
+    )
+
+
+def build_shard_indexes(
+    parts: List[np.ndarray],
+    dimension: int,
+    index_type: str = FLAT,
+    metric: Optional[int] = None,
+    processes: Optional[int] = None,
+) -> List["faiss.Index"]:
+    """
+    Build the index of every shard, in parallel processes where it pays off.
+
+    Flat shards are built in this process, as sending their vectors to a
+    worker would take longer than adding them; graph and inverted file
+    shards are built by a pool of fresh processes, one shard per task.
+
+    Args:
+        parts: The vectors of each shard
+        dimension: Dimension of the vectors
+        index_type: One of INDEX_TYPES, used for every shard
+        metric: The FAISS metric of the indexes, L2 if not provided
+        processes: Maximum number of worker processes, the number of CPUs by default
+
+    Returns:
+        The index of each shard
+    """
+    import faiss
+
+    if metric is None:
+        metric = faiss.METRIC_L2
+    indexes: List[Optional["faiss.Index"]] = [None] * len(parts)
+
+    pooled = [position for position, vectors in enumerate(parts) if len(vectors) and index_type != FLAT]
+    processes = min(processes or os.cpu_count() or 1, len(pooled))
+    if processes > 1:
+        # Fresh processes do not inherit the locks held by other threads of the application
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(processes, mp_context=context) as executor:
+            futures = {
+                position: executor.submit(build_serialized_index, index_type, parts[position], metric)
+                for position in pooled
+            }
+            for position, future in futures.items():
+                indexes[position] = faiss.deserialize_index(future.result())
+
+    for position, vectors in enumerate(parts):
+        if indexes[position] is None:
+            if len(vectors):
+                indexes[position] = build_index(index_type, vectors, metric)
+            else:
+                indexes[position] = faiss.IndexFlat(dimension, metric)
+    return indexes
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    A vector store made of several FAISS vector stores, searched together.
+
+    Every query is searched in all shards at once by a pool of threads,
+    as FAISS releases the GIL while it searches, and the top k of each
+    shard are merged. With exact (flat) shards the merged top k is the top
+    k of a single index over the same chunks, with the same scores, and
+    the search time falls with the number of cores, because each core
+    scans a smaller index. Approximate shards are each searched with the
+    same settings as a single approximate index.
+
+    Shards are replaced, never changed, by add_texts(), delete() and
+    update_sources(): a changed shard is a copy that is swapped in, so
+    searches running at the same time see either the old or the new shard.
+    """
+
+    def __init__(
+        self,
+        shards: List[FAISS],
+        partition_by: str = DEFAULT_PARTITION,
+        search_threads: Optional[int] = None,
+    ):
+        """
+        Initialize the sharded store.
+
+        Args:
+            shards: The vector stores of the shards, in shard order, with the same embeddings and metric
+            partition_by: How chunks were assigned to the shards, BY_SOURCE or BY_HASH
+            search_threads: Number of shards searched at the same time, up to the number of CPUs by default
+        """
+        if not shards:
+            raise ValueError("A sharded vector store needs at least one shard.")
+        if partition_by not in PARTITION_MODES:
+            raise ValueError(f"Unknown partition mode {partition_by!r}, expected one of {PARTITION_MODES}.")
+        self._shards: Tuple[FAISS, ...] = tuple(shards)
+        self.partition_by = partition_by
+        self._lock = threading.Lock()
+
+        search_threads = min(search_threads or os.cpu_count() or 1, len(shards))
+        self._executor = ThreadPoolExecutor(search_threads, thread_name_prefix="shard-search") if search_threads > 1 else None
+
+    @property
+    def shards(self) -> Tuple[FAISS, ...]:
+        """The vector stores of the shards."""
+        return self._shards
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._shards[0].embeddings
+
+    def get_shard_position(self, document: Document) -> int:
+        """Get the shard a chunk belongs to."""
+        return get_shard_position(document, len(self._shards), self.partition_by)
+
+    def _search(
+        self,
+        vectors: np.ndarray,
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search every shard and return the merged documents of each query with their distances."""
+        import faiss
+
+        shards = self._shards
+        vectors = np.array(vectors, dtype=np.float32)
+        if shards[0]._normalize_L2:
+            faiss.normalize_L2(vectors)
+
+        def search_shard(shard: FAISS) -> Tuple[np.ndarray, np.ndarray]:
+            return search_index(shard.index, vectors, k, nprobe, ef_search)
+
+        if self._executor is None:
+            shard_results = [search_shard(shard) for shard in shards]
+        else:
+            shard_results = list(self._executor.map(search_shard, shards))
+
+        higher_is_better = shards[0].index.metric_type == faiss.METRIC_INNER_PRODUCT
+        results = []
+        for hits in merge_top_k(shard_results, k, higher_is_better):
+            documents = []
+            for distance, shard_position, position in hits:
+                shard = shards[shard_position]
+                document = shard.docstore.search(shard.index_to_docstore_id[position])
+                if isinstance(document, Document):
+                    documents.append((document, distance))
+            results.append(documents)
+        return results
+
+    def search_vectors_with_scores(
+        self,
+        vectors: np.ndarray,
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Search every shard for query vectors with per-query search parameters.
+
+        Args:
+            vectors: The query vectors, one per row
+            k: Number of documents returned per query
+            nprobe: Optional number of inverted lists to visit, for IVF shards
+            ef_search: Optional beam width of the graph search, for HNSW shards
+
+        Returns:
+            The most similar documents of each query vector, with their relevance
+            scores (higher is more relevant)
+        """
+        relevance_score_fn = self._select_relevance_score_fn()
+        return [
+            [(document, relevance_score_fn(distance)) for document, distance in documents]
+            for documents in self._search(vectors, k, nprobe, ef_search)
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the documents most similar to an embedding, with their distances like FAISS."""
+        return self._search(np.array([embedding], dtype=np.float32), k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Return the documents most similar to a query, with their distances like FAISS."""
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._shards[0]._select_relevance_score_fn()
+
+    def _similarity_search_with_relevance_scores(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.search_vectors_with_scores([self.embeddings.embed_query(query)], k)[0]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed texts and add them to copies of their shards, which are then swapped in.
+
+        Args:
+            texts: The texts to add
+            metadatas: Optional metadata of each text
+            ids: Optional docstore ids of the texts, new ids if not provided
+
+        Returns:
+            The docstore ids of the added texts
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self.embeddings.embed_documents(texts)
+
+        positions_by_shard: Dict[int, List[int]] = {}
+        for position, (text, metadata) in enumerate(zip(texts, metadatas)):
+            shard_position = self.get_shard_position(Document(page_content=text, metadata=metadata))
+            positions_by_shard.setdefault(shard_position, []).append(position)
+
+        with self._lock:
+            shards = list(self._shards)
+            for shard_position, positions in positions_by_shard.items():
+                shard = _copy_shard(shards[shard_position])
+                shard.add_embeddings(
+                    [(texts[position], vectors[position]) for position in positions],
+                    metadatas=[metadatas[position] for position in positions],
+                    ids=[ids[position] for position in positions],
+                )
+                shards[shard_position] = shard
+            self._shards = tuple(shards)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete chunks by docstore id from copies of the shards holding them, which are then swapped in."""
+        if not ids:
+            return False
+        deleted_ids = set(ids)
+        with self._lock:
+            shards = list(self._shards)
+            for shard_position, shard in enumerate(shards):
+                shard_ids = [docstore_id for docstore_id in shard.index_to_docstore_id.values() if docstore_id in deleted_ids]
+                if shard_ids:
+                    shard = _copy_shard(shard)
+                    delete_from_vector_store(shard, shard_ids)
+                    shards[shard_position] = shard
+            self._shards = tuple(shards)
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        documents = []
+        for docstore_id in ids:
+            for shard in self._shards:
+                document = shard.docstore.search(docstore_id)
+                if isinstance(document, Document):
+                    documents.append(document)
+                    break
+        return documents
+
+    def _get_source_shards(self, sources: Set[str]) -> Set[int]:
+        """Get the shards holding chunks of some sources."""
+        if self.partition_by == BY_SOURCE:
+            return {self.get_shard_position(Document(page_content="", metadata={"source": source})) for source in sources}
+        return {
+            shard_position for shard_position, shard in enumerate(self._shards)
+            if any(
+                shard.docstore.search(docstore_id).metadata.get("source") in sources
+                for docstore_id in shard.index_to_docstore_id.values()
+            )
+        }
+
+    def update_sources(
+        self,
+        documents: List[Document],
+        sources: Optional[Iterable[str]] = None,
+        embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    ) -> Dict[str, int]:
+        """
+        Replace the chunks of some pages, rebuilding only the shards that hold them.
+
+        Each affected shard is copied, patched like a single index (unchanged
+        chunks are kept, only new chunks are embedded, and the index keeps
+        its type) and swapped in, while searches keep using the other
+        shards and the old copy. Partitioned by source, the pages of one
+        site are in a single shard, so a site that changes rebuilds one shard.
+
+        Args:
+            documents: The current chunks of the changed pages
+            sources: The pages whose chunks are replaced, the sources of the chunks by default;
+                pages listed without chunks are removed
+            embedding_cache: Optional cache used to embed the new chunks
+
+        Returns:
+            A dict with the number of added, removed and unchanged chunks and of rebuilt shards
+        """
+        sources = set(sources) if sources is not None else set()
+        sources.update(document.metadata["source"] for document in documents)
+
+        with self._lock:
+            documents_by_shard: Dict[int, List[Document]] = {
+                shard_position: [] for shard_position in self._get_source_shards(sources)
+            }
+            for document in documents:
+                documents_by_shard.setdefault(self.get_shard_position(document), []).append(document)
+
+            update_stats = {"added": 0, "removed": 0, "unchanged": 0, "shards": len(documents_by_shard)}
+            shards = list(self._shards)
+            with stage("shard_update", shards=len(documents_by_shard)) as counters:
+                for shard_position, shard_documents in sorted(documents_by_shard.items()):
+                    shard = _copy_shard(shards[shard_position])
+                    shard_stats = update_vector_store(shard, shard_documents, embedding_cache)
+
+                    # Pages with no chunks left in this shard are not seen by update_vector_store
+                    kept_sources = {document.metadata["source"] for document in shard_documents}
+                    removed_ids = [
+                        docstore_id for docstore_id in shard.index_to_docstore_id.values()
+                        if shard.docstore.search(docstore_id).metadata.get("source") in sources - kept_sources
+                    ]
+                    delete_from_vector_store(shard, removed_ids)
+                    shard_stats["removed"] += len(removed_ids)
+
+                    shards[shard_position] = shard
+                    for key, value in shard_stats.items():
+                        update_stats[key] += value
+                counters.update(update_stats)
+            self._shards = tuple(shards)
+        return update_stats
+
+    def describe(self) -> Dict[str, object]:
+        """
+        Describe the shards.
+
+        Returns:
+            A dict with the partition mode, the number of chunks and the description of each shard's index
+        """
+        shards = self._shards
+        return {
+            "partition_by": self.partition_by,
+            "chunks": sum(shard.index.ntotal for shard in shards),
+            "shards": [describe_index(shard.index) for shard in shards],
+        }
+
+    def close(self) -> None:
+        """Stop the search threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "ShardedVectorStore":
+        """
+        Build a sharded store from texts, see create_sharded_vector_store() for the keyword arguments.
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [None] * len(texts)
+        documents = [
+            Document(id=docstore_id, page_content=text, metadata=metadata)
+            for text, metadata, docstore_id in zip(texts, metadatas, ids)
+        ]
+        return create_sharded_vector_store(documents, embedding, **kwargs)
+
+
+def _copy_shard(shard: FAISS) -> FAISS:
+    """Copy a shard into memory, so the copy can be changed while searches read the original."""
+    from live_index import copy_vector_store
+
+    return copy_vector_store(shard)
+
+
+def build_sharded_store(
+    documents: List[Document],
+    vectors: np.ndarray,
+    embeddings: Embeddings,
+    num_shards: int,
+    partition_by: str = DEFAULT_PARTITION,
+    index_config: Optional[IndexConfig] = None,
+    processes: Optional[int] = None,
+    metric: Optional[int] = None,
+    normalize_L2: bool = False,
+    relevance_score_fn: Optional[Callable[[float], float]] = None,
+    distance_strategy: DistanceStrategy = DistanceStrategy.EUCLIDEAN_DISTANCE,
+    search_threads: Optional[int] = None,
+) -> ShardedVectorStore:
+    """
+    Partition embedded chunks into shards and build the index of each shard.
+
+    The index type is chosen for the whole corpus, so every shard is of
+    the type a single index of the same chunks would be.
+    """
+    if index_config is None:
+        index_config = IndexConfig()
+    index_type = resolve_index_type(index_config, len(documents), vectors.shape[1])
+
+    positions_by_shard: List[List[int]] = [[] for _ in range(num_shards)]
+    for position, document in enumerate(documents):
+        positions_by_shard[get_shard_position(document, num_shards, partition_by)].append(position)
+
+    with stage("index", chunks=len(documents), shards=num_shards):
+        indexes = build_shard_indexes(
+            [vectors[positions] for positions in positions_by_shard], vectors.shape[1], index_type, metric, processes
+        )
+    shards = [
+        make_shard(
+            [documents[position] for position in positions],
+            index,
+            embeddings,
+            normalize_L2,
+            relevance_score_fn,
+            distance_strategy,
+        )
+        for positions, index in zip(positions_by_shard, indexes)
+    ]
+    return ShardedVectorStore(shards, partition_by, search_threads)
+
+
+def create_sharded_vector_store(
+    documents: List[Document],
+    embeddings: Optional[Embeddings] = None,
+    num_shards: int = DEFAULT_NUM_SHARDS,
+    partition_by: str = DEFAULT_PARTITION,
+    embedding_cache: Optional[ChunkEmbeddingCache] = None,
+    index_config: Optional[IndexConfig] = None,
+    processes: Optional[int] = None,
+    search_threads: Optional[int] = None,
+) -> ShardedVectorStore:
+    """
+    Create a sharded vector store from documents.
+
+    The chunks are embedded once in this process, with the shared model
+    that already uses every core, and the shard indexes are then built in
+    parallel processes.
+
+    Args:
+        documents: List of documents to index
+        embeddings: Optional embeddings to use, the shared model if not provided
+        num_shards: Number of shards
+        partition_by: BY_SOURCE to keep the chunks of a site in one shard, BY_HASH for shards of even size
+        embedding_cache: Optional cache of chunk embeddings, so only new text is embedded
+        index_config: Optional type and memory budget of the index, chosen for the whole corpus
+        processes: Maximum number of processes building indexes, the number of CPUs by default
+        search_threads: Number of shards searched at the same time, up to the number of CPUs by default
+
+    Returns:
+        The sharded vector store
+    """
+    print(f"Creating sharded vector store with {num_shards} shards from document chunks...")
+
+    if embeddings is None:
+        from document_processor import get_embeddings
+
+        embeddings = get_embeddings()
+
+    texts = [document.page_content for document in documents]
+    with stage("embed", chunks=len(documents)):
+        if embedding_cache is None:
+            vectors = embeddings.embed_documents(texts)
+        else:
+            vectors = embedding_cache.embed_documents(texts, embeddings)
+
+    sharded_store = build_sharded_store(
+        documents,
+        np.array(vectors, dtype=np.float32),
+        embeddings,
+        num_shards,
+        partition_by,
+        index_config,
+        processes,
+        search_threads=search_threads,
+    )
+    print(f"Sharded vector store created with {len(documents)} document chunks.")
+    return sharded_store
+
+
+def shard_vector_store(
+    vector_store: FAISS,
+    num_shards: int = DEFAULT_NUM_SHARDS,
+    partition_by: str = DEFAULT_PARTITION,
+    index_config: Optional[IndexConfig] = None,
+    processes: Optional[int] = None,
+    search_threads: Optional[int] = None,
+) -> ShardedVectorStore:
+    """
+    Split a FAISS vector store into shards, without embedding its chunks again.
+
+    The vectors are read back from the index, so an index that stores them
+    compressed (float16 or product quantized) passes its approximations on.
+
+    Args:
+        vector_store: The vector store to split, in memory or opened from a disk index
+        num_shards: Number of shards
+        partition_by: BY_SOURCE or BY_HASH
+        index_config: Optional type and memory budget of the index, chosen for the whole corpus
+        processes: Maximum number of processes building indexes, the number of CPUs by default
+        search_threads: Number of shards searched at the same time, up to the number of CPUs by default
+
+    Returns:
+        The sharded vector store, with the same chunks, docstore ids and search settings
+    """
+    positions = sorted(vector_store.index_to_docstore_id)
+    documents = []
+    for position in positions:
+        docstore_id = vector_store.index_to_docstore_id[position]
+        document = vector_store.docstore.search(docstore_id)
+        documents.append(Document(id=docstore_id, page_content=document.page_content, metadata=dict(document.metadata)))
+
+    return build_sharded_store(
+        documents,
+        reconstruct_vectors(vector_store.index)[positions],
+        vector_store.embeddings,
+        num_shards,
+        partition_by,
+        index_config,
+        processes,
+        vector_store.index.metric_type,
+        vector_store._normalize_L2,
+        vector_store.override_relevance_score_fn,
+        vector_store.distance_strategy,
+        search_threads,
+    )
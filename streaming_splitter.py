@@ -0,0 +1,291 @@
+"""
+Streaming text splitter module for the RAG application.
+Splits text into the same chunks as LangChain's RecursiveCharacterTextSplitter
+with its default separators, but reads the text incrementally and yields
+each chunk as soon as it is complete, with its exact start offset.
+"""
+
+import copy
+import itertools
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+# Separators tried in order, as for RecursiveCharacterTextSplitter
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+def choose_separator(text: str, separators: List[str]) -> Tuple[str, List[str]]:
+    """
+    Choose the first separator found in a text.
+
+    Args:
+        text: The text to split
+        separators: The separators, in order of preference
+
+    Returns:
+        The separator and the separators left for pieces that are still too long
+    """
+    for position, separator in enumerate(separators):
+        if separator == "":
+            return separator, []
+        if separator in text:
+            return separator, separators[position + 1:]
+    return separators[-1], []
+
+
+def split_on_separator(text: str, separator: str) -> List[str]:
+    """
+    Cut a text before every occurrence of a separator, keeping the separator at the start of each piece.
+
+    Args:
+        text: The text to split
+        separator: The separator, "" to split into characters
+
+    Returns:
+        The non-empty pieces, which joined give the text back
+    """
+    if separator == "":
+        return list(text)
+    parts = text.split(separator)
+    pieces = [parts[0]] if parts[0] else []
+    pieces.extend(separator + part for part in parts[1:])
+    return pieces
+
+
+def iter_pieces(blocks: Iterable[str], separator: str) -> Iterator[str]:
+    """
+    Cut a stream of text blocks before every occurrence of a separator.
+
+    Only the text since the last occurrence is held, so memory is bounded
+    by the longest piece rather than by the whole text. An occurrence
+    spread over two blocks is found like any other.
+
+    Args:
+        blocks: The text, in blocks of any size
+        separator: The separator, "" to split into characters
+
+    Returns:
+        An iterator over the non-empty pieces, as split_on_separator() gives them
+    """
+    if separator == "":
+        for block in blocks:
+            yield from block
+        return
+
+    buffer = ""
+    piece_start = 0
+    search_from = 0
+    for block in blocks:
+        if not block:
+            continue
+        buffer = buffer[piece_start:] + block
+        search_from -= piece_start
+        piece_start = 0
+        while True:
+            position = buffer.find(separator, search_from)
+            if position == -1:
+                # Occurrences can start no earlier than the last separator-length characters
+                search_from = max(search_from, len(buffer) - len(separator) + 1)
+                break
+            if position > piece_start:
+                yield buffer[piece_start:position]
+            piece_start = position
+            search_from = position + len(separator)
+    if piece_start < len(buffer):
+        yield buffer[piece_start:]
+
+
+class StreamingTextSplitter:
+    """
+    A recursive text splitter that yields its chunks as it reads the text.
+
+    The text is cut before each occurrence of the first separator found
+    in it, and the pieces are merged into chunks of up to chunk_size, with
+    up to chunk_overlap of the end of a chunk repeated at the start of the
+    next. Pieces that are too long on their own are split again with the
+    next separators. This is the algorithm of RecursiveCharacterTextSplitter
+    with keep_separator and strip_whitespace, so with the same settings the
+    chunks are the same, but:
+
+    - pieces are cut from the text as they are needed, and only the pieces
+      of the chunk being built are held, instead of every piece of the text
+    - chunks are yielded one at a time, so a caller can embed or queue them
+      while the rest of the page is still being split
+    - start offsets are counted while splitting instead of searching for
+      each chunk in the text, so a chunk repeated in the text gets its own offset
+    - the chunk size can be measured with any length function, such as a token count
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        length_function: Callable[[str], int] = len,
+        separators: Optional[List[str]] = None,
+        add_start_index: bool = True,
+    ):
+        """
+        Initialize the splitter.
+
+        Args:
+            chunk_size: Maximum size of a chunk, measured with length_function
+            chunk_overlap: Maximum size of the text repeated from the previous chunk
+            length_function: Function measuring a text, the number of characters by default
+            separators: Separators tried in order, DEFAULT_SEPARATORS if not provided
+            add_start_index: Whether to add the offset of each chunk in its document to its metadata
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"The chunk overlap ({chunk_overlap}) is larger than the chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self.add_start_index = add_start_index
+
+    def iter_chunks(self, text: Union[str, Iterable[str]]) -> Iterator[Tuple[str, int]]:
+        """
+        Split a text into chunks.
+
+        Args:
+            text: The text, or an iterable of consecutive blocks of it, such as a file read in blocks
+
+        Returns:
+            An iterator over the chunks and their start offsets in the text
+        """
+        if isinstance(text, str):
+            separator, next_separators = choose_separator(text, self.separators)
+            pieces: Iterable[str] = iter_pieces([text], separator)
+        else:
+            separator, next_separators, blocks = self._choose_stream_separator(iter(text))
+            pieces = iter_pieces(blocks, separator)
+        return self._merge_pieces(pieces, next_separators, 0)
+
+    def _choose_stream_separator(self, blocks: Iterator[str]) -> Tuple[str, List[str], Iterable[str]]:
+        """
+        Choose the separator of a stream of blocks, reading as few blocks as possible.
+
+        Blocks are read until the first separator is found. If it is not in
+        the text at all, the whole text is read to choose the next one.
+        """
+        first_separator = self.separators[0]
+        if first_separator == "":
+            return first_separator, [], blocks
+
+        read_blocks = []
+        tail = ""
+        for block in blocks:
+            read_blocks.append(block)
+            boundary_text = tail + block
+            if first_separator in boundary_text:
+                return first_separator, self.separators[1:], itertools.chain(read_blocks, blocks)
+            # Keep the end of the text read so far, where an occurrence could start
+            tail = boundary_text[max(0, len(boundary_text) - len(first_separator) + 1):]
+
+        text = "".join(read_blocks)
+        separator, next_separators = choose_separator(text, self.separators)
+        return separator, next_separators, [text]
+
+    def _merge_pieces(self, pieces: Iterable[str], next_separators: List[str], offset: int) -> Iterator[Tuple[str, int]]:
+        """
+        Merge consecutive pieces into chunks, splitting pieces that are too long with the next separators.
+
+        Args:
+            pieces: The consecutive pieces of a text
+            next_separators: The separators used to split pieces of chunk_size or more
+            offset: The offset of the first piece in the document
+        """
+        window: Deque[str] = deque()
+        window_lengths: Deque[int] = deque()
+        window_start = offset
+        total = 0
+        position = offset
+
+        for piece in pieces:
+            length = self.length_function(piece)
+            if length < self.chunk_size:
+                if total + length > self.chunk_size and window:
+                    chunk = self._join(window, window_start)
+                    if chunk is not None:
+                        yield chunk
+                    # Keep the end of the chunk as the overlap of the next one
+                    while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                        total -= window_lengths.popleft()
+                        window_start += len(window.popleft())
+                if not window:
+                    window_start = position
+                window.append(piece)
+                window_lengths.append(length)
+                total += length
+            else:
+                # Pieces before a long piece are merged on their own, without overlap into it
+                if window:
+                    chunk = self._join(window, window_start)
+                    if chunk is not None:
+                        yield chunk
+                    window.clear()
+                    window_lengths.clear()
+                    total = 0
+                if not next_separators:
+                    yield piece, position
+                else:
+                    separator, remaining_separators = choose_separator(piece, next_separators)
+                    yield from self._merge_pieces(split_on_separator(piece, separator), remaining_separators, position)
+            position += len(piece)
+
+        if window:
+            chunk = self._join(window, window_start)
+            if chunk is not None:
+                yield chunk
+
+    def _join(self, window: Deque[str], window_start: int) -> Optional[Tuple[str, int]]:
+        """Join the pieces of a chunk without its surrounding whitespace, None if nothing is left."""
+        text = "".join(window)
+        stripped_start = text.lstrip()
+        chunk = stripped_start.rstrip()
+        if not chunk:
+            return None
+        return chunk, window_start + len(text) - len(stripped_start)
+
+    def split_text(self, text: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Split a text into chunks.
+
+        Args:
+            text: The text, or an iterable of consecutive blocks of it
+
+        Returns:
+            The chunks
+        """
+        return [chunk for chunk, _ in self.iter_chunks(text)]
+
+    def iter_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Split documents into chunks, yielding each chunk as soon as it is complete.
+
+        Args:
+            documents: The documents to split
+
+        Returns:
+            An iterator over the chunks, with a copy of the metadata of their document
+            and, with add_start_index, their "start_index" in it
+        """
+        for document in documents:
+            for chunk, start_index in self.iter_chunks(document.page_content):
+                metadata = copy.deepcopy(document.metadata)
+                if self.add_start_index:
+                    metadata["start_index"] = start_index
+                yield Document(page_content=chunk, metadata=metadata)
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Split documents into chunks.
+
+        Args:
+            documents: The documents to split
+
+        Returns:
+            The chunks, see iter_documents()
+        """
+        return list(self.iter_documents(documents))
@@ -0,0 +1,105 @@
+"""
+A small local HTTP server used by tests instead of the network.
+"""
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class LocalWebServer:
+    """
+    Serves a dict of HTML pages on localhost.
+
+    Pages are served with an ETag and answer conditional requests with
+    304 Not Modified, and redirected paths answer 301 with their target.
+    The server counts requests, downloaded bodies and the highest number of
+    requests handled at the same time.
+    """
+
+    def __init__(self, pages: Dict[str, str], delay_seconds: float = 0.0, redirects: Optional[Dict[str, str]] = None):
+        self.pages = dict(pages)
+        self.redirects = dict(redirects or {})
+        self.delay_seconds = delay_seconds
+        self.request_count = 0
+        self.body_count = 0
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.request_paths = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "LocalWebServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, path: str) -> str:
+        """Return the absolute URL of a path on the server."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{path}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.request_count += 1
+                    server.request_paths.append(self.path)
+                    server.active_requests += 1
+                    server.max_active_requests = max(server.max_active_requests, server.active_requests)
+                try:
+                    if server.delay_seconds:
+                        time.sleep(server.delay_seconds)
+                    self._respond()
+                finally:
+                    with server._lock:
+                        server.active_requests -= 1
+
+            def _respond(self):
+                if self.path in server.redirects:
+                    self.send_response(301)
+                    self.send_header("Location", server.redirects[self.path])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                html = server.pages.get(self.path)
+                if html is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body = html.encode("utf-8")
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                with server._lock:
+                    server.body_count += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
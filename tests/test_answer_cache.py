@@ -0,0 +1,126 @@
+"""
+Unit tests for the answer_cache module.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from answer_cache import SIMILARITY_THRESHOLD_ENV_VAR, SemanticAnswerCache, _read_similarity_threshold, get_index_version
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAnswerCache(unittest.TestCase):
+    """Test cases for the answer cache module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.clock = FakeClock()
+        self.cache = SemanticAnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=3, clock=self.clock)
+
+    def test_similar_question_hits(self):
+        """Test that the same or a similar question returns the stored answer."""
+        context = [Document(page_content="RAG stands for Retrieval Augmented Generation.")]
+        self.cache.store("v1", "What is RAG?", [1.0, 0.0, 0.0], "An answer", context)
+
+        # Same text with other case and spacing, without an embedding
+        self.assertEqual(self.cache.lookup("v1", "  what is   RAG? ").answer, "An answer")
+        # A paraphrase with a close embedding
+        cached_answer = self.cache.lookup("v1", "Explain RAG", [0.95, 0.1, 0.0])
+        self.assertEqual(cached_answer.answer, "An answer")
+        self.assertEqual(cached_answer.context, context)
+        # A different question
+        self.assertIsNone(self.cache.lookup("v1", "Who wrote this?", [0.0, 1.0, 0.0]))
+        # The same question about another index
+        self.assertIsNone(self.cache.lookup("v2", "What is RAG?", [1.0, 0.0, 0.0]))
+
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_entries_expire(self):
+        """Test that answers are not returned after their time to live."""
+        self.cache.store("v1", "What is RAG?", [1.0, 0.0], "An answer")
+        self.clock.now = 59
+        self.assertIsNotNone(self.cache.lookup("v1", "What is RAG?", [1.0, 0.0]))
+
+        self.clock.now = 61
+        self.assertIsNone(self.cache.lookup("v1", "What is RAG?", [1.0, 0.0]))
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_expired_entry_does_not_shadow_fresh_similar_entry(self):
+        """Test that a fresh similar answer is returned when the most similar one has expired."""
+        self.cache.ttl_seconds = 10
+        self.cache.store("v1", "What is RAG?", [1.0, 0.0], "Old answer")
+        self.clock.now = 8
+        self.cache.store("v1", "What's RAG?", [0.99, 0.01], "Fresh answer")
+
+        self.clock.now = 12
+        cached_answer = self.cache.lookup("v1", "Explain RAG", [1.0, 0.0])
+        self.assertIsNotNone(cached_answer)
+        self.assertEqual(cached_answer.answer, "Fresh answer")
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_similarity_threshold_from_environment(self):
+        """Test that the threshold environment variable is validated."""
+        with mock.patch.dict(os.environ, {SIMILARITY_THRESHOLD_ENV_VAR: "0.8"}):
+            self.assertEqual(_read_similarity_threshold(), 0.8)
+        with mock.patch.dict(os.environ, {SIMILARITY_THRESHOLD_ENV_VAR: "high"}):
+            with self.assertRaisesRegex(ValueError, SIMILARITY_THRESHOLD_ENV_VAR):
+                _read_similarity_threshold()
+        with mock.patch.dict(os.environ, {SIMILARITY_THRESHOLD_ENV_VAR: "95"}):
+            with self.assertRaisesRegex(ValueError, "between -1 and 1"):
+                _read_similarity_threshold()
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test that the least recently used answer is evicted beyond the maximum size."""
+        self.cache.store("v1", "First", [1.0, 0.0, 0.0], "1")
+        self.cache.store("v1", "Second", [0.0, 1.0, 0.0], "2")
+        self.cache.store("v1", "Third", [0.0, 0.0, 1.0], "3")
+        self.cache.lookup("v1", "First")
+        self.cache.store("v1", "Fourth", [1.0, 1.0, 0.0], "4")
+
+        self.assertIsNotNone(self.cache.lookup("v1", "First"))
+        self.assertIsNone(self.cache.lookup("v1", "Second"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_invalidate_index_version(self):
+        """Test that invalidating a version removes only its answers."""
+        self.cache.store("v1", "What is RAG?", [1.0, 0.0], "Old answer")
+        self.cache.store("v2", "What is RAG?", [1.0, 0.0], "Other answer")
+
+        self.assertEqual(self.cache.invalidate("v1"), 1)
+        self.assertIsNone(self.cache.lookup("v1", "What is RAG?", [1.0, 0.0]))
+        self.assertEqual(self.cache.lookup("v2", "What is RAG?", [1.0, 0.0]).answer, "Other answer")
+
+    def test_index_version_follows_content(self):
+        """Test that the index version changes when chunks are added or deleted."""
+        embeddings = DeterministicFakeEmbedding(size=16)
+        vector_store = FAISS.from_texts(["First chunk", "Second chunk"], embeddings)
+        version = get_index_version(vector_store)
+
+        self.assertEqual(get_index_version(vector_store), version)
+        ids = vector_store.add_texts(["Third chunk"])
+        added_version = get_index_version(vector_store)
+        self.assertNotEqual(added_version, version)
+
+        vector_store.delete(ids)
+        self.assertNotEqual(get_index_version(vector_store), added_version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Unit tests for the batch_query module.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_community.vectorstores import FAISS
+
+from batch_query import arun_batch, is_retryable_error, read_questions_file, run_batch_file
+from rag_engine import aquery_rag_chain, create_rag_chain
+
+
+class RateLimitError(Exception):
+    """An error shaped like a rate limit response of the Anthropic client."""
+
+    status_code = 429
+
+
+class SlowChatModel(BaseChatModel):
+    """A chat model that answers after a delay and tracks how many calls overlap."""
+
+    delay_seconds: float = 0.05
+    rate_limited_calls: int = 0
+    calls: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        raise NotImplementedError("Only the async API is used by the batch runner")
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> ChatResult:
+        self.calls += 1
+        if self.calls <= self.rate_limited_calls:
+            raise RateLimitError("rate limited")
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay_seconds)
+        self.in_flight -= 1
+        question = messages[0].content.split("Question: ")[1].split(" \n")[0]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"Answer to {question}"))])
+
+
+class TestBatchQuery(unittest.TestCase):
+    """Test cases for the batch query module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.vector_store = FAISS.from_texts(
+            ["RAG stands for Retrieval Augmented Generation.", "FAISS is a vector index."],
+            DeterministicFakeEmbedding(size=16),
+            metadatas=[{"source": "https://example.com/rag"}, {"source": "https://example.com/faiss"}],
+        )
+        self.temporary_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        shutil.rmtree(self.temporary_dir, ignore_errors=True)
+
+    def test_aquery_rag_chain(self):
+        """Test that a question can be answered asynchronously."""
+        chain = create_rag_chain(self.vector_store, llm=SlowChatModel(delay_seconds=0))
+
+        self.assertEqual(asyncio.run(aquery_rag_chain(chain, "What is RAG?")), "Answer to What is RAG?")
+
+    def test_questions_run_concurrently(self):
+        """Test that the batch answers up to `concurrency` questions at the same time."""
+        llm = SlowChatModel(delay_seconds=0.1)
+        chain = create_rag_chain(self.vector_store, llm=llm)
+        questions = [{"id": number, "question": f"Question {number}?"} for number in range(20)]
+        results = []
+
+        start_time = time.perf_counter()
+        stats = asyncio.run(arun_batch(chain, questions, results.append, concurrency=10))
+        elapsed = time.perf_counter() - start_time
+
+        self.assertEqual(llm.max_in_flight, 10)
+        # One question at a time would take 2 seconds
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(stats["answered"], 20)
+        self.assertEqual(sorted(result["id"] for result in results), list(range(20)))
+        for result in results:
+            self.assertEqual(result["answer"], f"Answer to Question {result['id']}?")
+            self.assertEqual(len(result["sources"]), 2)
+
+    def test_rate_limited_questions_are_retried(self):
+        """Test that rate-limited attempts are retried and other errors are reported."""
+        llm = SlowChatModel(delay_seconds=0, rate_limited_calls=3)
+        chain = create_rag_chain(self.vector_store, llm=llm)
+        results = []
+
+        stats = asyncio.run(arun_batch(
+            chain, [{"id": 1, "question": "What is RAG?"}], results.append, base_backoff_seconds=0.01
+        ))
+
+        self.assertEqual(results[0]["answer"], "Answer to What is RAG?")
+        self.assertEqual(results[0]["attempts"], 4)
+        self.assertEqual(stats["retries"], 3)
+
+        # Giving up after the last attempt
+        llm = SlowChatModel(delay_seconds=0, rate_limited_calls=10)
+        chain = create_rag_chain(self.vector_store, llm=llm)
+        results = []
+        stats = asyncio.run(arun_batch(
+            chain, [{"id": 1, "question": "What is RAG?"}], results.append, max_attempts=2, base_backoff_seconds=0.01
+        ))
+        self.assertEqual(stats["failed"], 1)
+        self.assertIn("rate limited", results[0]["error"])
+
+        self.assertTrue(is_retryable_error(RateLimitError()))
+        self.assertFalse(is_retryable_error(ValueError()))
+
+    def test_questions_are_read_as_workers_make_room(self):
+        """Test that the batch reads only a bounded number of questions ahead of the answers."""
+        chain = create_rag_chain(self.vector_store, llm=SlowChatModel(delay_seconds=0))
+        results = []
+        read_ahead = []
+
+        def questions():
+            for number in range(50):
+                read_ahead.append(number - len(results))
+                yield {"id": number, "question": f"Question {number}?"}
+
+        stats = asyncio.run(arun_batch(chain, questions(), results.append, concurrency=2))
+
+        self.assertEqual(stats["answered"], 50)
+        # Two questions in flight and four queued
+        self.assertLessEqual(max(read_ahead), 6)
+
+    def test_max_attempts_is_validated(self):
+        """Test that fewer than one attempt per question is rejected up front."""
+        chain = create_rag_chain(self.vector_store, llm=SlowChatModel(delay_seconds=0))
+        questions = [{"id": 1, "question": "What is RAG?"}]
+
+        with self.assertRaisesRegex(ValueError, "max_attempts"):
+            asyncio.run(arun_batch(chain, questions, [].append, max_attempts=0))
+        with self.assertRaisesRegex(ValueError, "max_attempts"):
+            run_batch_file(chain, "questions.jsonl", os.path.join(self.temporary_dir, "answers.jsonl"),
+                           max_attempts=0)
+
+    def test_invalid_question_line_is_reported(self):
+        """Test that a line without a question fails the batch after the questions read before it."""
+        questions_path = os.path.join(self.temporary_dir, "questions.jsonl")
+        output_path = os.path.join(self.temporary_dir, "answers.jsonl")
+        with open(questions_path, "w") as questions_file:
+            questions_file.write('"What is RAG?"\n')
+            questions_file.write('{"id": "q2"}\n')
+        chain = create_rag_chain(self.vector_store, llm=SlowChatModel(delay_seconds=0))
+
+        with self.assertRaisesRegex(ValueError, "Line 2"):
+            run_batch_file(chain, questions_path, output_path)
+        with open(output_path) as output_file:
+            self.assertEqual([json.loads(line)["id"] for line in output_file], [1])
+
+    def test_run_batch_file(self):
+        """Test that questions are read from and answers written to JSON Lines files."""
+        questions_path = os.path.join(self.temporary_dir, "questions.jsonl")
+        output_path = os.path.join(self.temporary_dir, "answers.jsonl")
+        with open(questions_path, "w") as questions_file:
+            questions_file.write('{"id": "q1", "question": "What is RAG?", "expected": "Retrieval"}\n')
+            questions_file.write("\n")
+            questions_file.write('"What is FAISS?"\n')
+
+        self.assertEqual([item["id"] for item in read_questions_file(questions_path)], ["q1", 3])
+        chain = create_rag_chain(self.vector_store, llm=SlowChatModel(delay_seconds=0))
+        stats = run_batch_file(chain, questions_path, output_path, concurrency=2)
+
+        with open(output_path) as output_file:
+            results = {result["id"]: result for result in map(json.loads, output_file)}
+        self.assertEqual(stats["answered"], 2)
+        self.assertEqual(results["q1"]["answer"], "Answer to What is RAG?")
+        self.assertEqual(results["q1"]["expected"], "Retrieval")
+        self.assertEqual(results[3]["answer"], "Answer to What is FAISS?")
+
+
+if __name__ == '__main__':
+    unittest.main()
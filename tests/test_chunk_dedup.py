@@ -0,0 +1,120 @@
+"""
+Unit tests for the chunk_dedup module.
+"""
+
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from chunk_dedup import (
+    DUPLICATE_SOURCES_KEY,
+    ChunkDeduplicator,
+    apply_duplicate_sources,
+    choose_lsh_bands,
+    forget_duplicate_sources,
+)
+
+LICENSE_TEXT = (
+    "Licensed under the Apache License, Version 2.0. You may not use this file except in compliance "
+    "with the License. Unless required by applicable law or agreed to in writing, software distributed "
+    "under the License is distributed on an AS IS BASIS, without warranties or conditions of any kind."
+)
+
+
+def make_chunk(text: str, source: str) -> Document:
+    """Build a chunk of a source."""
+    return Document(page_content=text, metadata={"source": source})
+
+
+class TestChunkDedup(unittest.TestCase):
+    """Test cases for the chunk de-duplication module."""
+
+    def test_exact_duplicates_are_dropped(self):
+        """Test that copies differing only in case and whitespace are dropped."""
+        deduplicator = ChunkDeduplicator()
+        chunks = [
+            make_chunk(LICENSE_TEXT, "http://example.com/a"),
+            make_chunk("Page specific text about installing the client.", "http://example.com/a"),
+            make_chunk("  " + LICENSE_TEXT.upper() + "\n", "http://example.com/b"),
+        ]
+
+        kept = deduplicator.filter(chunks)
+
+        self.assertEqual(kept, chunks[:2])
+        self.assertEqual(kept[0].metadata[DUPLICATE_SOURCES_KEY], ["http://example.com/b"])
+        self.assertNotIn(DUPLICATE_SOURCES_KEY, kept[1].metadata)
+        self.assertEqual(deduplicator.stats(), {"kept": 2, "exact_duplicates": 1, "near_duplicates": 0})
+
+    def test_near_duplicates_are_dropped(self):
+        """Test that a chunk with a one-word difference is dropped and a different chunk is kept."""
+        deduplicator = ChunkDeduplicator(threshold=0.8)
+        near_copy = LICENSE_TEXT.replace("Version 2.0", "Version 2.1")
+        different = "The client retries failed requests with exponential backoff and gives up after five attempts."
+
+        kept = deduplicator.filter([
+            make_chunk(LICENSE_TEXT, "http://example.com/a"),
+            make_chunk(near_copy, "http://example.com/b"),
+            make_chunk(different, "http://example.com/b"),
+        ])
+
+        self.assertEqual([chunk.page_content for chunk in kept], [LICENSE_TEXT, different])
+        self.assertEqual(deduplicator.near_duplicates, 1)
+        self.assertEqual(deduplicator.get_duplicate_sources(LICENSE_TEXT), ["http://example.com/b"])
+
+    def test_exact_only_threshold(self):
+        """Test that a threshold of 1.0 keeps near-duplicates."""
+        deduplicator = ChunkDeduplicator(threshold=1.0)
+        near_copy = LICENSE_TEXT.replace("Version 2.0", "Version 2.1")
+
+        kept = deduplicator.filter([make_chunk(LICENSE_TEXT, "a"), make_chunk(near_copy, "b")])
+
+        self.assertEqual(len(kept), 2)
+
+    def test_copies_within_one_source_are_not_recorded(self):
+        """Test that repeated text of a single page is dropped without listing its own source."""
+        deduplicator = ChunkDeduplicator()
+
+        kept = deduplicator.filter([make_chunk(LICENSE_TEXT, "a"), make_chunk(LICENSE_TEXT, "a")])
+
+        self.assertEqual(len(kept), 1)
+        self.assertNotIn(DUPLICATE_SOURCES_KEY, kept[0].metadata)
+
+    def test_registered_chunks_are_not_kept_again(self):
+        """Test that chunks already indexed make later copies duplicates."""
+        deduplicator = ChunkDeduplicator()
+        deduplicator.register([make_chunk(LICENSE_TEXT, "a")])
+
+        kept = deduplicator.filter([make_chunk(LICENSE_TEXT, "b")])
+
+        self.assertEqual(kept, [])
+        self.assertEqual(deduplicator.get_duplicate_sources(LICENSE_TEXT), ["b"])
+
+    def test_duplicate_sources_in_vector_store(self):
+        """Test recording and forgetting duplicate sources on indexed chunks."""
+        deduplicator = ChunkDeduplicator()
+        kept = deduplicator.filter([make_chunk(LICENSE_TEXT, "a")])
+        vector_store = FAISS.from_documents(kept, DeterministicFakeEmbedding(size=16))
+
+        # A copy found after the chunk was indexed
+        deduplicator.filter([make_chunk(LICENSE_TEXT, "b"), make_chunk(LICENSE_TEXT, "c")])
+        self.assertEqual(apply_duplicate_sources(vector_store, deduplicator), 1)
+        document = vector_store.similarity_search(LICENSE_TEXT, k=1)[0]
+        self.assertEqual(document.metadata[DUPLICATE_SOURCES_KEY], ["b", "c"])
+
+        forget_duplicate_sources(vector_store, {"b"})
+        self.assertEqual(document.metadata[DUPLICATE_SOURCES_KEY], ["c"])
+        forget_duplicate_sources(vector_store, {"c"})
+        self.assertNotIn(DUPLICATE_SOURCES_KEY, document.metadata)
+
+    def test_choose_lsh_bands(self):
+        """Test that the LSH bands cover the signature and turn near the threshold."""
+        for threshold in (0.5, 0.8, 0.9):
+            bands, rows = choose_lsh_bands(threshold, 128)
+            self.assertEqual(bands * rows, 128)
+            self.assertLessEqual((1 / bands) ** (1 / rows), threshold)
+
+
+if __name__ == '__main__':
+    unittest.main()
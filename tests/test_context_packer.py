@@ -0,0 +1,89 @@
+"""
+Unit tests for the context_packer module.
+"""
+
+import unittest
+
+from langchain_core.documents import Document
+
+from context_packer import ContextPacker, choose_score_cutoff, estimate_tokens, merge_chunks
+
+
+class TestContextPacker(unittest.TestCase):
+    """Test cases for the context packer module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        # A page split into chunks of 40 characters with an overlap of 10, as split_documents does
+        self.page = (
+            "Retrieval Augmented Generation combines a retriever with a language model. "
+            "The retriever finds passages and the model answers from them."
+        )
+        self.chunks = [
+            Document(page_content=self.page[start:start + 40], metadata={"source": "https://example.com", "start_index": start})
+            for start in range(0, len(self.page), 30)
+        ]
+
+    def test_overlapping_chunks_are_merged(self):
+        """Test that overlapping chunks of one source are merged back into the page text."""
+        scored_documents = [(chunk, 0.9 - i * 0.01) for i, chunk in enumerate(reversed(self.chunks))]
+        passages = merge_chunks(scored_documents)
+
+        self.assertEqual(len(passages), 1)
+        self.assertEqual(passages[0].text, self.page)
+        self.assertEqual(passages[0].chunk_count, len(self.chunks))
+        self.assertEqual(passages[0].score, 0.9)
+        document = passages[0].to_document()
+        self.assertEqual(document.metadata["start_index"], 0)
+        self.assertEqual(document.metadata["end_index"], len(self.page))
+
+    def test_distant_and_mismatched_chunks_are_not_merged(self):
+        """Test that chunks that do not touch, or whose overlap differs, stay apart."""
+        first, _, third = self.chunks[0], self.chunks[1], self.chunks[2]
+        mismatched = Document(page_content="X" * 40, metadata={"source": "https://example.com", "start_index": 30})
+        other_source = Document(page_content=self.chunks[1].page_content,
+                                metadata={"source": "https://other.example.com", "start_index": 30})
+
+        passages = merge_chunks([(first, 0.9), (third, 0.8), (mismatched, 0.7), (other_source, 0.6)])
+
+        self.assertEqual(len(passages), 4)
+        self.assertEqual([passage.score for passage in passages], [0.9, 0.8, 0.7, 0.6])
+
+    def test_score_cutoff_drops_weak_hits(self):
+        """Test that the cutoff keeps the hits before the largest drop in relevance."""
+        self.assertEqual(choose_score_cutoff([0.82, 0.8, 0.45, 0.4]), 0.8)
+        # Without a clear drop only the margin below the best hit applies
+        self.assertAlmostEqual(choose_score_cutoff([0.8, 0.75, 0.7, 0.65]), 0.6)
+        self.assertEqual(choose_score_cutoff([]), 0.0)
+
+    def test_pack_fits_the_token_budget_and_reports_savings(self):
+        """Test that packing merges, drops and truncates to stay within the budget."""
+        packer = ContextPacker(token_budget=20)
+        weak_hit = Document(page_content="Unrelated text about cooking pasta at home.", metadata={"source": "https://food.example.com"})
+        scored_documents = [(chunk, 0.8) for chunk in self.chunks] + [(weak_hit, 0.3)]
+
+        packed, stats = packer.pack(scored_documents)
+
+        self.assertEqual(len(packed), 1)
+        self.assertLessEqual(estimate_tokens(packed[0].page_content), 20)
+        self.assertTrue(self.page.startswith(packed[0].page_content))
+        self.assertEqual(stats["hits"], len(self.chunks) + 1)
+        self.assertEqual(stats["kept_hits"], len(self.chunks))
+        self.assertEqual(stats["tokens_after"], estimate_tokens(packed[0].page_content))
+        self.assertEqual(stats["tokens_saved"], stats["tokens_before"] - stats["tokens_after"])
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    def test_passages_that_do_not_fit_are_dropped(self):
+        """Test that passages after the first are dropped when they exceed the budget."""
+        packer = ContextPacker(token_budget=15, min_score_gap=1.0)
+        first = Document(page_content="a" * 40)
+        second = Document(page_content="b" * 40)
+
+        packed, stats = packer.pack([(first, 0.9), (second, 0.85)])
+
+        self.assertEqual([document.page_content for document in packed], ["a" * 40])
+        self.assertEqual(stats["dropped_passages"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
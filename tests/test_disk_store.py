@@ -0,0 +1,106 @@
+"""
+Unit tests for the disk_store module.
+"""
+
+import shutil
+import tempfile
+import threading
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from disk_store import ReadOnlyFAISS, is_disk_index, load_disk_index, open_disk_index, write_disk_index
+from index_factory import FLAT, HNSW, IVF, IndexConfig, apply_index_config, get_index_type
+
+
+class TestDiskStore(unittest.TestCase):
+    """Test cases for the disk store module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.directory = tempfile.mkdtemp()
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.documents = [
+            Document(
+                page_content=f"Chunk number {i} of the page",
+                metadata={"source": f"https://example.com/{i % 7}", "start_index": i},
+            )
+            for i in range(400)
+        ]
+        self.vector_store = FAISS.from_documents(self.documents, self.embeddings)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_open_matches_in_memory_search(self):
+        """Test that an opened disk index returns the same results as the in-memory store."""
+        for index_type in (FLAT, HNSW, IVF):
+            with self.subTest(index_type=index_type):
+                vector_store = apply_index_config(self.vector_store, IndexConfig(index_type))
+                write_disk_index(vector_store, self.directory)
+                opened_store = open_disk_index(self.directory, self.embeddings)
+
+                self.assertTrue(is_disk_index(self.directory))
+                self.assertIsInstance(opened_store, ReadOnlyFAISS)
+                self.assertEqual(get_index_type(opened_store.index), index_type)
+                self.assertEqual(opened_store.index.ntotal, 400)
+                self.assertEqual(len(opened_store.index_to_docstore_id), 400)
+
+                for query in ("Chunk number 12 of the page", "Chunk number 399 of the page"):
+                    expected = vector_store.similarity_search(query, k=3)
+                    result = opened_store.similarity_search(query, k=3)
+                    self.assertEqual([doc.page_content for doc in result], [doc.page_content for doc in expected])
+                    self.assertEqual([doc.metadata for doc in result], [doc.metadata for doc in expected])
+                opened_store.docstore.close()
+
+    def test_opened_index_is_read_only(self):
+        """Test that writes to an opened disk index are refused."""
+        write_disk_index(self.vector_store, self.directory)
+        opened_store = open_disk_index(self.directory, self.embeddings)
+
+        with self.assertRaises(ValueError):
+            opened_store.add_texts(["New chunk"])
+        with self.assertRaises(ValueError):
+            opened_store.add_documents([Document(page_content="New chunk")])
+        with self.assertRaises(ValueError):
+            opened_store.delete([opened_store.index_to_docstore_id[0]])
+        with self.assertRaises(ValueError):
+            opened_store.save_local(self.directory)
+        self.assertEqual(opened_store.index.ntotal, 400)
+
+    def test_load_is_writable(self):
+        """Test that a loaded disk index holds every chunk in memory and can be updated."""
+        write_disk_index(self.vector_store, self.directory)
+        loaded_store = load_disk_index(self.directory, self.embeddings)
+
+        self.assertNotIsInstance(loaded_store, ReadOnlyFAISS)
+        self.assertEqual(loaded_store.index_to_docstore_id, self.vector_store.index_to_docstore_id)
+        loaded_store.add_texts(["A brand new chunk"], metadatas=[{"source": "https://example.com/new"}])
+
+        result = loaded_store.similarity_search("A brand new chunk", k=1)
+        self.assertEqual(result[0].metadata, {"source": "https://example.com/new"})
+        self.assertEqual(loaded_store.index.ntotal, 401)
+
+    def test_search_from_several_threads(self):
+        """Test that one opened disk index can be searched from several threads."""
+        write_disk_index(apply_index_config(self.vector_store, IndexConfig(HNSW)), self.directory)
+        opened_store = open_disk_index(self.directory, self.embeddings)
+        results = {}
+
+        def search(number):
+            results[number] = opened_store.similarity_search(f"Chunk number {number} of the page", k=1)[0].page_content
+
+        threads = [threading.Thread(target=search, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {number: f"Chunk number {number} of the page" for number in range(8)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,19 @@
 Unit tests for the document_processor module.
 """
 
+import shutil
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 
 from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
 from langchain_core.vectorstores import VectorStore
 
 import document_processor
+from index_cache import IndexCache
+from tests.http_test_server import LocalWebServer
 
 
 class TestDocumentProcessor(unittest.TestCase):
@@ -24,22 +30,28 @@ class TestDocumentProcessor(unittest.TestCase):
         
         # Sample URL for testing
         self.test_url = "https://example.com"
+        
+        # Make sure every test starts without a shared embedding model
+        document_processor.reset_embeddings()
+        self.addCleanup(document_processor.reset_embeddings)
 
-    @patch('document_processor.WebBaseLoader')
-    def test_load_documents_from_url(self, mock_web_loader):
+    def test_load_documents_from_url(self):
         """Test loading documents from a URL."""
-        # Configure the mock
-        mock_loader_instance = MagicMock()
-        mock_loader_instance.load.return_value = self.sample_documents
-        mock_web_loader.return_value = mock_loader_instance
+        pages = {"/": "<html><head><title>Test page</title></head><body><p>Test paragraph</p></body></html>"}
         
-        # Call the function
-        result = document_processor.load_documents_from_url(self.test_url)
+        with LocalWebServer(pages) as server:
+            result = document_processor.load_documents_from_url(server.url("/"))
         
         # Assertions
-        mock_web_loader.assert_called_once()
-        self.assertEqual(result, self.sample_documents)
-        self.assertEqual(len(result), 2)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].page_content, "Test paragraph")
+        self.assertEqual(result[0].metadata, {"source": server.url("/"), "title": "Test page"})
+
+    def test_load_documents_from_url_error(self):
+        """Test that a page that cannot be loaded raises an error."""
+        with LocalWebServer({}) as server:
+            with self.assertRaises(ValueError):
+                document_processor.load_documents_from_url(server.url("/missing"))
 
     def test_split_documents(self):
         """Test splitting documents into chunks."""
@@ -112,9 +124,182 @@ class TestDocumentProcessor(unittest.TestCase):
         # Assertions
         mock_load_documents.assert_called_once_with(self.test_url)
         mock_split_documents.assert_called_once_with(self.sample_documents)
-        mock_create_vector_store.assert_called_once_with(self.sample_documents)
+        mock_create_vector_store.assert_called_once_with(self.sample_documents, embedding_cache=None)
         self.assertEqual(result, mock_vector_store)
 
+    @patch('document_processor.HuggingFaceEmbeddings')
+    def test_get_embeddings_is_shared(self, mock_embeddings):
+        """Test that the embedding model is loaded once and shared across threads."""
+        results = []
+        
+        def load_embeddings():
+            results.append(document_processor.get_embeddings())
+        
+        threads = [threading.Thread(target=load_embeddings) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        mock_embeddings.assert_called_once_with(model_name="all-MiniLM-L6-v2")
+        self.assertEqual(len(results), 8)
+        for embeddings in results:
+            self.assertIs(embeddings, mock_embeddings.return_value)
+
+    @patch('document_processor.create_embeddings')
+    def test_warm_up_embeddings(self, mock_create_embeddings):
+        """Test that warming up loads the model and reports its cost."""
+        fake_embeddings = DeterministicFakeEmbedding(size=16)
+        mock_create_embeddings.return_value = fake_embeddings
+        
+        stats = document_processor.warm_up_embeddings()
+        
+        self.assertIs(document_processor.get_embeddings(), fake_embeddings)
+        self.assertGreaterEqual(stats["load_seconds"], 0.0)
+        self.assertGreaterEqual(stats["warm_up_seconds"], 0.0)
+        self.assertGreater(stats["resident_memory_bytes"], 0)
+        
+        # A second warm up reuses the loaded model
+        document_processor.warm_up_embeddings()
+        mock_create_embeddings.assert_called_once()
+
+    @patch('document_processor.load_documents_from_url')
+    @patch('document_processor.create_embeddings')
+    def test_load_and_process_url_uses_index_cache(self, mock_create_embeddings, mock_load_documents):
+        """Test that an unchanged page is loaded from the index cache instead of re-embedded."""
+        mock_load_documents.return_value = self.sample_documents
+        mock_create_embeddings.return_value = DeterministicFakeEmbedding(size=16)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        index_cache = IndexCache(cache_dir)
+
+        first_store = document_processor.load_and_process_url(self.test_url, index_cache)
+        self.assertEqual(len(index_cache.entries()), 1)
+
+        with patch('document_processor.create_vector_store') as mock_create_vector_store:
+            second_store = document_processor.load_and_process_url(self.test_url, index_cache)
+            mock_create_vector_store.assert_not_called()
+
+        self.assertEqual(second_store.index.ntotal, first_store.index.ntotal)
+
+        # A change in the page content builds a new index
+        mock_load_documents.return_value = [Document(page_content="Changed page", metadata={"source": "test1"})]
+        document_processor.load_and_process_url(self.test_url, index_cache)
+        self.assertEqual(len(index_cache.entries()), 2)
+
+    def test_parse_html_document(self):
+        """Test extracting the text of an HTML page."""
+        html = "<html><head><title>Title</title></head><body><h1>Heading</h1><p>Paragraph text</p></body></html>"
+        
+        document = document_processor.parse_html_document(self.test_url, html)
+        
+        self.assertEqual(document.page_content, "Heading\n\nParagraph text")
+        self.assertEqual(document.metadata, {"source": self.test_url, "title": "Title"})
+
+    @patch('document_processor.create_embeddings')
+    def test_load_and_process_urls_skips_unchanged_pages(self, mock_create_embeddings):
+        """Test that a multi-URL index only downloads and re-embeds changed pages."""
+        mock_create_embeddings.return_value = DeterministicFakeEmbedding(size=16)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        index_cache = IndexCache(cache_dir)
+        pages = {
+            "/a": "<html><body><p>Alpha page content</p></body></html>",
+            "/b": "<html><body><p>Beta page content</p></body></html>",
+            "/c": "<html><body><p>Gamma page content</p></body></html>",
+        }
+        
+        with LocalWebServer(pages) as server:
+            urls = [server.url(path) for path in ["/a", "/b", "/c"]]
+            first_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            self.assertEqual(first_store.index.ntotal, 3)
+            self.assertEqual(server.body_count, 3)
+            
+            # Nothing changed: no page bodies are downloaded again
+            second_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            self.assertEqual(second_store.index.ntotal, 3)
+            self.assertEqual(server.body_count, 3)
+            
+            # One page changed and one page was removed
+            server.pages["/b"] = "<html><body><p>Beta page was rewritten</p></body></html>"
+            del server.pages["/c"]
+            third_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            self.assertEqual(server.body_count, 4)
+        
+        stored_texts = sorted(
+            third_store.docstore.search(docstore_id).page_content.strip()
+            for docstore_id in third_store.index_to_docstore_id.values()
+        )
+        self.assertEqual(stored_texts, ["Alpha page content", "Beta page was rewritten"])
+
+    @patch('document_processor.create_embeddings')
+    def test_page_that_comes_back_after_a_404_is_indexed_again(self, mock_create_embeddings):
+        """Test that a removed page forgets its validators, so an unchanged return is downloaded and indexed."""
+        mock_create_embeddings.return_value = DeterministicFakeEmbedding(size=16)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        index_cache = IndexCache(cache_dir)
+        pages = {
+            "/a": "<html><body><p>Alpha page content</p></body></html>",
+            "/b": "<html><body><p>Beta page content</p></body></html>",
+        }
+        
+        with LocalWebServer(pages) as server:
+            urls = [server.url("/a"), server.url("/b")]
+            document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            
+            del server.pages["/b"]
+            vector_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            self.assertEqual(vector_store.index.ntotal, 1)
+            
+            # The page is back with the same ETag: it must not be answered with a 304
+            server.pages["/b"] = pages["/b"]
+            vector_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            self.assertEqual(server.body_count, 3)
+        
+        stored_texts = sorted(
+            vector_store.docstore.search(docstore_id).page_content.strip()
+            for docstore_id in vector_store.index_to_docstore_id.values()
+        )
+        self.assertEqual(stored_texts, ["Alpha page content", "Beta page content"])
+
+    @patch('document_processor.create_embeddings')
+    def test_load_and_process_urls_drops_duplicate_chunks(self, mock_create_embeddings):
+        """Test that text repeated across pages is indexed once and kept while any page still has it."""
+        mock_create_embeddings.return_value = DeterministicFakeEmbedding(size=16)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        index_cache = IndexCache(cache_dir)
+        shared_text = "Shared license text that appears on every page of the site."
+        pages = {
+            "/a": f"<html><body><p>Alpha page content</p><p>{'Alpha filler. ' * 80}</p><p>{shared_text}</p></body></html>",
+            "/b": f"<html><body><p>Beta page content</p><p>{'Beta filler. ' * 80}</p><p>{shared_text}</p></body></html>",
+        }
+        
+        with LocalWebServer(pages) as server:
+            urls = [server.url("/a"), server.url("/b")]
+            vector_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+            
+            shared_chunks = [
+                document for document in vector_store.docstore._dict.values()
+                if document.page_content == shared_text
+            ]
+            self.assertEqual(len(shared_chunks), 1)
+            other_url = ({server.url("/a"), server.url("/b")} - {shared_chunks[0].metadata["source"]}).pop()
+            self.assertEqual(shared_chunks[0].metadata["duplicate_sources"], [other_url])
+            
+            # The page that held the kept copy is gone, the other page still has the text
+            del server.pages[shared_chunks[0].metadata["source"].split(server.url(""))[1]]
+            vector_store = document_processor.load_and_process_urls(urls, index_cache, requests_per_second_per_host=0)
+        
+        shared_chunks = [
+            document for document in vector_store.docstore._dict.values()
+            if document.page_content == shared_text
+        ]
+        self.assertEqual(len(shared_chunks), 1)
+        self.assertEqual(shared_chunks[0].metadata["source"], other_url)
+        self.assertNotIn("duplicate_sources", shared_chunks[0].metadata)
+
 
 if __name__ == '__main__':
     unittest.main()
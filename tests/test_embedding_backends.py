@@ -0,0 +1,125 @@
+"""
+Unit tests for the embedding_backends module.
+"""
+
+import importlib.util
+import unittest
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import document_processor
+from embedding_backends import (
+    ONNX_INT8,
+    OnnxEmbeddings,
+    create_backend_embeddings,
+    create_onnx_int8_embeddings,
+    get_embedding_backend_names,
+    mean_pool_and_normalize,
+    register_embedding_backend,
+)
+from embedding_cache import get_embedding_model_name
+
+
+class WordTokenizer:
+    """A tokenizer giving every word the id of its length, padding each batch to its longest text."""
+
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def encode_batch(self, texts: List[str]) -> List[SimpleNamespace]:
+        self.batches.append(list(texts))
+        token_lists = [[len(word) for word in text.split()] for text in texts]
+        length = max(len(tokens) for tokens in token_lists)
+        return [
+            SimpleNamespace(
+                ids=tokens + [0] * (length - len(tokens)),
+                attention_mask=[1] * len(tokens) + [0] * (length - len(tokens)),
+                type_ids=[0] * length,
+            )
+            for tokens in token_lists
+        ]
+
+
+class IdSession:
+    """An inference session whose token embedding is (id, 1), taking no token type ids."""
+
+    def __init__(self):
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feeds):
+        self.feeds.append(feeds)
+        ids = feeds["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=2)]
+
+
+class TestEmbeddingBackends(unittest.TestCase):
+    """Test cases for the embedding backends module."""
+
+    def test_mean_pooling_ignores_padding_and_normalizes(self):
+        """Test that padding tokens do not count and the sentence vectors have unit length."""
+        token_embeddings = np.array([[[3.0, 0.0], [5.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+        attention_mask = np.array([[1, 1, 0]])
+
+        pooled = mean_pool_and_normalize(token_embeddings, attention_mask)
+
+        np.testing.assert_allclose(pooled, [[1.0, 0.0]])
+
+    def test_onnx_embeddings_keep_the_order_of_length_sorted_batches(self):
+        """Test that texts are batched by length and the vectors come back in input order."""
+        tokenizer = WordTokenizer()
+        session = IdSession()
+        embeddings = OnnxEmbeddings(session, tokenizer, "test-model@onnx-int8", batch_size=2)
+        texts = ["a bb ccc dddd", "eeeee", "ff gg", "hhhhhhhh i"]
+
+        vectors = embeddings.embed_documents(texts)
+
+        self.assertEqual(tokenizer.batches, [["eeeee", "ff gg"], ["hhhhhhhh i", "a bb ccc dddd"]])
+        # Each vector is the normalized (mean word length, 1) of its own text
+        for text, vector in zip(texts, vectors):
+            expected = np.array([np.mean([len(word) for word in text.split()]), 1.0])
+            np.testing.assert_allclose(vector, expected / np.linalg.norm(expected), rtol=1e-6)
+        # Only the inputs the model declares are fed
+        self.assertEqual(set(session.feeds[0]), {"input_ids", "attention_mask"})
+        self.assertEqual(embeddings.embed_query("eeeee"), vectors[1])
+        self.assertEqual(get_embedding_model_name(embeddings), "test-model@onnx-int8")
+
+    def test_backends_are_selected_by_name(self):
+        """Test that registered backends are created by name and unknown names are refused."""
+        register_embedding_backend("fake", lambda model_name: DeterministicFakeEmbedding(size=8))
+
+        self.assertIn("fake", get_embedding_backend_names())
+        self.assertIsInstance(create_backend_embeddings("all-MiniLM-L6-v2", "fake"), DeterministicFakeEmbedding)
+        with self.assertRaises(ValueError):
+            create_backend_embeddings("all-MiniLM-L6-v2", "missing")
+
+    def test_shared_embeddings_use_the_selected_backend(self):
+        """Test that selecting another backend reloads the shared model with it."""
+        register_embedding_backend("fake", lambda model_name: DeterministicFakeEmbedding(size=8))
+        previous_backend = document_processor.get_embedding_backend()
+        self.addCleanup(document_processor.set_embedding_backend, previous_backend)
+
+        document_processor.set_embedding_backend("fake")
+
+        self.assertEqual(document_processor.get_embedding_backend(), "fake")
+        self.assertIsInstance(document_processor.get_embeddings(), DeterministicFakeEmbedding)
+        with self.assertRaises(ValueError):
+            document_processor.set_embedding_backend("missing")
+
+    @unittest.skipIf(importlib.util.find_spec("onnxruntime") is not None, "onnxruntime is installed")
+    def test_onnx_backend_names_its_missing_packages(self):
+        """Test that the ONNX backend explains which packages to install when they are missing."""
+        with self.assertRaises(ImportError) as context:
+            create_onnx_int8_embeddings("all-MiniLM-L6-v2")
+
+        self.assertIn("pip install onnxruntime", str(context.exception))
+        self.assertIn(ONNX_INT8, str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
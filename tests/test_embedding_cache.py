@@ -0,0 +1,160 @@
+"""
+Unit tests for the embedding_cache module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_community.vectorstores import FAISS
+
+from embedding_cache import VECTORS_FILE, ChunkEmbeddingCache, _ModelEmbeddingStore, make_chunk_key, update_vector_store
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that count how many texts were embedded."""
+
+    def __init__(self, model_name: str = "counting-model"):
+        self.model_name = model_name
+        self.embedded_texts: List[str] = []
+        self._embeddings = DeterministicFakeEmbedding(size=16)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded_texts.extend(texts)
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embeddings.embed_query(text)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test cases for the embedding cache module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.embeddings = CountingEmbeddings()
+
+    def test_chunk_key_includes_model_name(self):
+        """Test that the chunk key depends on the model and the text."""
+        self.assertEqual(make_chunk_key("model", "text"), make_chunk_key("model", "text"))
+        self.assertNotEqual(make_chunk_key("model", "text"), make_chunk_key("other-model", "text"))
+        self.assertNotEqual(make_chunk_key("model", "text"), make_chunk_key("model", "other text"))
+
+    def test_embeds_only_missing_texts(self):
+        """Test that cached texts are not embedded again."""
+        cache = ChunkEmbeddingCache(self.cache_dir)
+
+        first_vectors = cache.embed_documents(["alpha", "beta"], self.embeddings)
+        second_vectors = cache.embed_documents(["beta", "gamma", "alpha"], self.embeddings)
+
+        self.assertEqual(self.embeddings.embedded_texts, ["alpha", "beta", "gamma"])
+        self.assertEqual(second_vectors[0], first_vectors[1])
+        self.assertEqual(second_vectors[2], first_vectors[0])
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 3)
+
+    def test_cache_persists_on_disk(self):
+        """Test that embeddings are reused by a new cache instance."""
+        first_cache = ChunkEmbeddingCache(self.cache_dir)
+        expected_vectors = first_cache.embed_documents(["alpha", "beta"], self.embeddings)
+
+        second_cache = ChunkEmbeddingCache(self.cache_dir)
+        vectors = second_cache.embed_documents(["alpha", "beta"], self.embeddings)
+
+        self.assertEqual(self.embeddings.embedded_texts, ["alpha", "beta"])
+        for vector, expected_vector in zip(vectors, expected_vectors):
+            self.assertEqual(len(vector), 16)
+            for value, expected_value in zip(vector, expected_vector):
+                self.assertAlmostEqual(value, expected_value, places=6)
+
+    def test_orphan_vectors_of_a_crashed_append_are_dropped(self):
+        """Test that a vector written without its key is not given to the next key."""
+        store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+        store.put_many(["a"], np.array([[1.0, 1.0]]))
+        # A crash between the vectors and keys appends leaves a vector without a key
+        with open(os.path.join(self.cache_dir, VECTORS_FILE), "ab") as vectors_file:
+            vectors_file.write(np.array([[9.0, 9.0]], dtype=np.float32).tobytes())
+
+        reopened_store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+        reopened_store.put_many(["b"], np.array([[2.0, 2.0]]))
+
+        self.assertEqual(reopened_store.get("b").tolist(), [2.0, 2.0])
+        reloaded_store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+        self.assertEqual(reloaded_store.get("a").tolist(), [1.0, 1.0])
+        self.assertEqual(reloaded_store.get("b").tolist(), [2.0, 2.0])
+
+    def test_stores_sharing_a_directory_keep_rows_aligned(self):
+        """Test that two writers appending to the same store, as two processes would, keep every key on its vector."""
+        first_store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+        second_store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+
+        first_store.put_many(["a"], np.array([[1.0, 1.0]]))
+        second_store.put_many(["b"], np.array([[2.0, 2.0]]))
+        first_store.put_many(["c", "b"], np.array([[3.0, 3.0], [2.0, 2.0]]))
+
+        reloaded_store = _ModelEmbeddingStore(self.cache_dir, "test-model")
+        self.assertEqual(len(reloaded_store.rows), 3)
+        for store in (first_store, reloaded_store):
+            self.assertEqual(store.get("a").tolist(), [1.0, 1.0])
+            self.assertEqual(store.get("b").tolist(), [2.0, 2.0])
+            self.assertEqual(store.get("c").tolist(), [3.0, 3.0])
+
+    def test_models_are_cached_separately(self):
+        """Test that the same text is embedded once per model."""
+        cache = ChunkEmbeddingCache(self.cache_dir)
+        other_embeddings = CountingEmbeddings(model_name="other-model")
+
+        cache.embed_documents(["alpha"], self.embeddings)
+        cache.embed_documents(["alpha"], other_embeddings)
+
+        self.assertEqual(self.embeddings.embedded_texts, ["alpha"])
+        self.assertEqual(other_embeddings.embedded_texts, ["alpha"])
+
+    def test_update_vector_store_patches_changed_chunks(self):
+        """Test that only new chunks are embedded and removed chunks are deleted."""
+        cache = ChunkEmbeddingCache(self.cache_dir)
+        page_chunks = [
+            Document(page_content="first paragraph", metadata={"source": "page", "start_index": 0}),
+            Document(page_content="second paragraph", metadata={"source": "page", "start_index": 16}),
+            Document(page_content="third paragraph", metadata={"source": "page", "start_index": 33}),
+        ]
+        other_chunks = [Document(page_content="other site", metadata={"source": "other", "start_index": 0})]
+        texts = [document.page_content for document in page_chunks + other_chunks]
+        vectors = cache.embed_documents(texts, self.embeddings)
+        vector_store = FAISS.from_embeddings(
+            list(zip(texts, vectors)),
+            self.embeddings,
+            metadatas=[document.metadata for document in page_chunks + other_chunks],
+        )
+        self.embeddings.embedded_texts.clear()
+
+        updated_chunks = [
+            Document(page_content="first paragraph", metadata={"source": "page", "start_index": 0}),
+            Document(page_content="new paragraph", metadata={"source": "page", "start_index": 16}),
+            Document(page_content="third paragraph", metadata={"source": "page", "start_index": 30}),
+        ]
+        stats = update_vector_store(vector_store, updated_chunks, cache)
+
+        self.assertEqual(stats, {"added": 1, "removed": 1, "unchanged": 2})
+        self.assertEqual(self.embeddings.embedded_texts, ["new paragraph"])
+        self.assertEqual(vector_store.index.ntotal, 4)
+
+        stored_documents = [vector_store.docstore.search(docstore_id) for docstore_id in vector_store.index_to_docstore_id.values()]
+        stored_texts = sorted(document.page_content for document in stored_documents)
+        self.assertEqual(stored_texts, ["first paragraph", "new paragraph", "other site", "third paragraph"])
+        third = [document for document in stored_documents if document.page_content == "third paragraph"][0]
+        self.assertEqual(third.metadata["start_index"], 30)
+
+        result = vector_store.similarity_search("new paragraph", k=1)
+        self.assertEqual(result[0].page_content, "new paragraph")
+
+
+if __name__ == '__main__':
+    unittest.main()
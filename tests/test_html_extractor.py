@@ -0,0 +1,138 @@
+"""
+Unit tests for the html_extractor module.
+"""
+
+import unittest
+
+from html_extractor import extract_page, extract_text, extract_text_blocks
+
+PAGE = """
+<html>
+<head><title> Guide   page </title><script>var tracking = 1;</script></head>
+<body>
+  <div id="cookie-banner">We use cookies to improve your experience.</div>
+  <header><a href="/">Home</a></header>
+  <nav><ul><li>Guide page 1</li><li>Guide page 2</li></ul></nav>
+  <main>
+    <article>
+      <header><h1>Installing the client</h1></header>
+      <section>
+        <div>
+          <div><p>First <b>nested</b> paragraph.</p></div>
+          <p>Second paragraph<br>on two lines.</p>
+        </div>
+        Loose text inside a section.
+        <ul><li>Item one</li><li>Item two</li></ul>
+      </section>
+    </article>
+  </main>
+  <aside class="sidebar">Related links</aside>
+  <footer>Copyright notice</footer>
+</body>
+</html>
+"""
+
+# Layout of a Sphinx page with the Read the Docs theme
+SPHINX_PAGE = """
+<html><body class="wy-body-for-nav">
+  <div class="wy-grid-for-nav">
+    <nav data-toggle="wy-nav-shift" class="wy-nav-side"><div class="wy-menu wy-menu-vertical">Table of contents</div></nav>
+    <section data-toggle="wy-nav-shift" class="wy-nav-content-wrap">
+      <div class="wy-nav-content">
+        <div class="rst-content">
+          <div role="main" class="document">
+            <div class="section" id="installation"><h1>Installation</h1><p>Run pip install.</p></div>
+          </div>
+          <footer><p>Built with Sphinx.</p></footer>
+        </div>
+      </div>
+    </section>
+  </div>
+</body></html>
+"""
+
+# Bootstrap layout with a sidebar column and a navbar
+BOOTSTRAP_PAGE = """
+<html><body>
+  <nav class="navbar navbar-expand-lg"><a class="navbar-brand">Brand</a></nav>
+  <div id="main-menu-offset" class="container has-sidebar">
+    <div class="row">
+      <div class="col-md-3 sidebar">Sidebar links</div>
+      <div class="col-md-9"><h2>Quarterly results</h2><p class="share-price">The share price rose.</p></div>
+    </div>
+  </div>
+</body></html>
+"""
+
+# WordPress layout whose content sits inside a container named after the menu
+WORDPRESS_PAGE = """
+<html><body class="post-template-default">
+  <div id="page" class="site menu">
+    <header id="masthead" class="site-header"><div class="menu-primary-container">Home About</div></header>
+    <div id="content" class="site-content">
+      <main id="main" class="site-main"><article class="post"><h1 class="entry-title">Hello world</h1>
+        <div class="entry-content"><p>Welcome to WordPress.</p></div></article></main>
+      <aside id="secondary" class="widget-area">Recent posts</aside>
+    </div>
+    <div class="sharedaddy sd-sharing-enabled social-share">Share this</div>
+  </div>
+</body></html>
+"""
+
+
+class TestHtmlExtractor(unittest.TestCase):
+    """Test cases for the HTML extractor module."""
+
+    def test_nested_blocks_are_emitted_once_in_order(self):
+        """Test that text inside nested containers appears once and in document order."""
+        blocks = extract_text_blocks(PAGE)
+
+        self.assertEqual(blocks, [
+            "Installing the client",
+            "First nested paragraph.",
+            "Second paragraph on two lines.",
+            "Loose text inside a section.",
+            "Item one",
+            "Item two",
+        ])
+
+    def test_boilerplate_is_removed(self):
+        """Test that navigation, banners, sidebars, footers and scripts are dropped."""
+        text = extract_text(PAGE)
+
+        for boilerplate in ["cookies", "Home", "Guide page", "Related links", "Copyright", "tracking"]:
+            self.assertNotIn(boilerplate, text)
+
+    def test_title(self):
+        """Test that the page title is extracted and normalized."""
+        title, _ = extract_page(PAGE)
+
+        self.assertEqual(title, "Guide page")
+
+    def test_parsers_give_the_same_result(self):
+        """Test that the lxml and built-in parser backends extract the same blocks."""
+        self.assertEqual(extract_page(PAGE, parser="lxml"), extract_page(PAGE, parser="html.parser"))
+
+    def test_layout_class_names_are_not_boilerplate(self):
+        """Test that hyphenated layout names containing nav, sidebar, menu or share keep their content."""
+        for parser in ("lxml", "html.parser"):
+            with self.subTest(parser=parser):
+                self.assertEqual(extract_text_blocks(SPHINX_PAGE, parser), ["Installation", "Run pip install."])
+                self.assertEqual(extract_text_blocks(BOOTSTRAP_PAGE, parser),
+                                 ["Quarterly results", "The share price rose."])
+
+    def test_main_content_is_never_dropped(self):
+        """Test that a boilerplate-looking container holding the main element keeps its content."""
+        for parser in ("lxml", "html.parser"):
+            with self.subTest(parser=parser):
+                blocks = extract_text_blocks(WORDPRESS_PAGE, parser)
+                self.assertEqual(blocks, ["Hello world", "Welcome to WordPress."])
+
+    def test_page_without_body(self):
+        """Test that a fragment without html or body tags is still extracted."""
+        self.assertEqual(extract_text("<p>Just a paragraph</p>"), "Just a paragraph")
+        self.assertEqual(extract_text(""), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Unit tests for the index_cache module.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from disk_store import ReadOnlyFAISS
+from index_cache import IndexCache, compute_content_hash, make_cache_key
+
+
+class TestIndexCache(unittest.TestCase):
+    """Test cases for the index cache module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.sample_documents = [
+            Document(page_content="This is test document 1", metadata={"source": "test1"}),
+            Document(page_content="This is test document 2", metadata={"source": "test2"}),
+        ]
+        self.vector_store = FAISS.from_documents(self.sample_documents, self.embeddings)
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_content_hash_changes_with_content(self):
+        """Test that the content hash identifies the page content."""
+        changed_documents = [Document(page_content="Changed content", metadata={"source": "test1"})]
+
+        self.assertEqual(compute_content_hash(self.sample_documents), compute_content_hash(list(self.sample_documents)))
+        self.assertNotEqual(compute_content_hash(self.sample_documents), compute_content_hash(changed_documents))
+
+    def test_cache_key_includes_settings(self):
+        """Test that the cache key changes with the URL, content and settings."""
+        settings = {"embedding_model": "model-a", "chunk_size": 1000, "chunk_overlap": 200}
+        other_settings = {"embedding_model": "model-b", "chunk_size": 1000, "chunk_overlap": 200}
+
+        key = make_cache_key("https://example.com", "hash", settings)
+
+        self.assertEqual(key, make_cache_key("https://example.com", "hash", dict(settings)))
+        self.assertNotEqual(key, make_cache_key("https://example.org", "hash", settings))
+        self.assertNotEqual(key, make_cache_key("https://example.com", "other-hash", settings))
+        self.assertNotEqual(key, make_cache_key("https://example.com", "hash", other_settings))
+
+    def test_save_and_load(self):
+        """Test that a saved index can be loaded back."""
+        cache = IndexCache(self.cache_dir)
+
+        self.assertIsNone(cache.load("missing", self.embeddings))
+
+        cache.save("key", self.vector_store, "https://example.com")
+        loaded_store = cache.load("key", self.embeddings)
+
+        self.assertIsNotNone(loaded_store)
+        self.assertEqual(loaded_store.index.ntotal, 2)
+        result = loaded_store.similarity_search("This is test document 1", k=1)
+        self.assertEqual(result[0].page_content, "This is test document 1")
+
+    def test_evicts_least_recently_used_entries(self):
+        """Test that old entries are evicted when the cache grows too large."""
+        cache = IndexCache(self.cache_dir)
+        cache.save("first", self.vector_store, "https://example.com/1")
+        entry_size = cache.total_size()
+
+        # Allow room for two entries only
+        cache.max_size_bytes = entry_size * 2 + entry_size // 2
+        cache.save("second", self.vector_store, "https://example.com/2")
+        cache.load("first", self.embeddings)
+        cache.save("third", self.vector_store, "https://example.com/3")
+
+        self.assertTrue(cache.contains("first"))
+        self.assertFalse(cache.contains("second"))
+        self.assertTrue(cache.contains("third"))
+        self.assertLessEqual(cache.total_size(), cache.max_size_bytes)
+
+    def test_disk_backed_entries(self):
+        """Test that a disk-backed cache opens entries read-only and loads them writable."""
+        cache = IndexCache(self.cache_dir, disk_backed=True)
+        cache.save("key", self.vector_store, "https://example.com")
+
+        opened_store = cache.open("key", self.embeddings)
+        self.assertIsInstance(opened_store, ReadOnlyFAISS)
+        result = opened_store.similarity_search("This is test document 2", k=1)
+        self.assertEqual(result[0].page_content, "This is test document 2")
+        self.assertEqual(result[0].metadata, {"source": "test2"})
+
+        loaded_store = cache.load("key", self.embeddings)
+        self.assertNotIsInstance(loaded_store, ReadOnlyFAISS)
+        loaded_store.add_texts(["This is test document 3"])
+        self.assertEqual(loaded_store.index.ntotal, 3)
+
+    def test_concurrent_saves_of_the_same_key(self):
+        """Test that concurrent saves of one key all succeed and leave one readable entry."""
+        cache = IndexCache(self.cache_dir)
+        cache.save("key", self.vector_store, "https://example.com")
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def save():
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    cache.save("key", self.vector_store, "https://example.com")
+                    cache.load("key", self.embeddings)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.load("key", self.embeddings).index.ntotal, 2)
+        cache.evict()
+        self.assertEqual(os.listdir(self.cache_dir), ["key"])
+        self.assertEqual(os.listdir(cache.entry_path("key")).count("cache_entry.json"), 1)
+        self.assertEqual([entry["key"] for entry in cache.entries()], ["key"])
+
+    def test_corrupt_entry_is_removed(self):
+        """Test that an unreadable entry is treated as a miss."""
+        cache = IndexCache(self.cache_dir)
+        cache.save("key", self.vector_store, "https://example.com")
+        os.remove(os.path.join(cache.entry_path("key"), "index.faiss"))
+
+        self.assertIsNone(cache.load("key", self.embeddings))
+        self.assertFalse(cache.contains("key"))
+
+
+if __name__ == '__main__':
+    unittest.main()
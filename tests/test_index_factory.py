@@ -0,0 +1,133 @@
+"""
+Unit tests for the index_factory module.
+"""
+
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from embedding_cache import update_vector_store
+from index_factory import (
+    FLAT,
+    FLAT_FP16,
+    HNSW,
+    INDEX_TYPES,
+    IVF,
+    IVF_FP16,
+    IVF_PQ,
+    IndexConfig,
+    apply_index_config,
+    choose_index_type,
+    delete_from_vector_store,
+    describe_index,
+    get_index_type,
+    similarity_search_with_parameters,
+)
+
+
+def make_vector_store(count: int) -> FAISS:
+    """Build a flat vector store of numbered texts."""
+    texts = [f"Chunk number {i} of the corpus" for i in range(count)]
+    return FAISS.from_texts(
+        texts,
+        DeterministicFakeEmbedding(size=16),
+        metadatas=[{"source": f"http://example.com/{i % 10}"} for i in range(count)],
+    )
+
+
+class TestIndexFactory(unittest.TestCase):
+    """Test cases for the index factory module."""
+
+    def test_choose_index_type_by_size(self):
+        """Test that the index type grows with the corpus."""
+        self.assertEqual(choose_index_type(1_000, 384), FLAT)
+        self.assertEqual(choose_index_type(100_000, 384), HNSW)
+        self.assertEqual(choose_index_type(5_000_000, 384), IVF)
+
+    def test_choose_index_type_by_memory_budget(self):
+        """Test that a tight memory budget selects more compact storage."""
+        megabyte = 1024 * 1024
+        self.assertEqual(choose_index_type(10_000, 384, memory_budget_bytes=10 * megabyte), FLAT_FP16)
+        self.assertEqual(choose_index_type(100_000, 384, memory_budget_bytes=80 * megabyte), IVF_FP16)
+        self.assertEqual(choose_index_type(100_000, 384, memory_budget_bytes=10 * megabyte), IVF_PQ)
+
+    def test_every_index_type_finds_exact_matches(self):
+        """Test that each index type is built in place and returns the indexed text for its own query."""
+        for index_type in INDEX_TYPES:
+            with self.subTest(index_type=index_type):
+                vector_store = make_vector_store(500)
+                apply_index_config(vector_store, IndexConfig(index_type=index_type))
+
+                self.assertEqual(get_index_type(vector_store.index), index_type)
+                self.assertEqual(vector_store.index.ntotal, 500)
+                result = similarity_search_with_parameters(
+                    vector_store, "Chunk number 42 of the corpus", k=1, nprobe=100, ef_search=128
+                )
+                self.assertEqual(result[0].page_content, "Chunk number 42 of the corpus")
+
+    def test_delete_keeps_docstore_mapping(self):
+        """Test that deleting from approximate indexes keeps vectors and documents aligned."""
+        for index_type in (FLAT, HNSW, IVF):
+            with self.subTest(index_type=index_type):
+                vector_store = make_vector_store(300)
+                apply_index_config(vector_store, IndexConfig(index_type=index_type))
+                deleted_ids = list(vector_store.index_to_docstore_id.values())[:50]
+
+                delete_from_vector_store(vector_store, deleted_ids)
+                vector_store.add_texts(["A chunk added after the delete"])
+
+                self.assertEqual(get_index_type(vector_store.index), index_type)
+                self.assertEqual(vector_store.index.ntotal, 251)
+                self.assertEqual(len(vector_store.index_to_docstore_id), 251)
+                for text in ["Chunk number 200 of the corpus", "A chunk added after the delete"]:
+                    result = similarity_search_with_parameters(vector_store, text, k=1, nprobe=100, ef_search=128)
+                    self.assertEqual(result[0].page_content, text)
+
+    def test_update_vector_store_on_hnsw_index(self):
+        """Test that an HNSW index can be patched in place when a page changes."""
+        vector_store = make_vector_store(100)
+        apply_index_config(vector_store, IndexConfig(index_type=HNSW))
+
+        stats = update_vector_store(vector_store, [
+            Document(page_content="Chunk number 0 of the corpus", metadata={"source": "http://example.com/0"}),
+            Document(page_content="New text of page zero", metadata={"source": "http://example.com/0"}),
+        ])
+
+        self.assertEqual(stats, {"added": 1, "removed": 9, "unchanged": 1})
+        self.assertEqual(vector_store.index.ntotal, 92)
+        self.assertEqual(vector_store.similarity_search("New text of page zero", k=1)[0].page_content,
+                         "New text of page zero")
+
+    def test_default_config_keeps_small_stores_flat(self):
+        """Test that automatic selection leaves a small store unchanged."""
+        vector_store = make_vector_store(50)
+        index = vector_store.index
+
+        apply_index_config(vector_store)
+
+        self.assertIs(vector_store.index, index)
+        self.assertEqual(describe_index(vector_store.index), {"index_type": FLAT, "vectors": 50, "dimension": 16})
+
+    def test_product_quantization_fallback_is_not_rebuilt(self):
+        """Test that a store too small for product quantization is converted once and then left alone."""
+        vector_store = make_vector_store(100)
+        index_config = IndexConfig(index_type=IVF_PQ)
+
+        apply_index_config(vector_store, index_config)
+        index = vector_store.index
+        apply_index_config(vector_store, index_config)
+        apply_index_config(vector_store, index_config)
+
+        self.assertEqual(get_index_type(index), FLAT_FP16)
+        self.assertIs(vector_store.index, index)
+
+    def test_unknown_index_type(self):
+        """Test that an unknown index type is rejected."""
+        with self.assertRaises(ValueError):
+            apply_index_config(make_vector_store(10), IndexConfig(index_type="lsh"))
+
+
+if __name__ == '__main__':
+    unittest.main()
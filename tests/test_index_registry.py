@@ -0,0 +1,173 @@
+"""
+Unit tests for the index_registry module.
+"""
+
+import gc
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from document_processor import load_shared_url_index
+from index_registry import IndexRegistry, estimate_vector_store_bytes
+
+
+class TestIndexRegistry(unittest.TestCase):
+    """Test cases for the index registry module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+
+    def make_vector_store(self, text: str) -> FAISS:
+        return FAISS.from_texts([text], self.embeddings)
+
+    def test_concurrent_requests_share_one_build(self):
+        """Test that concurrent callers of one key wait for a single build and share its index."""
+        registry = IndexRegistry()
+        build_started = threading.Event()
+        build_count = []
+
+        def build():
+            build_count.append(1)
+            build_started.set()
+            time.sleep(0.1)
+            return self.make_vector_store("shared")
+
+        handles = []
+        handles_lock = threading.Lock()
+
+        def session():
+            handle = registry.acquire("https://example.com", build)
+            with handles_lock:
+                handles.append(handle)
+
+        threads = [threading.Thread(target=session) for _ in range(10)]
+        threads[0].start()
+        build_started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(build_count), 1)
+        self.assertEqual(len({id(handle.vector_store) for handle in handles}), 1)
+        stats = registry.stats()
+        self.assertEqual(stats["builds"], 1)
+        self.assertEqual(stats["waits"], 9)
+        self.assertEqual(stats["in_use"], 1)
+
+    def test_unused_indexes_are_evicted_least_recently_used_first(self):
+        """Test that eviction keeps the budget with unused indexes only, oldest first."""
+        registry = IndexRegistry(memory_budget_bytes=250, memory_estimator=lambda vector_store: 100)
+
+        first = registry.acquire("first", lambda: self.make_vector_store("first"))
+        second = registry.acquire("second", lambda: self.make_vector_store("second"))
+        first.release()
+        second.release()
+        # Use the first index again, so the second one is the least recently used
+        registry.acquire("first", lambda: self.make_vector_store("first")).release()
+
+        third = registry.acquire("third", lambda: self.make_vector_store("third"))
+        stats = registry.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["memory_bytes"], 200)
+
+        # The second index was evicted, so it is built again
+        fourth = registry.acquire("second", lambda: self.make_vector_store("second"))
+        self.assertEqual(registry.stats()["builds"], 4)
+
+        # Indexes in use are kept even over the budget
+        self.assertFalse(third.released)
+        self.assertEqual(registry.stats()["in_use"], 2)
+        third.release()
+        fourth.release()
+        self.assertLessEqual(registry.stats()["memory_bytes"], 250)
+
+    def test_failed_build_is_retried(self):
+        """Test that a failed build raises for its caller and is built again by the next one."""
+        registry = IndexRegistry()
+
+        def failing_build():
+            raise ValueError("No content was loaded from the URL.")
+
+        with self.assertRaises(ValueError):
+            registry.acquire("https://example.com", failing_build)
+        handle = registry.acquire("https://example.com", lambda: self.make_vector_store("retry"))
+
+        self.assertEqual(handle.vector_store.docstore.search(handle.vector_store.index_to_docstore_id[0]).page_content,
+                         "retry")
+        self.assertEqual(registry.stats()["failures"], 1)
+
+    def test_dropped_handle_releases_its_reference(self):
+        """Test that a handle garbage collected without release() no longer keeps its index."""
+        registry = IndexRegistry(memory_budget_bytes=0, memory_estimator=lambda vector_store: 100)
+        handle = registry.acquire("https://example.com", lambda: self.make_vector_store("dropped"))
+        self.assertEqual(registry.stats()["indexes"], 1)
+
+        del handle
+        gc.collect()
+
+        self.assertEqual(registry.stats()["indexes"], 0)
+
+    def test_pages_added_by_a_session_stay_in_its_live_index(self):
+        """Test that a page one session adds is counted against the budget but never seen by other sessions."""
+        registry = IndexRegistry()
+        first = registry.acquire("https://example.com", lambda: self.make_vector_store("First page"))
+        memory_bytes = registry.stats()["memory_bytes"]
+
+        live_index = first.get_live_index()
+        self.assertIs(first.get_live_index(), live_index)
+        live_index.add_documents(
+            [Document(page_content="Second page " * 50, metadata={"source": "https://example.com/second"})]
+        ).result()
+        self.assertEqual(live_index.snapshot().index.ntotal, 2)
+        self.assertEqual(registry.stats()["memory_bytes"],
+                         memory_bytes + estimate_vector_store_bytes(live_index.snapshot()))
+
+        # Another session on the same page gets the index its key describes
+        second = registry.acquire("https://example.com", lambda: self.make_vector_store("First page"))
+        self.assertIs(second.vector_store, first.vector_store)
+        self.assertEqual(second.vector_store.index.ntotal, 1)
+        self.assertIsNot(second.get_live_index(), live_index)
+        self.assertEqual(second.get_live_index().snapshot().index.ntotal, 1)
+
+        # The grown index and its live index go with the handle
+        first.release()
+        self.assertEqual(registry.stats()["memory_bytes"], memory_bytes)
+        with self.assertRaises(RuntimeError):
+            live_index.add_documents([Document(page_content="Third page", metadata={"source": "third"})])
+        second.release()
+
+    def test_memory_estimate_counts_index_and_texts(self):
+        """Test that the estimate grows with the vectors and chunk texts of a store."""
+        small = FAISS.from_texts(["a" * 100], self.embeddings)
+        large = FAISS.from_texts(["a" * 1000] * 10, self.embeddings)
+
+        self.assertGreater(estimate_vector_store_bytes(small), 100)
+        self.assertGreater(estimate_vector_store_bytes(large), 10 * estimate_vector_store_bytes(small) - 1)
+
+    @patch('document_processor.get_embeddings')
+    @patch('document_processor.load_documents_from_url')
+    def test_url_index_is_shared_until_the_page_changes(self, mock_load_documents, mock_get_embeddings):
+        """Test that sessions on the same page version share an index and a changed page gets a new one."""
+        mock_get_embeddings.return_value = self.embeddings
+        mock_load_documents.return_value = [Document(page_content="First version", metadata={"source": "https://example.com"})]
+        registry = IndexRegistry()
+
+        first = load_shared_url_index("https://example.com", registry)
+        second = load_shared_url_index("https://example.com", registry)
+        mock_load_documents.return_value = [Document(page_content="Second version", metadata={"source": "https://example.com"})]
+        changed = load_shared_url_index("https://example.com", registry)
+
+        self.assertIs(first.vector_store, second.vector_store)
+        self.assertIsNot(changed.vector_store, first.vector_store)
+        self.assertEqual(registry.stats()["builds"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
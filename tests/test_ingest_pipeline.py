@@ -0,0 +1,149 @@
+"""
+Unit tests for the ingest_pipeline module.
+"""
+
+import time
+import unittest
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from document_processor import create_text_splitter, parse_html_document
+from ingest_pipeline import IngestPipeline
+from web_fetcher import FetchResult
+
+
+def make_results(page_count: int, paragraphs_per_page: int = 5):
+    """Build fetch results of pages with several long paragraphs."""
+    results = []
+    for page in range(page_count):
+        paragraphs = "".join(
+            f"<p>Page {page} paragraph {paragraph}. " + "Some filler text. " * 40 + "</p>"
+            for paragraph in range(paragraphs_per_page)
+        )
+        results.append(FetchResult(
+            url=f"http://example.com/{page}",
+            status_code=200,
+            html=f"<html><body>{paragraphs}</body></html>",
+        ))
+    return results
+
+
+class TestIngestPipeline(unittest.TestCase):
+    """Test cases for the ingest pipeline module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.text_splitter = create_text_splitter()
+
+    def test_indexes_every_chunk_in_batches(self):
+        """Test that all chunks are indexed, one batch at a time."""
+        results = make_results(6)
+        expected_chunks = self.text_splitter.split_documents(
+            [parse_html_document(result.url, result.html) for result in results]
+        )
+        progress_updates = []
+        pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=parse_html_document,
+            split_page=self.text_splitter.split_documents,
+            batch_size=4,
+            queue_size=2,
+            progress_callback=progress_updates.append,
+        )
+
+        vector_store = pipeline.run(iter(results))
+
+        self.assertEqual(vector_store.index.ntotal, len(expected_chunks))
+        self.assertEqual(len(progress_updates), -(-len(expected_chunks) // 4))
+        stats = pipeline.stats()
+        self.assertEqual(stats["fetch"]["items"], 6)
+        self.assertEqual(stats["split"]["items"], len(expected_chunks))
+        self.assertEqual(stats["embed"]["items"], len(expected_chunks))
+        self.assertLessEqual(stats["fetch"]["max_queue_depth"], 2)
+        self.assertLessEqual(stats["split"]["max_queue_depth"], 2 * 4)
+
+        # Page bodies are not kept once they have been processed
+        self.assertEqual(len(pipeline.fetch_results), 6)
+        for result in pipeline.fetch_results:
+            self.assertIsNone(result.html)
+
+        result = vector_store.similarity_search(expected_chunks[3].page_content, k=1)
+        self.assertEqual(result[0].page_content, expected_chunks[3].page_content)
+
+    def test_stages_overlap(self):
+        """Test that splitting a page overlaps with fetching the next one."""
+        results = make_results(10, paragraphs_per_page=1)
+
+        def slow_fetch():
+            for result in results:
+                time.sleep(0.05)
+                yield result
+
+        def slow_parse(url, html):
+            time.sleep(0.05)
+            return parse_html_document(url, html)
+
+        pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=slow_parse,
+            split_page=self.text_splitter.split_documents,
+        )
+
+        start_time = time.perf_counter()
+        pipeline.run(slow_fetch())
+        elapsed = time.perf_counter() - start_time
+
+        # Running the stages one after the other would take at least 1 second
+        self.assertLess(elapsed, 0.85)
+
+    def test_adds_to_existing_store_and_skips_unchanged_pages(self):
+        """Test that chunks are added to a given store and pages without a body are skipped."""
+        pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=parse_html_document,
+            split_page=self.text_splitter.split_documents,
+        )
+        existing_store = pipeline.run(iter(make_results(1, paragraphs_per_page=1)))
+        existing_count = existing_store.index.ntotal
+
+        results = make_results(2, paragraphs_per_page=1)
+        results.append(FetchResult(url="http://example.com/unchanged", status_code=304, not_modified=True))
+        second_pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=parse_html_document,
+            split_page=self.text_splitter.split_documents,
+        )
+        vector_store = second_pipeline.run(iter(results), existing_store)
+
+        self.assertIs(vector_store, existing_store)
+        self.assertEqual(vector_store.index.ntotal, existing_count * 3)
+        self.assertEqual(len(second_pipeline.fetch_results), 3)
+
+    def test_returns_none_without_content(self):
+        """Test that a run without pages produces no store."""
+        pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=parse_html_document,
+            split_page=self.text_splitter.split_documents,
+        )
+
+        self.assertIsNone(pipeline.run(iter([])))
+
+    def test_stage_errors_are_raised(self):
+        """Test that an error in a stage stops the pipeline and is raised."""
+        def failing_parse(url, html):
+            raise RuntimeError("parse failed")
+
+        pipeline = IngestPipeline(
+            self.embeddings,
+            parse_page=failing_parse,
+            split_page=self.text_splitter.split_documents,
+        )
+
+        with self.assertRaises(RuntimeError):
+            pipeline.run(iter(make_results(50)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Unit tests for the instrumentation module.
+"""
+
+import io
+import json
+import time
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_community.vectorstores import FAISS
+
+from document_processor import split_documents
+from instrumentation import (
+    InstrumentationHook,
+    JsonLinesTraceHook,
+    MetricsRecorder,
+    SamplingProfiler,
+    add_hook,
+    record_stage,
+    remove_hook,
+    stage,
+)
+from rag_engine import create_rag_chain
+
+
+class CollectingHook(InstrumentationHook):
+    """A hook that keeps every event."""
+
+    def __init__(self):
+        self.events = []
+
+    def on_stage(self, event):
+        self.events.append(event)
+
+
+class FailingHook(InstrumentationHook):
+    """A hook that raises on every event."""
+
+    def on_stage(self, event):
+        raise RuntimeError("exporter is down")
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for the instrumentation module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.hook = CollectingHook()
+        add_hook(self.hook)
+
+    def tearDown(self):
+        """Remove the test hook."""
+        remove_hook(self.hook)
+
+    def test_stage_passes_time_and_counters_to_hooks(self):
+        """Test that a stage reports its duration and counters, also when it fails."""
+        with stage("split", documents=1) as counters:
+            time.sleep(0.01)
+            counters["chunks"] = 3
+        with self.assertRaises(ValueError):
+            with stage("split", documents=1):
+                raise ValueError("failed")
+
+        self.assertEqual([event.stage for event in self.hook.events], ["split", "split"])
+        self.assertGreaterEqual(self.hook.events[0].seconds, 0.01)
+        self.assertEqual(self.hook.events[0].counters, {"documents": 1, "chunks": 3})
+        self.assertEqual(self.hook.events[1].counters, {"documents": 1, "errors": 1})
+
+        # A removed hook gets no more events
+        remove_hook(self.hook)
+        record_stage("fetch", 0.1, bytes=10)
+        self.assertEqual(len(self.hook.events), 2)
+
+    def test_failing_hook_does_not_break_the_stage(self):
+        """Test that an error of a hook is logged, and neither fails the stage nor hides its error."""
+        failing_hook = FailingHook()
+        add_hook(failing_hook)
+        try:
+            with self.assertLogs("instrumentation", level="ERROR") as logs:
+                with stage("embed") as counters:
+                    counters["chunks"] = 2
+                with self.assertRaisesRegex(ValueError, "failed"):
+                    with stage("embed"):
+                        raise ValueError("failed")
+        finally:
+            remove_hook(failing_hook)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("exporter is down", logs.output[0])
+        # The other hooks still get every event
+        self.assertEqual([event.counters for event in self.hook.events], [{"chunks": 2}, {"errors": 1}])
+
+    def test_metrics_are_exported_as_json_and_prometheus(self):
+        """Test that the recorder aggregates the stages and exports them."""
+        recorder = MetricsRecorder()
+        add_hook(recorder)
+        try:
+            record_stage("fetch", 0.5, bytes=1000, pages=1)
+            record_stage("fetch", 1.5, bytes=3000, pages=1)
+            record_stage("generate", 2.0, input_tokens=700, output_tokens=50)
+        finally:
+            remove_hook(recorder)
+
+        snapshot = json.loads(recorder.to_json())
+        self.assertEqual(snapshot["fetch"]["calls"], 2)
+        self.assertEqual(snapshot["fetch"]["seconds"], 2.0)
+        self.assertEqual(snapshot["fetch"]["max_seconds"], 1.5)
+        self.assertEqual(snapshot["fetch"]["counters"], {"bytes": 4000, "pages": 2})
+
+        prometheus = recorder.to_prometheus()
+        self.assertIn('rag_stage_calls_total{stage="fetch"} 2', prometheus)
+        self.assertIn('rag_stage_seconds_total{stage="generate"} 2', prometheus)
+        self.assertIn('rag_stage_bytes_total{stage="fetch"} 4000', prometheus)
+        self.assertIn('rag_stage_output_tokens_total{stage="generate"} 50', prometheus)
+        self.assertIn("# TYPE rag_stage_bytes_total counter", prometheus)
+
+    def test_trace_hook_writes_json_lines(self):
+        """Test that the trace hook writes one JSON object per stage event."""
+        output_file = io.StringIO()
+        trace_hook = JsonLinesTraceHook(output_file)
+        add_hook(trace_hook)
+        try:
+            record_stage("embed", 0.25, chunks=32)
+        finally:
+            remove_hook(trace_hook)
+
+        event = json.loads(output_file.getvalue().splitlines()[0])
+        self.assertEqual(event["stage"], "embed")
+        self.assertEqual(event["counters"], {"chunks": 32})
+
+    def test_ingest_and_query_stages_are_recorded(self):
+        """Test that splitting and the nodes of the RAG chain report their stages."""
+        document = Document(page_content="RAG stands for Retrieval Augmented Generation. " * 50,
+                            metadata={"source": "https://example.com"})
+        chunks = split_documents([document])
+
+        vector_store = FAISS.from_documents(chunks, DeterministicFakeEmbedding(size=16))
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Retrieval Augmented Generation")]))
+        create_rag_chain(vector_store, llm=llm).invoke({"question": "What is RAG?"})
+
+        events = {event.stage: event for event in self.hook.events}
+        self.assertEqual(events["split"].counters, {"documents": 1, "chunks": len(chunks)})
+        self.assertEqual(events["retrieve"].counters, {"documents": min(4, len(chunks))})
+        self.assertEqual(events["generate"].counters, {"documents": min(4, len(chunks))})
+
+    def test_sampling_profiler_finds_the_busy_function(self):
+        """Test that the profiler attributes samples to the function that is running."""
+        def busy_function():
+            end_time = time.perf_counter() + 0.3
+            while time.perf_counter() < end_time:
+                pass
+
+        with SamplingProfiler(interval_seconds=0.001) as profiler:
+            busy_function()
+
+        self.assertFalse(profiler.running)
+        self.assertGreater(profiler.samples, 0)
+        self.assertTrue(any(row["function"].startswith("busy_function") for row in profiler.report(5)))
+        self.assertIn("busy_function", profiler.format_report(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
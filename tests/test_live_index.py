@@ -0,0 +1,138 @@
+"""
+Unit tests for the live_index module.
+"""
+
+import tempfile
+import threading
+import unittest
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_community.vectorstores import FAISS
+
+from disk_store import open_disk_index, write_disk_index
+from live_index import LiveIndex, copy_vector_store
+from rag_engine import create_rag_chain
+
+
+class BlockingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings whose document embedding waits until it is released."""
+
+    def __init__(self):
+        super().__init__(size=16)
+        object.__setattr__(self, "started", threading.Event())
+        object.__setattr__(self, "release", threading.Event())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.started.set()
+        self.release.wait(5)
+        return super().embed_documents(texts)
+
+
+def get_texts(vector_store: FAISS) -> List[str]:
+    return sorted(vector_store.docstore.search(docstore_id).page_content
+                  for docstore_id in vector_store.index_to_docstore_id.values())
+
+
+class TestLiveIndex(unittest.TestCase):
+    """Test cases for the live index module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.vector_store = FAISS.from_documents(
+            [Document(page_content="First page about RAG.", metadata={"source": "https://example.com/first"})],
+            self.embeddings,
+        )
+
+    def test_queries_during_an_add_see_the_previous_snapshot(self):
+        """Test that queries keep answering from the complete previous index while pages are embedded."""
+        embeddings = BlockingEmbedding()
+        embeddings.release.set()
+        vector_store = FAISS.from_texts(["First page about RAG."], embeddings)
+        embeddings.release.clear()
+        embeddings.started.clear()
+        live_index = LiveIndex(vector_store)
+
+        future = live_index.add_documents(
+            [Document(page_content="Second page about FAISS.", metadata={"source": "https://example.com/second"})]
+        )
+        self.assertTrue(embeddings.started.wait(5))
+
+        # The writer is embedding the new page, queries are served from the old snapshot without waiting
+        self.assertIs(live_index.snapshot(), vector_store)
+        self.assertEqual([document.page_content for document in live_index.snapshot().similarity_search("FAISS")],
+                         ["First page about RAG."])
+        self.assertFalse(future.done())
+
+        embeddings.release.set()
+        result = future.result(5)
+        live_index.close()
+
+        self.assertEqual(result["added"], 1)
+        self.assertEqual(result["version"], 1)
+        self.assertEqual(get_texts(live_index.snapshot()), ["First page about RAG.", "Second page about FAISS."])
+        # The served store was copied, not changed
+        self.assertEqual(get_texts(vector_store), ["First page about RAG."])
+
+    def test_adding_a_page_again_replaces_its_chunks(self):
+        """Test that a page added again is patched instead of indexed twice."""
+        live_index = LiveIndex(self.vector_store)
+        live_index.add_documents(
+            [Document(page_content="Second page, first version.", metadata={"source": "https://example.com/second"})]
+        ).result(5)
+        result = live_index.add_documents(
+            [Document(page_content="Second page, new version.", metadata={"source": "https://example.com/second"})]
+        ).result(5)
+        live_index.close()
+
+        self.assertEqual(result["added"], 1)
+        self.assertEqual(result["removed"], 1)
+        self.assertEqual(get_texts(live_index.snapshot()), ["First page about RAG.", "Second page, new version."])
+        self.assertEqual(live_index.stats()["version"], 2)
+
+    def test_failed_add_keeps_the_current_snapshot(self):
+        """Test that an add that fails raises for its caller and leaves the served index as it was."""
+        live_index = LiveIndex(self.vector_store)
+        future = live_index.add_documents([Document(page_content="No source.", metadata={})])
+        with self.assertRaises(KeyError):
+            future.result(5)
+        live_index.close()
+
+        self.assertIs(live_index.snapshot(), self.vector_store)
+        self.assertEqual(live_index.stats()["failures"], 1)
+
+    def test_chain_over_a_live_index_finds_added_pages(self):
+        """Test that an existing chain answers from pages added after it was created."""
+        live_index = LiveIndex(self.vector_store)
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="First"), AIMessage(content="Second")]))
+        rag_chain = create_rag_chain(live_index, llm=llm)
+
+        before = rag_chain.invoke({"question": "What is FAISS?"})
+        live_index.add_documents(
+            [Document(page_content="Second page about FAISS.", metadata={"source": "https://example.com/second"})]
+        ).result(5)
+        after = rag_chain.invoke({"question": "What is FAISS?"})
+        live_index.close()
+
+        self.assertEqual(len(before["context"]), 1)
+        self.assertIn("Second page about FAISS.", [document.page_content for document in after["context"]])
+
+    def test_disk_index_is_copied_before_it_is_changed(self):
+        """Test that a read-only disk index can be grown through a copy."""
+        with tempfile.TemporaryDirectory() as directory:
+            write_disk_index(self.vector_store, directory)
+            disk_vector_store = open_disk_index(directory, self.embeddings)
+
+            vector_store_copy = copy_vector_store(disk_vector_store)
+            vector_store_copy.add_texts(["Added text."], metadatas=[{"source": "https://example.com/added"}])
+
+            self.assertEqual(get_texts(vector_store_copy), ["Added text.", "First page about RAG."])
+            self.assertEqual(disk_vector_store.index.ntotal, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
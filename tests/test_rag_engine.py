@@ -2,13 +2,31 @@
 Unit tests for the rag_engine module.
 """
 
+import asyncio
+import os
 import unittest
 from unittest.mock import MagicMock, patch
 
 from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
 from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import FAISS
 
-from rag_engine import create_rag_chain, query_rag_chain, State
+from answer_cache import SemanticAnswerCache
+from context_packer import ContextPacker
+from index_factory import IndexConfig, apply_index_config
+from retrieval_batcher import RetrievalBatcher
+from rag_engine import (
+    LLM_MODEL_NAME,
+    RAG_PROMPT,
+    State,
+    create_rag_chain,
+    get_llm,
+    query_rag_chain,
+    stream_rag_chain,
+)
 
 
 class TestRagEngine(unittest.TestCase):
@@ -28,38 +46,45 @@ class TestRagEngine(unittest.TestCase):
         # Configure the mock to return sample documents
         self.mock_vector_store.similarity_search.return_value = self.sample_docs
 
-    @patch('rag_engine.ChatAnthropic')
-    @patch('rag_engine.hub')
-    def test_create_rag_chain(self, mock_hub, mock_chat_anthropic):
+    @patch('langchain_anthropic.ChatAnthropic')
+    def test_create_rag_chain(self, mock_chat_anthropic):
         """Test that a RAG chain can be created successfully."""
-        # Configure mocks
-        mock_prompt = MagicMock()
-        mock_hub.pull.return_value = mock_prompt
-        
         # Create the chain
         chain = create_rag_chain(self.mock_vector_store)
         
-        # Assert that the chain was created
+        # Assert that the chain was created without creating a model client
         self.assertIsNotNone(chain)
-        mock_hub.pull.assert_called_once_with("rlm/rag-prompt")
+        mock_chat_anthropic.assert_not_called()
 
-    @patch('rag_engine.ChatAnthropic')
-    @patch('rag_engine.hub')
-    def test_query_rag_chain(self, mock_hub, mock_chat_anthropic):
-        """Test querying the RAG chain."""
-        # Configure mocks
-        mock_prompt = MagicMock()
-        mock_hub.pull.return_value = mock_prompt
+    def test_rag_prompt_is_bundled(self):
+        """Test that the bundled prompt formats the question and context."""
+        messages = RAG_PROMPT.invoke({
+            "question": "What is RAG?",
+            "context": "RAG stands for Retrieval Augmented Generation.",
+        })
         
+        text = messages.to_messages()[0].content
+        self.assertIn("Question: What is RAG?", text)
+        self.assertIn("Context: RAG stands for Retrieval Augmented Generation.", text)
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"})
+    def test_llm_is_shared(self):
+        """Test that every chain uses one chat model client."""
+        llm = get_llm()
+        
+        self.assertIs(get_llm(), llm)
+        self.assertEqual(llm.model, LLM_MODEL_NAME)
+
+    def test_query_rag_chain(self):
+        """Test querying the RAG chain."""
         # Configure the LLM mock
         mock_llm_instance = MagicMock()
         mock_response = MagicMock()
         mock_response.content = "This is a test answer about AI and RAG."
         mock_llm_instance.invoke.return_value = mock_response
-        mock_chat_anthropic.return_value = mock_llm_instance
         
         # Create the chain
-        chain = create_rag_chain(self.mock_vector_store)
+        chain = create_rag_chain(self.mock_vector_store, llm=mock_llm_instance)
         
         # Query the chain
         result = query_rag_chain(chain, "What is RAG?")
@@ -68,6 +93,102 @@ class TestRagEngine(unittest.TestCase):
         self.assertEqual(result, "This is a test answer about AI and RAG.")
         self.mock_vector_store.similarity_search.assert_called_once_with("What is RAG?")
 
+    def test_search_parameters_are_used_for_retrieval(self):
+        """Test that nprobe is applied when retrieving from an IVF index."""
+        texts = [f"Document number {i}" for i in range(200)]
+        vector_store = FAISS.from_texts(texts, DeterministicFakeEmbedding(size=16))
+        apply_index_config(vector_store, IndexConfig(index_type="ivf"))
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Answer")]))
+        
+        chain = create_rag_chain(vector_store, nprobe=vector_store.index.nlist, llm=llm)
+        result = chain.invoke({"question": "Document number 7"})
+        
+        # Visiting every list makes the search exact
+        self.assertEqual(result["context"][0].page_content, "Document number 7")
+        self.assertEqual(len(result["context"]), 4)
+
+    def test_retrieval_batcher_is_used_for_retrieval(self):
+        """Test that a chain with a retrieval batcher retrieves through it, also asynchronously."""
+        texts = [f"Document number {i}" for i in range(20)]
+        vector_store = FAISS.from_texts(texts, DeterministicFakeEmbedding(size=16))
+        batcher = RetrievalBatcher(vector_store, k=2)
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="One"), AIMessage(content="Two")]))
+        
+        chain = create_rag_chain(vector_store, llm=llm, retrieval_batcher=batcher)
+        result = chain.invoke({"question": "Document number 7"})
+        async_result = asyncio.run(chain.ainvoke({"question": "Document number 8"}))
+        batcher.close()
+        
+        self.assertEqual(result["context"][0].page_content, "Document number 7")
+        self.assertEqual(len(result["context"]), 2)
+        self.assertEqual(async_result["context"][0].page_content, "Document number 8")
+        self.assertEqual(batcher.stats()["queries"], 2)
+
+    def test_context_packer_packs_the_retrieved_chunks(self):
+        """Test that a chain with a context packer merges overlapping chunks and reports the tokens saved."""
+        page = "RAG stands for Retrieval Augmented Generation. It answers questions from retrieved text."
+        chunks = [page[start:start + 40] for start in range(0, len(page), 30)]
+        metadatas = [{"source": "https://example.com", "start_index": start} for start in range(0, len(page), 30)]
+        vector_store = FAISS.from_texts(chunks, DeterministicFakeEmbedding(size=16), metadatas=metadatas)
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Retrieval Augmented Generation")]))
+        # The fake embeddings are random, so keep every hit whatever its score
+        packer = ContextPacker(fetch_k=len(chunks), score_margin=float("inf"), min_score_gap=float("inf"))
+        
+        chain = create_rag_chain(vector_store, llm=llm, context_packer=packer)
+        answer_stream = stream_rag_chain(chain, "What is RAG?")
+        answer = "".join(answer_stream)
+        
+        self.assertEqual(answer, "Retrieval Augmented Generation")
+        self.assertEqual([document.page_content for document in answer_stream.context], [page])
+        self.assertEqual(answer_stream.packing_stats["hits"], len(chunks))
+        self.assertGreater(answer_stream.packing_stats["tokens_saved"], 0)
+
+    def test_repeat_questions_are_answered_from_the_cache(self):
+        """Test that a repeat question skips generation until the index changes."""
+        vector_store = FAISS.from_texts(["RAG stands for Retrieval Augmented Generation."],
+                                        DeterministicFakeEmbedding(size=16))
+        mock_llm = MagicMock()
+        mock_llm.invoke.return_value.content = "Retrieval Augmented Generation"
+        answer_cache = SemanticAnswerCache()
+        
+        chain = create_rag_chain(vector_store, answer_cache=answer_cache, llm=mock_llm)
+        first_result = chain.invoke({"question": "What is RAG?"})
+        second_result = chain.invoke({"question": "what is RAG?"})
+        
+        self.assertEqual(second_result["answer"], "Retrieval Augmented Generation")
+        self.assertEqual(second_result["context"], first_result["context"])
+        self.assertTrue(second_result["cached"])
+        self.assertEqual(mock_llm.invoke.call_count, 1)
+        
+        # A changed index invalidates the cached answer
+        vector_store.add_texts(["RAG was introduced in 2020."])
+        mock_llm.invoke.return_value.content = "A newer answer"
+        self.assertEqual(query_rag_chain(chain, "What is RAG?"), "A newer answer")
+        self.assertEqual(mock_llm.invoke.call_count, 2)
+        self.assertEqual(answer_cache.stats()["invalidations"], 1)
+
+    def test_stream_rag_chain(self):
+        """Test that the answer is streamed token by token and timed."""
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="RAG means Retrieval Augmented Generation")]))
+        vector_store = FAISS.from_texts(["RAG stands for Retrieval Augmented Generation."],
+                                        DeterministicFakeEmbedding(size=16))
+        chain = create_rag_chain(vector_store, answer_cache=SemanticAnswerCache(), llm=llm)
+        
+        answer_stream = stream_rag_chain(chain, "What is RAG?")
+        pieces = list(answer_stream)
+        
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces), "RAG means Retrieval Augmented Generation")
+        self.assertEqual(answer_stream.answer, "RAG means Retrieval Augmented Generation")
+        self.assertEqual(answer_stream.context[0].page_content, "RAG stands for Retrieval Augmented Generation.")
+        self.assertFalse(answer_stream.cached)
+        self.assertLessEqual(answer_stream.time_to_first_token, answer_stream.total_seconds)
+        
+        # A cached answer is streamed whole
+        cached_stream = stream_rag_chain(chain, "What is RAG?")
+        self.assertEqual(list(cached_stream), ["RAG means Retrieval Augmented Generation"])
+        self.assertTrue(cached_stream.cached)
+
     def test_state_typing(self):
         """Test that the State TypedDict works correctly."""
         # Create a valid state
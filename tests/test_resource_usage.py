@@ -0,0 +1,41 @@
+"""
+Unit tests for the resource_usage module.
+"""
+
+import unittest
+
+from resource_usage import get_peak_resident_memory_bytes, get_private_memory_bytes, get_resident_memory_bytes
+
+
+class TestResourceUsage(unittest.TestCase):
+    """Test cases for the resource usage module."""
+
+    def test_resident_memory_grows_with_allocation(self):
+        """Test that the resident memory reflects a large allocation."""
+        memory_before = get_resident_memory_bytes()
+        large_buffer = b"x" * (64 * 1024 * 1024)
+        memory_after = get_resident_memory_bytes()
+
+        self.assertGreater(memory_before, 0)
+        self.assertGreater(memory_after, memory_before)
+        del large_buffer
+
+    def test_private_memory_grows_with_allocation(self):
+        """Test that the private memory reflects a large allocation and stays within the RSS."""
+        memory_before = get_private_memory_bytes()
+        large_buffer = b"x" * (64 * 1024 * 1024)
+        memory_after = get_private_memory_bytes()
+
+        self.assertGreater(memory_before, 0)
+        self.assertGreater(memory_after, memory_before)
+        self.assertLessEqual(memory_after, get_resident_memory_bytes())
+        del large_buffer
+
+    def test_peak_resident_memory(self):
+        """Test that the peak resident memory is reported in bytes."""
+        # Any Python process uses at least a few megabytes
+        self.assertGreater(get_peak_resident_memory_bytes(), 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
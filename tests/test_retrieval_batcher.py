@@ -0,0 +1,118 @@
+"""
+Unit tests for the retrieval_batcher module.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from retrieval_batcher import RetrievalBatcher, search_batch
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that count the embedding calls."""
+
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return super().embed_documents(texts)
+
+
+class TestRetrievalBatcher(unittest.TestCase):
+    """Test cases for the retrieval batcher module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.embeddings = CountingEmbedding(size=16)
+        self.texts = [f"Chunk about topic {number}" for number in range(50)]
+        self.vector_store = FAISS.from_texts(self.texts, self.embeddings)
+        self.embeddings.calls = 0
+
+    def test_search_batch_matches_single_searches(self):
+        """Test that a batched search returns what each query would get alone."""
+        queries = ["Chunk about topic 3", "Chunk about topic 42", "Something else"]
+
+        results = search_batch(self.vector_store, queries, k=4)
+
+        self.assertEqual(self.embeddings.calls, 1)
+        for query, documents in zip(queries, results):
+            expected = self.vector_store.similarity_search(query, k=4)
+            self.assertEqual([doc.page_content for doc in documents], [doc.page_content for doc in expected])
+
+    def test_given_embeddings_are_not_recomputed(self):
+        """Test that queries with an embedding skip the embedding pass."""
+        embedding = self.embeddings.embed_query("Chunk about topic 7")
+        self.embeddings.calls = 0
+
+        results = search_batch(self.vector_store, ["Ignored text"], [embedding], k=1)
+
+        self.assertEqual(self.embeddings.calls, 0)
+        self.assertEqual(results[0][0].page_content, "Chunk about topic 7")
+
+    def test_concurrent_queries_are_batched(self):
+        """Test that queries of concurrent threads are embedded and searched together."""
+        batcher = RetrievalBatcher(self.vector_store, max_batch_size=8, max_wait_ms=100, k=1)
+        barrier = threading.Barrier(16)
+        results = {}
+
+        def search(number):
+            barrier.wait()
+            results[number] = batcher.search(f"Chunk about topic {number}")[0].page_content
+
+        threads = [threading.Thread(target=search, args=(number,)) for number in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        self.assertEqual(results, {number: f"Chunk about topic {number}" for number in range(16)})
+        self.assertEqual(batcher.stats()["queries"], 16)
+        self.assertLessEqual(batcher.stats()["batches"], 4)
+        self.assertEqual(self.embeddings.calls, batcher.stats()["batches"])
+        with self.assertRaises(RuntimeError):
+            batcher.search("Chunk about topic 1")
+
+    def test_async_search(self):
+        """Test that async callers are batched without blocking the event loop."""
+        batcher = RetrievalBatcher(self.vector_store, max_batch_size=32, max_wait_ms=50, k=1)
+
+        async def search_all():
+            return await asyncio.gather(*(batcher.asearch(f"Chunk about topic {number}") for number in range(10)))
+
+        results = asyncio.run(search_all())
+        batcher.close()
+
+        self.assertEqual([documents[0].page_content for documents in results], self.texts[:10])
+        # The first query may be dispatched alone before the others are queued
+        self.assertLessEqual(batcher.stats()["batches"], 2)
+
+    def test_lone_caller_is_not_delayed(self):
+        """Test that a single caller does not wait for a batch to fill."""
+        batcher = RetrievalBatcher(self.vector_store, max_wait_ms=1000, k=1)
+
+        start_time = time.perf_counter()
+        for number in range(3):
+            self.assertEqual(batcher.search(f"Chunk about topic {number}")[0].page_content, self.texts[number])
+        elapsed = time.perf_counter() - start_time
+        batcher.close()
+
+        self.assertLess(elapsed, 0.5)
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failed batch raises the error in each caller."""
+        batcher = RetrievalBatcher(self.vector_store, k=1)
+        self.vector_store.index_to_docstore_id.clear()
+
+        with self.assertRaises(KeyError):
+            batcher.search("Chunk about topic 1")
+        batcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+Unit tests for the sharded_store module.
+"""
+
+import unittest
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from answer_cache import get_index_version
+from index_factory import HNSW, search_vectors_with_scores
+from sharded_store import (
+    BY_HASH,
+    BY_SOURCE,
+    build_shard_indexes,
+    create_sharded_vector_store,
+    get_site,
+    merge_top_k,
+    shard_vector_store,
+)
+
+SITES = ["https://docs.example.com", "https://blog.example.org", "https://wiki.example.net", "https://api.example.io"]
+
+
+def make_documents(count: int = 200):
+    return [
+        Document(
+            page_content=f"Chunk {position} about topic {position % 7}.",
+            metadata={"source": f"{SITES[position % len(SITES)]}/page/{position % 10}"},
+        )
+        for position in range(count)
+    ]
+
+
+class TestShardedStore(unittest.TestCase):
+    """Test cases for the sharded store module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.documents = make_documents()
+        self.vector_store = FAISS.from_documents(self.documents, self.embeddings)
+        self.queries = [f"Question {number} about topic {number % 7}?" for number in range(20)]
+
+    def test_search_matches_a_single_index(self):
+        """Test that searching the shards returns the same chunks and scores as one flat index."""
+        for partition_by in (BY_SOURCE, BY_HASH):
+            sharded_store = shard_vector_store(self.vector_store, 3, partition_by, search_threads=3)
+            self.addCleanup(sharded_store.close)
+            with self.subTest(partition_by=partition_by):
+                self.assertEqual(sum(shard.index.ntotal for shard in sharded_store.shards), len(self.documents))
+                for query in self.queries:
+                    expected = self.vector_store.similarity_search_with_score(query, k=6)
+                    results = sharded_store.similarity_search_with_score(query, k=6)
+                    self.assertEqual([document.id for document, _ in results],
+                                     [document.id for document, _ in expected])
+                    np.testing.assert_allclose([score for _, score in results],
+                                               [score for _, score in expected], rtol=1e-5)
+
+    def test_relevance_scores_match_a_single_index(self):
+        """Test that the batched search with relevance scores used by the chain matches one index."""
+        sharded_store = shard_vector_store(self.vector_store, 4, BY_HASH)
+        vectors = self.embeddings.embed_documents(self.queries)
+
+        expected = search_vectors_with_scores(self.vector_store, vectors, k=4)
+        results = search_vectors_with_scores(sharded_store, vectors, k=4)
+
+        for result, expected_result in zip(results, expected):
+            self.assertEqual([document.page_content for document, _ in result],
+                             [document.page_content for document, _ in expected_result])
+            np.testing.assert_allclose([score for _, score in result],
+                                       [score for _, score in expected_result], rtol=1e-5)
+
+    def test_partition_by_source_keeps_each_site_in_one_shard(self):
+        """Test that every chunk of a site is in the same shard."""
+        sharded_store = create_sharded_vector_store(self.documents, self.embeddings, num_shards=3)
+
+        sites_by_shard = [
+            {get_site(shard.docstore.search(docstore_id).metadata["source"])
+             for docstore_id in shard.index_to_docstore_id.values()}
+            for shard in sharded_store.shards
+        ]
+        for site in SITES:
+            self.assertEqual(sum(get_site(site) in sites for sites in sites_by_shard), 1)
+
+    def test_updating_a_site_rebuilds_only_its_shard(self):
+        """Test that a changed site replaces its own shard and leaves the other shards as they are."""
+        sharded_store = create_sharded_vector_store(self.documents, self.embeddings, num_shards=4)
+        old_shards = sharded_store.shards
+        old_version = get_index_version(sharded_store)
+        site = SITES[0]
+        site_shard = sharded_store.get_shard_position(Document(page_content="", metadata={"source": site}))
+
+        # Page 0 of the site changes, page 4 is gone
+        new_chunks = [Document(page_content="Rewritten page about sharding.", metadata={"source": f"{site}/page/0"})]
+        update_stats = sharded_store.update_sources(new_chunks, sources=[f"{site}/page/4"])
+
+        self.assertEqual(update_stats["shards"], 1)
+        self.assertEqual(update_stats["added"], 1)
+        self.assertGreater(update_stats["removed"], 0)
+        for position, shard in enumerate(sharded_store.shards):
+            if position == site_shard:
+                self.assertIsNot(shard, old_shards[position])
+            else:
+                self.assertIs(shard, old_shards[position])
+        sources = {shard.docstore.search(docstore_id).metadata["source"]
+                   for shard in sharded_store.shards for docstore_id in shard.index_to_docstore_id.values()}
+        self.assertNotIn(f"{site}/page/4", sources)
+        self.assertEqual(sharded_store.similarity_search("Rewritten page about sharding.", k=1)[0].page_content,
+                         "Rewritten page about sharding.")
+        # The replaced shard was not changed, so searches that were using it finished on consistent data
+        self.assertEqual(old_shards[site_shard].index.ntotal,
+                         sum(1 for document in self.documents if sharded_store.get_shard_position(document) == site_shard))
+        self.assertNotEqual(get_index_version(sharded_store), old_version)
+
+    def test_adds_and_deletes_replace_shards_instead_of_changing_them(self):
+        """Test that add_texts() and delete() swap in changed copies, leaving the shards searches hold intact."""
+        sharded_store = create_sharded_vector_store(self.documents, self.embeddings, num_shards=4)
+        old_shards = sharded_store.shards
+        old_sizes = [shard.index.ntotal for shard in old_shards]
+        site_shard = sharded_store.get_shard_position(Document(page_content="", metadata={"source": SITES[1]}))
+
+        ids = sharded_store.add_texts(["New page about sharding."], metadatas=[{"source": f"{SITES[1]}/new"}])
+        self.assertEqual(sharded_store.similarity_search("New page about sharding.", k=1)[0].page_content,
+                         "New page about sharding.")
+        added_shards = sharded_store.shards
+        self.assertEqual(added_shards[site_shard].index.ntotal, old_sizes[site_shard] + 1)
+
+        sharded_store.delete(ids)
+        for position, shard in enumerate(sharded_store.shards):
+            if position == site_shard:
+                self.assertIsNot(shard, added_shards[position])
+                self.assertEqual(shard.index.ntotal, old_sizes[position])
+            else:
+                self.assertIs(shard, old_shards[position])
+        self.assertEqual([shard.index.ntotal for shard in old_shards], old_sizes)
+        self.assertEqual(added_shards[site_shard].index.ntotal, old_sizes[site_shard] + 1)
+
+    def test_approximate_shards_are_built_in_worker_processes(self):
+        """Test that graph indexes built by worker processes come back searchable."""
+        random_state = np.random.RandomState(0)
+        parts = [random_state.normal(size=(300, 16)).astype(np.float32) for _ in range(2)]
+
+        indexes = build_shard_indexes(parts, 16, HNSW, processes=2)
+
+        for vectors, index in zip(parts, indexes):
+            self.assertIsInstance(faiss.downcast_index(index), faiss.IndexHNSWFlat)
+            self.assertEqual(index.ntotal, len(vectors))
+            _, positions = index.search(vectors[:5], 1)
+            self.assertEqual(positions[:, 0].tolist(), list(range(5)))
+
+    def test_merge_keeps_the_best_hits_of_every_shard(self):
+        """Test that the merge skips missing hits and orders inner products from the highest."""
+        shard_results = [
+            (np.array([[0.9, 0.2, 0.0]]), np.array([[4, 7, -1]])),
+            (np.array([[0.95, 0.5, 0.1]]), np.array([[1, 3, 0]])),
+        ]
+
+        merged = merge_top_k(shard_results, 3, higher_is_better=True)
+
+        self.assertEqual(merged, [[(0.95, 1, 1), (0.9, 0, 4), (0.5, 1, 3)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
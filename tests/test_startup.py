@@ -0,0 +1,25 @@
+"""
+Start-up tests for the command-line interface.
+"""
+
+import unittest
+
+from benchmarks.bench_startup import STARTUP_BUDGET_SECONDS, get_loaded_lazy_modules, measure_import_seconds
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for the cold start of main.py."""
+
+    def test_heavy_dependencies_are_imported_lazily(self):
+        """Test that importing main loads none of the heavy dependencies listed in LAZY_MODULES."""
+        self.assertEqual(get_loaded_lazy_modules("main"), [])
+
+    def test_cold_start_is_within_budget(self):
+        """Test that main imports within the start-up budget (RAG_STARTUP_BUDGET_SECONDS)."""
+        # Import once so the files are in the page cache, then time a cold interpreter
+        measure_import_seconds("main")
+        self.assertLess(measure_import_seconds("main"), STARTUP_BUDGET_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Unit tests for the streaming_splitter module.
+"""
+
+import glob
+import os
+import random
+import unittest
+from typing import Iterator
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from html_extractor import extract_text
+from streaming_splitter import StreamingTextSplitter, iter_pieces, split_on_separator
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "fixtures")
+
+# Words and separators the random texts are made of, few enough to repeat often
+RANDOM_TOKENS = ["alpha", "beta", "gamma", "delta", "x" * 40, " ", " ", "\n", "\n\n", "  "]
+
+
+def make_random_text(generator: random.Random, length: int) -> str:
+    return "".join(generator.choice(RANDOM_TOKENS) for _ in range(length))
+
+
+def iter_blocks(text: str, block_size: int) -> Iterator[str]:
+    for start in range(0, len(text), block_size):
+        yield text[start:start + block_size]
+
+
+class TestStreamingSplitter(unittest.TestCase):
+    """Test cases for the streaming splitter module."""
+
+    def test_chunks_match_the_recursive_splitter_on_a_fixture(self):
+        """Test that a fixture page is split into the same chunks with the same offsets as before."""
+        with open(sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))[0], encoding="utf-8") as fixture_file:
+            document = Document(page_content=extract_text(fixture_file.read()), metadata={"source": "fixture"})
+        recursive_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+
+        expected = recursive_splitter.split_documents([document])
+        chunks = StreamingTextSplitter(1000, 200).split_documents([document])
+
+        self.assertEqual([(chunk.page_content, chunk.metadata) for chunk in chunks],
+                         [(chunk.page_content, chunk.metadata) for chunk in expected])
+
+    def test_chunks_match_the_recursive_splitter_on_random_texts(self):
+        """Test that random texts give the same chunks as before, whole or streamed in blocks."""
+        generator = random.Random(7)
+        for chunk_size, chunk_overlap in [(50, 10), (100, 0), (120, 60)]:
+            recursive_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            splitter = StreamingTextSplitter(chunk_size, chunk_overlap)
+            for _ in range(100):
+                text = make_random_text(generator, generator.randint(0, 200))
+                expected = recursive_splitter.split_text(text)
+                with self.subTest(chunk_size=chunk_size, chunk_overlap=chunk_overlap, text=text):
+                    self.assertEqual(splitter.split_text(text), expected)
+                    self.assertEqual(splitter.split_text(iter_blocks(text, 7)), expected)
+
+    def test_start_offsets_are_exact_for_repeated_text(self):
+        """Test that every chunk gets its own offset, even when the same text appears earlier."""
+        text = "\n\n".join(["Same paragraph repeated here."] * 6)
+        splitter = StreamingTextSplitter(40, 0)
+
+        chunks = list(splitter.iter_chunks(text))
+
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual([start for _, start in chunks], [index * 31 for index in range(6)])
+        for chunk, start in chunks:
+            self.assertEqual(text[start:start + len(chunk)], chunk)
+
+    def test_separators_across_block_boundaries_are_found(self):
+        """Test that a separator split over two blocks cuts the stream like the whole text."""
+        text = "first\n\nsecond\n\nthird"
+
+        self.assertEqual(list(iter_pieces(iter_blocks(text, 6), "\n\n")), split_on_separator(text, "\n\n"))
+        self.assertEqual(list(iter_pieces(iter_blocks(text, 1), "\n\n")), ["first", "\n\nsecond", "\n\nthird"])
+
+    def test_chunk_size_can_be_measured_in_tokens(self):
+        """Test that the length function sets the chunk size, here a count of words."""
+        text = " ".join(f"word{index}" for index in range(30))
+        splitter = StreamingTextSplitter(10, 0, length_function=lambda piece: len(piece.split()))
+
+        chunks = splitter.split_text(text)
+
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(len(chunk.split()) == 10 for chunk in chunks))
+
+    def test_chunks_are_yielded_before_the_text_is_read(self):
+        """Test that the first chunk comes out before the last block is read."""
+        blocks_read = []
+
+        def read_blocks() -> Iterator[str]:
+            for index in range(100):
+                blocks_read.append(index)
+                yield f"Paragraph number {index} of the page.\n\n"
+
+        first_chunk, start = next(StreamingTextSplitter(100, 20).iter_chunks(read_blocks()))
+
+        self.assertEqual(start, 0)
+        self.assertTrue(first_chunk.startswith("Paragraph number 0"))
+        self.assertLess(len(blocks_read), 10)
+
+    def test_overlap_larger_than_chunk_size_is_refused(self):
+        """Test that an overlap larger than the chunk size raises an error."""
+        with self.assertRaises(ValueError):
+            StreamingTextSplitter(100, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Unit tests for the web_fetcher module.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tests.http_test_server import LocalWebServer
+from web_fetcher import (
+    HostRateLimiter,
+    ValidatorStore,
+    crawl_site,
+    extract_links,
+    fetch_urls,
+    is_in_crawl_scope,
+)
+
+
+def make_page(title: str, links=()) -> str:
+    """Build a small HTML page with links to other pages."""
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><body><h1>{title}</h1><p>Content of {title}.</p>{anchors}</body></html>"
+
+
+class TestWebFetcher(unittest.TestCase):
+    """Test cases for the web fetcher module."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_fetch_urls_concurrently_in_order(self):
+        """Test that URLs are fetched concurrently and returned in input order."""
+        pages = {f"/page{i}": make_page(f"Page {i}") for i in range(8)}
+        with LocalWebServer(pages, delay_seconds=0.2) as server:
+            urls = [server.url(f"/page{i}") for i in range(8)]
+
+            start_time = time.perf_counter()
+            results = fetch_urls(urls, max_concurrency=8, requests_per_second_per_host=0)
+            elapsed = time.perf_counter() - start_time
+
+        self.assertEqual([result.url for result in results], urls)
+        for i, result in enumerate(results):
+            self.assertTrue(result.ok)
+            self.assertIn(f"Page {i}", result.html)
+        self.assertGreater(server.max_active_requests, 1)
+        self.assertLess(elapsed, 8 * 0.2)
+
+    def test_fetch_urls_reports_errors(self):
+        """Test that missing pages are reported as errors."""
+        with LocalWebServer({}) as server:
+            results = fetch_urls([server.url("/missing")], requests_per_second_per_host=0)
+
+        self.assertFalse(results[0].ok)
+        self.assertEqual(results[0].status_code, 404)
+        self.assertEqual(results[0].error, "HTTP 404")
+
+    def test_conditional_requests_skip_unchanged_pages(self):
+        """Test that saved validators make the server skip unchanged bodies."""
+        validators_path = os.path.join(self.temp_dir, "validators.json")
+        pages = {"/a": make_page("A"), "/b": make_page("B")}
+        with LocalWebServer(pages) as server:
+            urls = [server.url("/a"), server.url("/b")]
+            validator_store = ValidatorStore(validators_path)
+            fetch_urls(urls, requests_per_second_per_host=0, validator_store=validator_store)
+            validator_store.save()
+
+            server.pages["/b"] = make_page("B changed")
+            results = fetch_urls(urls, requests_per_second_per_host=0, validator_store=ValidatorStore(validators_path))
+
+        self.assertTrue(results[0].not_modified)
+        self.assertIsNone(results[0].html)
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].not_modified)
+        self.assertIn("B changed", results[1].html)
+        self.assertEqual(server.body_count, 3)
+
+    def test_links_are_resolved_against_the_redirected_url(self):
+        """Test that relative links of a redirected page are resolved against its final URL, also after a 304."""
+        validators_path = os.path.join(self.temp_dir, "validators.json")
+        pages = {"/docs/": make_page("Index", ["guide"]), "/docs/guide": make_page("Guide")}
+        with LocalWebServer(pages, redirects={"/docs": "/docs/"}) as server:
+            validator_store = ValidatorStore(validators_path)
+            first = fetch_urls([server.url("/docs")], requests_per_second_per_host=0, validator_store=validator_store)[0]
+            second = fetch_urls([server.url("/docs")], requests_per_second_per_host=0, validator_store=validator_store)[0]
+
+        self.assertEqual(first.final_url, server.url("/docs/"))
+        self.assertEqual(first.links, [server.url("/docs/guide")])
+        self.assertEqual(validator_store.get(server.url("/docs"))["base_url"], server.url("/docs/"))
+        self.assertTrue(second.not_modified)
+        self.assertEqual(second.links, [server.url("/docs/guide")])
+
+    def test_rate_limiter_spaces_requests_per_host(self):
+        """Test that requests to one host are spaced while other hosts are not delayed."""
+        rate_limiter = HostRateLimiter(requests_per_second=20)
+
+        start_time = time.perf_counter()
+        for _ in range(5):
+            rate_limiter.wait("http://example.com/page")
+        same_host_elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for i in range(5):
+            rate_limiter.wait(f"http://host{i}.example.com/page")
+        other_hosts_elapsed = time.perf_counter() - start_time
+
+        self.assertGreaterEqual(same_host_elapsed, 4 * 0.05 - 0.01)
+        self.assertLess(other_hosts_elapsed, 0.05)
+
+    def test_extract_links(self):
+        """Test that links are made absolute and fragments removed."""
+        html = make_page("Links", ["/docs/a", "b#section", "mailto:someone@example.com", "/docs/a"])
+
+        links = extract_links("http://example.com/docs/index.html", html)
+
+        self.assertEqual(links, ["http://example.com/docs/a", "http://example.com/docs/b"])
+
+    def test_crawl_scope(self):
+        """Test that a crawl stays on the host and below the start directory."""
+        start_url = "http://example.com/docs/index.html"
+
+        self.assertTrue(is_in_crawl_scope(start_url, "http://example.com/docs/guide/intro"))
+        self.assertFalse(is_in_crawl_scope(start_url, "http://example.com/blog/post"))
+        self.assertFalse(is_in_crawl_scope(start_url, "http://other.com/docs/index.html"))
+
+    def test_crawl_site(self):
+        """Test that a crawl follows in-scope links up to the page limit."""
+        pages = {
+            "/docs/": make_page("Index", ["/docs/a", "/docs/b", "/blog/post"]),
+            "/docs/a": make_page("A", ["/docs/c", "/docs/"]),
+            "/docs/b": make_page("B"),
+            "/docs/c": make_page("C"),
+            "/blog/post": make_page("Blog"),
+        }
+        with LocalWebServer(pages) as server:
+            results = crawl_site(server.url("/docs/"), max_pages=10, requests_per_second_per_host=0)
+            limited_results = crawl_site(server.url("/docs/"), max_pages=2, requests_per_second_per_host=0)
+
+        crawled_paths = sorted(result.url.split(server.url(""))[1] for result in results)
+        self.assertEqual(crawled_paths, ["/docs/", "/docs/a", "/docs/b", "/docs/c"])
+        self.assertEqual(len(limited_results), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,481 @@
+"""
+Web fetching module for the RAG application.
+Fetches many URLs concurrently over a pooled HTTP session, with per-host
+rate limits and conditional requests so unchanged pages are not downloaded.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import record_stage
+
+# Default number of pages fetched at the same time
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Default maximum number of requests per second sent to a single host
+DEFAULT_REQUESTS_PER_SECOND_PER_HOST = 5.0
+
+# Default timeout of a single request in seconds
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+USER_AGENT = "web-content-rag/1.0"
+
+
+@dataclass
+class FetchResult:
+    """The outcome of fetching one URL."""
+    url: str
+    status_code: Optional[int] = None
+    html: Optional[str] = None
+    not_modified: bool = False
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_bytes: int = 0
+    elapsed_seconds: float = 0.0
+    links: List[str] = field(default_factory=list)
+    # The URL the page was served from after redirects, the base of its relative links
+    final_url: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the page was downloaded or is known to be unchanged."""
+        return self.error is None and (self.not_modified or self.html is not None)
+
+
+class ValidatorStore:
+    """
+    Stores the ETag and Last-Modified validators of fetched pages.
+
+    The validators are sent back with the next request for the same URL so
+    the server can answer 304 Not Modified instead of sending the body. The
+    links found on each page, and the URL they were resolved against after
+    redirects, are stored too, so a crawl can continue through pages that
+    were not downloaded again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the store and load any saved validators.
+
+        Args:
+            path: JSON file where the validators are saved
+        """
+        self.path = path
+        self._records: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path) as validators_file:
+                    self._records = json.load(validators_file)
+            except (OSError, ValueError):
+                self._records = {}
+
+    def get(self, url: str) -> Dict[str, object]:
+        """Return the saved validators of a URL, or an empty dict."""
+        with self._lock:
+            return dict(self._records.get(url, {}))
+
+    def urls(self) -> List[str]:
+        """Return the URLs with saved validators."""
+        with self._lock:
+            return list(self._records)
+
+    def forget(self, url: str) -> None:
+        """Forget the validators and links of a URL, so it is downloaded in full next time."""
+        with self._lock:
+            self._records.pop(url, None)
+
+    def record(self, result: FetchResult) -> None:
+        """Save the validators and links of a downloaded page."""
+        if result.html is None:
+            return
+        with self._lock:
+            self._records[result.url] = {
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+                "links": result.links,
+                "base_url": result.final_url or result.url,
+            }
+
+    def clear(self) -> None:
+        """Forget every saved validator."""
+        with self._lock:
+            self._records = {}
+
+    def save(self) -> None:
+        """Write the validators to disk."""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as validators_file:
+                json.dump(self._records, validators_file)
+            os.replace(temporary_path, self.path)
+
+
+class HostRateLimiter:
+    """
+    Limits the number of requests per second sent to each host.
+
+    Requests to different hosts do not wait for each other.
+    """
+
+    def __init__(self, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_second: Maximum request rate per host, 0 for no limit
+        """
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_request_time: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Block until a request to the host of the URL is allowed."""
+        if self.min_interval == 0.0:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time.get(host, now))
+            self._next_request_time[host] = request_time + self.min_interval
+        delay = request_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_session(pool_size: int = DEFAULT_MAX_CONCURRENCY) -> requests.Session:
+    """
+    Create an HTTP session that keeps connections alive between requests.
+
+    Args:
+        pool_size: Number of connections kept open per host
+
+    Returns:
+        A configured requests session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def extract_links(base_url: str, html: str) -> List[str]:
+    """
+    Extract the absolute http(s) links of a page, without fragments.
+
+    Args:
+        base_url: The URL of the page
+        html: The HTML content of the page
+
+    Returns:
+        The unique links in document order
+    """
+    import bs4
+
+    soup = bs4.BeautifulSoup(html, "html.parser", parse_only=bs4.SoupStrainer("a"))
+    links = []
+    seen_links = set()
+    for anchor in soup.find_all("a", href=True):
+        link, _ = urldefrag(urljoin(base_url, anchor["href"]))
+        if urlparse(link).scheme not in ("http", "https"):
+            continue
+        if link not in seen_links:
+            seen_links.add(link)
+            links.append(link)
+    return links
+
+
+def fetch_url(
+    session: requests.Session,
+    url: str,
+    validator_store: Optional[ValidatorStore] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> FetchResult:
+    """
+    Fetch one URL, sending saved validators as a conditional request.
+
+    Args:
+        session: The pooled HTTP session
+        url: The URL to fetch
+        validator_store: Optional store of ETag/Last-Modified validators
+        rate_limiter: Optional per-host rate limiter
+        timeout: Request timeout in seconds
+
+    Returns:
+        The fetch result, with not_modified set if the server answered 304
+    """
+    headers = {}
+    if validator_store is not None:
+        validators = validator_store.get(url)
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
+
+    start_time = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        return record_fetch(FetchResult(url=url, error=str(e), elapsed_seconds=time.perf_counter() - start_time))
+
+    result = FetchResult(
+        url=url,
+        status_code=response.status_code,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        content_bytes=len(response.content),
+        elapsed_seconds=time.perf_counter() - start_time,
+    )
+
+    if response.status_code == 304:
+        result.not_modified = True
+        if validator_store is not None:
+            result.links = list(validator_store.get(url).get("links", []))
+        return record_fetch(result)
+
+    if response.status_code >= 400:
+        result.error = f"HTTP {response.status_code}"
+        return record_fetch(result)
+
+    result.html = response.text
+    # Relative links are relative to the page after redirects, such as /docs -> /docs/
+    result.final_url = response.url
+    result.links = extract_links(response.url, result.html)
+    return record_fetch(result)
+
+
+def record_fetch(result: FetchResult) -> FetchResult:
+    """
+    Record a fetch as a "fetch" stage with its bytes and outcome.
+
+    Args:
+        result: The fetch result
+
+    Returns:
+        The same result
+    """
+    record_stage(
+        "fetch",
+        result.elapsed_seconds,
+        pages=1,
+        bytes=result.content_bytes,
+        not_modified=int(result.not_modified),
+        errors=int(result.error is not None),
+    )
+    return result
+
+
+def iter_fetch_urls(
+    urls: Iterable[str],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    validator_store: Optional[ValidatorStore] = None,
+    session: Optional[requests.Session] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+) -> Iterator[FetchResult]:
+    """
+    Fetch many URLs concurrently and yield each result as soon as it completes.
+
+    At most max_concurrency requests are in flight, so only a bounded number
+    of downloaded pages are held in memory at any time.
+
+    Args:
+        urls: The URLs to fetch
+        max_concurrency: Maximum number of requests in flight
+        requests_per_second_per_host: Maximum request rate per host
+        validator_store: Optional store of validators for conditional requests
+        session: Optional pooled session, created if not provided
+        rate_limiter: Optional shared rate limiter, created if not provided
+
+    Yields:
+        One fetch result per URL, in completion order
+    """
+    if session is None:
+        session = create_session(max_concurrency)
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(requests_per_second_per_host)
+
+    url_iterator = iter(urls)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight = set()
+        for url in itertools.islice(url_iterator, max_concurrency):
+            in_flight.add(executor.submit(fetch_url, session, url, validator_store, rate_limiter))
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if validator_store is not None:
+                    validator_store.record(result)
+                # Keep the pool busy before handing the result to the caller
+                for url in itertools.islice(url_iterator, 1):
+                    in_flight.add(executor.submit(fetch_url, session, url, validator_store, rate_limiter))
+                yield result
+
+
+def fetch_urls(
+    urls: List[str],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    validator_store: Optional[ValidatorStore] = None,
+    session: Optional[requests.Session] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+) -> List[FetchResult]:
+    """
+    Fetch many URLs concurrently.
+
+    Args:
+        urls: The URLs to fetch
+        max_concurrency: Maximum number of requests in flight
+        requests_per_second_per_host: Maximum request rate per host
+        validator_store: Optional store of validators for conditional requests
+        session: Optional pooled session, created if not provided
+        rate_limiter: Optional shared rate limiter, created if not provided
+
+    Returns:
+        One fetch result per URL, in the same order as the URLs
+    """
+    results_by_url = {}
+    for result in iter_fetch_urls(
+        urls,
+        max_concurrency=max_concurrency,
+        requests_per_second_per_host=requests_per_second_per_host,
+        validator_store=validator_store,
+        session=session,
+        rate_limiter=rate_limiter,
+    ):
+        results_by_url[result.url] = result
+
+    return [results_by_url[url] for url in urls]
+
+
+def is_in_crawl_scope(start_url: str, url: str) -> bool:
+    """
+    Check whether a URL belongs to the site being crawled.
+
+    A URL is in scope when it is on the same host as the start URL and its
+    path starts with the directory of the start URL.
+
+    Args:
+        start_url: The URL the crawl started from
+        url: The URL to check
+
+    Returns:
+        True if the URL should be crawled
+    """
+    start = urlparse(start_url)
+    candidate = urlparse(url)
+    if candidate.netloc != start.netloc:
+        return False
+    start_directory = start.path[: start.path.rfind("/") + 1] or "/"
+    return candidate.path.startswith(start_directory)
+
+
+def iter_crawl_site(
+    start_url: str,
+    max_pages: int = 100,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    validator_store: Optional[ValidatorStore] = None,
+) -> Iterator[FetchResult]:
+    """
+    Crawl a site breadth first and yield each page as soon as it is fetched.
+
+    New links are queued as pages complete, so the pool stays busy instead
+    of waiting for a whole level of the crawl to finish.
+
+    Args:
+        start_url: The URL to start from
+        max_pages: Maximum number of pages to fetch
+        max_concurrency: Maximum number of requests in flight
+        requests_per_second_per_host: Maximum request rate per host
+        validator_store: Optional store of validators for conditional requests
+
+    Yields:
+        The fetch result of every visited page, in completion order
+    """
+    print(f"Crawling {start_url} (up to {max_pages} pages)...")
+
+    session = create_session(max_concurrency)
+    rate_limiter = HostRateLimiter(requests_per_second_per_host)
+
+    start_url, _ = urldefrag(start_url)
+    queued_urls = {start_url}
+    frontier = deque([start_url])
+    submitted_count = 0
+    crawled_count = 0
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight = set()
+        while frontier or in_flight:
+            # Start fetching queued pages while there is room in the pool
+            while frontier and len(in_flight) < max_concurrency and submitted_count < max_pages:
+                url = frontier.popleft()
+                in_flight.add(executor.submit(fetch_url, session, url, validator_store, rate_limiter))
+                submitted_count += 1
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if validator_store is not None:
+                    validator_store.record(result)
+                for link in result.links:
+                    if link not in queued_urls and is_in_crawl_scope(start_url, link):
+                        queued_urls.add(link)
+                        frontier.append(link)
+                crawled_count += 1
+                yield result
+
+    print(f"Crawled {crawled_count} pages from {start_url}")
+
+
+def crawl_site(
+    start_url: str,
+    max_pages: int = 100,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second_per_host: float = DEFAULT_REQUESTS_PER_SECOND_PER_HOST,
+    validator_store: Optional[ValidatorStore] = None,
+) -> List[FetchResult]:
+    """
+    Crawl a site breadth first, fetching pages concurrently.
+
+    Args:
+        start_url: The URL to start from
+        max_pages: Maximum number of pages to fetch
+        max_concurrency: Maximum number of requests in flight
+        requests_per_second_per_host: Maximum request rate per host
+        validator_store: Optional store of validators for conditional requests
+
+    Returns:
+        The fetch results of every visited page
+    """
+    return list(iter_crawl_site(
+        start_url,
+        max_pages=max_pages,
+        max_concurrency=max_concurrency,
+        requests_per_second_per_host=requests_per_second_per_host,
+        validator_store=validator_store,
+    ))